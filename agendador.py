@@ -0,0 +1,414 @@
+"""
+Agendador de tarefas de manutenção e pré-processamento
+As definições das tarefas (agenda no formato cron) e o histórico de execuções
+ficam no próprio banco. Várias réplicas podem rodar o agendador ao mesmo
+tempo: uma trava com prazo (tabela agendador_trava) garante que apenas uma
+delas executa as tarefas.
+
+Execução:
+    - embutido: app8.py inicia uma thread por processo (iniciar_em_segundo_plano)
+    - separado: python agendador.py            (laço contínuo)
+                python agendador.py --uma-vez  (executa o que estiver pendente e sai)
+                python agendador.py --tarefa backup_noturno
+"""
+import argparse
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from arquivo_reservas import arquivar_reservas
+from armazenamento import atualizar_estatisticas_planejador, coletar_estatisticas, resumo_arquivo
+from cache_sync import limpar_change_log
+from consultas import CONSULTAS
+from database_backup import fazer_backup, limpar_backups_antigos, pasta_backups
+from eventos_reservas import atualizar_projecoes
+from filiais import bancos_das_filiais
+from limite_login import limpar_limites
+from operacoes import para_data
+from pdfgenerator import pre_renderizar_contrato, limpar_contratos_pre_renderizados
+from repositorio import ContextoDados
+from saude_banco import verificar_integridade
+from snapshot_analitico import atualizar_snapshot
+
+DB_FILE = 'locadora_v2.db'
+
+# Segundos entre verificações de tarefas pendentes
+INTERVALO_VERIFICACAO = 30
+
+# Validade da trava: se a réplica que a detém parar, outra assume após esse prazo
+DURACAO_TRAVA = 600
+
+# Identifica este processo como dono da trava
+DONO = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+# --- AGENDA (CRON) ---
+
+def _campo_cron(texto: str, minimo: int, maximo: int) -> set:
+    """Valores de um campo cron: *, 5, 1-5, */15, 0-30/10, 1,15"""
+    valores = set()
+    for parte in texto.split(','):
+        intervalo, _, passo = parte.partition('/')
+        if intervalo == '*':
+            inicio, fim = minimo, maximo
+        elif '-' in intervalo:
+            inicio, fim = (int(v) for v in intervalo.split('-', 1))
+        else:
+            inicio = fim = int(intervalo)
+            if passo:
+                fim = maximo
+        if inicio < minimo or fim > maximo or inicio > fim:
+            raise ValueError(f"Valor fora do intervalo {minimo}-{maximo}: {parte}")
+        valores.update(range(inicio, fim + 1, int(passo) if passo else 1))
+    return valores
+
+
+def proxima_execucao(agenda: str, depois: datetime) -> datetime:
+    """
+    Próximo instante (minuto cheio, estritamente após 'depois') que satisfaz a agenda
+    cron de 5 campos: minuto hora dia-do-mês mês dia-da-semana (0 ou 7 = domingo).
+    """
+    campos = agenda.split()
+    if len(campos) != 5:
+        raise ValueError(f"Agenda deve ter 5 campos: {agenda}")
+    minutos = sorted(_campo_cron(campos[0], 0, 59))
+    horas = sorted(_campo_cron(campos[1], 0, 23))
+    dias = _campo_cron(campos[2], 1, 31)
+    meses = _campo_cron(campos[3], 1, 12)
+    dias_semana = {d % 7 for d in _campo_cron(campos[4], 0, 7)}
+    # Como no cron: com dia do mês e dia da semana restritos, basta um dos dois
+    ambos_restritos = campos[2] != '*' and campos[4] != '*'
+
+    inicio = depois.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    dia = inicio.date()
+    for _ in range(366 * 5):
+        dia_semana = (dia.weekday() + 1) % 7
+        if ambos_restritos:
+            dia_ok = dia.day in dias or dia_semana in dias_semana
+        else:
+            dia_ok = dia.day in dias and dia_semana in dias_semana
+        if dia.month in meses and dia_ok:
+            for hora in horas:
+                for minuto in minutos:
+                    candidato = datetime(dia.year, dia.month, dia.day, hora, minuto)
+                    if candidato >= inicio:
+                        return candidato
+        dia += timedelta(days=1)
+    raise ValueError(f"Agenda sem execução nos próximos 5 anos: {agenda}")
+
+
+# --- TAREFAS ---
+
+def tarefa_backup(db_file):
+    backup_file, mensagem = fazer_backup(db_file)
+    if not backup_file:
+        raise RuntimeError(mensagem)
+    _, mensagem_limpeza = limpar_backups_antigos(backup_dir=pasta_backups(db_file))
+    return f"{mensagem}. {mensagem_limpeza}"
+
+
+def tarefa_otimizar(db_file):
+    removidos = limpar_change_log(db_file)
+    limpar_limites(db_file)
+    analisadas = atualizar_estatisticas_planejador(db_file)
+    coletar_estatisticas(db_file)
+    compactar = " Compactação recomendada (páginas livres)." if resumo_arquivo(db_file)['compactar'] else ""
+    return (f"ANALYZE: {', '.join(analisadas) or 'estatísticas em dia'}; PRAGMA optimize executado; "
+            f"{removidos} registro(s) antigos do change_log removidos.{compactar}")
+
+
+def tarefa_projecoes(db_file):
+    aplicados = atualizar_projecoes(db_file)
+    return "; ".join(f"{nome}: {quantidade} evento(s)" for nome, quantidade in aplicados.items())
+
+
+def tarefa_snapshot(db_file):
+    resumo = atualizar_snapshot(db_file)
+    return f"Cópia analítica atualizada ({resumo['modo']}) em {resumo['segundos']:.2f}s"
+
+
+def tarefa_pre_renderizar(db_file, dia: date = None):
+    """Gera os contratos das saídas previstas para amanhã (o balcão só baixa o arquivo)"""
+    dia = dia or date.today() + timedelta(days=1)
+    conn = sqlite3.connect(db_file)
+    try:
+        reservas = conn.execute(CONSULTAS['agendador_saidas_previstas'], (dia,)).fetchall()
+    finally:
+        conn.close()
+
+    contexto = ContextoDados(db_file)
+    gerados = 0
+    for reserva_id, cliente_id, carro_id, data_inicio, data_fim in reservas:
+        cliente = contexto.cliente(cliente_id)
+        carro = contexto.carro(carro_id)
+        if cliente is None or carro is None:
+            continue
+        pre_renderizar_contrato(cliente.to_dict(), carro.para_documento(), para_data(data_inicio), para_data(data_fim))
+        gerados += 1
+    removidos = limpar_contratos_pre_renderizados()
+    return f"{gerados} contrato(s) pré-gerado(s) para {dia.strftime('%d/%m/%Y')}; {removidos} antigo(s) removido(s)"
+
+
+def tarefa_arquivar(db_file):
+    return f"{arquivar_reservas(db_file)} reserva(s) encerrada(s) movida(s) para o arquivo morto"
+
+
+def tarefa_integridade(db_file):
+    verificacao = verificar_integridade(db_file)
+    if not verificacao['ok']:
+        raise RuntimeError(f"integrity_check encontrou problemas: {verificacao['resultado']}")
+    return f"integrity_check ok em {verificacao['segundos']:.2f}s"
+
+
+# nome -> (função, agenda padrão, descrição)
+TAREFAS = {
+    'backup_noturno': (tarefa_backup, '0 2 * * *', "Backup do banco e limpeza dos backups antigos"),
+    'otimizar_banco': (tarefa_otimizar, '30 2 * * *', "ANALYZE quando desatualizado, PRAGMA optimize, coleta de tamanhos e limpeza do change_log"),
+    'atualizar_snapshot': (tarefa_snapshot, '*/5 * * * *', "Atualização incremental da cópia analítica"),
+    'pre_renderizar_contratos': (tarefa_pre_renderizar, '0 3 * * *', "Contratos das saídas previstas para amanhã"),
+    'arquivar_reservas': (tarefa_arquivar, '15 3 * * *', "Reservas encerradas antigas para o arquivo morto"),
+    'verificar_integridade': (tarefa_integridade, '45 3 * * *', "PRAGMA integrity_check completo (resultado na página Backup)"),
+    'atualizar_projecoes': (tarefa_projecoes, '*/5 * * * *', "Projeções do livro de eventos (ocupação, movimento mensal, estado das reservas)"),
+}
+
+
+# --- PERSISTÊNCIA ---
+
+def instalar_agendador(db_file=DB_FILE, agora: datetime = None):
+    """Cria as tabelas do agendador e registra as tarefas conhecidas (sem alterar agendas já salvas)"""
+    agora = agora or datetime.now()
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS agendador_tarefas (
+            nome TEXT PRIMARY KEY,
+            agenda TEXT NOT NULL,
+            ativa INTEGER NOT NULL DEFAULT 1,
+            proxima_execucao TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS agendador_execucoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tarefa TEXT NOT NULL,
+            inicio TIMESTAMP NOT NULL,
+            fim TIMESTAMP,
+            status TEXT NOT NULL,
+            mensagem TEXT,
+            executado_por TEXT
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_agendador_execucoes_tarefa ON agendador_execucoes (tarefa, id)")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS agendador_trava (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            dono TEXT NOT NULL,
+            expira_em REAL NOT NULL
+        )
+    ''')
+    for nome, (_, agenda, _) in TAREFAS.items():
+        c.execute("INSERT OR IGNORE INTO agendador_tarefas (nome, agenda, ativa, proxima_execucao) VALUES (?, ?, 1, ?)",
+                  (nome, agenda, proxima_execucao(agenda, agora)))
+    conn.commit()
+    conn.close()
+
+
+def adquirir_trava(db_file=DB_FILE, dono: str = DONO, duracao: float = DURACAO_TRAVA) -> bool:
+    """Obtém ou renova a trava do agendador; False se outra réplica a detém"""
+    agora = time.time()
+    conn = sqlite3.connect(db_file, timeout=5)
+    try:
+        c = conn.execute('''
+            INSERT INTO agendador_trava (id, dono, expira_em) VALUES (1, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET dono = excluded.dono, expira_em = excluded.expira_em
+            WHERE agendador_trava.dono = excluded.dono OR agendador_trava.expira_em < ?
+        ''', (dono, agora + duracao, agora))
+        conn.commit()
+        return c.rowcount == 1
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def liberar_trava(db_file=DB_FILE, dono: str = DONO):
+    conn = sqlite3.connect(db_file, timeout=5)
+    try:
+        conn.execute("DELETE FROM agendador_trava WHERE id = 1 AND dono = ?", (dono,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def executar_tarefa(nome: str, db_file=DB_FILE, executado_por: str = DONO):
+    """Executa uma tarefa registrando a execução no histórico. Retorna (sucesso, mensagem)."""
+    funcao = TAREFAS[nome][0]
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        c = conn.execute("INSERT INTO agendador_execucoes (tarefa, inicio, status, executado_por) VALUES (?, ?, ?, ?)",
+                         (nome, datetime.now(), 'Executando', executado_por))
+        execucao_id = c.lastrowid
+        conn.commit()
+
+        try:
+            sucesso, mensagem = True, funcao(db_file)
+        except Exception as e:
+            sucesso, mensagem = False, str(e)
+
+        conn.execute("UPDATE agendador_execucoes SET fim = ?, status = ?, mensagem = ? WHERE id = ?",
+                     (datetime.now(), 'Sucesso' if sucesso else 'Erro', mensagem, execucao_id))
+        conn.commit()
+    finally:
+        conn.close()
+    return sucesso, mensagem
+
+
+def executar_pendentes(db_file=DB_FILE, agora: datetime = None, dono: str = DONO) -> list:
+    """
+    Executa as tarefas ativas cuja próxima execução já passou, se esta réplica
+    detiver a trava. Execuções perdidas (processo parado) rodam uma única vez.
+    Retorna [(tarefa, sucesso, mensagem)].
+    """
+    if not adquirir_trava(db_file, dono):
+        return []
+
+    agora = agora or datetime.now()
+    conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES)
+    try:
+        pendentes = conn.execute('''
+            SELECT nome, agenda FROM agendador_tarefas
+            WHERE ativa = 1 AND proxima_execucao <= ?
+            ORDER BY proxima_execucao
+        ''', (agora,)).fetchall()
+    finally:
+        conn.close()
+
+    resultados = []
+    for nome, agenda in pendentes:
+        if nome not in TAREFAS or not adquirir_trava(db_file, dono):
+            continue
+        sucesso, mensagem = executar_tarefa(nome, db_file, dono)
+        conn = sqlite3.connect(db_file, timeout=30)
+        try:
+            conn.execute("UPDATE agendador_tarefas SET proxima_execucao = ? WHERE nome = ?",
+                         (proxima_execucao(agenda, max(agora, datetime.now())), nome))
+            conn.commit()
+        finally:
+            conn.close()
+        resultados.append((nome, sucesso, mensagem))
+    return resultados
+
+
+def listar_tarefas(db_file=DB_FILE) -> list:
+    """Tarefas com a agenda, a próxima execução e o resultado da última execução"""
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    try:
+        linhas = conn.execute('''
+            SELECT t.nome, t.agenda, t.ativa, t.proxima_execucao,
+                   e.inicio AS ultima_execucao, e.status AS ultimo_status, e.mensagem AS ultima_mensagem
+            FROM agendador_tarefas t
+            LEFT JOIN agendador_execucoes e
+                ON e.id = (SELECT MAX(id) FROM agendador_execucoes WHERE tarefa = t.nome)
+            ORDER BY t.nome
+        ''').fetchall()
+    finally:
+        conn.close()
+    return [dict(linha, descricao=TAREFAS.get(linha['nome'], (None, None, ''))[2]) for linha in linhas]
+
+
+def historico_execucoes(db_file=DB_FILE, limite: int = 50) -> list:
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    try:
+        linhas = conn.execute('''
+            SELECT tarefa, inicio, fim, status, mensagem, executado_por
+            FROM agendador_execucoes ORDER BY id DESC LIMIT ?
+        ''', (limite,)).fetchall()
+    finally:
+        conn.close()
+    return [dict(linha) for linha in linhas]
+
+
+def alterar_tarefa(nome: str, agenda: str, ativa: bool, db_file=DB_FILE):
+    """Altera agenda/ativação de uma tarefa. Retorna (sucesso, mensagem)."""
+    try:
+        proxima = proxima_execucao(agenda, datetime.now())
+    except ValueError as e:
+        return False, f"Agenda inválida: {e}"
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.execute("UPDATE agendador_tarefas SET agenda = ?, ativa = ?, proxima_execucao = ? WHERE nome = ?",
+                     (agenda, int(ativa), proxima, nome))
+        conn.commit()
+    finally:
+        conn.close()
+    return True, f"Tarefa {nome} atualizada. Próxima execução: {proxima.strftime('%d/%m/%Y %H:%M')}"
+
+
+# --- EXECUÇÃO CONTÍNUA ---
+
+def executar_continuamente(db_file=DB_FILE, intervalo: float = INTERVALO_VERIFICACAO, parar: threading.Event = None):
+    parar = parar or threading.Event()
+    while not parar.is_set():
+        try:
+            executar_pendentes(db_file)
+        except Exception as e:
+            print(f"Erro no agendador: {e}")
+        parar.wait(intervalo)
+
+
+_threads = {}
+_thread_lock = threading.Lock()
+
+
+def iniciar_em_segundo_plano(db_file=DB_FILE):
+    """Inicia (uma vez por processo e por banco de filial) a thread do agendador embutido"""
+    with _thread_lock:
+        thread = _threads.get(db_file)
+        if thread is None or not thread.is_alive():
+            instalar_agendador(db_file)
+            thread = threading.Thread(target=executar_continuamente, args=(db_file,),
+                                      name=f'agendador:{db_file}', daemon=True)
+            thread.start()
+            _threads[db_file] = thread
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agendador de tarefas da locadora")
+    parser.add_argument('--uma-vez', action='store_true', help="Executa as tarefas pendentes e sai")
+    parser.add_argument('--tarefa', choices=sorted(TAREFAS), help="Executa uma tarefa imediatamente e sai")
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_VERIFICACAO)
+    parser.add_argument('--banco', help="Banco de uma filial (padrão: os bancos de todas as filiais)")
+    args = parser.parse_args()
+
+    bancos = [args.banco] if args.banco else bancos_das_filiais()
+    for banco in bancos:
+        instalar_agendador(banco)
+    if args.tarefa:
+        for banco in bancos:
+            sucesso, mensagem = executar_tarefa(args.tarefa, banco)
+            print(f"{'✅' if sucesso else '❌'} [{banco}] {args.tarefa}: {mensagem}")
+    elif args.uma_vez:
+        for banco in bancos:
+            for nome, sucesso, mensagem in executar_pendentes(banco):
+                print(f"{'✅' if sucesso else '❌'} [{banco}] {nome}: {mensagem}")
+    else:
+        print(f"Agendador em execução ({DONO}) para {', '.join(bancos)}, verificando a cada {args.intervalo:.0f}s")
+        parar = threading.Event()
+        threads = [threading.Thread(target=executar_continuamente, args=(banco, args.intervalo, parar),
+                                    name=f'agendador:{banco}') for banco in bancos]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            parar.set()
+        finally:
+            for banco in bancos:
+                liberar_trava(banco)
@@ -0,0 +1,366 @@
+"""
+API JSON da Locadora (ASGI), executada ao lado da interface Streamlit
+Expõe as mesmas operações de domínio (operacoes.py) sobre o mesmo banco,
+autenticando com as sessões do AuthManager (o session_id é o token Bearer).
+Cada requisição usa o banco da filial do usuário autenticado (filiais.py).
+
+Execução:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+    GET  /api/saude                          (sonda leve dos bancos: 200 ou 503)
+    POST /api/login                          {"username", "password"}
+    POST /api/logout
+    GET  /api/disponibilidade?inicio=AAAA-MM-DD&fim=AAAA-MM-DD
+    GET  /api/disponibilidade/proximas?inicio=AAAA-MM-DD&dias=N   (primeira data livre por modelo e por carro)
+    GET  /api/reservas?placa=&cliente=&status=Reservada,Locada&de=&ate=&depois=&limite=&arquivo=1
+                                             (busca paginada por cursor; "proximo" é o cursor da página seguinte)
+    POST /api/reservas                       {"carro_id", "cliente_id", "inicio", "fim", "km_franquia"?, "adiantamento"?}
+    POST /api/reservas/{id}/entrega          {"km_saida"?, "data_saida"?}
+    POST /api/reservas/{id}/devolucao        {"km_volta", "data_devolucao"?, "valor_lavagem"?, "valor_multas"?, "valor_danos"?, "valor_outros"?}
+    GET  /api/reservas/{id}/recibo[?formato=pdf]
+    GET  /api/reservas/{id}/eventos          (linha do tempo no livro de eventos)
+"""
+import json
+import logging
+import re
+from datetime import date, datetime
+from urllib.parse import parse_qs
+from auth import auth_manager
+from banco_async import executar, encerrar
+from busca_reservas import buscar_reservas, cursor_para_texto, ler_cursor, TAMANHO_PAGINA
+from eventos_reservas import eventos_da_reserva
+from estrutura_banco import criar_estrutura
+from filiais import banco_da_filial, bancos_das_filiais, filial_do_usuario
+from limite_login import endereco_encaminhado, PROXIES_CONFIAVEIS
+from operacoes import carros_disponiveis, proximas_janelas, janelas_por_modelo, reservar, entregar, devolver, montar_recibo, para_data
+from pdfgenerator import gerar_recibo_pdf
+from saude_banco import sonda, verificar_rapido
+
+# Erros internos vão para o log do servidor (uvicorn), não para a resposta
+logger = logging.getLogger('api')
+
+
+class ErroApi(Exception):
+    """Erro com status HTTP, convertido em resposta JSON {"erro": mensagem}"""
+
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+def _json_padrao(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+async def _responder(send, status: int, corpo: bytes, tipo: str = 'application/json'):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', tipo.encode()), (b'content-length', str(len(corpo)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': corpo})
+
+
+async def _responder_json(send, status: int, dados):
+    corpo = json.dumps(dados, default=_json_padrao, ensure_ascii=False).encode('utf-8')
+    await _responder(send, status, corpo, 'application/json; charset=utf-8')
+
+
+async def _ler_corpo(receive) -> dict:
+    corpo = b''
+    while True:
+        mensagem = await receive()
+        corpo += mensagem.get('body', b'')
+        if not mensagem.get('more_body'):
+            break
+    if not corpo:
+        return {}
+    try:
+        dados = json.loads(corpo)
+    except ValueError:
+        raise ErroApi(400, "Corpo da requisição não é um JSON válido")
+    if not isinstance(dados, dict):
+        raise ErroApi(400, "O corpo da requisição deve ser um objeto JSON")
+    return dados
+
+
+def _campo(dados: dict, nome: str, tipo, obrigatorio: bool = True, padrao=None):
+    """Lê e converte um campo do corpo/query (tipo: int, float ou para_data)"""
+    valor = dados.get(nome)
+    if valor is None or valor == '':
+        if obrigatorio:
+            raise ErroApi(400, f"Campo obrigatório ausente: {nome}")
+        return padrao
+    try:
+        return tipo(valor)
+    except (TypeError, ValueError):
+        raise ErroApi(400, f"Valor inválido para {nome}: {valor}")
+
+
+def _token(scope) -> str:
+    for nome, valor in scope.get('headers', []):
+        if nome == b'authorization':
+            partes = valor.decode('latin-1').split(' ', 1)
+            if len(partes) == 2 and partes[0].lower() == 'bearer':
+                return partes[1].strip()
+    return ''
+
+
+async def _usuario(scope, permissao: str) -> dict:
+    token = _token(scope)
+    usuario = await executar(auth_manager.validate_session, token) if token else None
+    if usuario is None:
+        raise ErroApi(401, "Sessão inválida ou expirada")
+    if permissao not in usuario['permissions']:
+        raise ErroApi(403, "Permissão insuficiente")
+    return usuario
+
+
+def _endereco(scope) -> str:
+    """Endereço do cliente: o do proxy confiável no X-Forwarded-For, ou o da conexão sem proxy"""
+    if PROXIES_CONFIAVEIS > 0:
+        for nome, valor in scope.get('headers', []):
+            if nome == b'x-forwarded-for':
+                return endereco_encaminhado(valor.decode('latin-1'))
+        return ''
+    return (scope.get('client') or ('', 0))[0]
+
+
+def _banco(requisicao) -> str:
+    """Banco da filial do usuário autenticado"""
+    try:
+        return banco_da_filial(filial_do_usuario(requisicao['usuario']))
+    except ValueError as e:
+        raise ErroApi(403, str(e))
+
+
+# --- HANDLERS ---
+
+async def saude(requisicao):
+    # Sonda leve de cada banco de filial (para o health check da plataforma de deploy)
+    bancos = {banco: await executar(sonda, banco) for banco in bancos_das_filiais()}
+    ok = all(resultado['ok'] for resultado in bancos.values())
+    return (200 if ok else 503), {'status': 'ok' if ok else 'erro', 'bancos': bancos}
+
+
+async def login(requisicao):
+    dados = requisicao['corpo']
+    sucesso, usuario = await executar(
+        auth_manager.authenticate, str(dados.get('username', '')), str(dados.get('password', '')),
+        _endereco(requisicao['scope']), 'api'
+    )
+    if not sucesso:
+        mensagem = usuario.get('error') if usuario else "Usuário ou senha incorretos"
+        raise ErroApi(429 if usuario and 'retry_after' in usuario else 401, mensagem)
+    return 200, {'token': usuario['session_id'], 'usuario': {
+        campo: usuario[campo] for campo in ('id', 'username', 'role', 'full_name', 'filial', 'permissions')
+    }}
+
+
+async def sair(requisicao):
+    await executar(auth_manager.logout, requisicao['usuario']['session_id'])
+    return 200, {'mensagem': "Sessão encerrada"}
+
+
+async def disponibilidade(requisicao):
+    query = requisicao['query']
+    inicio = _campo(query, 'inicio', para_data)
+    fim = _campo(query, 'fim', para_data)
+    if fim < inicio:
+        raise ErroApi(400, "A data de devolução deve ser igual ou posterior à data de retirada")
+    carros = await executar(carros_disponiveis, inicio, fim, _banco(requisicao))
+    return 200, {'inicio': inicio, 'fim': fim, 'total': len(carros), 'carros': carros}
+
+
+async def proximas_datas(requisicao):
+    query = requisicao['query']
+    inicio = _campo(query, 'inicio', para_data)
+    dias = _campo(query, 'dias', int)
+    if dias < 0:
+        raise ErroApi(400, "A duração da locação não pode ser negativa")
+    janelas = await executar(proximas_janelas, inicio, dias, _banco(requisicao))
+    return 200, {'inicio': inicio, 'dias': dias, 'modelos': janelas_por_modelo(janelas), 'carros': janelas}
+
+
+async def buscar(requisicao):
+    query = requisicao['query']
+    limite = _campo(query, 'limite', int, False, TAMANHO_PAGINA)
+    if not 1 <= limite <= 200:
+        raise ErroApi(400, "O limite deve estar entre 1 e 200")
+    status = [item.strip() for item in query.get('status', '').split(',') if item.strip()]
+    linhas, proximo = await executar(
+        buscar_reservas,
+        query.get('placa'),
+        query.get('cliente'),
+        status,
+        _campo(query, 'de', para_data, False),
+        _campo(query, 'ate', para_data, False),
+        _campo(query, 'depois', ler_cursor, False),
+        limite,
+        incluir_arquivo=query.get('arquivo') == '1',
+        db_file=_banco(requisicao),
+    )
+    return 200, {'total': len(linhas), 'reservas': linhas,
+                 'proximo': cursor_para_texto(proximo) if proximo else None}
+
+
+async def criar_reserva(requisicao):
+    dados = requisicao['corpo']
+    inicio = _campo(dados, 'inicio', para_data)
+    if inicio < date.today():
+        raise ErroApi(400, "A data de retirada não pode estar no passado")
+    sucesso, resultado = await executar(
+        reservar,
+        _campo(dados, 'carro_id', int),
+        _campo(dados, 'cliente_id', int),
+        inicio,
+        _campo(dados, 'fim', para_data),
+        _campo(dados, 'km_franquia', int, False, 300),
+        _campo(dados, 'adiantamento', float, False),
+        usuario=requisicao['usuario']['username'],
+        db_file=_banco(requisicao),
+    )
+    if not sucesso:
+        raise ErroApi(409, resultado)
+    return 201, {'reserva_id': resultado}
+
+
+async def confirmar_entrega(requisicao):
+    dados = requisicao['corpo']
+    sucesso, mensagem = await executar(
+        entregar,
+        requisicao['reserva_id'],
+        _campo(dados, 'km_saida', int, False),
+        _campo(dados, 'data_saida', para_data, False),
+        usuario=requisicao['usuario']['username'],
+        db_file=_banco(requisicao),
+    )
+    if not sucesso:
+        raise ErroApi(409, mensagem)
+    return 200, {'mensagem': mensagem}
+
+
+async def finalizar_devolucao(requisicao):
+    dados = requisicao['corpo']
+    sucesso, resultado = await executar(
+        devolver,
+        requisicao['reserva_id'],
+        _campo(dados, 'km_volta', int),
+        _campo(dados, 'data_devolucao', para_data, False),
+        _campo(dados, 'valor_lavagem', float, False, 0.0),
+        _campo(dados, 'valor_multas', float, False, 0.0),
+        _campo(dados, 'valor_danos', float, False, 0.0),
+        _campo(dados, 'valor_outros', float, False, 0.0),
+        usuario=requisicao['usuario']['username'],
+        db_file=_banco(requisicao),
+    )
+    if not sucesso:
+        raise ErroApi(409, resultado)
+    return 200, {'fechamento': resultado}
+
+
+async def recibo(requisicao):
+    dados_recibo = await executar(montar_recibo, requisicao['reserva_id'], _banco(requisicao))
+    if dados_recibo is None:
+        raise ErroApi(404, f"Reserva {requisicao['reserva_id']} não encontrada")
+    if requisicao['query'].get('formato') == 'pdf':
+        pdf_bytes = await executar(gerar_recibo_pdf, *dados_recibo)
+        return 200, pdf_bytes
+    cliente, carro, dados = dados_recibo
+    return 200, {'cliente': cliente, 'carro': carro, 'recibo': dados}
+
+
+async def eventos(requisicao):
+    lista = await executar(eventos_da_reserva, requisicao['reserva_id'], _banco(requisicao))
+    if not lista:
+        raise ErroApi(404, f"Reserva {requisicao['reserva_id']} não encontrada no livro de eventos")
+    return 200, {'reserva_id': requisicao['reserva_id'], 'eventos': lista}
+
+
+# (método, caminho, handler, permissão exigida ou None para rotas públicas)
+ROTAS = [
+    ('GET', re.compile(r'^/api/saude$'), saude, None),
+    ('POST', re.compile(r'^/api/login$'), login, None),
+    ('POST', re.compile(r'^/api/logout$'), sair, 'read'),
+    ('GET', re.compile(r'^/api/disponibilidade$'), disponibilidade, 'read'),
+    ('GET', re.compile(r'^/api/disponibilidade/proximas$'), proximas_datas, 'read'),
+    ('GET', re.compile(r'^/api/reservas$'), buscar, 'read'),
+    ('POST', re.compile(r'^/api/reservas$'), criar_reserva, 'write'),
+    ('POST', re.compile(r'^/api/reservas/(?P<reserva_id>\d+)/entrega$'), confirmar_entrega, 'write'),
+    ('POST', re.compile(r'^/api/reservas/(?P<reserva_id>\d+)/devolucao$'), finalizar_devolucao, 'write'),
+    ('GET', re.compile(r'^/api/reservas/(?P<reserva_id>\d+)/recibo$'), recibo, 'read'),
+    ('GET', re.compile(r'^/api/reservas/(?P<reserva_id>\d+)/eventos$'), eventos, 'read'),
+]
+
+
+def _rota(metodo: str, caminho: str):
+    caminho_encontrado = False
+    for metodo_rota, padrao, handler, permissao in ROTAS:
+        encontrado = padrao.match(caminho)
+        if encontrado:
+            caminho_encontrado = True
+            if metodo_rota == metodo:
+                return handler, permissao, encontrado.groupdict()
+    raise ErroApi(405 if caminho_encontrado else 404,
+                  "Método não permitido" if caminho_encontrado else "Rota não encontrada")
+
+
+async def _lifespan(receive, send):
+    while True:
+        mensagem = await receive()
+        if mensagem['type'] == 'lifespan.startup':
+            # Estrutura dos bancos no startup do servidor, não na importação do módulo
+            try:
+                for banco in bancos_das_filiais():
+                    saude_banco = await executar(verificar_rapido, banco)
+                    if not saude_banco['healthy']:
+                        await executar(criar_estrutura, banco)
+            except Exception as e:
+                logger.exception("Falha ao preparar os bancos no startup")
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensagem['type'] == 'lifespan.shutdown':
+            encerrar()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """Aplicação ASGI"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    try:
+        handler, permissao, argumentos = _rota(scope['method'], scope['path'])
+        query = {chave: valores[-1] for chave, valores in parse_qs(scope.get('query_string', b'').decode()).items()}
+        requisicao = {
+            'scope': scope,
+            'query': query,
+            'corpo': await _ler_corpo(receive) if scope['method'] == 'POST' else {},
+            'usuario': await _usuario(scope, permissao) if permissao else None,
+        }
+        if 'reserva_id' in argumentos:
+            requisicao['reserva_id'] = int(argumentos['reserva_id'])
+
+        status, resposta = await handler(requisicao)
+    except ErroApi as e:
+        await _responder_json(send, e.status, {'erro': e.mensagem})
+        return
+    except Exception:
+        # O detalhe (SQL, caminhos de arquivo) fica só no log do servidor
+        logger.exception("Erro interno em %s %s", scope['method'], scope['path'])
+        await _responder_json(send, 500, {'erro': "Erro interno"})
+        return
+
+    if isinstance(resposta, bytes):
+        await _responder(send, status, resposta, 'application/pdf')
+    else:
+        await _responder_json(send, status, resposta)
@@ -3,6 +3,7 @@ import sqlite3
 import pandas as pd
 from datetime import date, datetime, timedelta
 import os
+import time
 #import matplotlib.pyplot as plt
 import matplotlib
 matplotlib.use('Agg')
@@ -10,19 +11,45 @@ import matplotlib.pyplot as plt
 import io # Importar io para lidar com dados em memória
 from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font
-from pdfgenerator import gerar_contrato_pdf, gerar_recibo_pdf # Importa as funções do novo módulo
+from pdfgenerator import obter_contrato_pdf, gerar_recibo_pdf # Importa as funções do novo módulo
 from pdfgenerator import STATUS_CARRO, STATUS_CLIENTE # Importa os status do novo módulo
 from database_backup import interface_backup, fazer_backup # Importa funções de backup
-from init_db import init_db_production, check_db_health # Importa inicialização robusta
+from init_db import init_db_production # Importa inicialização robusta
+from saude_banco import estado_saude, invalidar_saude, ultima_verificacao # Saúde do banco em níveis (quick_check no início, integrity_check agendado)
 from auth import auth_manager, login_page, logout, require_login, get_current_user, check_permission, USER_ROLES # Importa sistema de autenticação
+from cache_sync import obter_cache # Cache do processo invalidado pelo change_log
+from consultas import CONSULTAS # Catálogo de consultas parametrizadas
+from conexao import obter_pool, verificar_restauracao # Pool de conexões com cache de statements
+from frota_analytics import obter_indicadores_frota, JANELA_UTILIZACAO_DIAS # Indicadores vetorizados da frota
+from repositorio import ContextoDados, contar_reservas_ativas_cliente # Consultas pontuais sem pandas
+from importacao import importar, COLUNAS as COLUNAS_IMPORTACAO, OBRIGATORIAS as OBRIGATORIAS_IMPORTACAO # Importação em lote
+from exportacao import exportar_zip, TIPOS_DOCUMENTO # Exportação em lote de contratos/recibos
+from armazem_blobs import guardar_blob, novo_blob, obter_blob, remover_blob # PDFs/ZIPs em disco; a sessão guarda só o handle
+from operacoes import reservar, entregar, editar_reserva, cancelar_reserva, calcular_fechamento, devolver, montar_recibo, proximas_janelas, janelas_por_modelo # Operações de domínio (compartilhadas com a API)
+from formatacao import formatar_moeda, moeda, datas, formatar_tabela, pagina, total_paginas # Formatação vetorizada para exibição
+from snapshot_analitico import consultar as consultar_snapshot, garantir_snapshot, atualizar_snapshot, descrever_idade # Cópia analítica para Histórico/Relatórios
+from armazenamento import resumo_arquivo, tamanhos_objetos, estatisticas_desatualizadas, atualizar_estatisticas_planejador, historico_linhas, crescimento_linhas, compactar_banco, formatar_bytes # Monitor de armazenamento
+from arquivo_reservas import estatisticas_arquivo, IDADE_ARQUIVAMENTO_DIAS # Arquivo morto das reservas encerradas
+from agendador import iniciar_em_segundo_plano, listar_tarefas, historico_execucoes, executar_tarefa, alterar_tarefa # Tarefas agendadas
+from simulacao_frota import obter_simulacao_frota, EXECUCOES_PADRAO, JANELA_HISTORICO_DIAS # Dimensionamento da frota por Monte Carlo
+from eventos_reservas import eventos_da_reserva, ocupacao_por_dia, movimento_mensal # Livro de eventos das reservas e projeções
+from filiais import listar_filiais, banco_da_filial, filial_do_usuario, bancos_das_filiais, consultar_filiais # Um banco (shard) por filial
+from busca_reservas import buscar_reservas, garantir_indices, STATUS_ATIVOS # Busca indexada de reservas com paginação por cursor
+from rastreamento import iniciar_rastro, definir_pagina, trecho, rastreado, percentis_por_pagina, trechos_mais_lentos # Tempos por página e perfil sob demanda
+from fragmentos import fragmento # Seções interativas como fragmentos (rerun só da seção)
 import numpy as np
 
 
-# --- INICIALIZAÇÃO DO BANCO DE DADOS ---
-# Verificar e inicializar banco para produção
-db_health = check_db_health()
-if not db_health['healthy']:
-    init_db_production()
+# --- RASTREAMENTO ---
+# Cada execução do script vira um rastro (tempo total + sql/pdf/gráficos/excel). Uma execução
+# interrompida por st.rerun()/st.stop() não chega ao fim do script e é gravada aqui, na seguinte
+rastro_anterior = st.session_state.pop('rastro_execucao', None)
+if rastro_anterior is not None:
+    rastro_anterior.encerrar(concluido=False)
+    if rastro_anterior.perfil:
+        st.session_state['perfil_execucao'] = rastro_anterior.perfil
+rastro_execucao = iniciar_rastro(perfilar=st.session_state.pop('perfilar_proxima_execucao', False))
+st.session_state['rastro_execucao'] = rastro_execucao
 
 # --- AUTENTICAÇÃO ---
 # Verificar login antes de mostrar aplicação
@@ -32,19 +59,118 @@ if not require_login():
 # Obter usuário atual
 current_user = get_current_user()
 
+# --- FILIAL E BANCO DE DADOS ---
+# Cada filial tem o seu banco; o administrador escolhe a filial na barra lateral
+if check_permission('manage_users'):
+    filial_atual = st.session_state.get('filial_selecionada', filial_do_usuario(current_user))
+else:
+    filial_atual = filial_do_usuario(current_user)
+try:
+    DB_FILE = banco_da_filial(filial_atual)
+except ValueError as e:
+    st.error(f"{e}. Peça ao administrador para revisar o cadastro do usuário.")
+    st.stop()
+
+# Banco restaurado por outra sessão/réplica: troca as conexões do pool e descarta o estado guardado
+verificar_restauracao(DB_FILE)
+
+# Verificar e inicializar o banco da filial para produção. O quick_check roda uma vez
+# por processo; os reruns só leem o estado guardado (o integrity_check completo é agendado)
+db_health = estado_saude(DB_FILE)
+if not db_health['healthy']:
+    init_db_production(DB_FILE)
+    invalidar_saude(DB_FILE)
+    db_health = estado_saude(DB_FILE)
+    if not db_health['healthy']:
+        st.error(f"⚠️ Problemas no banco de dados: {db_health.get('error') or db_health.get('integrity')}")
+
+# Índices da busca de reservas (uma vez por processo; a primeira criação em um banco grande leva alguns segundos)
+garantir_indices(DB_FILE)
+
+# Agendador embutido (uma thread por processo e por filial; a trava no banco garante uma única réplica executando).
+# Com AGENDADOR_EMBUTIDO=0 o agendador roda separado: python agendador.py
+if os.environ.get('AGENDADOR_EMBUTIDO', '1') != '0':
+    for banco_filial in bancos_das_filiais():
+        if banco_filial == DB_FILE or os.path.exists(banco_filial):
+            iniciar_em_segundo_plano(banco_filial)
+
+# Mapa de identidade desta execução: cada carro/cliente/reserva é lido no máximo uma vez por rerun
+contexto = ContextoDados(DB_FILE)
+
 # --- FUNÇÕES DE FORMATAÇÃO E UTILIDADE ---
 
-def formatar_moeda(valor):
-    """Formata um valor float para a moeda brasileira (R$ 0.000,00)."""
-    if valor is None:
-        valor = 0.0
-    # Garante que o separador decimal seja vírgula e o milhar seja ponto
-    return f"R$ {valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+def pagina_visivel(df, chave):
+    """
+    Recorta o DataFrame na página escolhida pelo usuário, para que só as linhas
+    exibidas sejam formatadas. O seletor só aparece quando há mais de uma página.
+    """
+    paginas = total_paginas(len(df))
+    if paginas == 1:
+        return df
+    numero = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1,
+                             step=1, key=f"pagina_{chave}")
+    st.caption(f"{len(df)} registros no total")
+    return pagina(df, numero)
+
+
+def _avancar_busca(chave, cursor):
+    st.session_state[f"cursores_{chave}"].append(cursor)
+
+
+def _voltar_busca(chave):
+    st.session_state[f"cursores_{chave}"].pop()
+
+
+def pagina_de_reservas(chave, filtros, **opcoes):
+    """
+    Página atual de uma busca de reservas paginada por cursor. A sessão guarda a
+    pilha de cursores das páginas já vistas (Anterior desempilha) e volta para a
+    primeira página quando os filtros mudam.
+    """
+    if st.session_state.get(f"filtros_{chave}") != filtros:
+        st.session_state[f"filtros_{chave}"] = filtros
+        st.session_state[f"cursores_{chave}"] = [None]
+    cursores = st.session_state[f"cursores_{chave}"]
+    linhas, proximo = buscar_reservas(**filtros, depois=cursores[-1], db_file=DB_FILE, **opcoes)
+
+    if len(cursores) > 1 or proximo:
+        col_anterior, col_pagina, col_proxima = st.columns([1, 2, 1])
+        col_anterior.button("⬅️ Anterior", key=f"anterior_{chave}", disabled=len(cursores) == 1,
+                            on_click=_voltar_busca, args=(chave,))
+        col_pagina.caption(f"Página {len(cursores)}")
+        col_proxima.button("Próxima ➡️", key=f"proxima_{chave}", disabled=proximo is None,
+                           on_click=_avancar_busca, args=(chave, proximo))
+    return pd.DataFrame(linhas)
+
+
+def guardar_para_download(dados, nome_arquivo, mime='application/pdf'):
+    """Grava o documento no armazém em disco; a sessão guarda apenas o handle"""
+    st.session_state.documento_download = guardar_blob(dados, nome_arquivo, mime)
+
+
+def botao_download(label, key=None, handle=None):
+    """
+    Botão de download do documento guardado (por padrão, o da sessão), lido do disco.
+    Retorna False se não há documento ou se ele já expirou.
+    """
+    documento = obter_blob(handle or st.session_state.get('documento_download'))
+    if documento is None:
+        return False
+    with open(documento['caminho'], 'rb') as arquivo:
+        st.download_button(label=label, data=arquivo, file_name=documento['nome_arquivo'],
+                           mime=documento['mime'], key=key)
+    return True
+
+
+def limpar_download():
+    """Remove o documento da sessão (e do disco)"""
+    remover_blob(st.session_state.get('documento_download'))
+    st.session_state.documento_download = None
 
 
 # --- BANCO DE DADOS ---
 def init_db():
-    conn = sqlite3.connect('locadora_v2.db', detect_types=sqlite3.PARSE_DECLTYPES)
+    conn = sqlite3.connect(DB_FILE, detect_types=sqlite3.PARSE_DECLTYPES)
     c = conn.cursor()
 
     c.execute('''
@@ -203,114 +329,178 @@ def init_db():
 
 
 def run_query(query, params=(), fetch=False):
-    conn = sqlite3.connect('locadora_v2.db', detect_types=sqlite3.PARSE_DECLTYPES)
-    c = conn.cursor()
+    """
+    Executa uma consulta do catálogo (consultas.CONSULTAS) em uma conexão do pool.
+    Retorna DataFrame (fetch=True), o ID inserido (INSERT), None ou a mensagem de erro.
+    """
     try:
-        c.execute(query, params)
-        if fetch:
-            data = c.fetchall()
-            headers = [description[0] for description in c.description]
-            conn.close()
-            return pd.DataFrame(data, columns=headers)
-        conn.commit()
-        if query.strip().upper().startswith("INSERT"):
-            last_id = c.lastrowid
-            conn.close()
-            return last_id
-        conn.close()
-        return None
+        with obter_pool(DB_FILE).conexao() as conn:
+            c = conn.execute(query, params)
+            if fetch:
+                data = c.fetchall()
+                headers = [description[0] for description in c.description]
+                return pd.DataFrame(data, columns=headers)
+            conn.commit()
+            if query.strip().upper().startswith("INSERT"):
+                return c.lastrowid
+            return None
     except Exception as e:
-        conn.close()
         return str(e)
 
 
 def run_query_dataframe(query, params=()):
     """Executa uma query SELECT e retorna um DataFrame, ou um DataFrame vazio em caso de erro."""
-    conn = sqlite3.connect('locadora_v2.db', detect_types=sqlite3.PARSE_DECLTYPES)
-    c = conn.cursor()
     try:
-        c.execute(query, params)
-        data = c.fetchall()
-        headers = [description[0] for description in c.description]
-        conn.close()
-        return pd.DataFrame(data, columns=headers)
+        with obter_pool(DB_FILE).conexao() as conn:
+            c = conn.execute(query, params)
+            data = c.fetchall()
+            headers = [description[0] for description in c.description]
+            return pd.DataFrame(data, columns=headers)
     except Exception as e:
         st.error(f"Erro ao executar consulta: {e}")
-        conn.close()
         return pd.DataFrame() # Retorna um DataFrame vazio em caso de erro
 
 
-def gerar_recibo_para_download(reserva_id):
-    # 1. Buscar dados da reserva
-    query_reserva = """
-        SELECT 
-            r.id, r.data_inicio, r.data_fim, r.km_saida, r.km_volta, r.km_franquia,
-            r.custo_lavagem, r.valor_multas, r.valor_danos, r.valor_outros, r.adiantamento, r.valor_total,
-            cl.nome AS cliente_nome, cl.cpf AS cliente_cpf, cl.telefone AS cliente_telefone,
-            c.modelo AS carro_modelo, c.placa AS carro_placa, c.cor AS carro_cor, c.preco_km AS carro_preco_km, c.diaria AS carro_diaria,
-            c.numero_chassi AS carro_chassi, c.numero_renavam AS carro_renavam
-        FROM reservas r
-        JOIN clientes cl ON r.cliente_id = cl.id
-        JOIN carros c ON r.carro_id = c.id
-        WHERE r.id = ?
+def run_query_analitica(query, params=()):
     """
-    reserva_df = run_query_dataframe(query_reserva, (reserva_id,))
+    Executa uma query SELECT na cópia analítica (Histórico e Relatórios), sem
+    disputar o banco principal com as gravações do balcão. Se a cópia não
+    estiver disponível, consulta o banco principal (somente leitura).
+    """
+    try:
+        return consultar_snapshot(query, params, DB_FILE)
+    except (sqlite3.Error, OSError):
+        try:
+            return consultar_snapshot(query, params, DB_FILE, copia=False)
+        except (sqlite3.Error, OSError) as e:
+            st.error(f"Erro ao executar consulta: {e}")
+            return pd.DataFrame()
 
-    if reserva_df.empty:
-        st.error(f"Reserva com ID {reserva_id} não encontrada.")
-        return None
 
-    reserva_data = reserva_df.iloc[0].to_dict()
+@rastreado('sql')
+def run_query_filiais(query, params=()):
+    """
+    Executa a consulta na cópia analítica de todas as filiais, em paralelo, com a
+    coluna 'Filial' na frente. Filiais que falharem são avisadas e ficam de fora.
+    """
+    df, erros = consultar_filiais(query, params)
+    for filial, erro in erros.items():
+        st.warning(f"Filial {filial} indisponível: {erro}")
+    return df
 
-    # Preparar dados do cliente
-    cliente = {
-        'nome': reserva_data['cliente_nome'],
-        'cpf': reserva_data['cliente_cpf'],
-        'telefone': reserva_data['cliente_telefone']
-    }
 
-    # Preparar dados do carro
-    carro = {
-        'modelo': reserva_data['carro_modelo'],
-        'placa': reserva_data['carro_placa'],
-        'cor': reserva_data['carro_cor'],
-        'preco_km': reserva_data['carro_preco_km'],
-        'diaria': reserva_data['carro_diaria'],
-        'chassi': reserva_data['carro_chassi'],
-        'renavam': reserva_data['carro_renavam']
-    }
+def exibir_proximas_janelas(inicio, fim):
+    """
+    Quando nenhum carro está livre: primeira data de retirada possível para a
+    mesma duração, por modelo e por carro (uma consulta em vez de tentar datas)
+    """
+    dias = (fim - inicio).days
+    janelas = proximas_janelas(inicio, dias, DB_FILE)
+    if not janelas:
+        return
+    st.markdown(f"##### 🔎 Próximas datas livres para {max(dias, 1)} dia(s)")
+    df_modelos = formatar_tabela(pd.DataFrame(janelas_por_modelo(janelas)), colunas_data=['janela_inicio', 'janela_fim'])
+    st.dataframe(df_modelos.rename(columns={
+        'modelo': 'Modelo', 'janela_inicio': 'Retirada', 'janela_fim': 'Devolução', 'carros': 'Carros Livres'}),
+        use_container_width=True, hide_index=True)
+    with st.expander("Por veículo"):
+        df_carros = formatar_tabela(pd.DataFrame(janelas)[['modelo', 'placa', 'janela_inicio', 'janela_fim']],
+                                    colunas_data=['janela_inicio', 'janela_fim'])
+        st.dataframe(df_carros.rename(columns={
+            'modelo': 'Modelo', 'placa': 'Placa', 'janela_inicio': 'Retirada', 'janela_fim': 'Devolução'}),
+            use_container_width=True, hide_index=True)
+
+
+def exibir_idade_snapshot(chave):
+    """Atualiza a cópia analítica se estiver velha e mostra a idade dos dados"""
+    try:
+        idade = garantir_snapshot(DB_FILE)
+    except (sqlite3.Error, OSError) as e:
+        st.warning(f"Cópia analítica indisponível, consultando o banco principal: {e}")
+        return
+    col_idade, col_botao = st.columns([4, 1])
+    col_idade.caption(f"📸 Dados analíticos atualizados há: {descrever_idade(idade)}")
+    if col_botao.button("🔄 Atualizar dados", key=f"atualizar_snapshot_{chave}"):
+        atualizar_snapshot(DB_FILE)
+        st.rerun()
+
+
+def run_query_cacheada(query, params=(), tabelas=('carros', 'clientes', 'reservas')):
+    """
+    Executa uma query SELECT usando o cache do processo.
+    O resultado é invalidado quando qualquer réplica altera uma das tabelas informadas.
+    Retorna uma cópia do DataFrame (ou a mensagem de erro, como run_query).
+    """
+    cache = obter_cache(DB_FILE)
+    chave = (query, tuple(params))
+    resultado = cache.obter(chave, tabelas, lambda: run_query(query, params, fetch=True))
+    if isinstance(resultado, str):
+        cache.invalidar(chave)  # Não mantém erros em cache
+        return resultado
+    return resultado.copy()
 
-    # Calcular dias de cobrança
-    data_inicio_dt = pd.to_datetime(reserva_data['data_inicio']).date()
-    data_fim_dt = pd.to_datetime(reserva_data['data_fim']).date()
-    dias_cobranca = (data_fim_dt - data_inicio_dt).days
-
-    # Preparar dados para o recibo
-    recibo_dados = {
-        'data_inicio': data_inicio_dt,
-        'data_fim': data_fim_dt,
-        'km_saida': reserva_data['km_saida'],
-        'km_volta': reserva_data['km_volta'],
-        'km_franquia': reserva_data['km_franquia'] if reserva_data['km_franquia'] is not None else 0.0,
-        'dias_cobranca': dias_cobranca,
-        'custo_diarias': reserva_data['carro_diaria'] * dias_cobranca,
-        'custo_km': max(0, reserva_data['km_volta'] - reserva_data['km_saida'] - (reserva_data['km_franquia'] if reserva_data['km_franquia'] is not None else 0.0)) * reserva_data['carro_preco_km'],
-        'valor_lavagem': reserva_data['custo_lavagem'] if reserva_data['custo_lavagem'] is not None else 0.0,
-        'valor_multas': reserva_data['valor_multas'] if reserva_data['valor_multas'] is not None else 0.0,
-        'valor_danos': reserva_data['valor_danos'] if reserva_data['valor_danos'] is not None else 0.0,
-        'valor_outros': reserva_data['valor_outros'] if reserva_data['valor_outros'] is not None else 0.0,
-        'adiantamento': reserva_data['adiantamento'] if reserva_data['adiantamento'] is not None else 0.0,
-        'total_final': reserva_data['valor_total']
-    }
+
+def gerar_recibo_para_download(reserva_id):
+    # 1. Buscar dados da reserva e montar os dados do recibo
+    dados_recibo = montar_recibo(reserva_id, DB_FILE)
+
+    if dados_recibo is None:
+        st.error(f"Reserva com ID {reserva_id} não encontrada.")
+        return None
 
     # Gerar o PDF
     try:
-        pdf_bytes = gerar_recibo_pdf(cliente, carro, recibo_dados)
+        pdf_bytes = gerar_recibo_pdf(*dados_recibo)
         return pdf_bytes
     except Exception as e:
         st.error(f"Erro ao gerar recibo PDF: {e}")
         return None
 
+def exibir_importacao(tipo):
+    """Aba de importação em lote (CSV/XLSX) de clientes ou carros"""
+    st.subheader("Importação em Lote (CSV / XLSX)")
+    st.caption(f"Colunas aceitas: {', '.join(COLUNAS_IMPORTACAO[tipo])}. "
+               f"Obrigatórias: {', '.join(OBRIGATORIAS_IMPORTACAO[tipo])}.")
+
+    if not check_permission('write'):
+        st.warning("⚠️ Você não tem permissão para importar registros.")
+        return
+
+    arquivo = st.file_uploader("Arquivo", type=['csv', 'xlsx'], key=f"importacao_{tipo}")
+    if arquivo is None:
+        return
+
+    col_validar, col_importar = st.columns(2)
+    validar = col_validar.button("🔍 Apenas Validar", key=f"validar_importacao_{tipo}")
+    gravar = col_importar.button("📥 Importar Linhas Válidas", type="primary", key=f"gravar_importacao_{tipo}")
+    if not (validar or gravar):
+        return
+
+    with st.spinner("Processando arquivo..."):
+        arquivo.seek(0)
+        resultado = importar(tipo, arquivo, arquivo.name, DB_FILE, apenas_validar=validar)
+
+    if resultado['importadas'] == 0 and resultado['erros'].empty:
+        st.error(resultado['mensagem'])
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Linhas Lidas", resultado['lidas'])
+    col2.metric("Válidas" if validar else "Importadas", resultado['importadas'])
+    col3.metric("Rejeitadas", resultado['rejeitadas'])
+    st.success(resultado['mensagem'])
+
+    if not resultado['erros'].empty:
+        st.dataframe(resultado['erros'], use_container_width=True)
+        st.download_button(
+            label="📄 Baixar Relatório de Erros (CSV)",
+            data=resultado['erros'].to_csv(index=False).encode('utf-8'),
+            file_name=f"importacao_{tipo}_erros.csv",
+            mime="text/csv",
+            key=f"relatorio_importacao_{tipo}"
+        )
+
+
 # --- INTERFACE ---
 # Título da Página com acento
 st.set_page_config(page_title="Locadora Iguacu Veiculos", layout="wide", page_icon="🚗")
@@ -319,6 +509,11 @@ st.set_page_config(page_title="Locadora Iguacu Veiculos", layout="wide", page_ic
 st.sidebar.markdown("---")
 st.sidebar.markdown(f"**👤 {current_user['full_name']}**")
 st.sidebar.markdown(f"**🔒 {current_user['role'].title()}**")
+if check_permission('manage_users') and len(listar_filiais()) > 1:
+    st.sidebar.selectbox("🏢 Filial", listar_filiais(), index=listar_filiais().index(filial_atual),
+                         key="filial_selecionada")
+else:
+    st.sidebar.markdown(f"**🏢 {filial_atual.title()}**")
 
 if st.sidebar.button("🚪 Logout", key="logout_btn"):
     logout()
@@ -335,14 +530,15 @@ if check_permission('manage_users'):
     menu_options.append("👥 Gerenciar Usuários")
 
 menu = st.sidebar.radio("Ir para", menu_options, key="main_menu_selector")
+definir_pagina(menu)
 
 # 1. DASHBOARD
 if menu == "Dashboard":
     st.title("📊 Painel Gerencial e Agenda do Dia")
 
     # 1. Métricas Principais
-    df_carros = run_query("SELECT * FROM carros", fetch=True)
-    df_reservas = run_query("SELECT * FROM reservas", fetch=True)
+    df_carros = run_query_cacheada(CONSULTAS['carros_todos'], tabelas=('carros',))
+    df_reservas = run_query_cacheada(CONSULTAS['reservas_todas'], tabelas=('reservas',))
 
     df_carros = df_carros if not isinstance(df_carros, str) else pd.DataFrame()
     df_reservas = df_reservas if not isinstance(df_reservas, str) else pd.DataFrame()
@@ -354,67 +550,29 @@ if menu == "Dashboard":
     ultimo_dia_mes = (proximo_mes - timedelta(days=proximo_mes.day)).strftime('%Y-%m-%d')
 
     # A consulta de faturamento usa o 'status' original 'Finalizada'
-    query_faturamento_mensal = f"""
-        SELECT SUM(valor_total) FROM reservas 
-        WHERE status = 'Finalizada' 
-        AND data_fim BETWEEN '{primeiro_dia_mes}' AND '{ultimo_dia_mes}'
-    """
+    df_faturamento_mensal = run_query_cacheada(CONSULTAS['dashboard_faturamento_periodo'],
+                                               (primeiro_dia_mes, ultimo_dia_mes), tabelas=('reservas',))
+    faturamento_mensal_resultado = df_faturamento_mensal.iloc[0, 0] if not isinstance(df_faturamento_mensal, str) else None
 
-    conn = sqlite3.connect('locadora_v2.db')
-    c = conn.cursor()
-    c.execute(query_faturamento_mensal)
-    faturamento_mensal_resultado = c.fetchone()[0]
-    conn.close()
-
-    faturamento_mensal = faturamento_mensal_resultado if faturamento_mensal_resultado else 0.0
+    faturamento_mensal = faturamento_mensal_resultado if pd.notna(faturamento_mensal_resultado) and faturamento_mensal_resultado else 0.0
     # ---------------------------------------------
 
     hoje_str = date.today().strftime('%Y-%m-%d')
 
     # Busca Locados (reserva_status = 'Locada')
-    query_locados = f"""
-        SELECT 
-            c.modelo, c.placa, r.data_fim, cl.nome as cliente 
-        FROM reservas r
-        JOIN carros c ON r.carro_id = c.id
-        JOIN clientes cl ON r.cliente_id = cl.id
-        WHERE r.status = 'Ativa' AND r.reserva_status = 'Locada'
-    """
-    df_locados = run_query(query_locados, fetch=True)
+    df_locados = run_query_cacheada(CONSULTAS['dashboard_locados'])
     df_locados = df_locados if not isinstance(df_locados, str) else pd.DataFrame()
 
     # Busca Reservados (reserva_status = 'Reservada')
-    query_reservados = f"""
-        SELECT 
-            c.modelo, c.placa, r.data_inicio, cl.nome as cliente 
-        FROM reservas r
-        JOIN carros c ON r.carro_id = c.id
-        JOIN clientes cl ON r.cliente_id = cl.id
-        WHERE r.status = 'Ativa' AND r.reserva_status = 'Reservada'
-    """
-    df_reservados = run_query(query_reservados, fetch=True)
+    df_reservados = run_query_cacheada(CONSULTAS['dashboard_reservados'])
     df_reservados = df_reservados if not isinstance(df_reservados, str) else pd.DataFrame()
 
     # Consultas de Agenda (usando o novo reserva_status)
     # Devoluções Previstas são carros Locados (que saíram) e devem voltar hoje
-    query_entradas_hoje = f"""
-        SELECT c.modelo, c.placa, cl.nome AS cliente, r.data_fim
-        FROM reservas r 
-        JOIN carros c ON r.carro_id = c.id
-        JOIN clientes cl ON r.cliente_id = cl.id
-        WHERE r.status = 'Ativa' AND r.reserva_status = 'Locada' AND date(r.data_fim) = date('{hoje_str}')
-    """
-    entradas_hoje = run_query(query_entradas_hoje, fetch=True)
+    entradas_hoje = run_query_cacheada(CONSULTAS['dashboard_entradas_dia'], (hoje_str,))
 
     # Saídas Previstas são reservas que precisam ser entregues hoje
-    query_saidas_hoje = f"""
-        SELECT c.modelo, c.placa, cl.nome AS cliente, r.data_inicio
-        FROM reservas r 
-        JOIN carros c ON r.carro_id = c.id
-        JOIN clientes cl ON r.cliente_id = cl.id
-        WHERE r.reserva_status = 'Reservada' AND date(r.data_inicio) = date('{hoje_str}')
-    """
-    saidas_hoje = run_query(query_saidas_hoje, fetch=True)
+    saidas_hoje = run_query_cacheada(CONSULTAS['dashboard_saidas_dia'], (hoje_str,))
 
     df_entradas = entradas_hoje if not isinstance(entradas_hoje, str) else pd.DataFrame()
     df_saidas = saidas_hoje if not isinstance(saidas_hoje, str) else pd.DataFrame()
@@ -431,51 +589,50 @@ if menu == "Dashboard":
     # --- CHECAGEM RÁPIDA DE DISPONIBILIDADE (CORRIGIDO) ---
     st.subheader("🗓️ Verificação Rápida de Disponibilidade")
 
-    col_data1, col_data2 = st.columns(2)
+    # Seção isolada: mudar as datas reexecuta só a verificação, não as métricas e a agenda
+    @fragmento("Verificação de Disponibilidade")
+    def secao_verificacao_disponibilidade():
+        col_data1, col_data2 = st.columns(2)
 
-    data_inicio_check = col_data1.date_input("Início da Locação", date.today(), key="check_inicio")
-    data_fim_check = col_data2.date_input("Fim da Locação", data_inicio_check + timedelta(days=1),
-                                          min_value=data_inicio_check, key="check_fim")
-    #data_fim_check = col_data2.date_input("Fim da Locação", date.today() + timedelta(days=7),
-                                          #min_value=data_inicio_check, key="check_fim")
+        data_inicio_check = col_data1.date_input("Início da Locação", date.today(), key="check_inicio")
+        data_fim_check = col_data2.date_input("Fim da Locação", data_inicio_check + timedelta(days=1),
+                                              min_value=data_inicio_check, key="check_fim")
+        #data_fim_check = col_data2.date_input("Fim da Locação", date.today() + timedelta(days=7),
+                                              #min_value=data_inicio_check, key="check_fim")
 
-    if data_inicio_check <= data_fim_check:
+        if data_inicio_check <= data_fim_check:
 
-        # CORREÇÃO CRÍTICA APLICADA AQUI: data_fim >= DATE('{inicio}', '-1 day')
-        # Garante que, se a reserva termina no dia 27, a checagem só causa conflito até o dia 27 (28-1),
-        # permitindo o aluguel no dia 28.
+            # CORREÇÃO CRÍTICA APLICADA AQUI: data_fim >= DATE('{inicio}', '-1 day')
+            # Garante que, se a reserva termina no dia 27, a checagem só causa conflito até o dia 27 (28-1),
+            # permitindo o aluguel no dia 28.
 
-        query_check = f"""
-            SELECT modelo, placa, diaria, preco_km 
-            FROM carros 
-            WHERE status NOT IN ('Indisponível', 'Excluído')  -- <<< Considera todos, exceto Indisponível
-            AND id NOT IN (
-                SELECT carro_id FROM reservas 
-                WHERE reserva_status IN ('Reservada', 'Locada') -- <<< Apenas reservas ativas
-                AND (data_inicio <= '{data_fim_check}' AND data_fim >= DATE('{data_inicio_check}', '+0 day'))
+            # Considera todos os carros, exceto Indisponível/Excluído, sem reservas ativas no período
+            livres_check = run_query_cacheada(
+                CONSULTAS['carros_disponiveis_periodo_resumo'],
+                (STATUS_CARRO['INDISPONIVEL'], STATUS_CARRO['EXCLUIDO'], data_fim_check, data_inicio_check)
             )
-        """
-        livres_check = run_query(query_check, fetch=True)
 
 
-        if not isinstance(livres_check, str) and not livres_check.empty:
-            st.success(
-                f"✅ {len(livres_check)} Veículos Disponíveis de {data_inicio_check.strftime('%d/%m')} a {data_fim_check.strftime('%d/%m')}.")
+            if not isinstance(livres_check, str) and not livres_check.empty:
+                st.success(
+                    f"✅ {len(livres_check)} Veículos Disponíveis de {data_inicio_check.strftime('%d/%m')} a {data_fim_check.strftime('%d/%m')}.")
 
-            # Formatando as moedas para exibição
-            livres_check['Diária (R$)'] = livres_check['diaria'].apply(lambda x: formatar_moeda(x).replace('R$ ', ''))
-            livres_check['Preço/KM (R$)'] = livres_check['preco_km'].apply(
-                lambda x: formatar_moeda(x).replace('R$ ', ''))
+                # Formatando as moedas para exibição
+                livres_check['Diária (R$)'] = moeda(livres_check['diaria'], simbolo=False)
+                livres_check['Preço/KM (R$)'] = moeda(livres_check['preco_km'], simbolo=False)
 
-            st.dataframe(
-                livres_check.rename(columns={'modelo': 'Modelo', 'placa': 'Placa'})[
-                    ['Modelo', 'Placa', 'Diária (R$)', 'Preço/KM (R$)']],
-                use_container_width=True
-            )
-        elif isinstance(livres_check, str):
-            st.error(f"Erro ao consultar disponibilidade: {livres_check}")
-        else:
-            st.warning("⚠️ Nenhum carro disponível para o período selecionado.")
+                st.dataframe(
+                    livres_check.rename(columns={'modelo': 'Modelo', 'placa': 'Placa'})[
+                        ['Modelo', 'Placa', 'Diária (R$)', 'Preço/KM (R$)']],
+                    use_container_width=True
+                )
+            elif isinstance(livres_check, str):
+                st.error(f"Erro ao consultar disponibilidade: {livres_check}")
+            else:
+                st.warning("⚠️ Nenhum carro disponível para o período selecionado.")
+                exibir_proximas_janelas(data_inicio_check, data_fim_check)
+
+    secao_verificacao_disponibilidade()
 
     st.divider()
 
@@ -485,7 +642,7 @@ if menu == "Dashboard":
     with col_status1:
         st.subheader("Situação da Frota: Carros Locados")
         if not df_locados.empty:
-            df_locados['data_fim'] = pd.to_datetime(df_locados['data_fim']).dt.strftime('%d/%m/%Y')
+            df_locados['data_fim'] = datas(df_locados['data_fim'])
 
             st.dataframe(
                 df_locados.rename(columns={
@@ -502,7 +659,7 @@ if menu == "Dashboard":
     with col_status2:
         st.subheader("Situação da Frota: Carros Reservados (Aguardando Entrega)")
         if not df_reservados.empty:
-            df_reservados['data_inicio'] = pd.to_datetime(df_reservados['data_inicio']).dt.strftime('%d/%m/%Y')
+            df_reservados['data_inicio'] = datas(df_reservados['data_inicio'])
 
             st.dataframe(
                 df_reservados.rename(columns={
@@ -538,6 +695,25 @@ if menu == "Dashboard":
         else:
             st.info("Nenhuma nova locação agendada.")
 
+    # 4. Projeções do livro de eventos (atualizadas só com os eventos novos)
+    st.divider()
+    col_ocupacao, col_movimento = st.columns(2)
+    with col_ocupacao:
+        st.subheader("Ocupação: Próximos 14 Dias")
+        ocupacao = ocupacao_por_dia(date.today(), date.today() + timedelta(days=13), DB_FILE)
+        with trecho('grafico', 'ocupacao_14_dias'):
+            st.bar_chart(pd.DataFrame({'Reservas': list(ocupacao.values())},
+                                      index=[dia.strftime('%d/%m') for dia in ocupacao]))
+    with col_movimento:
+        st.subheader("Movimento por Mês")
+        movimento = movimento_mensal(DB_FILE, meses=6)
+        if movimento:
+            st.dataframe(formatar_tabela(pd.DataFrame(movimento), colunas_moeda=['receita']).rename(columns={
+                'mes': 'Mês', 'reservas': 'Reservas', 'cancelamentos': 'Cancelamentos',
+                'devolucoes': 'Devoluções', 'receita': 'Receita'}), use_container_width=True, hide_index=True)
+        else:
+            st.info("Nenhum evento de reserva registrado.")
+
 
 # 2. CLIENTES (COMPLETO: CADASTRO, EDIÇÃO, EXCLUSÃO E OBSERVAÇÕES)
 elif menu == "Clientes":
@@ -545,7 +721,10 @@ elif menu == "Clientes":
 
     # Banco já foi inicializado no início da aplicação
 
-    tab1, tab2 = st.tabs(["Cadastrar Novo", "Ver / Editar Clientes"])
+    tab1, tab2, tab_importar = st.tabs(["Cadastrar Novo", "Ver / Editar Clientes", "Importar em Lote"])
+
+    with tab_importar:
+        exibir_importacao('clientes')
 
     with tab1:
         st.subheader("Cadastro de Cliente")
@@ -575,7 +754,7 @@ elif menu == "Clientes":
                 else:
                     # Incluindo 'validade_cnh' e 'observacoes' na query INSERT
                     res = run_query(
-                        "INSERT INTO clientes (nome, cpf, cnh, validade_cnh, telefone, endereco, observacoes) VALUES (?,?,?,?,?,?,?)",
+                        CONSULTAS['cliente_inserir'],
                         (nome, cpf, cnh, validade_cnh, telefone, endereco, observacoes)
                     )
                     if isinstance(res, str):
@@ -587,13 +766,11 @@ elif menu == "Clientes":
 
     with tab2:
         # Filtra para não exibir clientes com status 'Removido' na lista principal
-        df_clientes = run_query_dataframe(f"SELECT * FROM clientes WHERE status != '{STATUS_CLIENTE['REMOVIDO']}'")
+        df_clientes = run_query_dataframe(CONSULTAS['clientes_exceto_status'], (STATUS_CLIENTE['REMOVIDO'],))
         if not df_clientes.empty:
 
-            # Formatação para exibição
-            df_clientes_display = df_clientes.copy()
-            df_clientes_display['validade_cnh'] = pd.to_datetime(df_clientes_display['validade_cnh']).dt.strftime(
-                '%d/%m/%Y')
+            # Formatação para exibição (apenas a página visível)
+            df_clientes_display = formatar_tabela(pagina_visivel(df_clientes, 'clientes'), colunas_data=['validade_cnh'])
 
             st.dataframe(df_clientes_display, use_container_width=True)
 
@@ -639,11 +816,7 @@ elif menu == "Clientes":
                         if not up_nome or not up_cnh or not up_telefone:
                             st.error("⚠️ Os campos Nome, CNH e Telefone não podem ficar vazios.")
                         else:
-                            run_query("""
-                                UPDATE clientes 
-                                SET nome=?, cnh=?, validade_cnh=?, telefone=?, endereco=?, observacoes=? 
-                                WHERE id=?
-                            """, (
+                            run_query(CONSULTAS['cliente_atualizar'], (
                             up_nome, up_cnh, up_validade_cnh, up_telefone, up_endereco, up_observacoes, id_cliente_sel))
                             st.toast("Cliente atualizado!", icon="✔️")
                             st.success(f"Cliente **{up_nome}** atualizado com sucesso!")
@@ -651,18 +824,14 @@ elif menu == "Clientes":
 
                     if col_botoes[1].form_submit_button("🗑️ Marcar como REMOVIDO"):
                         # --- CHECAGEM CRÍTICA DE RESERVAS ATIVAS (REPETIDA DA LÓGICA ANTERIOR) ---
-                        reservas_ativas_check = run_query(
-                            "SELECT COUNT(*) FROM reservas WHERE cliente_id=? AND reserva_status IN ('Reservada', 'Locada')",
-                            (id_cliente_sel,),
-                            fetch=True
-                        ).iloc[0, 0]
+                        reservas_ativas_check = contar_reservas_ativas_cliente(id_cliente_sel, DB_FILE)
 
                         if reservas_ativas_check > 0:
                             st.error(
                                 f"❌ Não é possível remover. O cliente possui {reservas_ativas_check} reserva(s) Ativa(s). Finalize a devolução primeiro.")
                         else:
                             # Se não há reservas ativas, marca o cliente como 'Removido'
-                            run_query("UPDATE clientes SET status=? WHERE id=?", (STATUS_CLIENTE['REMOVIDO'], id_cliente_sel))
+                            run_query(CONSULTAS['cliente_atualizar_status'], (STATUS_CLIENTE['REMOVIDO'], id_cliente_sel))
                             st.toast("Cliente marcado como Removido!", icon="🗑️")
                             st.warning("Cliente marcado como **REMOVIDO** (Registro mantido para histórico).")
                             st.rerun()
@@ -674,7 +843,10 @@ elif menu == "Clientes":
 elif menu == "Frota (Carros)":
     st.title("🚙 Gestão da Frota")
 
-    tab1, tab2 = st.tabs(["Cadastrar Veículo", "Ver / Editar / Status"])
+    tab1, tab2, tab_importar = st.tabs(["Cadastrar Veículo", "Ver / Editar / Status", "Importar em Lote"])
+
+    with tab_importar:
+        exibir_importacao('carros')
 
     with tab1:
         st.subheader("Cadastro de Novo Veículo")
@@ -706,7 +878,7 @@ elif menu == "Frota (Carros)":
                     st.error("⚠️ Preencha Modelo, Placa, Cor, Número do Chassi, Número do Renavam, Ano do Veículo e certifique-se que a Diária seja maior que zero.")
                 else:
                     res = run_query(
-                        "INSERT INTO carros (modelo, placa, cor, km_atual, diaria, preco_km, status, numero_chassi, numero_renavam, ano_veiculo, km_troca_oleo) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                        CONSULTAS['carro_inserir'],
                         (modelo, placa, cor, km, diaria, p_km, status_inicial, numero_chassi, numero_renavam, ano_veiculo, km_troca_oleo)
                     )
                     if isinstance(res, str):
@@ -717,19 +889,32 @@ elif menu == "Frota (Carros)":
                         st.rerun()
 
     with tab2:
-        df = run_query(f"SELECT * FROM carros WHERE status != '{STATUS_CARRO['EXCLUIDO']}'", fetch=True)
+        df = run_query(CONSULTAS['carros_exceto_status'], (STATUS_CARRO['EXCLUIDO'],), fetch=True)
         if not isinstance(df, str) and not df.empty:
             st.subheader("Frota Atual")
-            # Adiciona coluna calculada para KM até próxima troca de óleo
-            df_display = df.copy()
-            df_display['km_ate_proxima_troca'] = df_display.apply(
-                lambda row: max(0, int(row['km_troca_oleo']) - int(row['km_atual'])) if pd.notna(row['km_troca_oleo']) and pd.notna(row['km_atual']) else 0,
-                axis=1
-            )
+            # Indicadores calculados de forma vetorizada (em cache até carros/reservas mudarem)
+            indicadores = obter_indicadores_frota(DB_FILE)
+            df_display = df.join(indicadores, on='id')
 
-            # Exibe apenas as colunas principais incluindo a nova coluna calculada
+            # Exibe apenas as colunas principais incluindo as colunas calculadas
             st.dataframe(df_display[['id', 'modelo', 'placa', 'cor', 'km_atual', 'km_troca_oleo', 'km_ate_proxima_troca', 'diaria', 'status', 'numero_chassi', 'numero_renavam', 'ano_veiculo']], use_container_width=True)
 
+            st.subheader("📈 Indicadores da Frota")
+            st.caption(f"Utilização nos últimos {JANELA_UTILIZACAO_DIAS} dias; KM/dia e receita sobre as locações finalizadas.")
+            col_u, col_k, col_r = st.columns(3)
+            col_u.metric("Utilização Média", f"{df_display['utilizacao_pct'].mean():.1f}%")
+            col_k.metric("KM Médio por Dia", f"{df_display['km_por_dia'].mean():.1f}")
+            col_r.metric("Receita Total da Frota", formatar_moeda(df_display['receita_total'].sum()))
+            indicadores_display = df_display[['id', 'modelo', 'placa', 'utilizacao_pct', 'km_por_dia',
+                                              'km_ate_proxima_troca', 'previsao_troca_oleo', 'receita_total']].copy()
+            indicadores_display['previsao_troca_oleo'] = datas(indicadores_display['previsao_troca_oleo'], vazio='-')
+            indicadores_display['receita_total'] = moeda(indicadores_display['receita_total'])
+            st.dataframe(indicadores_display.rename(columns={
+                'utilizacao_pct': 'Utilização (%)', 'km_por_dia': 'KM/Dia',
+                'km_ate_proxima_troca': 'KM até Troca', 'previsao_troca_oleo': 'Previsão Troca de Óleo',
+                'receita_total': 'Receita'
+            }), use_container_width=True)
+
             carro_opcoes = df['id'].astype(str) + " - " + df['modelo'] + " (" + df['placa'] + ")"
             opcoes_com_placeholder = ["Selecione o veículo..."] + carro_opcoes.tolist()
 
@@ -791,7 +976,7 @@ elif menu == "Frota (Carros)":
                             st.error("❌ O KM atualizado não pode ser menor que o KM registrado anteriormente.")
                         else:
                             # Atualiza todos os campos
-                            run_query("UPDATE carros SET cor=?, diaria=?, preco_km=?, km_atual=?, status=?, numero_chassi=?, numero_renavam=?, ano_veiculo=?, km_troca_oleo=? WHERE id=?",
+                            run_query(CONSULTAS['carro_atualizar'],
                                       (up_cor, up_diaria, up_p_km, up_km, up_status, up_numero_chassi, up_numero_renavam, up_ano_veiculo, up_km_troca_oleo, id_edit))
                             st.toast("Dados do veículo atualizados!", icon="✔️")
                             st.success(f"Veículo **{dados_atuais['modelo']}** atualizado para status **{up_status}**!")
@@ -805,7 +990,7 @@ elif menu == "Frota (Carros)":
                                 f"❌ Não é possível excluir. O carro está **{dados_atuais['status']}**. Finalize a pendência primeiro.")
                         else:
                             # Se não está em locação, define o status para 'EXCLUIDO'
-                            run_query("UPDATE carros SET status=? WHERE id=?",
+                            run_query(CONSULTAS['carro_atualizar_status'],
                                       (STATUS_CARRO['EXCLUIDO'], id_edit))
                             st.toast("Carro marcado como Excluído!", icon="🔥")
                             st.error("Veículo marcado como **EXCLUÍDO** (Registro mantido para histórico).")
@@ -822,137 +1007,126 @@ elif menu == "1. Reservar Veículo":
     with tab_reservar:
         st.subheader("Nova Reserva (Bloqueio de Data)")
 
-        c1, c2 = st.columns(2)
-        inicio = c1.date_input("Data Retirada (Previsão)", min_value=date.today(), key="reserva_inicio_novo")
-        fim = c2.date_input("Data Devolução (Previsão)",inicio + timedelta(days=1), min_value=inicio,key="reserva_fim_novo")
+        # Seção isolada: datas, cliente e veículo reexecutam só a escolha do carro
+        @fragmento("Nova Reserva")
+        def secao_nova_reserva():
+            c1, c2 = st.columns(2)
+            inicio = c1.date_input("Data Retirada (Previsão)", min_value=date.today(), key="reserva_inicio_novo")
+            fim = c2.date_input("Data Devolução (Previsão)",inicio + timedelta(days=1), min_value=inicio,key="reserva_fim_novo")
 
-        clientes_db = run_query_dataframe("SELECT * FROM clientes WHERE status = 'Ativo'") # Apenas clientes ativos
+            clientes_db = run_query_dataframe(CONSULTAS['clientes_por_status'], (STATUS_CLIENTE['ATIVO'],)) # Apenas clientes ativos
 
-        if clientes_db.empty:
-            st.warning("⚠️ Você precisa cadastrar clientes ativos na aba 'Clientes' antes de fazer uma reserva.")
-        else:
-            lista_clientes = clientes_db['id'].astype(str) + " - " + clientes_db['nome'] + " (CPF: " + clientes_db[
-                'cpf'] + ")"
-            opcoes_cliente_placeholder = ["Selecione o cliente..."] + lista_clientes.tolist()
+            if clientes_db.empty:
+                st.warning("⚠️ Você precisa cadastrar clientes ativos na aba 'Clientes' antes de fazer uma reserva.")
+            else:
+                lista_clientes = clientes_db['id'].astype(str) + " - " + clientes_db['nome'] + " (CPF: " + clientes_db[
+                    'cpf'] + ")"
+                opcoes_cliente_placeholder = ["Selecione o cliente..."] + lista_clientes.tolist()
 
-            cliente_escolhido_str = st.selectbox("Selecione o Cliente", opcoes_cliente_placeholder, key="reserva_cliente_novo")
+                cliente_escolhido_str = st.selectbox("Selecione o Cliente", opcoes_cliente_placeholder, key="reserva_cliente_novo")
 
-            if cliente_escolhido_str != "Selecione o cliente...":
+                if cliente_escolhido_str != "Selecione o cliente...":
 
-                try:
-                    cliente_id = int(cliente_escolhido_str.split(" - ")[0])
-                    dados_cliente = clientes_db[clientes_db['id'] == cliente_id].iloc[0]
-                except:
-                    st.warning("Erro ao processar ID do cliente. Selecione novamente.")
-                    cliente_id = None
-                    dados_cliente = None
-
-                if cliente_id and inicio <= fim:
-
-                    # Consulta para carros DISPONÍVEIS no período (status 'Disponível' E sem conflito)
-                    query = f"""
-                        SELECT * FROM carros 
-                        WHERE status NOT IN ('{STATUS_CARRO['INDISPONIVEL']}', '{STATUS_CARRO['EXCLUIDO']}') 
-                        AND id NOT IN (
-                            SELECT carro_id FROM reservas 
-                            WHERE reserva_status IN ('Reservada', 'Locada') 
-                            AND (data_inicio <= '{fim}' AND data_fim >= DATE('{inicio}', '+0 day'))
+                    try:
+                        cliente_id = int(cliente_escolhido_str.split(" - ")[0])
+                        dados_cliente = clientes_db[clientes_db['id'] == cliente_id].iloc[0]
+                    except:
+                        st.warning("Erro ao processar ID do cliente. Selecione novamente.")
+                        cliente_id = None
+                        dados_cliente = None
+
+                    if cliente_id and inicio <= fim:
+
+                        # Consulta para carros DISPONÍVEIS no período (status 'Disponível' E sem conflito)
+                        livres = run_query_dataframe(
+                            CONSULTAS['carros_disponiveis_periodo'],
+                            (STATUS_CARRO['INDISPONIVEL'], STATUS_CARRO['EXCLUIDO'], fim, inicio)
                         )
-                    """
-                    livres = run_query_dataframe(query)
-
-                    if not livres.empty:
-                        st.info(f"{len(livres)} veículos disponíveis para o período.")
-
-                        carro_opcoes = livres['id'].astype(str) + " - " + livres['modelo'] + " - " + livres['placa']
-                        opcoes_carro_placeholder = ["Selecione o veículo..."] + carro_opcoes.tolist()
-
-                        carro_escolhido_str = st.selectbox("Escolha o Veículo", opcoes_carro_placeholder, key="reserva_carro_novo")
-
-                        if carro_escolhido_str != "Selecione o veículo...":
-
-                            try:
-                                carro_id = int(carro_escolhido_str.split(" - ")[0])
-                                dados_carro = livres[livres['id'] == carro_id].iloc[0]
-                            except:
-                                st.warning("Erro ao processar ID do veículo. Selecione novamente.")
-                                carro_id = None
-                                dados_carro = None
-
-                            if carro_id:
-                                dias = (fim - inicio).days
-                                valor_previsto = dados_carro['diaria'] * max(dias, 1)  # Mínimo 1 dia
-
-                                st.metric("Valor Previsto (Diárias)", formatar_moeda(valor_previsto),
-                                          f"{max(dias, 1)} dias")
-                                
-                                # NOVO CAMPO: Franquia de KM
-                                km_franqui_input = st.number_input("KM de Franquia (primeiros KM's gratuitos)", min_value=0, value=300,
-                                                                    help="Defina a quantidade de KM que serão gratuitos para esta locação.", key="reserva_km_franquia_novo")
-                                
-                                # NOVO CAMPO: Adiantamento da locação (50% do valor previsto como padrão)
-                                adiantamento_default = valor_previsto * 0.5
-                                adiantamento_input = st.number_input("Valor de Adiantamento (R$)", min_value=0.0, 
-                                                                     value=min(adiantamento_default, valor_previsto), # Garante que o adiantamento não seja maior que o valor previsto
-                                                                     step=10.0, format="%.2f", key="reserva_adiantamento_novo")
-
-                                if st.button("✅ Confirmar Reserva (Apenas Bloqueio de Data)", type="primary", key="confirmar_reserva_novo"):
-
-                                    # Salvamos o KM ATUAL do carro no campo km_saida da reserva
-                                    km_saida_salvar = int(dados_carro['km_atual'])
-
-                                    # INCLUSÃO: Adicionando o campo reserva_status='Reservada', km_franquia e adiantamento
-                                    reserv_id = run_query(
-                                        "INSERT INTO reservas (carro_id, cliente_id, data_inicio, data_fim, status, reserva_status, km_saida, km_franquia, adiantamento, valor_multas, valor_danos, valor_outros) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
-                                        (carro_id, cliente_id, inicio, fim, 'Ativa', 'Reservada', km_saida_salvar, km_franqui_input, adiantamento_input, 0.0, 0.0, 0.0)
-                                    )
-
-                                    if isinstance(reserv_id, int):
-                                        # ATENÇÃO: NÃO ATUALIZAMOS o status do carro aqui. Ele permanece 'Disponível'.
-                                        st.toast("Reserva Confirmada! Aguardando Entrega.", icon="🎉")
-                                        st.success(
-                                            f"Reserva #{reserv_id} Confirmada. Prossiga para '2. Entrega do Veículo' para finalizar a locação.")
-                                        st.rerun()
-                                    else:
-                                        st.error(f"Erro ao salvar a reserva: {reserv_id}")
-
-                    elif isinstance(livres, str):
-                        st.error(f"Erro na consulta de carros disponíveis: {livres}")
-                    else:
-                        st.warning("Sem carros disponíveis para estas datas no período.")
+
+                        if not livres.empty:
+                            st.info(f"{len(livres)} veículos disponíveis para o período.")
+
+                            carro_opcoes = livres['id'].astype(str) + " - " + livres['modelo'] + " - " + livres['placa']
+                            opcoes_carro_placeholder = ["Selecione o veículo..."] + carro_opcoes.tolist()
+
+                            carro_escolhido_str = st.selectbox("Escolha o Veículo", opcoes_carro_placeholder, key="reserva_carro_novo")
+
+                            if carro_escolhido_str != "Selecione o veículo...":
+
+                                try:
+                                    carro_id = int(carro_escolhido_str.split(" - ")[0])
+                                    dados_carro = livres[livres['id'] == carro_id].iloc[0]
+                                except:
+                                    st.warning("Erro ao processar ID do veículo. Selecione novamente.")
+                                    carro_id = None
+                                    dados_carro = None
+
+                                if carro_id:
+                                    dias = (fim - inicio).days
+                                    valor_previsto = dados_carro['diaria'] * max(dias, 1)  # Mínimo 1 dia
+
+                                    st.metric("Valor Previsto (Diárias)", formatar_moeda(valor_previsto),
+                                              f"{max(dias, 1)} dias")
+
+                                    # NOVO CAMPO: Franquia de KM
+                                    km_franqui_input = st.number_input("KM de Franquia (primeiros KM's gratuitos)", min_value=0, value=300,
+                                                                        help="Defina a quantidade de KM que serão gratuitos para esta locação.", key="reserva_km_franquia_novo")
+
+                                    # NOVO CAMPO: Adiantamento da locação (50% do valor previsto como padrão)
+                                    adiantamento_default = valor_previsto * 0.5
+                                    adiantamento_input = st.number_input("Valor de Adiantamento (R$)", min_value=0.0, 
+                                                                         value=min(adiantamento_default, valor_previsto), # Garante que o adiantamento não seja maior que o valor previsto
+                                                                         step=10.0, format="%.2f", key="reserva_adiantamento_novo")
+
+                                    if st.button("✅ Confirmar Reserva (Apenas Bloqueio de Data)", type="primary", key="confirmar_reserva_novo"):
+
+                                        # Reserva com reserva_status='Reservada', km_franquia e adiantamento
+                                        # (a disponibilidade é conferida de novo dentro da transação)
+                                        reserva_ok, reserv_id = reservar(
+                                            carro_id, cliente_id, inicio, fim, km_franqui_input, adiantamento_input,
+                                            usuario=current_user['username'], db_file=DB_FILE
+                                        )
+
+                                        if reserva_ok:
+                                            # ATENÇÃO: NÃO ATUALIZAMOS o status do carro aqui. Ele permanece 'Disponível'.
+                                            st.toast("Reserva Confirmada! Aguardando Entrega.", icon="🎉")
+                                            st.success(
+                                                f"Reserva #{reserv_id} Confirmada. Prossiga para '2. Entrega do Veículo' para finalizar a locação.")
+                                            st.rerun()
+                                        else:
+                                            st.error(reserv_id)
+
+                        elif isinstance(livres, str):
+                            st.error(f"Erro na consulta de carros disponíveis: {livres}")
+                        else:
+                            st.warning("Sem carros disponíveis para estas datas no período.")
+                            exibir_proximas_janelas(inicio, fim)
+
+        secao_nova_reserva()
 
     with tab_gerenciar:
         st.subheader("Visualizar, Editar ou Excluir Reservas")
 
-        # Buscar todas as reservas que não estão 'Finalizada' ou 'Cancelada'
-        reservas_gerenciar = run_query_dataframe("""
-            SELECT 
-                r.id, cl.nome AS Cliente, c.modelo AS Veiculo, c.placa AS Placa, 
-                r.data_inicio, r.data_fim, r.reserva_status, r.km_franquia, r.adiantamento, 
-                r.carro_id, r.cliente_id, c.diaria, c.preco_km, c.km_atual, r.valor_multas, r.valor_danos, r.valor_outros
-            FROM reservas r 
-            JOIN clientes cl ON r.cliente_id = cl.id 
-            JOIN carros c ON r.carro_id = c.id
-            WHERE r.reserva_status IN ('Reservada', 'Locada')
-            ORDER BY r.data_inicio ASC
-        """)
+        # Reservas que não estão 'Finalizada' ou 'Cancelada', uma página por vez (busca indexada)
+        col_filtro_placa, col_filtro_cliente = st.columns(2)
+        filtros_gerenciar = {
+            'placa': col_filtro_placa.text_input("Filtrar por placa", key="gerenciar_filtro_placa").strip(),
+            'cliente': col_filtro_cliente.text_input("Filtrar por cliente (início do nome ou CPF)",
+                                                     key="gerenciar_filtro_cliente").strip(),
+        }
+        reservas_gerenciar = pagina_de_reservas('gerenciar', filtros_gerenciar, status=STATUS_ATIVOS, ordem='asc')
 
         if reservas_gerenciar.empty:
-            st.info("Nenhuma reserva ativa para gerenciar.")
+            st.info("Nenhuma reserva ativa para gerenciar." if not any(filtros_gerenciar.values())
+                    else "Nenhuma reserva ativa encontrada com esses filtros.")
         else:
+            reservas_gerenciar.rename(columns={'cliente': 'Cliente', 'modelo': 'Veiculo', 'placa': 'Placa'},
+                                      inplace=True)
             # Formatar para exibição
-            reservas_gerenciar_display = reservas_gerenciar.copy()
-            reservas_gerenciar_display['data_inicio'] = pd.to_datetime(
-                reservas_gerenciar_display['data_inicio']).dt.strftime('%d/%m/%Y')
-            reservas_gerenciar_display['data_fim'] = pd.to_datetime(reservas_gerenciar_display['data_fim']).dt.strftime(
-                '%d/%m/%Y')
-            reservas_gerenciar_display['adiantamento'] = reservas_gerenciar_display['adiantamento'].apply(
-                formatar_moeda)
-            reservas_gerenciar_display['valor_multas'] = reservas_gerenciar_display['valor_multas'].apply(
-                formatar_moeda)
-            reservas_gerenciar_display['valor_danos'] = reservas_gerenciar_display['valor_danos'].apply(formatar_moeda)
-            reservas_gerenciar_display['valor_outros'] = reservas_gerenciar_display['valor_outros'].apply(
-                formatar_moeda)
+            reservas_gerenciar_display = formatar_tabela(
+                reservas_gerenciar,
+                colunas_moeda=['adiantamento', 'valor_multas', 'valor_danos', 'valor_outros'],
+                colunas_data=['data_inicio', 'data_fim'])
             reservas_gerenciar_display.rename(columns={
                 'reserva_status': 'Status da Reserva',
                 'km_franquia': 'KM Franquia',
@@ -970,11 +1144,10 @@ elif menu == "1. Reservar Veículo":
             )
 
             # Seleção de reserva para edição/exclusão
-            opcoes_reserva = reservas_gerenciar.apply(
-                lambda
-                    x: f"ID {x['id']} - {x['Cliente']} ({x['Veiculo']} - {x['Placa']}) | De {pd.to_datetime(x['data_inicio']).strftime('%d/%m')} a {pd.to_datetime(x['data_fim']).strftime('%d/%m')}",
-                axis=1
-            )
+            opcoes_reserva = ("ID " + reservas_gerenciar['id'].astype(str) + " - " + reservas_gerenciar['Cliente']
+                              + " (" + reservas_gerenciar['Veiculo'] + " - " + reservas_gerenciar['Placa'] + ") | De "
+                              + datas(reservas_gerenciar['data_inicio'], '%d/%m') + " a "
+                              + datas(reservas_gerenciar['data_fim'], '%d/%m'))
             opcoes_com_placeholder_reserva = ["Selecione uma reserva para gerenciar..."] + opcoes_reserva.tolist()
 
             reserva_selecionada_str = st.selectbox("Selecionar Reserva", opcoes_com_placeholder_reserva,
@@ -1011,17 +1184,11 @@ elif menu == "1. Reservar Veículo":
 
                     st.markdown("##### Trocar Veículo (Opcional)")
                     # Consulta para carros DISPONÍVEIS no período (excluindo o carro atual da reserva)
-                    query_carros_disponiveis = f"""
-                        SELECT id, modelo, placa FROM carros 
-                        WHERE status NOT IN ('{STATUS_CARRO['INDISPONIVEL']}', '{STATUS_CARRO['EXCLUIDO']}') 
-                        AND id != {reserva_atual['carro_id']}
-                        AND id NOT IN (
-                            SELECT carro_id FROM reservas 
-                            WHERE reserva_status IN ('Reservada', 'Locada') 
-                            AND (data_inicio <= '{up_data_fim}' AND data_fim >= DATE('{up_data_inicio}', '+0 day'))
-                        )
-                    """
-                    carros_disponiveis = run_query_dataframe(query_carros_disponiveis)
+                    carros_disponiveis = run_query_dataframe(
+                        CONSULTAS['carros_disponiveis_troca'],
+                        (STATUS_CARRO['INDISPONIVEL'], STATUS_CARRO['EXCLUIDO'], int(reserva_atual['carro_id']),
+                         up_data_fim, up_data_inicio)
+                    )
 
                     if carros_disponiveis.empty:
                         st.warning("Nenhum outro veículo disponível para troca neste período.")
@@ -1038,46 +1205,35 @@ elif menu == "1. Reservar Veículo":
 
                     # Botões de ação
                     col_edit_botoes = st.columns(3)
-                    update_reserva = col_edit_botoes[0].form_submit_button("🔄 Atualizar Reserva", type="primary",
-                                                                           key=f"btn_update_reserva_{reserva_atual['id']}")
-                    cancel_reserva = col_edit_botoes[1].form_submit_button("🗑️ Cancelar Reserva",
-                                                                           key=f"btn_cancel_reserva_{reserva_atual['id']}")
-                    gerar_contrato = col_edit_botoes[2].form_submit_button("📄 Gerar Contrato",
-                                                                           key=f"btn_gerar_contrato_{reserva_atual['id']}")
+                    update_reserva = col_edit_botoes[0].form_submit_button("🔄 Atualizar Reserva", type="primary")
+                    cancel_reserva = col_edit_botoes[1].form_submit_button("🗑️ Cancelar Reserva")
+                    gerar_contrato = col_edit_botoes[2].form_submit_button("📄 Gerar Contrato")
 
                     if update_reserva:
                         novo_carro_id = reserva_atual['carro_id']
                         if veiculo_troca_str != f"Manter Veículo Atual ({reserva_atual['Veiculo']} - {reserva_atual['Placa']})":
                             novo_carro_id = int(veiculo_troca_str.split(" - ")[0])
 
-                        run_query("""
-                            UPDATE reservas 
-                            SET data_inicio=?, data_fim=?, km_franquia=?, adiantamento=?, carro_id=?, valor_multas=?, valor_danos=?, valor_outros=? 
-                            WHERE id=?
-                        """, (
-                            up_data_inicio,
-                            up_data_fim,
-                            up_km_franquia,
-                            up_adiantamento,
-                            novo_carro_id,
-                            reserva_atual['valor_multas'],
-                            reserva_atual['valor_danos'],
-                            reserva_atual['valor_outros'],
-                            reserva_atual['id']
-                        ))
-                        st.toast("Reserva atualizada com sucesso!", icon="✔️")
-                        st.success(f"Reserva ID **{reserva_atual['id']}** atualizada.")
-                        st.rerun()
+                        # Atualização e evento 'Editada' na mesma transação
+                        edicao_ok, mensagem_edicao = editar_reserva(
+                            reserva_atual['id'], up_data_inicio, up_data_fim, up_km_franquia, up_adiantamento,
+                            novo_carro_id, usuario=current_user['username'], db_file=DB_FILE
+                        )
+                        if not edicao_ok:
+                            st.error(mensagem_edicao)
+                        else:
+                            st.toast("Reserva atualizada com sucesso!", icon="✔️")
+                            st.success(f"Reserva ID **{reserva_atual['id']}** atualizada.")
+                            st.rerun()
 
                     if cancel_reserva:
-                        # Verifica se a reserva está locada (carro com o cliente)
-                        if reserva_atual['reserva_status'] == 'Locada':
-                            st.error(
-                                "❌ Não é possível cancelar uma reserva que já está Locada. Realize a Devolução primeiro.")
+                        # Reserva locada (carro com o cliente) não pode ser cancelada: a regra fica em cancelar_reserva
+                        cancelamento_ok, mensagem_cancelamento = cancelar_reserva(
+                            reserva_atual['id'], usuario=current_user['username'], db_file=DB_FILE
+                        )
+                        if not cancelamento_ok:
+                            st.error(f"❌ {mensagem_cancelamento}")
                         else:
-                            # Se a reserva não estiver locada, muda o status para 'Cancelada'
-                            run_query("UPDATE reservas SET reserva_status='Cancelada' WHERE id=?",
-                                      (reserva_atual['id'],))
                             st.toast("Reserva cancelada!", icon="🗑️")
                             st.warning(f"Reserva ID **{reserva_atual['id']}** cancelada.")
                             st.rerun()
@@ -1088,17 +1244,13 @@ elif menu == "1. Reservar Veículo":
                             st.error("❌ O contrato só pode ser gerado após a entrega efetiva do veículo (status 'Locada'). Use o menu '2. Entrega do Veículo' para entregar o veículo primeiro.")
                         else:
                             # Buscar dados completos do cliente e do carro para gerar o contrato
-                            dados_cliente_contrato = run_query_dataframe("SELECT * FROM clientes WHERE id=?",
-                                                                         (reserva_atual['cliente_id'],))
-                            dados_carro_contrato = run_query_dataframe("SELECT * FROM carros WHERE id=?",
-                                                                       (reserva_atual['carro_id'],))
-
-                            if not dados_cliente_contrato.empty and not dados_carro_contrato.empty:
-                                cliente_dict = dados_cliente_contrato.iloc[0].to_dict()
-                                carro_dict = dados_carro_contrato.iloc[0].to_dict()
-                                # Adiciona os campos necessários para o PDF
-                                carro_dict['chassi'] = carro_dict.get('numero_chassi')
-                                carro_dict['renavam'] = carro_dict.get('numero_renavam')
+                            dados_cliente_contrato = contexto.cliente(reserva_atual['cliente_id'])
+                            dados_carro_contrato = contexto.carro(reserva_atual['carro_id'])
+
+                            if dados_cliente_contrato is not None and dados_carro_contrato is not None:
+                                cliente_dict = dados_cliente_contrato.to_dict()
+                                # Inclui os campos 'chassi' e 'renavam' necessários para o PDF
+                                carro_dict = dados_carro_contrato.para_documento()
 
                                 # IMPORTANTE: Usar a data real da entrega (data_inicio da reserva quando foi locada)
                                 # e não a data da reserva original
@@ -1106,37 +1258,42 @@ elif menu == "1. Reservar Veículo":
                                 data_devolucao_prevista = pd.to_datetime(reserva_atual['data_fim']).date()
 
                                 # Gerar o PDF do contrato
-                                pdf_bytes_contrato = gerar_contrato_pdf(
+                                pdf_bytes_contrato = obter_contrato_pdf(
                                     cliente_dict,
                                     carro_dict,
                                     data_entrega_real,  # Data real da entrega do veículo
                                     data_devolucao_prevista  # Data prevista de devolução
                                 )
 
-                                # Salvar no Session State
-                                st.session_state.pdf_para_download = pdf_bytes_contrato
-                                st.session_state.pdf_file_name = f"contrato_{cliente_dict['nome']}_{carro_dict['placa']}.pdf"
+                                # Guardar em disco (a sessão fica só com o handle)
+                                guardar_para_download(pdf_bytes_contrato,
+                                                      f"contrato_{cliente_dict['nome']}_{carro_dict['placa']}.pdf")
                                 st.toast("Contrato gerado! Clique no botão de download abaixo.", icon="📄")
                                 st.success("✅ Contrato gerado com sucesso! Use o botão de download abaixo.")
                                 st.rerun()
                             else:
                                 st.error("Erro ao buscar dados para gerar o contrato.")
 
+                # Linha do tempo da reserva no livro de eventos (quem fez o quê e quando)
+                with st.expander("🧾 Histórico de Eventos da Reserva"):
+                    eventos_reserva = eventos_da_reserva(reserva_atual['id'], DB_FILE)
+                    if eventos_reserva:
+                        st.dataframe(pd.DataFrame([{
+                            'Quando': evento['ocorrido_em'],
+                            'Evento': evento['tipo'],
+                            'Usuário': evento['usuario'] or '-',
+                            'Detalhes': ', '.join(f"{campo}: {valor}" for campo, valor in evento['dados'].items()),
+                        } for evento in eventos_reserva]), use_container_width=True, hide_index=True)
+                    else:
+                        st.info("Nenhum evento registrado para esta reserva.")
+
         # Botão de download do contrato (fora do formulário, para aparecer após gerar)
-        if 'pdf_para_download' in st.session_state and st.session_state.pdf_para_download:
-        #if st.session_state.pdf_para_download:
+        if obter_blob(st.session_state.get('documento_download')) is not None:
             st.markdown("---")
-            st.download_button(
-                label="📥 Baixar Contrato em PDF",
-                data=st.session_state.pdf_para_download,
-                file_name=st.session_state.pdf_file_name,
-                mime="application/pdf",
-                key="download_contrato_edicao_reserva"
-            )
+            botao_download("📥 Baixar Contrato em PDF", key="download_contrato_edicao_reserva")
             # Limpa o estado após exibir o botão
             if st.button("✅ Concluído - Limpar", key="limpar_download_contrato"):
-                st.session_state.pdf_para_download = None
-                st.session_state.pdf_file_name = None
+                limpar_download()
                 st.rerun()
 
 # 5. 2. ENTREGA DO VEÍCULO (Confirma KM, Altera Status e Imprime Contrato)
@@ -1145,22 +1302,11 @@ elif menu == "2. Entrega do Veículo":
     st.info("Selecione uma reserva ativa e confirme a quilometragem para iniciar a locação.")
 
     # Inicializa o Session State para o PDF, se necessário
-    if 'pdf_para_download' not in st.session_state:
-        st.session_state.pdf_para_download = None
-        st.session_state.pdf_file_name = None
+    if 'documento_download' not in st.session_state:
+        st.session_state.documento_download = None
 
     # MUDANÇA NO FILTRO: Busca reservas ATIVAS que estão com reserva_status='Reservada'
-    query_entregar = """
-        SELECT 
-            r.id, cl.nome, c.modelo, c.placa, c.km_atual, r.carro_id, r.cliente_id, 
-            r.data_inicio, r.data_fim  
-        FROM reservas r 
-        JOIN carros c ON r.carro_id = c.id 
-        JOIN clientes cl ON r.cliente_id = cl.id
-        WHERE r.status='Ativa' AND r.reserva_status='Reservada'
-        ORDER BY r.data_inicio ASC
-    """
-    reservas_entregar = run_query(query_entregar, fetch=True)
+    reservas_entregar = run_query(CONSULTAS['reservas_pendentes_entrega'], fetch=True)
 
     if isinstance(reservas_entregar, str):
         st.error(f"Erro no banco de dados: {reservas_entregar}")
@@ -1190,16 +1336,12 @@ elif menu == "2. Entrega do Veículo":
                 cliente_id = int(reserva['cliente_id'])
 
                 # Buscar dados completos para o contrato
-                dados_carro = run_query("SELECT * FROM carros WHERE id=?", (carro_id,), fetch=True).iloc[0].to_dict()
                 # Garante que os campos chassi, renavam, cor e ano_veiculo existem, mesmo que None
-                dados_carro['chassi'] = dados_carro.get('numero_chassi')
-                dados_carro['renavam'] = dados_carro.get('numero_renavam')
-                dados_carro['ano_veiculo'] = dados_carro.get('ano_veiculo')
+                dados_carro = contexto.carro(carro_id).para_documento()
 
-                dados_cliente = run_query("SELECT * FROM clientes WHERE id=?", (cliente_id,), fetch=True).iloc[
-                    0].to_dict()
-                # Recarrega a reserva para ter todos os campos
-                dados_reserva = run_query("SELECT * FROM reservas WHERE id=?", (id_reserva_sel,), fetch=True).iloc[0]
+                dados_cliente = contexto.cliente(cliente_id)
+                # Carrega a reserva completa (uma única leitura por execução)
+                dados_reserva = contexto.reserva(id_reserva_sel)
 
                 # --- VALIDAÇÃO DE CNH ---
                 validade_cnh_db = dados_cliente.get('validade_cnh')
@@ -1219,9 +1361,6 @@ elif menu == "2. Entrega do Veículo":
 
                 st.markdown("---")
 
-                # Recarrega a reserva para ter todos os campos
-                dados_reserva = run_query("SELECT * FROM reservas WHERE id=?", (id_reserva_sel,), fetch=True).iloc[0]
-
                 st.markdown("---")
 
                 # 1. Confirmação de KM e Data de Saída
@@ -1255,45 +1394,42 @@ elif menu == "2. Entrega do Veículo":
                     submit_entrega = st.form_submit_button("✅ Finalizar Entrega e Gerar Contrato", type="primary")
 
                     if submit_entrega:
-                        # 2. Atualiza Status do Carro para 'Locado'
-                        run_query("UPDATE carros SET status='Locado', km_atual=? WHERE id=?",
-                                  (km_confirma, carro_id))
-
-                        # 3. Atualiza KM de Saída Real, a Data de Início na reserva
-                        run_query("UPDATE reservas SET km_saida=?, data_inicio=?, reserva_status='Locada' WHERE id=?",
-                                  (km_confirma, data_saida, id_reserva_sel))
-
-                        st.toast("Entrega Confirmada! Carro Locado.", icon="🔑")
-                        st.success("Entrega finalizada! O veículo agora está **Locado**. Baixe o contrato.")
-
-                        # 4. Geração do Contrato (AGORA SALVANDO NO SESSION STATE)
-                        pdf_bytes = gerar_contrato_pdf(
-                            dados_cliente,
-                            dados_carro,
-                            data_saida,  # Usar a data real da saída
-                            pd.to_datetime(dados_reserva['data_fim']).date()  # Data fim da reserva
-                        )
+                        # 2 e 3. Carro 'Locado' com o KM real e reserva 'Locada' com KM/data de saída (uma transação)
+                        entrega_ok, mensagem_entrega = entregar(id_reserva_sel, km_confirma, data_saida,
+                                                               usuario=current_user['username'], db_file=DB_FILE)
+
+                        if not entrega_ok:
+                            st.error(mensagem_entrega)
+                        else:
+                            contexto.atualizar('carros', carro_id, status=STATUS_CARRO['LOCADO'], km_atual=km_confirma)
+                            contexto.atualizar('reservas', id_reserva_sel, km_saida=km_confirma, data_inicio=data_saida,
+                                               reserva_status='Locada')
+
+                            st.toast("Entrega Confirmada! Carro Locado.", icon="🔑")
+                            st.success("Entrega finalizada! O veículo agora está **Locado**. Baixe o contrato.")
+
+                            # 4. Geração do Contrato (AGORA SALVANDO NO SESSION STATE)
+                            pdf_bytes = obter_contrato_pdf(
+                                dados_cliente,
+                                dados_carro,
+                                data_saida,  # Usar a data real da saída
+                                pd.to_datetime(dados_reserva['data_fim']).date()  # Data fim da reserva
+                            )
 
-                        # Salva o PDF no Session State
-                        st.session_state.pdf_para_download = pdf_bytes
-                        st.session_state.pdf_file_name = f"contrato_{dados_cliente['nome']}_{dados_carro['placa']}.pdf"
+                            # Guarda o PDF em disco (a sessão fica só com o handle)
+                            guardar_para_download(pdf_bytes, f"contrato_{dados_cliente['nome']}_{dados_carro['placa']}.pdf")
 
-                        st.balloons()
-                        #st.rerun() 
+                            st.balloons()
+                            #st.rerun() 
 
     # --- FORA DO FORMULÁRIO: EXIBIÇÃO DO DOWNLOAD BUTTON ---
-    # Verifica se há um PDF no Session State para download
-    if st.session_state.pdf_para_download is not None:
+    # Verifica se há um PDF guardado para download
+    if st.session_state.documento_download is not None:
         st.markdown("---")
-        st.download_button(
-            label="📄 Baixar Contrato em PDF",
-            data=st.session_state.pdf_para_download,
-            file_name=st.session_state.pdf_file_name,
-            mime="application/pdf"
-        )
+        botao_download("📄 Baixar Contrato em PDF")
         # Limpa o estado após exibir o botão, para que ele não apareça em re-runs subsequentes
-        st.session_state.pdf_para_download = None
-        st.session_state.pdf_file_name = None
+        # (o Streamlit já leu o arquivo para servir o download)
+        limpar_download()
         #st.rerun()  # Opcional: Força um rerun final para limpar a UI
 
     else:
@@ -1305,22 +1441,11 @@ elif menu == "Devolução":
     st.title("🔄 Devolução de Veículo")
 
     # Inicializa o Session State para o PDF, se necessário
-    if 'pdf_para_download' not in st.session_state:
-        st.session_state.pdf_para_download = None
-        st.session_state.pdf_file_name = None
+    if 'documento_download' not in st.session_state:
+        st.session_state.documento_download = None
 
     # MUDANÇA NO FILTRO: Busca reservas com reserva_status='Locada' (Carro em uso pelo cliente)
-    query_dev = """
-        SELECT 
-            r.id, cl.nome, c.modelo, c.placa, r.km_saida, c.preco_km, c.diaria, 
-            r.data_inicio, r.carro_id, r.cliente_id, r.km_franquia, r.adiantamento, 
-            r.valor_multas, r.valor_danos, r.valor_outros 
-        FROM reservas r 
-        JOIN carros c ON r.carro_id = c.id 
-        JOIN clientes cl ON r.cliente_id = cl.id
-        WHERE r.status='Ativa' AND r.reserva_status='Locada'
-    """
-    ativas = run_query(query_dev, fetch=True)
+    ativas = run_query(CONSULTAS['reservas_pendentes_devolucao'], fetch=True)
 
     if isinstance(ativas, str):
         st.error(f"Erro no banco de dados: {ativas}")
@@ -1347,146 +1472,134 @@ elif menu == "Devolução":
                     km_saida_safe = 0
                     st.warning("Aviso: KM de saída com formato inválido no banco. Usando 0.")
 
-                # Buscar dados completos do cliente para o recibo
-                cliente_id = int(reserva['cliente_id'])
-                dados_cliente = run_query("SELECT * FROM clientes WHERE id=?", (cliente_id,), fetch=True).iloc[0].to_dict()
+                # Seção isolada: KM e custos extras recalculam só a fatura
+                @fragmento("Fechamento da Devolução")
+                def secao_fechamento_devolucao(reserva, km_saida_safe):
+                    # Já devolvida nesta sessão: a seção pode reexecutar sozinha (download) com a reserva antiga
+                    if st.session_state.get('devolucao_finalizada') == int(reserva['id']):
+                        st.success(f"Devolução da placa {reserva['placa']} finalizada. O veículo está novamente disponível.")
+                        botao_download("📥 Baixar Comprovante de Devolução", key="download_recibo_pos_devolucao")
+                        return
+
+                    # Mapa de identidade da própria seção: o 'contexto' do script é o da última
+                    # execução completa, e a seção pode reexecutar sozinha muito depois dela
+                    contexto = ContextoDados(DB_FILE)
+                    reserva_atual = contexto.reserva(reserva['id'])
+                    if reserva_atual is None or reserva_atual['reserva_status'] != 'Locada':
+                        st.warning("Esta locação já foi encerrada em outra sessão. Selecione a locação novamente.")
+                        return
+
+                    # Buscar dados completos do cliente para o recibo
+                    cliente_id = int(reserva['cliente_id'])
+                    dados_cliente = contexto.cliente(cliente_id)
 
-                st.markdown("---")
+                    st.markdown("---")
 
-                col_input1, col_input2, col_input3 = st.columns(3)
+                    col_input1, col_input2, col_input3 = st.columns(3)
 
-                with col_input1:
-                    st.info(f"📍 KM de Saída: **{km_saida_safe}**")
-                    km_volta = st.number_input(
-                        "KM de Devolução (Atual)",
-                        min_value=km_saida_safe,
-                        value=km_saida_safe,
-                        help="A quilometragem não pode ser menor que a da saída."
-                    )
+                    with col_input1:
+                        st.info(f"📍 KM de Saída: **{km_saida_safe}**")
+                        km_volta = st.number_input(
+                            "KM de Devolução (Atual)",
+                            min_value=km_saida_safe,
+                            value=km_saida_safe,
+                            help="A quilometragem não pode ser menor que a da saída."
+                        )
 
-                with col_input2:
-                    st.write("💧 **Serviços Extras**")
-                    cobrar_lavagem = st.checkbox("Cobrar Lavagem?", value=False)
-                    valor_lavagem = 0.0
-                    if cobrar_lavagem:
-                        valor_lavagem = st.number_input("Valor da Lavagem (R$)", value=50.0, step=5.0, key="dev_valor_lavagem")
-                
-                with col_input3:
-                    st.write("💸 **Outros Custos**")
-                    valor_multas = st.number_input("Valor de Multas (R$)", min_value=0.0, value=0.0, step=10.0, format="%.2f", key="dev_valor_multas")
-                    valor_danos = st.number_input("Valor de Danos ao Veículo (R$)", min_value=0.0, value=0.0, step=10.0, format="%.2f", key="dev_valor_danos")
-                    valor_outros = st.number_input("Outros Custos (R$)", min_value=0.0, value=0.0, step=10.0, format="%.2f", key="dev_valor_outros")
-
-                # CÁLCULOS
-                data_saida_real = pd.to_datetime(reserva['data_inicio']).date()
-                data_devolucao = date.today()
-                dias = (data_devolucao - data_saida_real).days
-                dias_cobranca = max(dias, 1)
-
-                km_rodados_totais = km_volta - km_saida_safe
-                km_franquia_reserva = reserva['km_franquia'] if reserva['km_franquia'] is not None else 0
-                if km_rodados_totais > km_franquia_reserva:
-                    km_franquia_reserva = 0
-                km_a_cobrar = max(0, km_rodados_totais - km_franquia_reserva)
-
-                custo_km = km_a_cobrar * reserva['preco_km']
-                custo_diarias = reserva['diaria'] * dias_cobranca
-
-                subtotal_sem_adiantamento = custo_diarias + custo_km + valor_lavagem + valor_multas + valor_danos + valor_outros
-                total_final = subtotal_sem_adiantamento - reserva['adiantamento']
-                
-                # Define o que será exibido como "Total a Pagar"
-                if total_final >= 0:
-                    label_total = "Total a Pagar (R$)"
-                    valor_display = formatar_moeda(total_final)
-                else:
-                    label_total = "Valor a Receber (R$)"
-                    valor_display = formatar_moeda(abs(total_final))
+                    with col_input2:
+                        st.write("💧 **Serviços Extras**")
+                        cobrar_lavagem = st.checkbox("Cobrar Lavagem?", value=False)
+                        valor_lavagem = 0.0
+                        if cobrar_lavagem:
+                            valor_lavagem = st.number_input("Valor da Lavagem (R$)", value=50.0, step=5.0, key="dev_valor_lavagem")
+
+                    with col_input3:
+                        st.write("💸 **Outros Custos**")
+                        valor_multas = st.number_input("Valor de Multas (R$)", min_value=0.0, value=0.0, step=10.0, format="%.2f", key="dev_valor_multas")
+                        valor_danos = st.number_input("Valor de Danos ao Veículo (R$)", min_value=0.0, value=0.0, step=10.0, format="%.2f", key="dev_valor_danos")
+                        valor_outros = st.number_input("Outros Custos (R$)", min_value=0.0, value=0.0, step=10.0, format="%.2f", key="dev_valor_outros")
+
+                    # CÁLCULOS (mesma regra usada ao gravar a devolução)
+                    data_devolucao = date.today()
+                    fechamento = calcular_fechamento(reserva, km_saida_safe, km_volta, data_devolucao,
+                                                     valor_lavagem, valor_multas, valor_danos, valor_outros)
+                    data_saida_real = fechamento['data_inicio']
+                    dias_cobranca = fechamento['dias_cobranca']
+                    km_rodados_totais = fechamento['km_rodados']
+                    km_franquia_reserva = fechamento['km_franquia']
+                    km_a_cobrar = fechamento['km_a_cobrar']
+                    custo_km = fechamento['custo_km']
+                    custo_diarias = fechamento['custo_diarias']
+                    total_final = fechamento['total_final']
+
+                    # Define o que será exibido como "Total a Pagar"
+                    if total_final >= 0:
+                        label_total = "Total a Pagar (R$)"
+                        valor_display = formatar_moeda(total_final)
+                    else:
+                        label_total = "Valor a Receber (R$)"
+                        valor_display = formatar_moeda(abs(total_final))
 
-                st.markdown("---")
-                st.subheader("Fatura de Locação")
-
-                col_fat1, col_fat2, col_fat3, col_fat4 = st.columns(4)
-                col_fat1.metric("Diárias Cobradas", f"{dias_cobranca} dias",
-                                f"Início: {data_saida_real.strftime('%d/%m/%Y')}")
-                col_fat2.metric("Custo Diárias", formatar_moeda(custo_diarias))
-                col_fat3.metric("KM Rodados (Totais)", f"{km_rodados_totais} km")
-                col_fat4.metric("KM a Cobrar (Após Franquia)", f"{km_a_cobrar} km")
-
-                st.metric("KM de Franquia Aplicado", f"{km_franquia_reserva} km")
-                st.metric("Adiantamento Recebido", formatar_moeda(reserva['adiantamento'] if reserva['adiantamento'] is not None else 0.0))
-                
-                # Novos custos extras exibidos
-                if valor_lavagem > 0: st.metric("Custo Lavagem", formatar_moeda(valor_lavagem))
-                if valor_multas > 0: st.metric("Custo Multas", formatar_moeda(valor_multas))
-                if valor_danos > 0: st.metric("Custo Danos", formatar_moeda(valor_danos))
-                if valor_outros > 0: st.metric("Outros Custos", formatar_moeda(valor_outros))
+                    st.markdown("---")
+                    st.subheader("Fatura de Locação")
 
-                st.markdown("---")
-                st.metric(label_total, valor_display,
-                                          help=f"Diárias ({formatar_moeda(custo_diarias)}) + KM ({formatar_moeda(custo_km)}) + Lavagem ({formatar_moeda(valor_lavagem)}) + Multas ({formatar_moeda(valor_multas)}) + Danos ({formatar_moeda(valor_danos)}) + Outros ({formatar_moeda(valor_outros)}) - Adiantamento ({formatar_moeda(reserva['adiantamento'] if reserva['adiantamento'] is not None else 0.0)})")
-
-                if st.button("✅ Finalizar Devolução e Liberar Carro", type="primary"):
-                    # 1. Atualiza Status da Reserva e armazena os valores finais
-                    # MUDANÇA: Altera o reserva_status para 'Finalizada' e salva novos custos
-                    run_query("""
-                        UPDATE reservas 
-                        SET status='Finalizada', reserva_status='Finalizada', km_volta=?, custo_lavagem=?, valor_total=?, 
-                        valor_multas=?, valor_danos=?, valor_outros=? 
-                        WHERE id=?
-                    """, (km_volta, valor_lavagem, subtotal_sem_adiantamento, 
-                         valor_multas, valor_danos, valor_outros, int(reserva['id'])))
-
-                    # 2. Atualiza Status do Carro para 'Disponível' e KM
-                    run_query("UPDATE carros SET status='Disponível', km_atual=? WHERE id=?",
-                              (km_volta, int(reserva['carro_id'])))
-
-                    st.toast("Devolução Finalizada!", icon="🎉")
-                    st.success(
-                        f"Devolução da placa {reserva['placa']} finalizada. Total: {valor_display}. O veículo está novamente disponível.")
-
-                    # Re-buscar dados completos do carro para o recibo
-                    dados_carro_recibo = run_query("SELECT * FROM carros WHERE id=?", (int(reserva['carro_id']),), fetch=True).iloc[0].to_dict()
-                    dados_carro_recibo['chassi'] = dados_carro_recibo.get('numero_chassi')
-                    dados_carro_recibo['renavam'] = dados_carro_recibo.get('numero_renavam')
-
-                    # Geração do Recibo em PDF
-                    recibo_pdf_bytes = gerar_recibo_pdf(
-                        dados_cliente,
-                        dados_carro_recibo,
-                        {
-                            'data_inicio': data_saida_real,
-                            'data_fim': data_devolucao,
-                            'km_saida': km_saida_safe,
-                            'km_volta': km_volta,
-                            'km_franquia': km_franquia_reserva,
-                            'dias_cobranca': dias_cobranca,
-                            'custo_diarias': custo_diarias,
-                            'custo_km': custo_km,
-                            'valor_lavagem': valor_lavagem,
-                            'valor_multas': valor_multas,
-                            'valor_danos': valor_danos,
-                            'valor_outros': valor_outros,
-                            'adiantamento': reserva['adiantamento'] if reserva['adiantamento'] is not None else 0.0,
-                            'total_final': total_final
-                        }
-                    )
+                    col_fat1, col_fat2, col_fat3, col_fat4 = st.columns(4)
+                    col_fat1.metric("Diárias Cobradas", f"{dias_cobranca} dias",
+                                    f"Início: {data_saida_real.strftime('%d/%m/%Y')}")
+                    col_fat2.metric("Custo Diárias", formatar_moeda(custo_diarias))
+                    col_fat3.metric("KM Rodados (Totais)", f"{km_rodados_totais} km")
+                    col_fat4.metric("KM a Cobrar (Após Franquia)", f"{km_a_cobrar} km")
 
-                    # Salvar o recibo em Session State para download
-                    st.session_state.pdf_para_download = recibo_pdf_bytes
-                    st.session_state.pdf_file_name = f"recibo_{dados_cliente['nome']}_{reserva['placa']}_{date.today().strftime('%Y%m%d')}.pdf"
+                    st.metric("KM de Franquia Aplicado", f"{km_franquia_reserva} km")
+                    st.metric("Adiantamento Recebido", formatar_moeda(reserva['adiantamento'] if reserva['adiantamento'] is not None else 0.0))
 
-                    st.balloons()
-                    #st.rerun()
+                    # Novos custos extras exibidos
+                    if valor_lavagem > 0: st.metric("Custo Lavagem", formatar_moeda(valor_lavagem))
+                    if valor_multas > 0: st.metric("Custo Multas", formatar_moeda(valor_multas))
+                    if valor_danos > 0: st.metric("Custo Danos", formatar_moeda(valor_danos))
+                    if valor_outros > 0: st.metric("Outros Custos", formatar_moeda(valor_outros))
 
-            if st.session_state.pdf_para_download:
-                st.download_button(
-                    label="📥 Baixar Comprovante de Devolução",
-                    data=st.session_state.pdf_para_download,
-                    file_name=st.session_state.pdf_file_name,
-                    mime="application/pdf",
-                    key="download_recibo_pos_devolucao"
-                )
+                    st.markdown("---")
+                    st.metric(label_total, valor_display,
+                                              help=f"Diárias ({formatar_moeda(custo_diarias)}) + KM ({formatar_moeda(custo_km)}) + Lavagem ({formatar_moeda(valor_lavagem)}) + Multas ({formatar_moeda(valor_multas)}) + Danos ({formatar_moeda(valor_danos)}) + Outros ({formatar_moeda(valor_outros)}) - Adiantamento ({formatar_moeda(reserva['adiantamento'] if reserva['adiantamento'] is not None else 0.0)})")
+
+                    if st.button("✅ Finalizar Devolução e Liberar Carro", type="primary"):
+                        # Dados completos do carro para o recibo (lidos uma vez, atualizados após as escritas)
+                        dados_carro_devolucao = contexto.carro(reserva['carro_id'])
+
+                        # Reserva 'Finalizada' com os valores finais e carro 'Disponível' com o KM (uma transação)
+                        devolucao_ok, resultado_devolucao = devolver(
+                            int(reserva['id']), km_volta, data_devolucao,
+                            valor_lavagem, valor_multas, valor_danos, valor_outros,
+                            usuario=current_user['username'], db_file=DB_FILE
+                        )
+
+                        if not devolucao_ok:
+                            st.error(resultado_devolucao)
+                        else:
+                            contexto.atualizar('carros', reserva['carro_id'], status=STATUS_CARRO['DISPONIVEL'], km_atual=km_volta)
+                            st.session_state.devolucao_finalizada = int(reserva['id'])
+
+                            st.toast("Devolução Finalizada!", icon="🎉")
+                            st.success(
+                                f"Devolução da placa {reserva['placa']} finalizada. Total: {valor_display}. O veículo está novamente disponível.")
+
+                            dados_carro_recibo = dados_carro_devolucao.para_documento()
+
+                            # Geração do Recibo em PDF
+                            recibo_pdf_bytes = gerar_recibo_pdf(dados_cliente, dados_carro_recibo, resultado_devolucao)
+
+                            # Guardar o recibo em disco para download
+                            guardar_para_download(recibo_pdf_bytes,
+                                                  f"recibo_{dados_cliente['nome']}_{reserva['placa']}_{date.today().strftime('%Y%m%d')}.pdf")
+
+                            st.balloons()
+                            #st.rerun()
+
+                    if st.session_state.documento_download:
+                        botao_download("📥 Baixar Comprovante de Devolução", key="download_recibo_pos_devolucao")
+
+                secao_fechamento_devolucao(reserva, km_saida_safe)
 
     else:
         st.info("Nenhum veículo em locação para ser devolvido.")
@@ -1494,287 +1607,407 @@ elif menu == "Devolução":
 # 7. HISTÓRICO
 elif menu == "Histórico":
     st.title("📜 Histórico de Locações Finalizadas")
+    exibir_idade_snapshot('historico')
+
+    # O administrador pode somar as filiais (cada banco é consultado em paralelo)
+    consolidar_filiais = (check_permission('manage_users') and len(listar_filiais()) > 1 and
+                          st.checkbox("🏢 Consolidar todas as filiais", key="historico_consolidado"))
+
+    # Seção isolada: trocar o mês reexecuta só o faturamento, os gráficos e a tabela
+    @fragmento("Faturamento Mensal")
+    def secao_faturamento_mensal(consolidar_filiais):
+        st.subheader("Faturamento Mensal")
+
+        # Obter lista de meses com locações finalizadas
+        if consolidar_filiais:
+            meses_db = run_query_filiais(CONSULTAS['historico_meses'])
+            if not meses_db.empty:
+                meses_db = meses_db[['mes']].drop_duplicates().sort_values('mes', ascending=False)
+        else:
+            meses_db = run_query_analitica(CONSULTAS['historico_meses'])
+
+        if not meses_db.empty:
+            lista_meses = meses_db['mes'].tolist()
+            # Define o mês atual como padrão, se disponível na lista, caso contrário, usa o primeiro da lista
+            hoje_mes_str = date.today().strftime('%Y-%m')
+            if hoje_mes_str in lista_meses:
+                default_index = lista_meses.index(hoje_mes_str)
+            else:
+                default_index = 0 # Se o mês atual não está na lista, seleciona o primeiro
+
+            mes_selecionado_str = st.selectbox(
+                "Selecione o Mês", 
+                lista_meses, 
+                index=default_index, 
+                format_func=lambda x: datetime.strptime(x, '%Y-%m').strftime('%B/%Y')
+            )
+
+            primeiro_dia_mes = datetime.strptime(mes_selecionado_str, '%Y-%m').date().replace(day=1)
+            # Calcula o último dia do mês corretamente
+            if primeiro_dia_mes.month == 12:
+                ultimo_dia_mes = primeiro_dia_mes.replace(day=31)
+            else:
+                ultimo_dia_mes = (primeiro_dia_mes.replace(month=primeiro_dia_mes.month + 1, day=1) - timedelta(days=1))
+
+            if consolidar_filiais:
+                df_historico = run_query_filiais(CONSULTAS['historico_periodo'], (primeiro_dia_mes, ultimo_dia_mes))
+            else:
+                df_historico = run_query_analitica(CONSULTAS['historico_periodo'], (primeiro_dia_mes, ultimo_dia_mes))
+
+            if not df_historico.empty:
+                faturamento_total = df_historico['Total_Faturado'].sum()
+                st.metric(f"Faturamento Total em {datetime.strptime(mes_selecionado_str, '%Y-%m').strftime('%B/%Y')}", formatar_moeda(faturamento_total))
+
+                # --- GRÁFICOS ---
+                st.subheader("Análise de Desempenho")
+
+                # Gráfico 1: Faturamento por Veículo
+                faturamento_por_veiculo = df_historico.groupby('Veiculo')['Total_Faturado'].sum().sort_values(
+                    ascending=False)
+
+                with trecho('grafico', 'faturamento_por_modelo'):
+                    fig, ax = plt.subplots(figsize=(10, 6))
+                    faturamento_por_veiculo.plot(kind='bar', ax=ax, color='skyblue')
+                    ax.set_title(f"Faturamento Total por Modelo ({datetime.strptime(mes_selecionado_str, '%Y-%m').strftime('%B/%Y')})")
+                    ax.set_ylabel('Faturamento (R$)')
+                    ax.set_xlabel('Modelo do Veículo')
+                    plt.xticks(rotation=45, ha='right')
+                    plt.tight_layout()
+
+                col_grafico1, col_grafico2 = st.columns(2)
+
+                with col_grafico1:
+                    st.markdown("##### 📈 Faturamento por Modelo")
+                    with trecho('grafico', 'faturamento_por_modelo'):
+                        st.pyplot(fig)
+
+                # Gráfico 2: Participação no Faturamento (Gráfico de Pizza)
+                with trecho('grafico', 'participacao_faturamento'):
+                    fig_pizza, ax_pizza = plt.subplots(figsize=(8, 8))
+                    ax_pizza.pie(faturamento_por_veiculo, labels=faturamento_por_veiculo.index, autopct='%1.1f%%',
+                                 startangle=90, colors=plt.cm.Paired.colors)
+                    ax_pizza.set_title(f"Participação de Mercado ({datetime.strptime(mes_selecionado_str, '%Y-%m').strftime('%B/%Y')})")
+
+                with col_grafico2:
+                    st.markdown("##### 🍕 Participação no Faturamento")
+                    with trecho('grafico', 'participacao_faturamento'):
+                        st.pyplot(fig_pizza)
+
+                st.markdown("---")
+                st.subheader("Detalhes das Locações Finalizadas")
+
+                # --- BACKUP E DOWNLOAD CSV ---
+                # O CSV leva todas as linhas formatadas: só é montado quando pedido
+                if st.button("💾 Gerar CSV do Histórico Completo", key='gerar-csv'):
+                    df_historico_csv = formatar_tabela(df_historico, colunas_moeda=['Total_Faturado', 'Lucro_por_km'],
+                                                       colunas_data=['Inicio', 'Fim'])
+                    st.download_button(
+                        label="📥 Baixar Histórico Completo (CSV)",
+                        data=df_historico_csv.to_csv(index=False, sep=';').encode('utf-8'),
+                        file_name=f'historico_locacoes_{mes_selecionado_str}.csv',
+                        mime='text/csv',
+                        key='download-csv'
+                    )
+
+                # Na tela, só as linhas da página visível são formatadas
+                colunas_historico = ['Cliente', 'Veiculo', 'Placa', 'Inicio', 'Fim', 'Total_Faturado', 'Km_Rodados', 'Lucro_por_km']
+                if consolidar_filiais:
+                    colunas_historico = ['Filial'] + colunas_historico
+                st.dataframe(
+                    formatar_tabela(pagina_visivel(df_historico, 'historico')[colunas_historico],
+                                    colunas_moeda=['Total_Faturado', 'Lucro_por_km'], colunas_data=['Inicio', 'Fim']),
+                    use_container_width=True
+                )
 
-    st.subheader("Faturamento Mensal")
+            else:
+                st.info("Nenhuma locação finalizada para o mês selecionado ou dados insuficientes para gerar gráficos.")
+
+        else:
+            st.info("Nenhuma locação finalizada no histórico.")
+
+    secao_faturamento_mensal(consolidar_filiais)
+
+    st.markdown("---")
+
+    # Busca de qualquer reserva (inclusive do arquivo morto) por placa, cliente, status e período
+    @fragmento("Busca de Reservas")
+    def secao_busca_reservas():
+        st.subheader("🔎 Buscar Reservas")
+        col_busca_placa, col_busca_cliente, col_busca_status = st.columns(3)
+        busca_placa = col_busca_placa.text_input("Placa", key="busca_reservas_placa")
+        busca_cliente = col_busca_cliente.text_input("Cliente (início do nome ou CPF)", key="busca_reservas_cliente")
+        busca_status = col_busca_status.multiselect("Status", ['Reservada', 'Locada', 'Finalizada', 'Cancelada'],
+                                                    key="busca_reservas_status")
+        busca_inicio_de = busca_inicio_ate = None
+        if st.checkbox("Filtrar pelo período de retirada", key="busca_reservas_periodo"):
+            col_busca_de, col_busca_ate = st.columns(2)
+            busca_inicio_de = col_busca_de.date_input("Retirada a partir de", value=date.today() - timedelta(days=30),
+                                                      key="busca_reservas_de")
+            busca_inicio_ate = col_busca_ate.date_input("Retirada até", value=date.today(),
+                                                        key="busca_reservas_ate")
+
+        filtros_busca = {'placa': busca_placa.strip(), 'cliente': busca_cliente.strip(),
+                         'status': tuple(busca_status), 'inicio_de': busca_inicio_de, 'inicio_ate': busca_inicio_ate}
+        reservas_encontradas = pagina_de_reservas('historico_busca', filtros_busca, incluir_arquivo=True)
+
+        if reservas_encontradas.empty:
+            st.info("Nenhuma reserva encontrada com esses filtros.")
+        else:
+            reservas_encontradas['Origem'] = np.where(reservas_encontradas['arquivada'], "Arquivo morto", "Banco atual")
+            reservas_encontradas_display = formatar_tabela(
+                reservas_encontradas, colunas_moeda=['valor_total'], colunas_data=['data_inicio', 'data_fim'])
+            reservas_encontradas_display.rename(columns={
+                'id': 'ID', 'cliente': 'Cliente', 'cpf': 'CPF', 'modelo': 'Veiculo', 'placa': 'Placa',
+                'data_inicio': 'Inicio', 'data_fim': 'Fim', 'reserva_status': 'Status', 'valor_total': 'Valor Total'
+            }, inplace=True)
+            st.dataframe(
+                reservas_encontradas_display[['ID', 'Cliente', 'CPF', 'Veiculo', 'Placa', 'Inicio', 'Fim', 'Status',
+                                              'Valor Total', 'Origem']],
+                use_container_width=True, hide_index=True
+            )
 
-    # Obter lista de meses com locações finalizadas
-    meses_db = run_query_dataframe(
-        "SELECT DISTINCT strftime('%Y-%m', data_fim) AS mes FROM reservas WHERE reserva_status='Finalizada' ORDER BY mes DESC"
-    )
+    secao_busca_reservas()
 
-    if not meses_db.empty:
-        lista_meses = meses_db['mes'].tolist()
-        # Define o mês atual como padrão, se disponível na lista, caso contrário, usa o primeiro da lista
-        hoje_mes_str = date.today().strftime('%Y-%m')
-        if hoje_mes_str in lista_meses:
-            default_index = lista_meses.index(hoje_mes_str)
+# 8. RELATÓRIOS (NOVA ABA)
+elif menu == "Relatórios":
+    st.title("📈 Relatórios")
+    st.write("Aqui você pode gerar relatórios de disponibilidade da frota.")
+    exibir_idade_snapshot('relatorios')
+
+    # Seção isolada: trocar o mês/ano reexecuta só a grade de disponibilidade e o Excel
+    @fragmento("Disponibilidade do Mês")
+    def secao_relatorio_disponibilidade():
+        # Seleção de Mês e Ano
+        col_mes, col_ano = st.columns(2)
+        mes_selecionado = col_mes.selectbox("Selecione o Mês", range(1, 13), index=date.today().month - 1,
+                                           format_func=lambda x: datetime(2000, x, 1).strftime('%B'), key="relatorio_mes")
+        ano_selecionado = col_ano.selectbox("Selecione o Ano", range(datetime.now().year - 2, datetime.now().year + 3),
+                                           index=2, key="relatorio_ano")
+
+        # Obtém o primeiro e último dia do mês selecionado
+        primeiro_dia_mes = date(ano_selecionado, mes_selecionado, 1)
+        if mes_selecionado == 12:
+            ultimo_dia_mes = date(ano_selecionado, mes_selecionado, 31)
         else:
-            default_index = 0 # Se o mês atual não está na lista, seleciona o primeiro
+            ultimo_dia_mes = date(ano_selecionado, mes_selecionado + 1, 1) - timedelta(days=1)
 
-        mes_selecionado_str = st.selectbox(
-            "Selecione o Mês", 
-            lista_meses, 
-            index=default_index, 
-            format_func=lambda x: datetime.strptime(x, '%Y-%m').strftime('%B/%Y')
-        )
+        # Dataframe de carros ativos (não excluídos)
+        df_carros = run_query_analitica(CONSULTAS['carros_ativos_resumo'], (STATUS_CARRO['EXCLUIDO'],))
 
-        primeiro_dia_mes = datetime.strptime(mes_selecionado_str, '%Y-%m').date().replace(day=1)
-        # Calcula o último dia do mês corretamente
-        if primeiro_dia_mes.month == 12:
-            ultimo_dia_mes = primeiro_dia_mes.replace(day=31)
+        if df_carros.empty:
+            st.warning("Nenhum veículo ativo encontrado para gerar o relatório.")
         else:
-            ultimo_dia_mes = (primeiro_dia_mes.replace(month=primeiro_dia_mes.month + 1, day=1) - timedelta(days=1))
-
-        query_historico = f"""
-            SELECT 
-                r.id AS Reserva_ID, 
-                cl.nome AS Cliente, 
-                c.modelo AS Veiculo, 
-                c.placa AS Placa, 
-                r.data_inicio AS Inicio, 
-                r.data_fim AS Fim, 
-                r.valor_total AS Total_Faturado,
-                -- Tratamento para evitar divisão por zero: se km_rodados for 0, retorna 0, senão calcula
-                CASE WHEN (r.km_volta - r.km_saida) = 0 THEN 0 ELSE (r.valor_total / (r.km_volta - r.km_saida)) END AS Lucro_por_km,
-                (r.km_volta - r.km_saida) AS Km_Rodados
-            FROM reservas r
-            JOIN clientes cl ON r.cliente_id = cl.id
-            JOIN carros c ON r.carro_id = c.id
-            WHERE r.reserva_status = 'Finalizada'
-            AND r.data_fim BETWEEN '{primeiro_dia_mes}' AND '{ultimo_dia_mes}'
-        """
-        df_historico = run_query_dataframe(query_historico)
-
-        if not df_historico.empty:
-            faturamento_total = df_historico['Total_Faturado'].sum()
-            st.metric(f"Faturamento Total em {datetime.strptime(mes_selecionado_str, '%Y-%m').strftime('%B/%Y')}", formatar_moeda(faturamento_total))
-
-            # --- GRÁFICOS ---
-            st.subheader("Análise de Desempenho")
-
-            # Gráfico 1: Faturamento por Veículo
-            faturamento_por_veiculo = df_historico.groupby('Veiculo')['Total_Faturado'].sum().sort_values(
-                ascending=False)
-
-            fig, ax = plt.subplots(figsize=(10, 6))
-            faturamento_por_veiculo.plot(kind='bar', ax=ax, color='skyblue')
-            ax.set_title(f"Faturamento Total por Modelo ({datetime.strptime(mes_selecionado_str, '%Y-%m').strftime('%B/%Y')})")
-            ax.set_ylabel('Faturamento (R$)')
-            ax.set_xlabel('Modelo do Veículo')
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
-
-            col_grafico1, col_grafico2 = st.columns(2)
-
-            with col_grafico1:
-                st.markdown("##### 📈 Faturamento por Modelo")
-                st.pyplot(fig)
-
-            # Gráfico 2: Participação no Faturamento (Gráfico de Pizza)
-            fig_pizza, ax_pizza = plt.subplots(figsize=(8, 8))
-            ax_pizza.pie(faturamento_por_veiculo, labels=faturamento_por_veiculo.index, autopct='%1.1f%%',
-                         startangle=90, colors=plt.cm.Paired.colors)
-            ax_pizza.set_title(f"Participação de Mercado ({datetime.strptime(mes_selecionado_str, '%Y-%m').strftime('%B/%Y')})")
-
-            with col_grafico2:
-                st.markdown("##### 🍕 Participação no Faturamento")
-                st.pyplot(fig_pizza)
+            # Obter todas as reservas ativas (Locada ou Reservada) para o período do mês
+            df_reservas = run_query_analitica(CONSULTAS['reservas_ativas_periodo'], (ultimo_dia_mes, primeiro_dia_mes))
+
+            # Criar a estrutura para o relatório
+            # A primeira coluna será o nome do veículo, as outras serão os dias do mês
+            dias_no_mes = (ultimo_dia_mes - primeiro_dia_mes).days + 1
+            colunas_dias = [f"{d:02d}" for d in range(1, dias_no_mes + 1)]
+
+            # Inicializa o DataFrame do relatório com a coluna de veículos
+            df_relatorio_data = {'Veículo': df_carros['modelo'] + " (" + df_carros['placa'] + ")"}
+            for dia in colunas_dias:
+                df_relatorio_data[dia] = '' # Preenche com vazio inicialmente
+
+            df_relatorio = pd.DataFrame(df_relatorio_data)
+
+            # Mapear IDs de carro para índice no df_relatorio para atualização eficiente
+            carro_id_to_index = {carro_id: i for i, carro_id in enumerate(df_carros['id'])}        
+
+            # Preencher o DataFrame do relatório com base nas reservas
+            for index, row in df_reservas.iterrows():
+                carro_id = row['carro_id']
+                reserva_status = row['reserva_status']
+                data_inicio = pd.to_datetime(row['data_inicio']).date()
+                data_fim = pd.to_datetime(row['data_fim']).date()
+
+                if carro_id in carro_id_to_index:
+                    idx_df_relatorio = carro_id_to_index[carro_id]
+
+                    for d in range(1, dias_no_mes + 1):
+                        dia_atual = date(ano_selecionado, mes_selecionado, d)
+                        if data_inicio <= dia_atual <= data_fim:
+                            col_dia = f"{d:02d}"
+                            if reserva_status == 'Reservada':
+                                df_relatorio.at[idx_df_relatorio, col_dia] = 'Reservado'
+                            elif reserva_status == 'Locada':
+                                df_relatorio.at[idx_df_relatorio, col_dia] = 'Locado'
+
+            # Após preencher os status de reservas/locações, preencher o restante como 'Disponível'
+            for r_idx in range(len(df_relatorio)):
+                for c_idx in colunas_dias:
+                    if df_relatorio.at[r_idx, c_idx] == '':
+                        df_relatorio.at[r_idx, c_idx] = 'Disponível'
+
+            st.dataframe(df_relatorio, hide_index=True)
 
             st.markdown("---")
-            st.subheader("Detalhes das Locações Finalizadas")
+            st.subheader("Gerar Relatório Excel")
 
-            # --- BACKUP E DOWNLOAD CSV ---
-            df_historico_display = df_historico.copy()
+            if st.button("📊 Gerar e Baixar Relatório de Disponibilidade", type="primary"):
+                with trecho('excel', 'relatorio_disponibilidade'):
+                    output = io.BytesIO()
+                    workbook = Workbook()
+                    sheet = workbook.active
+                    sheet.title = f"Disponibilidade {mes_selecionado:02d}-{ano_selecionado}"
 
-            # Formata colunas para exibição na tela e para o CSV
-            df_historico_display['Inicio'] = pd.to_datetime(df_historico_display['Inicio']).dt.strftime('%d/%m/%Y')
-            df_historico_display['Fim'] = pd.to_datetime(df_historico_display['Fim']).dt.strftime('%d/%m/%Y')
-            df_historico_display['Total_Faturado'] = df_historico_display['Total_Faturado'].apply(formatar_moeda)
-            df_historico_display['Lucro_por_km'] = df_historico_display['Lucro_por_km'].apply(formatar_moeda)
+                    # Obter nomes dos veículos (serão os cabeçalhos das colunas do Excel, a partir da coluna B)
+                    # Usa a coluna 'Veículo' do df_relatorio que já inclui Modelo e Placa
+                    vehicle_names_with_plate = df_relatorio['Veículo'].tolist()
 
-            csv = df_historico_display.to_csv(index=False, sep=';').encode('utf-8')
+                    # Obter números dos dias (serão os cabeçalhos das linhas do Excel, a partir da linha 2)
+                    day_numbers_str = colunas_dias # ex: ['01', '02', ...]
 
-            st.download_button(
-                label="💾 Baixar Histórico Completo (CSV)",
-                data=csv,
-                file_name=f'historico_locacoes_{mes_selecionado_str}.csv',
-                mime='text/csv',
-                key='download-csv'
-            )
+                    # Célula A1 vazia ou com um rótulo
+                    sheet.cell(row=1, column=1, value="Dia/Veículo")
 
-            st.dataframe(
-                df_historico_display[['Cliente', 'Veiculo', 'Placa', 'Inicio', 'Fim', 'Total_Faturado', 'Km_Rodados', 'Lucro_por_km']],
-                use_container_width=True
-            )
+                    # Escrever nomes dos veículos como cabeçalhos de coluna (linha 1, começando da coluna B)
+                    for col_idx, vehicle_name in enumerate(vehicle_names_with_plate, start=2):
+                        sheet.cell(row=1, column=col_idx, value=vehicle_name)
 
-        else:
-            st.info("Nenhuma locação finalizada para o mês selecionado ou dados insuficientes para gerar gráficos.")
+                    # Escrever números dos dias como cabeçalhos de linha (coluna 1, começando da linha 2)
+                    for row_idx, day_str in enumerate(day_numbers_str, start=2):
+                        sheet.cell(row=row_idx, column=1, value=int(day_str)) # Converte para int para exibição
 
-    else:
-        st.info("Nenhuma locação finalizada no histórico.")
+                    # Estilo para o cabeçalho
+                    header_fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+                    header_font = Font(bold=True)
 
-# 8. RELATÓRIOS (NOVA ABA)
-elif menu == "Relatórios":
-    st.title("📈 Relatórios")
-    st.write("Aqui você pode gerar relatórios de disponibilidade da frota.")
+                    # Aplicar à primeira linha (cabeçalhos dos veículos)
+                    for col in range(1, len(vehicle_names_with_plate) + 2):
+                        sheet.cell(row=1, column=col).fill = header_fill
+                        sheet.cell(row=1, column=col).font = header_font
 
-    # Seleção de Mês e Ano
-    col_mes, col_ano = st.columns(2)
-    mes_selecionado = col_mes.selectbox("Selecione o Mês", range(1, 13), index=date.today().month - 1,
-                                       format_func=lambda x: datetime(2000, x, 1).strftime('%B'))
-    ano_selecionado = col_ano.selectbox("Selecione o Ano", range(datetime.now().year - 2, datetime.now().year + 3),
-                                       index=2)
+                    # Aplicar à primeira coluna (cabeçalhos dos dias)
+                    for row in range(1, len(day_numbers_str) + 2):
+                        sheet.cell(row=row, column=1).fill = header_fill
+                        sheet.cell(row=row, column=1).font = header_font
 
-    # Obtém o primeiro e último dia do mês selecionado
-    primeiro_dia_mes = date(ano_selecionado, mes_selecionado, 1)
-    if mes_selecionado == 12:
-        ultimo_dia_mes = date(ano_selecionado, mes_selecionado, 31)
-    else:
-        ultimo_dia_mes = date(ano_selecionado, mes_selecionado + 1, 1) - timedelta(days=1)
+                    # Preencher dados e aplicar formatação condicional
+                    green_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid") # Verde
+                    orange_fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid") # Laranja
+                    red_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")   # Vermelho
 
-    # Dataframe de carros ativos (não excluídos)
-    df_carros = run_query_dataframe(f"SELECT id, modelo, placa FROM carros WHERE status != '{STATUS_CARRO['EXCLUIDO']}'")
+                    # Preencher as células de dados (status)
+                    # Iterar pelos dias (que agora são as linhas no Excel)
+                    for day_excel_row_idx, day_str in enumerate(day_numbers_str, start=2):
+                        # Iterar pelos veículos (que agora são as colunas no Excel)
+                        for vehicle_excel_col_idx, vehicle_name_full in enumerate(vehicle_names_with_plate, start=2):
 
-    if df_carros.empty:
-        st.warning("Nenhum veículo ativo encontrado para gerar o relatório.")
-    else:
-        # Obter todas as reservas ativas (Locada ou Reservada) para o período do mês
-        query_reservas = f"""
-            SELECT carro_id, data_inicio, data_fim, reserva_status
-            FROM reservas
-            WHERE (reserva_status = 'Reservada' OR reserva_status = 'Locada')
-            AND (data_inicio <= '{ultimo_dia_mes}' AND data_fim >= '{primeiro_dia_mes}')
-        """
-        df_reservas = run_query_dataframe(query_reservas)
-
-        # Criar a estrutura para o relatório
-        # A primeira coluna será o nome do veículo, as outras serão os dias do mês
-        dias_no_mes = (ultimo_dia_mes - primeiro_dia_mes).days + 1
-        colunas_dias = [f"{d:02d}" for d in range(1, dias_no_mes + 1)]
-
-        # Inicializa o DataFrame do relatório com a coluna de veículos
-        df_relatorio_data = {'Veículo': df_carros['modelo'] + " (" + df_carros['placa'] + ")"}
-        for dia in colunas_dias:
-            df_relatorio_data[dia] = '' # Preenche com vazio inicialmente
-
-        df_relatorio = pd.DataFrame(df_relatorio_data)
-
-        # Mapear IDs de carro para índice no df_relatorio para atualização eficiente
-        carro_id_to_index = {carro_id: i for i, carro_id in enumerate(df_carros['id'])}        
-
-        # Preencher o DataFrame do relatório com base nas reservas
-        for index, row in df_reservas.iterrows():
-            carro_id = row['carro_id']
-            reserva_status = row['reserva_status']
-            data_inicio = pd.to_datetime(row['data_inicio']).date()
-            data_fim = pd.to_datetime(row['data_fim']).date()
-
-            if carro_id in carro_id_to_index:
-                idx_df_relatorio = carro_id_to_index[carro_id]
-                
-                for d in range(1, dias_no_mes + 1):
-                    dia_atual = date(ano_selecionado, mes_selecionado, d)
-                    if data_inicio <= dia_atual <= data_fim:
-                        col_dia = f"{d:02d}"
-                        if reserva_status == 'Reservada':
-                            df_relatorio.at[idx_df_relatorio, col_dia] = 'Reservado'
-                        elif reserva_status == 'Locada':
-                            df_relatorio.at[idx_df_relatorio, col_dia] = 'Locado'
-
-        # Após preencher os status de reservas/locações, preencher o restante como 'Disponível'
-        for r_idx in range(len(df_relatorio)):
-            for c_idx in colunas_dias:
-                if df_relatorio.at[r_idx, c_idx] == '':
-                    df_relatorio.at[r_idx, c_idx] = 'Disponível'
-
-        st.dataframe(df_relatorio, hide_index=True)
+                            # Para obter o status de um dia e veículo específicos,
+                            # precisamos encontrar a linha no df_relatorio que corresponde ao vehicle_name_full
+                            # e então pegar o valor da coluna 'day_str'.
 
-        st.markdown("---")
-        st.subheader("Gerar Relatório Excel")
-
-        if st.button("📊 Gerar e Baixar Relatório de Disponibilidade", type="primary"):
-            output = io.BytesIO()
-            workbook = Workbook()
-            sheet = workbook.active
-            sheet.title = f"Disponibilidade {mes_selecionado:02d}-{ano_selecionado}"
-
-            # Obter nomes dos veículos (serão os cabeçalhos das colunas do Excel, a partir da coluna B)
-            # Usa a coluna 'Veículo' do df_relatorio que já inclui Modelo e Placa
-            vehicle_names_with_plate = df_relatorio['Veículo'].tolist()
-            
-            # Obter números dos dias (serão os cabeçalhos das linhas do Excel, a partir da linha 2)
-            day_numbers_str = colunas_dias # ex: ['01', '02', ...]
-
-            # Célula A1 vazia ou com um rótulo
-            sheet.cell(row=1, column=1, value="Dia/Veículo")
-
-            # Escrever nomes dos veículos como cabeçalhos de coluna (linha 1, começando da coluna B)
-            for col_idx, vehicle_name in enumerate(vehicle_names_with_plate, start=2):
-                sheet.cell(row=1, column=col_idx, value=vehicle_name)
-
-            # Escrever números dos dias como cabeçalhos de linha (coluna 1, começando da linha 2)
-            for row_idx, day_str in enumerate(day_numbers_str, start=2):
-                sheet.cell(row=row_idx, column=1, value=int(day_str)) # Converte para int para exibição
-
-            # Estilo para o cabeçalho
-            header_fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-            header_font = Font(bold=True)
-            
-            # Aplicar à primeira linha (cabeçalhos dos veículos)
-            for col in range(1, len(vehicle_names_with_plate) + 2):
-                sheet.cell(row=1, column=col).fill = header_fill
-                sheet.cell(row=1, column=col).font = header_font
-            
-            # Aplicar à primeira coluna (cabeçalhos dos dias)
-            for row in range(1, len(day_numbers_str) + 2):
-                sheet.cell(row=row, column=1).fill = header_fill
-                sheet.cell(row=row, column=1).font = header_font
-
-            # Preencher dados e aplicar formatação condicional
-            green_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid") # Verde
-            orange_fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid") # Laranja
-            red_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")   # Vermelho
-
-            # Preencher as células de dados (status)
-            # Iterar pelos dias (que agora são as linhas no Excel)
-            for day_excel_row_idx, day_str in enumerate(day_numbers_str, start=2):
-                # Iterar pelos veículos (que agora são as colunas no Excel)
-                for vehicle_excel_col_idx, vehicle_name_full in enumerate(vehicle_names_with_plate, start=2):
-                    
-                    # Para obter o status de um dia e veículo específicos,
-                    # precisamos encontrar a linha no df_relatorio que corresponde ao vehicle_name_full
-                    # e então pegar o valor da coluna 'day_str'.
-                    
-                    # Encontrar o índice da linha do veículo no df_relatorio original
-                    original_df_row_index = df_relatorio[df_relatorio['Veículo'] == vehicle_name_full].index[0]
-                    
-                    # Obter o status para o dia específico dessa linha
-                    status = df_relatorio.at[original_df_row_index, day_str]
-                    
-                    cell = sheet.cell(row=day_excel_row_idx, column=vehicle_excel_col_idx, value=status)
-
-                    if status == 'Disponível':
-                        cell.fill = green_fill
-                    elif status == 'Reservado':
-                        cell.fill = orange_fill
-                    elif status == 'Locado':
-                        cell.fill = red_fill
-
-            # Ajustar largura das colunas
-            sheet.column_dimensions['A'].width = 10 # Largura para a coluna dos dias
-            for col_idx in range(2, len(vehicle_names_with_plate) + 2):
-                sheet.column_dimensions[chr(64 + col_idx)].width = 25 # Largura para os nomes dos veículos
-
-            workbook.save(output)
-            output.seek(0)
-
-            st.download_button(
-                label="Download Excel",
-                data=output.getvalue(),
-                file_name=f"relatorio_disponibilidade_{mes_selecionado:02d}-{ano_selecionado}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-            st.success("Relatório Excel gerado com sucesso!")
+                            # Encontrar o índice da linha do veículo no df_relatorio original
+                            original_df_row_index = df_relatorio[df_relatorio['Veículo'] == vehicle_name_full].index[0]
+
+                            # Obter o status para o dia específico dessa linha
+                            status = df_relatorio.at[original_df_row_index, day_str]
+
+                            cell = sheet.cell(row=day_excel_row_idx, column=vehicle_excel_col_idx, value=status)
+
+                            if status == 'Disponível':
+                                cell.fill = green_fill
+                            elif status == 'Reservado':
+                                cell.fill = orange_fill
+                            elif status == 'Locado':
+                                cell.fill = red_fill
+
+                    # Ajustar largura das colunas
+                    sheet.column_dimensions['A'].width = 10 # Largura para a coluna dos dias
+                    for col_idx in range(2, len(vehicle_names_with_plate) + 2):
+                        sheet.column_dimensions[chr(64 + col_idx)].width = 25 # Largura para os nomes dos veículos
+
+                    workbook.save(output)
+                    output.seek(0)
+
+                st.download_button(
+                    label="Download Excel",
+                    data=output.getvalue(),
+                    file_name=f"relatorio_disponibilidade_{mes_selecionado:02d}-{ano_selecionado}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+                st.success("Relatório Excel gerado com sucesso!")
+
+    secao_relatorio_disponibilidade()
+
+    # --- EXPORTAÇÃO DE DOCUMENTOS EM LOTE ---
+    st.markdown("---")
+    st.subheader("📦 Exportar Contratos e Recibos (ZIP)")
+    st.write("Gera de uma vez os contratos (reservas entregues) e recibos (locações finalizadas) do mês selecionado ou de reservas específicas.")
+
+    # Mês e ano escolhidos na seção de disponibilidade (lidos pelas chaves dos widgets do fragmento)
+    mes_selecionado = st.session_state.get('relatorio_mes', date.today().month)
+    ano_selecionado = st.session_state.get('relatorio_ano', date.today().year)
+    primeiro_dia_mes = date(ano_selecionado, mes_selecionado, 1)
+    ultimo_dia_mes = (primeiro_dia_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    col_tipos, col_ids = st.columns(2)
+    tipos_exportacao = col_tipos.multiselect("Documentos", TIPOS_DOCUMENTO, default=list(TIPOS_DOCUMENTO),
+                                             format_func=lambda tipo: tipo.capitalize() + "s")
+    ids_exportacao = col_ids.text_input("IDs das reservas (opcional, separados por vírgula)",
+                                        help="Se vazio, exporta as reservas do mês selecionado acima.")
+
+    if st.button("📦 Gerar ZIP de Documentos", disabled=not tipos_exportacao):
+        try:
+            lista_ids = [int(i) for i in ids_exportacao.replace(' ', '').split(',') if i] or None
+        except ValueError:
+            st.error("IDs inválidos. Use apenas números separados por vírgula.")
+            lista_ids = []
+
+        if lista_ids != []:
+            # O ZIP é escrito direto no armazém em disco
+            nome_zip = f"documentos_{mes_selecionado:02d}-{ano_selecionado}.zip" if lista_ids is None else "documentos_reservas.zip"
+            with st.spinner("Gerando documentos..."):
+                with novo_blob(nome_zip, 'application/zip') as (handle_zip, arquivo_zip):
+                    resumo_exportacao = exportar_zip(arquivo_zip, lista_ids, primeiro_dia_mes, ultimo_dia_mes,
+                                                     tuple(tipos_exportacao), db_file=DB_FILE)
+
+            if resumo_exportacao['documentos'] == 0:
+                remover_blob(handle_zip)
+                st.warning("Nenhum documento encontrado para os filtros informados.")
+            else:
+                st.success(f"{resumo_exportacao['documentos']} documentos gerados em {resumo_exportacao['segundos']:.1f}s "
+                           f"({resumo_exportacao['docs_por_segundo']:.1f} docs/s).")
+                botao_download("📥 Baixar ZIP", handle=handle_zip)
+            for nome_documento, erro_documento in resumo_exportacao['erros']:
+                st.error(f"Erro ao gerar {nome_documento}: {erro_documento}")
+
+    # --- DIMENSIONAMENTO DA FROTA (SIMULAÇÃO) ---
+    COLUNAS_SIMULACAO = {
+        'carros': 'Carros', 'utilizacao_pct': 'Utilização (%)', 'utilizacao_p10': 'Utilização P10 (%)',
+        'utilizacao_p90': 'Utilização P90 (%)', 'recusados': 'Pedidos Recusados', 'recusados_p95': 'Recusados P95',
+        'demanda_recusada_pct': 'Demanda Recusada (%)',
+    }
+    st.markdown("---")
+    st.subheader("🚙 Dimensionamento da Frota (Simulação)")
+    st.write(f"Simula {EXECUCOES_PADRAO} cenários da demanda de cada modelo (ajustada com as reservas dos últimos "
+             f"{JANELA_HISTORICO_DIAS} dias) para frotas um pouco menores e maiores que a atual.")
+
+    col_horizonte, col_fator = st.columns(2)
+    horizonte_simulacao = col_horizonte.selectbox("Horizonte", [90, 180, 365], index=2,
+                                                  format_func=lambda dias: f"{dias} dias")
+    fator_demanda = col_fator.slider("Variação da demanda", 0.5, 2.0, 1.0, 0.1,
+                                     help="1,0 = demanda observada; 1,2 = 20% a mais de pedidos")
+
+    if st.button("📊 Simular Tamanhos de Frota"):
+        with st.spinner("Simulando cenários..."):
+            inicio_simulacao = time.perf_counter()
+            df_simulacao = obter_simulacao_frota(DB_FILE, horizonte=horizonte_simulacao, fator_demanda=fator_demanda)
+            segundos_simulacao = time.perf_counter() - inicio_simulacao
+
+        if df_simulacao.empty:
+            st.info(f"Nenhuma reserva nos últimos {JANELA_HISTORICO_DIAS} dias para ajustar a demanda.")
+        else:
+            st.caption(f"Simulação concluída em {segundos_simulacao:.1f}s (reaproveitada até carros ou reservas mudarem).")
+            for modelo_simulado, df_modelo in df_simulacao.groupby('modelo'):
+                atual = int(df_modelo['frota_atual'].iloc[0])
+                st.markdown(f"**{modelo_simulado}** — frota atual: {atual} carro(s), "
+                            f"{df_modelo['pedidos'].iloc[0]:.0f} pedidos esperados em {horizonte_simulacao} dias")
+                df_modelo = df_modelo.assign(carros=[f"{n} (atual)" if n == atual else str(n) for n in df_modelo['carros']])
+                st.dataframe(df_modelo[list(COLUNAS_SIMULACAO)].rename(columns=COLUNAS_SIMULACAO),
+                             use_container_width=True, hide_index=True)
 
 # 8. GERENCIAR USUÁRIOS (APENAS ADMIN)
 elif menu == "👥 Gerenciar Usuários":
@@ -1784,7 +2017,8 @@ elif menu == "👥 Gerenciar Usuários":
         st.error("❌ Você não tem permissão para acessar esta seção.")
         st.stop()
 
-    tab_listar, tab_criar, tab_auditoria = st.tabs(["Listar Usuários", "Criar Usuário", "Logs de Auditoria"])
+    tab_listar, tab_criar, tab_auditoria, tab_desempenho = st.tabs(
+        ["Listar Usuários", "Criar Usuário", "Logs de Auditoria", "⏱️ Desempenho"])
 
     with tab_listar:
         st.subheader("Usuários Cadastrados")
@@ -1801,14 +2035,16 @@ elif menu == "👥 Gerenciar Usuários":
                 'employee': 'Funcionário',
                 'viewer': 'Visualizador'
             })
+            df_users['filial'] = [filial_do_usuario(u) for u in users]
 
             st.dataframe(
-                df_users[['username', 'full_name', 'email', 'role_display', 'status', 'created_at', 'last_login']],
+                df_users[['username', 'full_name', 'email', 'role_display', 'filial', 'status', 'created_at', 'last_login']],
                 column_config={
                     'username': 'Usuário',
                     'full_name': 'Nome Completo',
                     'email': 'Email',
                     'role_display': 'Nível',
+                    'filial': 'Filial',
                     'status': 'Status',
                     'created_at': 'Criado em',
                     'last_login': 'Último Login'
@@ -1844,6 +2080,12 @@ elif menu == "👥 Gerenciar Usuários":
                                 format_func=lambda x: USER_ROLES[x],
                                 index=list(USER_ROLES.keys()).index(user_data['role'])
                             )
+                            filiais_disponiveis = listar_filiais()
+                            filial_usuario = filial_do_usuario(user_data)
+                            new_filial = st.selectbox(
+                                "Filial", options=filiais_disponiveis,
+                                index=filiais_disponiveis.index(filial_usuario) if filial_usuario in filiais_disponiveis else 0
+                            )
                             new_active = st.checkbox("Usuário Ativo", value=user_data['is_active'])
 
                         new_password = st.text_input("Nova Senha (deixe vazio para manter)", type="password")
@@ -1853,6 +2095,7 @@ elif menu == "👥 Gerenciar Usuários":
                                 'full_name': new_full_name,
                                 'email': new_email,
                                 'role': new_role,
+                                'filial': new_filial,
                                 'is_active': new_active
                             }
 
@@ -1900,6 +2143,7 @@ elif menu == "👥 Gerenciar Usuários":
                     options=list(USER_ROLES.keys()),
                     format_func=lambda x: USER_ROLES[x]
                 )
+                filial_novo_usuario = st.selectbox("Filial", options=listar_filiais())
 
             if st.form_submit_button("👤 Criar Usuário", type="primary"):
                 if not username or not password or not full_name:
@@ -1910,7 +2154,7 @@ elif menu == "👥 Gerenciar Usuários":
                     st.error("❌ A senha deve ter pelo menos 6 caracteres!")
                 else:
                     success, message = auth_manager.create_user(
-                        username, password, role, full_name, email
+                        username, password, role, full_name, email, filial_novo_usuario
                     )
 
                     if success:
@@ -1927,7 +2171,7 @@ elif menu == "👥 Gerenciar Usuários":
 
         if logs:
             df_logs = pd.DataFrame(logs)
-            df_logs['timestamp'] = pd.to_datetime(df_logs['timestamp']).dt.strftime('%d/%m/%Y %H:%M:%S')
+            df_logs['timestamp'] = datas(df_logs['timestamp'], '%d/%m/%Y %H:%M:%S')
 
             st.dataframe(
                 df_logs,
@@ -1962,6 +2206,184 @@ elif menu == "👥 Gerenciar Usuários":
         else:
             st.info("Nenhum log de auditoria encontrado.")
 
+    with tab_desempenho:
+        st.subheader("⏱️ Tempo de Renderização por Página")
+        dias_rastro = st.selectbox("Período", [1, 7, 30], index=1, format_func=lambda d: f"Últimos {d} dia(s)",
+                                   key="dias_rastro")
+        df_tempos = percentis_por_pagina(dias_rastro)
+        if df_tempos.empty:
+            st.info("Nenhuma execução registrada no período.")
+        else:
+            st.dataframe(df_tempos.round(1).rename(columns={
+                'pagina': 'Página', 'execucoes': 'Execuções', 'interrompidas': 'Interrompidas',
+                'p50_ms': 'p50 (ms)', 'p95_ms': 'p95 (ms)', 'p99_ms': 'p99 (ms)',
+                'sql_p95_ms': 'SQL p95', 'pdf_p95_ms': 'PDF p95', 'grafico_p95_ms': 'Gráficos p95',
+                'excel_p95_ms': 'Excel p95', 'outros_p95_ms': 'Streamlit/pandas p95'}),
+                use_container_width=True, hide_index=True)
+            st.caption("Interrompidas: execuções encerradas por um rerun, medidas até o último trecho.")
+            pagina_rastro = st.selectbox("Trechos mais lentos da página", df_tempos['pagina'].tolist(),
+                                         key="pagina_rastro")
+            st.dataframe(trechos_mais_lentos(pagina_rastro, dias_rastro).round(1).rename(columns={
+                'categoria': 'Categoria', 'nome': 'Trecho', 'chamadas': 'Chamadas',
+                'ms_por_execucao': 'ms por Execução', 'ms_maximo': 'Máximo (ms)'}),
+                use_container_width=True, hide_index=True)
+
+        st.markdown("---")
+        st.subheader("🔬 Perfil da Próxima Execução")
+        st.caption("Liga o cProfile na próxima execução do script (a próxima página aberta ou ação feita). "
+                   "O arquivo .prof abre no pstats ou no snakeviz.")
+        if st.button("🔬 Perfilar a Próxima Execução", key="perfilar_proxima"):
+            st.session_state['perfilar_proxima_execucao'] = True
+            st.info("A próxima execução será perfilada. Volte a esta aba para baixar o resultado.")
+
+        perfil = st.session_state.get('perfil_execucao')
+        if perfil and obter_blob(perfil['handle']) is not None:
+            st.write(f"Último perfil: **{perfil['pagina'] or 'login'}** ({perfil['total_ms']:.0f} ms)")
+            botao_download("📥 Baixar Perfil (.prof)", key="baixar_perfil", handle=perfil['handle'])
+            with st.expander("Resumo (tempo acumulado)"):
+                st.code(perfil['resumo'])
+
 # 9. BACKUP (NOVA ABA)
 elif menu == "Backup":
-    interface_backup()
+    interface_backup(DB_FILE)
+
+    st.markdown("---")
+    st.subheader("📦 Armazenamento e Estatísticas do Banco")
+    resumo_banco = resumo_arquivo(DB_FILE)
+    col_tamanho, col_livres, col_pagina = st.columns(3)
+    col_tamanho.metric("Tamanho do Banco", formatar_bytes(resumo_banco['bytes']))
+    col_livres.metric("Páginas Livres", f"{resumo_banco['proporcao_livre']:.1%}",
+                      help=f"{resumo_banco['paginas_livres']} de {resumo_banco['paginas']} páginas "
+                           f"({formatar_bytes(resumo_banco['bytes_livres'])})")
+    col_pagina.metric("Tamanho da Página", f"{resumo_banco['tamanho_pagina']} bytes")
+    if resumo_banco['compactar']:
+        st.warning("⚠️ Muitas páginas livres no arquivo: a compactação (VACUUM) é recomendada.")
+
+    desatualizadas = estatisticas_desatualizadas(DB_FILE)
+    if desatualizadas:
+        st.warning("📈 Estatísticas do planejador desatualizadas: " + ", ".join(
+            f"{tabela} ({atuais} linhas, {'sem ANALYZE' if anteriores is None else f'{anteriores} no último ANALYZE'})"
+            for tabela, atuais, anteriores in desatualizadas))
+    else:
+        st.success("📈 Estatísticas do planejador em dia.")
+
+    arquivo = estatisticas_arquivo(DB_FILE)
+    st.caption(f"🗄️ Arquivo morto: {arquivo['reservas_arquivadas']} reserva(s) encerrada(s) há mais de "
+               f"{IDADE_ARQUIVAMENTO_DIAS} dias ({formatar_bytes(arquivo['bytes'])})"
+               + (f", último arquivamento em {datas(pd.Series([arquivo['ultimo_arquivamento']])).iloc[0]}"
+                  if arquivo['ultimo_arquivamento'] else ""))
+
+    with st.expander("Tamanho por tabela e índice"):
+        df_tamanhos = tamanhos_objetos(DB_FILE)
+        if df_tamanhos.empty:
+            st.info("Tabela virtual dbstat indisponível neste SQLite.")
+        else:
+            df_tamanhos['bytes'] = df_tamanhos['bytes'].map(formatar_bytes)
+            df_tamanhos['ocupacao'] = (df_tamanhos['ocupacao'] * 100).round(0).astype(int).astype(str) + '%'
+            st.dataframe(df_tamanhos.rename(columns={
+                'objeto': 'Objeto', 'tipo': 'Tipo', 'tabela': 'Tabela', 'paginas': 'Páginas',
+                'bytes': 'Tamanho', 'ocupacao': 'Ocupação'}), use_container_width=True, hide_index=True)
+
+    with st.expander("Crescimento das tabelas"):
+        df_historico = historico_linhas(DB_FILE)
+        if df_historico.empty:
+            st.info("Nenhuma coleta registrada ainda (a tarefa otimizar_banco grava uma por noite).")
+        else:
+            st.dataframe(crescimento_linhas(DB_FILE).rename(columns={
+                'tabela': 'Tabela', 'linhas': 'Linhas', 'variacao': 'Variação (30 dias)', 'por_dia': 'Por Dia'}),
+                use_container_width=True, hide_index=True)
+            with trecho('grafico', 'crescimento_tabelas'):
+                st.line_chart(df_historico.pivot_table(index='coletado_em', columns='tabela', values='linhas'))
+
+    verificacao = ultima_verificacao(DB_FILE)
+    if verificacao is None:
+        st.caption("🩺 Integridade: nenhuma verificação completa registrada (tarefa verificar_integridade).")
+    elif verificacao['ok']:
+        st.caption(f"🩺 Integridade: OK na verificação completa de "
+                   f"{verificacao['verificado_em']:%d/%m/%Y %H:%M} ({verificacao['segundos']:.1f}s)")
+    else:
+        st.error(f"🩺 A verificação completa de {verificacao['verificado_em']:%d/%m/%Y %H:%M} encontrou problemas: "
+                 f"{verificacao['resultado']}")
+
+    if check_permission('manage_users'):
+        col_analisar, col_compactar = st.columns(2)
+        with col_analisar:
+            if st.button("📈 Atualizar Estatísticas (ANALYZE)", key="armazenamento_analisar"):
+                analisadas = atualizar_estatisticas_planejador(DB_FILE)
+                st.success(f"ANALYZE executado: {', '.join(analisadas)}" if analisadas
+                           else "Estatísticas já estavam em dia (PRAGMA optimize executado).")
+        with col_compactar:
+            if st.button("🗜️ Compactar Banco (VACUUM)", key="armazenamento_compactar",
+                         help="Bloqueia o banco durante a execução"):
+                with st.spinner("Compactando banco..."):
+                    antes, depois = compactar_banco(DB_FILE)
+                st.success(f"Banco compactado: {formatar_bytes(antes)} → {formatar_bytes(depois)}")
+
+    if check_permission('manage_users'):
+        st.markdown("---")
+        st.subheader("⏰ Tarefas Agendadas")
+        st.caption("Agenda no formato cron: minuto hora dia-do-mês mês dia-da-semana")
+
+        tarefas = listar_tarefas(DB_FILE)
+        if tarefas:
+            df_tarefas = pd.DataFrame(tarefas)
+            df_tarefas['ativa'] = df_tarefas['ativa'].map({1: '✅', 0: '⏸️'})
+            df_tarefas = formatar_tabela(df_tarefas, colunas_data=['proxima_execucao', 'ultima_execucao'],
+                                         formato_data='%d/%m/%Y %H:%M')
+            st.dataframe(df_tarefas[['nome', 'descricao', 'agenda', 'ativa', 'proxima_execucao',
+                                     'ultima_execucao', 'ultimo_status', 'ultima_mensagem']].rename(columns={
+                'nome': 'Tarefa', 'descricao': 'Descrição', 'agenda': 'Agenda', 'ativa': 'Ativa',
+                'proxima_execucao': 'Próxima Execução', 'ultima_execucao': 'Última Execução',
+                'ultimo_status': 'Status', 'ultima_mensagem': 'Mensagem'}),
+                use_container_width=True, hide_index=True)
+
+            tarefa_selecionada = st.selectbox("Tarefa", [t['nome'] for t in tarefas], key="agendador_tarefa")
+            tarefa_atual = next(t for t in tarefas if t['nome'] == tarefa_selecionada)
+
+            col_executar, col_editar = st.columns(2)
+            with col_executar:
+                if st.button("▶️ Executar agora", key="agendador_executar"):
+                    with st.spinner(f"Executando {tarefa_selecionada}..."):
+                        sucesso, mensagem = executar_tarefa(tarefa_selecionada, DB_FILE,
+                                                            executado_por=current_user['username'])
+                    if sucesso:
+                        st.success(mensagem)
+                    else:
+                        st.error(mensagem)
+            with col_editar:
+                with st.form("form_agendador"):
+                    nova_agenda = st.text_input("Agenda", value=tarefa_atual['agenda'])
+                    ativa = st.checkbox("Ativa", value=bool(tarefa_atual['ativa']))
+                    if st.form_submit_button("💾 Salvar agenda"):
+                        sucesso, mensagem = alterar_tarefa(tarefa_selecionada, nova_agenda.strip(), ativa, DB_FILE)
+                        if sucesso:
+                            st.success(mensagem)
+                        else:
+                            st.error(mensagem)
+
+        with st.expander("📜 Histórico de execuções"):
+            execucoes = historico_execucoes(DB_FILE)
+            if execucoes:
+                st.dataframe(formatar_tabela(pd.DataFrame(execucoes), colunas_data=['inicio', 'fim'],
+                                             formato_data='%d/%m/%Y %H:%M:%S').rename(columns={
+                    'tarefa': 'Tarefa', 'inicio': 'Início', 'fim': 'Fim', 'status': 'Status',
+                    'mensagem': 'Mensagem', 'executado_por': 'Executado por'}),
+                    use_container_width=True, hide_index=True)
+            else:
+                st.info("Nenhuma execução registrada.")
+
+# --- DIAGNÓSTICO (APENAS ADMIN) ---
+if check_permission('manage_users'):
+    with st.sidebar.expander("🔧 Diagnóstico"):
+        stats_contexto = contexto.estatisticas()
+        cache_processo = obter_cache(DB_FILE)
+        st.caption("Mapa de identidade (esta execução)")
+        st.write(f"Acertos: {stats_contexto['acertos']} | Leituras: {stats_contexto['falhas']} | Entidades: {stats_contexto['entidades']}")
+        st.caption("Cache do processo (change_log)")
+        st.write(f"Acertos: {cache_processo.acertos} | Falhas: {cache_processo.falhas}")
+
+# --- FIM DA EXECUÇÃO ---
+rastro_execucao.encerrar()
+st.session_state.pop('rastro_execucao', None)
+if rastro_execucao.perfil:
+    st.session_state['perfil_execucao'] = rastro_execucao.perfil
@@ -0,0 +1,128 @@
+"""
+Armazém em disco para arquivos gerados para download (contratos, recibos, ZIPs)
+O arquivo é gravado uma vez no disco e a sessão do Streamlit guarda apenas o
+identificador (handle); assim a memória do servidor não cresce com o número
+de sessões abertas nem com o tamanho dos documentos.
+
+- Arquivos vencidos (VALIDADE_SEGUNDOS) são removidos a cada gravação.
+- Acima de LIMITE_BYTES os arquivos mais antigos são removidos primeiro.
+"""
+import json
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+PASTA_ARMAZEM = os.environ.get('ARMAZEM_BLOBS', os.path.join(tempfile.gettempdir(), 'locadora_blobs'))
+
+# Tempo de vida de um arquivo (segundos desde a gravação)
+VALIDADE_SEGUNDOS = 2 * 3600
+
+# Tamanho máximo somado dos arquivos do armazém
+LIMITE_BYTES = 256 * 1024 * 1024
+
+
+def _caminhos(handle: str, pasta: str):
+    # O handle vem da sessão: só aceita o formato gerado por novo_blob (evita caminhos arbitrários)
+    if not handle or len(handle) != 32 or not all(c in '0123456789abcdef' for c in handle):
+        raise ValueError(f"Handle inválido: {handle!r}")
+    caminho = os.path.join(pasta, handle)
+    return caminho, caminho + '.json'
+
+
+@contextmanager
+def novo_blob(nome_arquivo: str, mime: str = 'application/octet-stream', pasta: str = None):
+    """
+    Abre um arquivo novo no armazém para escrita: with novo_blob(...) as (handle, arquivo).
+    O arquivo só fica visível (obter_blob) depois que o bloco termina sem erro.
+    """
+    pasta = pasta or PASTA_ARMAZEM
+    os.makedirs(pasta, exist_ok=True)
+    handle = uuid.uuid4().hex
+    caminho, caminho_info = _caminhos(handle, pasta)
+    temporario = caminho + '.tmp'
+    try:
+        with open(temporario, 'wb') as arquivo:
+            yield handle, arquivo
+        os.replace(temporario, caminho)
+        with open(caminho_info + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'nome_arquivo': nome_arquivo, 'mime': mime}, f, ensure_ascii=False)
+        os.replace(caminho_info + '.tmp', caminho_info)
+    except BaseException:
+        for resto in (temporario, caminho):
+            if os.path.exists(resto):
+                os.remove(resto)
+        raise
+    limpar_blobs(pasta)
+
+
+def guardar_blob(dados: bytes, nome_arquivo: str, mime: str = 'application/pdf', pasta: str = None) -> str:
+    """Grava os bytes no armazém e retorna o handle"""
+    with novo_blob(nome_arquivo, mime, pasta) as (handle, arquivo):
+        arquivo.write(dados)
+    return handle
+
+
+def obter_blob(handle: str, pasta: str = None):
+    """{'caminho', 'nome_arquivo', 'mime', 'tamanho'} do arquivo, ou None se não existe ou venceu"""
+    pasta = pasta or PASTA_ARMAZEM
+    try:
+        caminho, caminho_info = _caminhos(handle, pasta)
+        with open(caminho_info, encoding='utf-8') as f:
+            info = json.load(f)
+        estado = os.stat(caminho)
+    except (ValueError, OSError):
+        return None
+    if time.time() - estado.st_mtime > VALIDADE_SEGUNDOS:
+        return None
+    return dict(info, caminho=caminho, tamanho=estado.st_size)
+
+
+def remover_blob(handle: str, pasta: str = None):
+    pasta = pasta or PASTA_ARMAZEM
+    try:
+        for caminho in _caminhos(handle, pasta):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+    except (ValueError, OSError):
+        pass
+
+
+def limpar_blobs(pasta: str = None, limite_bytes: int = None, agora: float = None) -> int:
+    """Remove os arquivos vencidos e, acima do limite de tamanho, os mais antigos. Retorna a quantidade removida."""
+    pasta = pasta or PASTA_ARMAZEM
+    limite_bytes = LIMITE_BYTES if limite_bytes is None else limite_bytes
+    agora = agora or time.time()
+    if not os.path.isdir(pasta):
+        return 0
+
+    arquivos = []
+    for nome in os.listdir(pasta):
+        if len(nome) != 32:
+            continue
+        try:
+            estado = os.stat(os.path.join(pasta, nome))
+        except OSError:
+            continue
+        arquivos.append((estado.st_mtime, estado.st_size, nome))
+    arquivos.sort()
+
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    removidos = 0
+    for modificado, tamanho, nome in arquivos:
+        if agora - modificado <= VALIDADE_SEGUNDOS and total <= limite_bytes:
+            break
+        remover_blob(nome, pasta)
+        total -= tamanho
+        removidos += 1
+    return removidos
+
+
+def estatisticas_blobs(pasta: str = None) -> dict:
+    """{'arquivos', 'bytes'} atualmente no armazém"""
+    pasta = pasta or PASTA_ARMAZEM
+    if not os.path.isdir(pasta):
+        return {'arquivos': 0, 'bytes': 0}
+    tamanhos = [os.path.getsize(os.path.join(pasta, nome)) for nome in os.listdir(pasta) if len(nome) == 32]
+    return {'arquivos': len(tamanhos), 'bytes': sum(tamanhos)}
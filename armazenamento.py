@@ -0,0 +1,300 @@
+"""
+Monitor de armazenamento e estatísticas do planejador de consultas
+- Tamanho por tabela e índice (tabela virtual dbstat) e ocupação das páginas
+- Proporção de páginas livres no arquivo (quando compensa compactar com VACUUM)
+- Crescimento do número de linhas ao longo do tempo (coletas gravadas no banco)
+- ANALYZE das tabelas cujas estatísticas (sqlite_stat1) ficaram desatualizadas
+
+Uso pela linha de comando:
+    python armazenamento.py              # relatório
+    python armazenamento.py --coletar    # grava uma coleta no histórico
+    python armazenamento.py --analisar   # ANALYZE das tabelas desatualizadas + PRAGMA optimize
+    python armazenamento.py --compactar  # VACUUM (bloqueia o banco durante a execução)
+"""
+import argparse
+import os
+import sqlite3
+from datetime import datetime, timedelta
+import pandas as pd
+
+DB_FILE = 'locadora_v2.db'
+
+# Variação de linhas (relativa à registrada em sqlite_stat1) que torna as estatísticas desatualizadas
+LIMITE_DESATUALIZACAO = 0.25
+
+# Proporção de páginas livres a partir da qual a compactação é recomendada
+LIMITE_PAGINAS_LIVRES = 0.20
+
+# Abaixo desse espaço livre (bytes) a compactação não compensa, qualquer que seja a proporção
+MINIMO_BYTES_LIVRES = 1024 * 1024
+
+# Coletas mais antigas que isso são removidas do histórico
+DIAS_HISTORICO = 365
+
+
+def _tabelas_usuario(conn) -> list:
+    return [nome for (nome,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+
+
+def _instalar_historico(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS armazenamento_coletas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            coletado_em TIMESTAMP NOT NULL,
+            tamanho_pagina INTEGER NOT NULL,
+            paginas INTEGER NOT NULL,
+            paginas_livres INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS armazenamento_tabelas (
+            coleta_id INTEGER NOT NULL REFERENCES armazenamento_coletas (id) ON DELETE CASCADE,
+            tabela TEXT NOT NULL,
+            linhas INTEGER NOT NULL,
+            bytes INTEGER,
+            PRIMARY KEY (coleta_id, tabela)
+        )
+    ''')
+
+
+def resumo_arquivo(db_file=DB_FILE) -> dict:
+    """Páginas do arquivo, páginas livres e se a compactação (VACUUM) é recomendada"""
+    conn = sqlite3.connect(db_file)
+    try:
+        tamanho_pagina = conn.execute("PRAGMA page_size").fetchone()[0]
+        paginas = conn.execute("PRAGMA page_count").fetchone()[0]
+        paginas_livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        conn.close()
+
+    proporcao_livre = paginas_livres / paginas if paginas else 0.0
+    bytes_livres = paginas_livres * tamanho_pagina
+    return {
+        'tamanho_pagina': tamanho_pagina,
+        'paginas': paginas,
+        'paginas_livres': paginas_livres,
+        'proporcao_livre': proporcao_livre,
+        'bytes': paginas * tamanho_pagina,
+        'bytes_livres': bytes_livres,
+        'auto_vacuum': ('nenhum', 'completo', 'incremental')[auto_vacuum],
+        'compactar': proporcao_livre >= LIMITE_PAGINAS_LIVRES and bytes_livres >= MINIMO_BYTES_LIVRES,
+    }
+
+
+def tamanhos_objetos(db_file=DB_FILE) -> pd.DataFrame:
+    """
+    Tamanho de cada tabela e índice segundo a tabela virtual dbstat.
+    Colunas: objeto, tipo, tabela, paginas, bytes, ocupacao (fração usada das páginas).
+    DataFrame vazio se o SQLite foi compilado sem dbstat.
+    """
+    conn = sqlite3.connect(db_file)
+    try:
+        linhas = conn.execute('''
+            SELECT s.name, COALESCE(m.type, 'table'), COALESCE(m.tbl_name, s.name),
+                   COUNT(*), SUM(s.pgsize), SUM(s.pgsize - s.unused)
+            FROM dbstat s
+            LEFT JOIN sqlite_master m ON m.name = s.name
+            GROUP BY s.name
+            ORDER BY SUM(s.pgsize) DESC, s.name
+        ''').fetchall()
+    except sqlite3.OperationalError:
+        linhas = []
+    finally:
+        conn.close()
+
+    df = pd.DataFrame(linhas, columns=['objeto', 'tipo', 'tabela', 'paginas', 'bytes', 'bytes_usados'])
+    df['tipo'] = df['tipo'].map({'table': 'tabela', 'index': 'índice'})
+    df['ocupacao'] = (df['bytes_usados'] / df['bytes']).where(df['bytes'] > 0, 0.0)
+    return df.drop(columns='bytes_usados')
+
+
+def estatisticas_desatualizadas(db_file=DB_FILE, limite: float = LIMITE_DESATUALIZACAO) -> list:
+    """
+    Tabelas com índices cujas estatísticas do planejador estão ausentes ou cuja
+    contagem de linhas variou mais que 'limite' desde o último ANALYZE.
+    Retorna [(tabela, linhas_atuais, linhas_no_analyze ou None)].
+    """
+    conn = sqlite3.connect(db_file)
+    try:
+        registradas = {}
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+            for tabela, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+                linhas = int(stat.split()[0])
+                registradas[tabela] = max(registradas.get(tabela, 0), linhas)
+
+        indexadas = {tabela for (tabela,) in conn.execute(
+            "SELECT DISTINCT tbl_name FROM sqlite_master WHERE type = 'index'")}
+        desatualizadas = []
+        for tabela in _tabelas_usuario(conn):
+            # Sem índices não há plano a escolher: o ANALYZE não muda nada
+            if tabela not in indexadas:
+                continue
+            atuais = conn.execute(f'SELECT COUNT(*) FROM "{tabela}"').fetchone()[0]
+            anteriores = registradas.get(tabela)
+            if anteriores is None:
+                if atuais:
+                    desatualizadas.append((tabela, atuais, None))
+            elif abs(atuais - anteriores) > limite * max(anteriores, 1):
+                desatualizadas.append((tabela, atuais, anteriores))
+        return desatualizadas
+    finally:
+        conn.close()
+
+
+def atualizar_estatisticas_planejador(db_file=DB_FILE, forcar: bool = False) -> list:
+    """
+    Executa ANALYZE nas tabelas desatualizadas (em todas, se forcar) e depois PRAGMA optimize.
+    Retorna os nomes das tabelas analisadas.
+    """
+    if forcar:
+        conn = sqlite3.connect(db_file)
+        try:
+            tabelas = _tabelas_usuario(conn)
+        finally:
+            conn.close()
+    else:
+        tabelas = [tabela for tabela, _, _ in estatisticas_desatualizadas(db_file)]
+
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        for tabela in tabelas:
+            conn.execute(f'ANALYZE "{tabela}"')
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+    finally:
+        conn.close()
+    return tabelas
+
+
+def coletar_estatisticas(db_file=DB_FILE, agora: datetime = None) -> int:
+    """Grava no histórico as linhas e bytes de cada tabela e as páginas do arquivo. Retorna o id da coleta."""
+    agora = agora or datetime.now()
+    resumo = resumo_arquivo(db_file)
+    tamanhos = tamanhos_objetos(db_file)
+    bytes_por_tabela = tamanhos.groupby('tabela')['bytes'].sum().to_dict() if not tamanhos.empty else {}
+
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        _instalar_historico(conn)
+        coleta_id = conn.execute('''
+            INSERT INTO armazenamento_coletas (coletado_em, tamanho_pagina, paginas, paginas_livres)
+            VALUES (?, ?, ?, ?)
+        ''', (agora, resumo['tamanho_pagina'], resumo['paginas'], resumo['paginas_livres'])).lastrowid
+        for tabela in _tabelas_usuario(conn):
+            linhas = conn.execute(f'SELECT COUNT(*) FROM "{tabela}"').fetchone()[0]
+            bytes_tabela = bytes_por_tabela.get(tabela)
+            conn.execute("INSERT INTO armazenamento_tabelas (coleta_id, tabela, linhas, bytes) VALUES (?, ?, ?, ?)",
+                         (coleta_id, tabela, linhas, None if bytes_tabela is None else int(bytes_tabela)))
+        conn.execute("DELETE FROM armazenamento_coletas WHERE coletado_em < ?",
+                     (agora - timedelta(days=DIAS_HISTORICO),))
+        conn.commit()
+    finally:
+        conn.close()
+    return coleta_id
+
+
+def historico_linhas(db_file=DB_FILE) -> pd.DataFrame:
+    """Linhas e bytes por tabela em cada coleta (colunas: coletado_em, tabela, linhas, bytes)"""
+    conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES)
+    try:
+        _instalar_historico(conn)
+        c = conn.execute('''
+            SELECT c.coletado_em, t.tabela, t.linhas, t.bytes
+            FROM armazenamento_tabelas t
+            JOIN armazenamento_coletas c ON c.id = t.coleta_id
+            ORDER BY c.coletado_em, t.tabela
+        ''')
+        return pd.DataFrame(c.fetchall(), columns=[descricao[0] for descricao in c.description])
+    finally:
+        conn.close()
+
+
+def crescimento_linhas(db_file=DB_FILE, dias: int = 30) -> pd.DataFrame:
+    """
+    Crescimento por tabela entre a primeira coleta dos últimos 'dias' e a mais recente.
+    Colunas: tabela, linhas, variacao, por_dia.
+    """
+    historico = historico_linhas(db_file)
+    if historico.empty:
+        return pd.DataFrame(columns=['tabela', 'linhas', 'variacao', 'por_dia'])
+
+    historico['coletado_em'] = pd.to_datetime(historico['coletado_em'])
+    recente = historico['coletado_em'].max()
+    janela = historico[historico['coletado_em'] >= recente - pd.Timedelta(days=dias)]
+    inicio = janela.groupby('tabela').first()
+    fim = janela.groupby('tabela').last()
+
+    dias_decorridos = ((fim['coletado_em'] - inicio['coletado_em']).dt.total_seconds() / 86400)
+    variacao = fim['linhas'] - inicio['linhas']
+    return pd.DataFrame({
+        'linhas': fim['linhas'],
+        'variacao': variacao,
+        'por_dia': (variacao / dias_decorridos).where(dias_decorridos > 0, 0.0),
+    }).reset_index().sort_values('linhas', ascending=False, ignore_index=True)
+
+
+def compactar_banco(db_file=DB_FILE) -> tuple:
+    """VACUUM do banco. Retorna (bytes_antes, bytes_depois)."""
+    antes = os.path.getsize(db_file)
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return antes, os.path.getsize(db_file)
+
+
+def formatar_bytes(valor) -> str:
+    for unidade in ('B', 'KB', 'MB'):
+        if valor < 1024:
+            return f"{valor:.0f} {unidade}" if unidade == 'B' else f"{valor:.1f} {unidade}"
+        valor /= 1024
+    return f"{valor:.1f} GB"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Armazenamento e estatísticas do planejador do banco")
+    parser.add_argument('--banco', default=DB_FILE)
+    parser.add_argument('--coletar', action='store_true', help="Grava uma coleta no histórico de crescimento")
+    parser.add_argument('--analisar', action='store_true', help="ANALYZE das tabelas desatualizadas e PRAGMA optimize")
+    parser.add_argument('--forcar', action='store_true', help="Com --analisar: analisa todas as tabelas")
+    parser.add_argument('--compactar', action='store_true', help="Executa VACUUM")
+    args = parser.parse_args()
+
+    if args.analisar:
+        analisadas = atualizar_estatisticas_planejador(args.banco, args.forcar)
+        print(f"ANALYZE: {', '.join(analisadas) or 'nenhuma tabela desatualizada'}")
+    if args.compactar:
+        antes, depois = compactar_banco(args.banco)
+        print(f"VACUUM: {formatar_bytes(antes)} -> {formatar_bytes(depois)}")
+    if args.coletar:
+        print(f"Coleta {coletar_estatisticas(args.banco)} gravada")
+
+    resumo = resumo_arquivo(args.banco)
+    print(f"\n📦 {args.banco}: {formatar_bytes(resumo['bytes'])} ({resumo['paginas']} páginas de "
+          f"{resumo['tamanho_pagina']} bytes, auto_vacuum {resumo['auto_vacuum']})")
+    print(f"   Páginas livres: {resumo['paginas_livres']} ({resumo['proporcao_livre']:.1%})"
+          f"{' -> compactação recomendada' if resumo['compactar'] else ''}")
+
+    tamanhos = tamanhos_objetos(args.banco)
+    if tamanhos.empty:
+        print("\n(dbstat indisponível neste SQLite)")
+    else:
+        print(f"\n   {'Objeto':<44}{'Tipo':<10}{'Páginas':>7}{'Tamanho':>10}{'Ocupação':>11}")
+        for linha in tamanhos.itertuples():
+            print(f"   {linha.objeto:<44}{linha.tipo:<10}{linha.paginas:>7}{formatar_bytes(linha.bytes):>10}"
+                  f"{linha.ocupacao:>11.0%}")
+
+    desatualizadas = estatisticas_desatualizadas(args.banco)
+    print("\n📈 Estatísticas do planejador: " + (
+        ', '.join(f"{t} ({atual} linhas, {'sem ANALYZE' if antes is None else f'{antes} no ANALYZE'})"
+                  for t, atual, antes in desatualizadas) or "em dia"))
+
+    crescimento = crescimento_linhas(args.banco)
+    if not crescimento.empty:
+        print("\n   Tabela                      Linhas   Variação (30d)   Por dia")
+        for linha in crescimento.itertuples():
+            print(f"   {linha.tabela:<26}{linha.linhas:>8}{linha.variacao:>+17}{linha.por_dia:>10.1f}")
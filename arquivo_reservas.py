@@ -0,0 +1,207 @@
+"""
+Arquivo morto das reservas encerradas
+Reservas Finalizadas/Canceladas mais antigas que IDADE_ARQUIVAMENTO_DIAS saem da
+tabela reservas (que fica só com o movimento recente, lido pelo Dashboard, pela
+disponibilidade e pelo gerenciamento) e vão para um banco separado
+(locadora_v2.db -> locadora_v2_arquivo.db).
+
+- O Histórico consulta a visão temporária reservas_historico (ver
+  criar_visao_historico), que une as duas tabelas.
+- A receita e os KM das reservas arquivadas ficam acumulados por carro
+  (reservas_resumo_carro), para os indicadores da frota não mudarem.
+- A movimentação usa uma transação sobre os dois arquivos (ATTACH): no modo de
+  journal padrão o SQLite confirma os dois juntos.
+
+Uso pela linha de comando:
+    python arquivo_reservas.py            # arquiva com a idade padrão
+    python arquivo_reservas.py --dias 730
+"""
+import argparse
+import os
+import sqlite3
+from datetime import date, timedelta
+import pandas as pd
+from conexao import uri_somente_leitura
+from frota_analytics import JANELA_UTILIZACAO_DIAS
+
+DB_FILE = 'locadora_v2.db'
+
+# Idade mínima (dias desde o fim da locação) para arquivar
+IDADE_ARQUIVAMENTO_DIAS = int(os.environ.get('ARQUIVO_IDADE_DIAS', 365))
+
+# Reservas mais novas que isso nunca são arquivadas: a utilização da frota e o
+# faturamento do mês no Dashboard leem apenas a tabela reservas
+IDADE_MINIMA_DIAS = JANELA_UTILIZACAO_DIAS + 31
+
+# Reservas movidas por transação (o banco fica livre entre os lotes)
+TAMANHO_LOTE = 500
+
+STATUS_ARQUIVAVEIS = ('Finalizada', 'Cancelada')
+
+
+def arquivo_morto(db_file=DB_FILE) -> str:
+    """Caminho do arquivo morto: locadora_v2.db -> locadora_v2_arquivo.db"""
+    base, extensao = os.path.splitext(db_file)
+    return f"{base}_arquivo{extensao}"
+
+
+def _colunas(conn, esquema: str) -> list:
+    return [(nome, tipo) for _, nome, tipo, _, _, _ in conn.execute(f"PRAGMA {esquema}.table_info(reservas)")]
+
+
+def _preparar_arquivo(conn) -> list:
+    """
+    Cria (ou completa, após ALTER TABLE na origem) as tabelas do arquivo anexado
+    como 'arquivo'. Retorna as colunas de main.reservas.
+    """
+    colunas = _colunas(conn, 'main')
+    definicoes = ', '.join(f'"{nome}" {tipo}' for nome, tipo in colunas if nome != 'id')
+    conn.execute(f"CREATE TABLE IF NOT EXISTS arquivo.reservas (id INTEGER PRIMARY KEY, {definicoes}, arquivado_em DATE)")
+    existentes = {nome for nome, _ in _colunas(conn, 'arquivo')}
+    for nome, tipo in colunas:
+        if nome not in existentes:
+            conn.execute(f'ALTER TABLE arquivo.reservas ADD COLUMN "{nome}" {tipo}')
+    conn.execute("CREATE INDEX IF NOT EXISTS arquivo.idx_reservas_data_fim ON reservas (data_fim)")
+    from busca_reservas import criar_indices  # Índices da busca de reservas (import aqui: busca_reservas importa este módulo)
+    criar_indices(conn, 'arquivo', cadastros=False)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS arquivo.reservas_resumo_carro (
+            carro_id INTEGER PRIMARY KEY,
+            locacoes INTEGER NOT NULL,
+            receita REAL NOT NULL,
+            km INTEGER NOT NULL,
+            dias INTEGER NOT NULL
+        )
+    ''')
+    return [nome for nome, _ in colunas]
+
+
+def arquivar_reservas(db_file=DB_FILE, dias: int = IDADE_ARQUIVAMENTO_DIAS, hoje: date = None,
+                      lote: int = TAMANHO_LOTE) -> int:
+    """
+    Move para o arquivo morto as reservas encerradas com data_fim anterior a hoje - dias.
+    Retorna a quantidade de reservas arquivadas.
+    """
+    if dias < IDADE_MINIMA_DIAS:
+        raise ValueError(f"A idade de arquivamento deve ser de pelo menos {IDADE_MINIMA_DIAS} dias")
+    hoje = hoje or date.today()
+    limite = hoje - timedelta(days=dias)
+
+    conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS arquivo", (arquivo_morto(db_file),))
+        colunas = ', '.join(f'"{nome}"' for nome in _preparar_arquivo(conn))
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS lote_arquivamento (id INTEGER PRIMARY KEY)")
+
+        total = 0
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM temp.lote_arquivamento")
+                movidas = conn.execute(f'''
+                    INSERT INTO temp.lote_arquivamento
+                    SELECT id FROM main.reservas
+                    WHERE reserva_status IN ({', '.join('?' * len(STATUS_ARQUIVAVEIS))})
+                    AND date(data_fim) < date(?)
+                    ORDER BY id LIMIT ?
+                ''', (*STATUS_ARQUIVAVEIS, limite, lote)).rowcount
+                if movidas == 0:
+                    conn.execute("COMMIT")
+                    break
+
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO arquivo.reservas ({colunas}, arquivado_em)
+                    SELECT {colunas}, ? FROM main.reservas WHERE id IN (SELECT id FROM temp.lote_arquivamento)
+                ''', (hoje,))
+                # Mesmas regras de calcular_indicadores_frota: KM não negativo, ao menos um dia
+                conn.execute('''
+                    INSERT INTO arquivo.reservas_resumo_carro (carro_id, locacoes, receita, km, dias)
+                    SELECT carro_id, COUNT(*), COALESCE(SUM(valor_total), 0),
+                           COALESCE(SUM(CASE WHEN km_volta IS NOT NULL AND km_saida IS NOT NULL
+                                             THEN MAX(km_volta - km_saida, 0) END), 0),
+                           COALESCE(SUM(CASE WHEN km_volta IS NOT NULL AND km_saida IS NOT NULL
+                                             THEN MAX(CAST(julianday(date(data_fim)) - julianday(date(data_inicio)) AS INTEGER), 1) END), 0)
+                    FROM main.reservas
+                    WHERE id IN (SELECT id FROM temp.lote_arquivamento) AND reserva_status = 'Finalizada'
+                    GROUP BY carro_id
+                    ON CONFLICT (carro_id) DO UPDATE SET
+                        locacoes = locacoes + excluded.locacoes,
+                        receita = receita + excluded.receita,
+                        km = km + excluded.km,
+                        dias = dias + excluded.dias
+                ''')
+                conn.execute("DELETE FROM main.reservas WHERE id IN (SELECT id FROM temp.lote_arquivamento)")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            total += movidas
+        return total
+    finally:
+        conn.close()
+
+
+def criar_visao_historico(conn, db_file=DB_FILE):
+    """
+    Cria na conexão a visão temporária reservas_historico (reservas recentes +
+    arquivo morto, com as colunas de main.reservas). Sem arquivo morto, a visão
+    mostra apenas a tabela reservas. A conexão precisa ter sido aberta com uri=True.
+    """
+    colunas = ', '.join(f'"{nome}"' for nome, _ in _colunas(conn, 'main'))
+    arquivo = arquivo_morto(db_file)
+    anexado = any(nome == 'arquivo' for _, nome, _ in conn.execute("PRAGMA database_list"))
+    if not anexado and os.path.exists(arquivo):
+        conn.execute("ATTACH DATABASE ? AS arquivo", (uri_somente_leitura(arquivo),))
+        anexado = True
+    if anexado and conn.execute("SELECT 1 FROM arquivo.sqlite_master WHERE name = 'reservas'").fetchone():
+        # Uma reserva recém-arquivada ainda pode constar na cópia analítica: vale a linha de main
+        corpo = (f"SELECT {colunas} FROM main.reservas UNION ALL "
+                 f"SELECT {colunas} FROM arquivo.reservas WHERE id NOT IN (SELECT id FROM main.reservas)")
+    else:
+        corpo = f"SELECT {colunas} FROM main.reservas"
+    conn.execute("DROP VIEW IF EXISTS temp.reservas_historico")
+    conn.execute(f"CREATE TEMP VIEW reservas_historico AS {corpo}")
+
+
+def resumo_arquivado_por_carro(db_file=DB_FILE) -> pd.DataFrame:
+    """Totais das locações arquivadas por carro (índice carro_id; colunas receita, km, dias)"""
+    arquivo = arquivo_morto(db_file)
+    vazio = pd.DataFrame(columns=['receita', 'km', 'dias'], index=pd.Index([], name='carro_id'))
+    if not os.path.exists(arquivo):
+        return vazio
+    conn = sqlite3.connect(uri_somente_leitura(arquivo), uri=True)
+    try:
+        linhas = conn.execute("SELECT carro_id, receita, km, dias FROM reservas_resumo_carro").fetchall()
+    except sqlite3.OperationalError:
+        return vazio
+    finally:
+        conn.close()
+    return pd.DataFrame(linhas, columns=['carro_id', 'receita', 'km', 'dias']).set_index('carro_id')
+
+
+def estatisticas_arquivo(db_file=DB_FILE) -> dict:
+    """{'reservas_arquivadas', 'ultimo_arquivamento', 'bytes'} do arquivo morto"""
+    arquivo = arquivo_morto(db_file)
+    if not os.path.exists(arquivo):
+        return {'reservas_arquivadas': 0, 'ultimo_arquivamento': None, 'bytes': 0}
+    conn = sqlite3.connect(uri_somente_leitura(arquivo), uri=True)
+    try:
+        quantidade, ultimo = conn.execute("SELECT COUNT(*), MAX(arquivado_em) FROM reservas").fetchone()
+    except sqlite3.OperationalError:
+        quantidade, ultimo = 0, None
+    finally:
+        conn.close()
+    return {'reservas_arquivadas': quantidade, 'ultimo_arquivamento': ultimo, 'bytes': os.path.getsize(arquivo)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move reservas encerradas antigas para o arquivo morto")
+    parser.add_argument('--dias', type=int, default=IDADE_ARQUIVAMENTO_DIAS,
+                        help=f"Idade mínima desde o fim da locação (padrão {IDADE_ARQUIVAMENTO_DIAS})")
+    parser.add_argument('--banco', default=DB_FILE)
+    args = parser.parse_args()
+
+    arquivadas = arquivar_reservas(args.banco, args.dias)
+    estatisticas = estatisticas_arquivo(args.banco)
+    print(f"{arquivadas} reserva(s) arquivada(s); {estatisticas['reservas_arquivadas']} no total em "
+          f"{arquivo_morto(args.banco)}")
@@ -7,8 +7,12 @@ import sqlite3
 import bcrypt
 import hashlib
 from datetime import datetime, timedelta
+import math
 import secrets
 from typing import Optional, Dict, Tuple
+from cache_sync import obter_cache
+from filiais import BANCO_AUTENTICACAO, FILIAIS
+from limite_login import obter_limitador, endereco_encaminhado
 
 # Constantes de nível de usuário
 USER_ROLES = {
@@ -29,9 +33,10 @@ ROLE_PERMISSIONS = {
 class AuthManager:
     """Gerenciador de autenticação e controle de acesso"""
 
-    def __init__(self, db_file='locadora_v2.db'):
+    def __init__(self, db_file=BANCO_AUTENTICACAO):
         self.db_file = db_file
         self._init_auth_db()
+        self.limitador = obter_limitador(db_file)
 
     def _init_auth_db(self):
         """Inicializa tabelas de autenticação no banco"""
@@ -82,6 +87,11 @@ class AuthManager:
             )
         ''')
 
+        # Filial do usuário (bancos anteriores ao roteamento por filial não têm a coluna)
+        colunas = [coluna[1] for coluna in c.execute("PRAGMA table_info(users)")]
+        if 'filial' not in colunas:
+            c.execute("ALTER TABLE users ADD COLUMN filial TEXT")
+
         conn.commit()
 
         # Criar usuário admin padrão se não existir
@@ -162,7 +172,7 @@ class AuthManager:
         conn.close()
 
     def create_user(self, username: str, password: str, role: str = 'employee',
-                   full_name: str = '', email: str = '') -> Tuple[bool, str]:
+                   full_name: str = '', email: str = '', filial: str = None) -> Tuple[bool, str]:
         """Cria novo usuário"""
         if role not in USER_ROLES:
             return False, f"Nível de usuário inválido: {role}"
@@ -170,25 +180,31 @@ class AuthManager:
         if len(password) < 6:
             return False, "A senha deve ter pelo menos 6 caracteres"
 
+        if filial is not None and filial not in FILIAIS:
+            return False, f"Filial inválida: {filial}"
+
         try:
             password_hash = self._hash_password(password)
 
+            # A conexão é fechada também na falha: a transação aberta pelo INSERT
+            # recusado prenderia o banco (e o limite de login) até o coletor de lixo
             conn = sqlite3.connect(self.db_file, detect_types=sqlite3.PARSE_DECLTYPES)
-            c = conn.cursor()
+            try:
+                c = conn.cursor()
 
-            c.execute("""
-                INSERT INTO users (username, password_hash, role, full_name, email)
-                VALUES (?, ?, ?, ?, ?)
-            """, (username, password_hash, role, full_name, email))
+                c.execute("""
+                    INSERT INTO users (username, password_hash, role, full_name, email, filial)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (username, password_hash, role, full_name, email, filial))
 
-            user_id = c.lastrowid
+                user_id = c.lastrowid
+                conn.commit()
+            finally:
+                conn.close()
 
             # Log de auditoria
             self._log_action(user_id, 'user_created', 'users', f'Usuário {username} criado')
 
-            conn.commit()
-            conn.close()
-
             return True, f"Usuário {username} criado com sucesso"
 
         except sqlite3.IntegrityError:
@@ -200,11 +216,17 @@ class AuthManager:
     def authenticate(self, username: str, password: str, ip_address: str = '',
                     user_agent: str = '') -> Tuple[bool, Optional[Dict]]:
         """Autentica usuário e retorna dados se válido"""
+        # Excesso de tentativas é recusado antes do bcrypt e da tabela users
+        permitido, espera = self.limitador.permitir(username, ip_address)
+        if not permitido:
+            return False, {"error": f"Muitas tentativas de login. Tente novamente em {math.ceil(espera)} segundos.",
+                           "retry_after": math.ceil(espera)}
+
         conn = sqlite3.connect(self.db_file, detect_types=sqlite3.PARSE_DECLTYPES)
         c = conn.cursor()
 
         c.execute("""
-            SELECT id, password_hash, role, full_name, email, is_active, locked_until
+            SELECT id, password_hash, role, full_name, email, is_active, locked_until, filial
             FROM users WHERE username = ?
         """, (username,))
 
@@ -214,7 +236,7 @@ class AuthManager:
         if not user:
             return False, None
 
-        user_id, password_hash, role, full_name, email, is_active, locked_until = user
+        user_id, password_hash, role, full_name, email, is_active, locked_until, filial = user
 
         # Verificar se conta está ativa
         if not is_active:
@@ -232,6 +254,7 @@ class AuthManager:
 
         # Login bem-sucedido - resetar tentativas
         self._reset_login_attempts(user_id)
+        self.limitador.liberar(username, ip_address)
 
         # Criar sessão
         session_id = self._generate_session_id()
@@ -255,19 +278,20 @@ class AuthManager:
             'role': role,
             'full_name': full_name,
             'email': email,
+            'filial': filial,
             'session_id': session_id,
             'permissions': ROLE_PERMISSIONS.get(role, [])
         }
 
         return True, user_data
 
-    def validate_session(self, session_id: str) -> Optional[Dict]:
-        """Valida sessão ativa"""
+    def _load_session(self, session_id: str):
+        """Busca a sessão e o usuário associado no banco"""
         conn = sqlite3.connect(self.db_file, detect_types=sqlite3.PARSE_DECLTYPES)
         c = conn.cursor()
 
         c.execute("""
-            SELECT s.user_id, u.username, u.role, u.full_name, u.email, s.expires_at
+            SELECT s.user_id, u.username, u.role, u.full_name, u.email, s.expires_at, u.filial
             FROM sessions s
             JOIN users u ON s.user_id = u.id
             WHERE s.session_id = ? AND u.is_active = 1
@@ -275,11 +299,20 @@ class AuthManager:
 
         result = c.fetchone()
         conn.close()
+        return result
+
+    def validate_session(self, session_id: str) -> Optional[Dict]:
+        """Valida sessão ativa"""
+        # Cache do processo, invalidado quando users/sessions mudam em qualquer réplica
+        result = obter_cache(self.db_file).obter(
+            ('session', session_id), ('sessions', 'users'),
+            lambda: self._load_session(session_id)
+        )
 
         if not result:
             return None
 
-        user_id, username, role, full_name, email, expires_at = result
+        user_id, username, role, full_name, email, expires_at, filial = result
 
         # Verificar se sessão expirou
         if expires_at < datetime.now():
@@ -292,6 +325,7 @@ class AuthManager:
             'role': role,
             'full_name': full_name,
             'email': email,
+            'filial': filial,
             'session_id': session_id,
             'permissions': ROLE_PERMISSIONS.get(role, [])
         }
@@ -323,7 +357,7 @@ class AuthManager:
         conn = sqlite3.connect(self.db_file, detect_types=sqlite3.PARSE_DECLTYPES)
         c = conn.cursor()
         c.execute("""
-            SELECT id, username, role, full_name, email, is_active, created_at, last_login
+            SELECT id, username, role, full_name, email, is_active, created_at, last_login, filial
             FROM users ORDER BY username
         """)
         users = c.fetchall()
@@ -331,15 +365,13 @@ class AuthManager:
 
         return [{
             'id': u[0], 'username': u[1], 'role': u[2], 'full_name': u[3],
-            'email': u[4], 'is_active': u[5], 'created_at': u[6], 'last_login': u[7]
+            'email': u[4], 'is_active': u[5], 'created_at': u[6], 'last_login': u[7],
+            'filial': u[8]
         } for u in users]
 
     def update_user(self, user_id: int, updates: Dict) -> Tuple[bool, str]:
         """Atualiza dados do usuário"""
         try:
-            conn = sqlite3.connect(self.db_file)
-            c = conn.cursor()
-
             update_fields = []
             values = []
 
@@ -363,6 +395,12 @@ class AuthManager:
                 update_fields.append("email = ?")
                 values.append(updates['email'])
 
+            if 'filial' in updates:
+                if updates['filial'] is not None and updates['filial'] not in FILIAIS:
+                    return False, f"Filial inválida: {updates['filial']}"
+                update_fields.append("filial = ?")
+                values.append(updates['filial'])
+
             if 'is_active' in updates:
                 update_fields.append("is_active = ?")
                 values.append(updates['is_active'])
@@ -373,9 +411,12 @@ class AuthManager:
             query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = ?"
             values.append(user_id)
 
-            c.execute(query, values)
-            conn.commit()
-            conn.close()
+            conn = sqlite3.connect(self.db_file)
+            try:
+                conn.execute(query, values)
+                conn.commit()
+            finally:
+                conn.close()
 
             return True, "Usuário atualizado com sucesso"
 
@@ -386,20 +427,21 @@ class AuthManager:
         """Remove usuário (desativa)"""
         try:
             conn = sqlite3.connect(self.db_file)
-            c = conn.cursor()
+            try:
+                c = conn.cursor()
 
-            # Verificar se é o último admin
-            c.execute("SELECT COUNT(*) FROM users WHERE role = 'admin' AND is_active = 1 AND id != ?", (user_id,))
-            admin_count = c.fetchone()[0]
+                # Verificar se é o último admin
+                c.execute("SELECT COUNT(*) FROM users WHERE role = 'admin' AND is_active = 1 AND id != ?", (user_id,))
+                admin_count = c.fetchone()[0]
 
-            if admin_count == 0:
-                conn.close()
-                return False, "Não é possível remover o último administrador"
+                if admin_count == 0:
+                    return False, "Não é possível remover o último administrador"
 
-            # Desativar usuário ao invés de deletar
-            c.execute("UPDATE users SET is_active = 0 WHERE id = ?", (user_id,))
-            conn.commit()
-            conn.close()
+                # Desativar usuário ao invés de deletar
+                c.execute("UPDATE users SET is_active = 0 WHERE id = ?", (user_id,))
+                conn.commit()
+            finally:
+                conn.close()
 
             return True, "Usuário desativado com sucesso"
 
@@ -431,6 +473,20 @@ class AuthManager:
 # Instância global do gerenciador de autenticação
 auth_manager = AuthManager()
 
+def _endereco_cliente() -> str:
+    """
+    Endereço do cliente para o limite de tentativas de login, acrescentado ao
+    X-Forwarded-For pelo proxy confiável (ver limite_login.endereco_encaminhado).
+    '' quando não é possível saber: o balde por endereço é ignorado.
+    """
+    try:
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+        cabecalhos = _get_websocket_headers() or {}
+    except Exception:
+        cabecalhos = {}
+    return endereco_encaminhado(cabecalhos.get('X-Forwarded-For', ''))
+
+
 def login_page():
     """Página de login"""
     st.title("🔐 Login - Locadora Iguacu Veiculos")
@@ -459,8 +515,7 @@ def login_page():
                     st.error("❌ Preencha usuário e senha")
                     return
 
-                # Obter IP (simulado para desenvolvimento)
-                ip_address = "127.0.0.1"  # Em produção, use request.remote_addr
+                ip_address = _endereco_cliente()
 
                 success, result = auth_manager.authenticate(username, password, ip_address)
 
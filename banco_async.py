@@ -0,0 +1,33 @@
+"""
+Acesso assíncrono ao SQLite para a API
+O módulo sqlite3 é síncrono: as chamadas ao banco rodam em um pool de threads
+dedicado, do mesmo tamanho do pool de conexões, e o loop de eventos fica livre
+para atender outras requisições enquanto a consulta executa.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from conexao import TAMANHO_POOL
+
+_executor = None
+
+
+def _obter_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=TAMANHO_POOL, thread_name_prefix='banco')
+    return _executor
+
+
+async def executar(funcao, *args, **kwargs):
+    """Executa uma função de acesso ao banco (operacoes, repositorio, auth) sem bloquear o loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_obter_executor(), functools.partial(funcao, *args, **kwargs))
+
+
+def encerrar():
+    """Finaliza as threads do pool (chamado no desligamento da API)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
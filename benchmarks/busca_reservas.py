@@ -0,0 +1,130 @@
+"""
+Benchmark da busca de reservas (busca_reservas.py)
+Gera um banco temporário com milhões de reservas e mede cada tipo de busca
+(sem filtro, por placa, por nome, por CPF, por status e período) na primeira
+página e em uma página profunda, comparando a página profunda por cursor com
+OFFSET e a aba Gerenciar antiga (todas as reservas ativas em um DataFrame).
+
+Uso:
+    python benchmarks/busca_reservas.py --reservas 2000000 --clientes 200000 --carros 500
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from busca_reservas import buscar_reservas, explicar_busca, garantir_indices, TAMANHO_PAGINA
+from conexao import obter_pool
+from consultas import CONSULTAS
+
+NOMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela', 'Heitor', 'Isabela', 'João',
+         'Karina', 'Lucas', 'Maria', 'Nelson', 'Olívia', 'Paulo', 'Renata', 'Sérgio', 'Tatiane', 'Vítor']
+SOBRENOMES = ['Silva', 'Souza', 'Oliveira', 'Santos', 'Lima', 'Pereira', 'Costa', 'Rodrigues', 'Almeida', 'Gomes']
+
+
+def preparar_banco(db_file, reservas, clientes, carros, hoje):
+    conn = sqlite3.connect(db_file)
+    conn.executescript('''
+        PRAGMA journal_mode=WAL;
+        CREATE TABLE carros (id INTEGER PRIMARY KEY AUTOINCREMENT, modelo TEXT, placa TEXT UNIQUE, cor TEXT,
+            diaria REAL, preco_km REAL, km_atual INTEGER, status TEXT DEFAULT 'Disponível');
+        CREATE TABLE clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT, cpf TEXT UNIQUE, status TEXT DEFAULT 'Ativo');
+        CREATE TABLE reservas (id INTEGER PRIMARY KEY AUTOINCREMENT, carro_id INTEGER, cliente_id INTEGER,
+            data_inicio DATE, data_fim DATE, reserva_status TEXT, status TEXT, valor_total REAL DEFAULT 0,
+            km_saida INTEGER, km_volta INTEGER, km_franquia INTEGER DEFAULT 300, adiantamento REAL DEFAULT 0,
+            valor_multas REAL DEFAULT 0, valor_danos REAL DEFAULT 0, valor_outros REAL DEFAULT 0);
+    ''')
+    conn.executemany("INSERT INTO carros (modelo, placa, diaria, preco_km, km_atual) VALUES ('Onix', ?, 150, 1.5, 0)",
+                     [(f"BEN{i:04d}",) for i in range(carros)])
+    conn.executemany("INSERT INTO clientes (nome, cpf) VALUES (?, ?)",
+                     [(f"{random.choice(NOMES)} {random.choice(SOBRENOMES)} {i}",
+                       f"{i:011d}"[:3] + '.' + f"{i:011d}"[3:6] + '.' + f"{i:011d}"[6:9] + '-' + f"{i:011d}"[9:])
+                      for i in range(clientes)])
+
+    def linhas():
+        for _ in range(reservas):
+            inicio = hoje - timedelta(days=random.randint(-60, 3650))
+            ativa = inicio >= hoje - timedelta(days=10)
+            status = random.choice(['Reservada', 'Locada']) if ativa else random.choice(['Finalizada'] * 9 + ['Cancelada'])
+            yield (random.randint(1, carros), random.randint(1, clientes), inicio,
+                   inicio + timedelta(days=random.randint(1, 10)), status, status, random.uniform(200, 1500))
+    conn.executemany('''
+        INSERT INTO reservas (carro_id, cliente_id, data_inicio, data_fim, reserva_status, status, valor_total)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', linhas())
+    conn.commit()
+    conn.close()
+
+
+def medir(funcao, repeticoes=20):
+    """Mediana em ms"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return sorted(tempos)[len(tempos) // 2], resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca de reservas por cursor x OFFSET x carga completa")
+    parser.add_argument('--reservas', type=int, default=2000000)
+    parser.add_argument('--clientes', type=int, default=200000)
+    parser.add_argument('--carros', type=int, default=500)
+    parser.add_argument('--paginas', type=int, default=2000, help="Profundidade da página profunda")
+    args = parser.parse_args()
+
+    random.seed(42)
+    hoje = date.today()
+    with tempfile.TemporaryDirectory() as pasta:
+        db_file = os.path.join(pasta, 'busca_benchmark.db')
+        inicio = time.perf_counter()
+        preparar_banco(db_file, args.reservas, args.clientes, args.carros, hoje)
+        print(f"Banco: {args.reservas} reservas, {args.clientes} clientes, {args.carros} carros "
+              f"({time.perf_counter() - inicio:.0f}s para gerar)")
+        inicio = time.perf_counter()
+        garantir_indices(db_file)
+        print(f"Criação dos índices: {time.perf_counter() - inicio:.1f}s\n")
+
+        with obter_pool(db_file).conexao() as conn:
+            cpf = conn.execute("SELECT cpf FROM clientes WHERE id = 4242").fetchone()[0]
+            corte = conn.execute("SELECT data_inicio, id FROM reservas ORDER BY data_inicio DESC, id DESC LIMIT 1 OFFSET ?",
+                                 (args.paginas * TAMANHO_PAGINA,)).fetchone()
+
+        buscas = {
+            'Sem filtro': {},
+            'Placa': {'placa': 'BEN0042'},
+            'Nome (início)': {'cliente': 'Maria Silva 1'},
+            'Nome comum': {'cliente': 'Maria'},
+            'CPF': {'cliente': cpf},
+            'Ativas (Gerenciar)': {'status': ('Reservada', 'Locada'), 'ordem': 'asc'},
+            'Finalizadas em um mês': {'status': 'Finalizada', 'inicio_de': hoje - timedelta(days=400),
+                                      'inicio_ate': hoje - timedelta(days=370)},
+        }
+        print(f"{'Busca':<24}{'1ª página':>12}{'Página ' + str(args.paginas):>16}   Índice")
+        for nome, filtros in buscas.items():
+            primeira, (linhas, _) = medir(lambda: buscar_reservas(db_file=db_file, **filtros))
+            profunda, _ = medir(lambda: buscar_reservas(db_file=db_file, depois=corte, **filtros)) \
+                if filtros.get('ordem', 'desc') == 'desc' else (float('nan'), None)
+            plano = next((passo for passo in explicar_busca(db_file, **filtros) if 'reservas' in passo), '')
+            print(f"{nome:<24}{primeira:>9.2f} ms{profunda:>13.2f} ms   {plano.split('USING ')[-1][:60]}")
+
+        with obter_pool(db_file).conexao() as conn:
+            offset, _ = medir(lambda: conn.execute(
+                "SELECT * FROM reservas ORDER BY data_inicio DESC, id DESC LIMIT ? OFFSET ?",
+                (TAMANHO_PAGINA, args.paginas * TAMANHO_PAGINA)).fetchall(), 5)
+            completa, df = medir(lambda: pd.read_sql_query(CONSULTAS['reservas_gerenciar'], conn), 5)
+        print(f"\nMesma página {args.paginas} com OFFSET: {offset:.1f} ms")
+        print(f"Aba Gerenciar antiga (todas as {len(df)} reservas ativas em um DataFrame): {completa:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
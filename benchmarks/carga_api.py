@@ -0,0 +1,146 @@
+"""
+Teste de carga da API JSON (api.py): requisições/segundo de disponibilidade e de reserva
+
+ATENÇÃO: a fase de reservas grava reservas reais (em datas distantes no futuro).
+Rode contra uma cópia do banco, por exemplo:
+    cp locadora_v2.db /tmp/carga/locadora_v2.db && cd /tmp/carga && uvicorn api:app --app-dir /caminho/do/projeto
+
+Uso:
+    python benchmarks/carga_api.py --url http://127.0.0.1:8000 --usuario admin --senha admin123 \
+        --duracao 10 --concorrencia 50 --cliente-id 1
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+
+class ConexaoHttp:
+    """Conexão HTTP/1.1 keep-alive mínima (apenas respostas com Content-Length)"""
+
+    def __init__(self, host, porta):
+        self.host = host
+        self.porta = porta
+        self.leitor = None
+        self.escritor = None
+
+    async def requisitar(self, metodo, caminho, token='', corpo=None):
+        if self.escritor is None:
+            self.leitor, self.escritor = await asyncio.open_connection(self.host, self.porta)
+
+        dados = json.dumps(corpo).encode() if corpo is not None else b''
+        cabecalhos = [f"{metodo} {caminho} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(dados)}"]
+        if token:
+            cabecalhos.append(f"Authorization: Bearer {token}")
+        if corpo is not None:
+            cabecalhos.append("Content-Type: application/json")
+        self.escritor.write(("\r\n".join(cabecalhos) + "\r\n\r\n").encode() + dados)
+        await self.escritor.drain()
+
+        status = int((await self.leitor.readline()).split()[1])
+        tamanho = 0
+        while True:
+            linha = await self.leitor.readline()
+            if linha in (b'\r\n', b''):
+                break
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            if nome.lower() == 'content-length':
+                tamanho = int(valor)
+        resposta = await self.leitor.readexactly(tamanho)
+        return status, resposta
+
+    def fechar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+
+
+async def _trabalhador(url, gerar_requisicao, fim, latencias, status_contagem):
+    conexao = ConexaoHttp(url.hostname, url.port or 80)
+    try:
+        while time.perf_counter() < fim:
+            metodo, caminho, token, corpo = gerar_requisicao()
+            inicio = time.perf_counter()
+            status, _ = await conexao.requisitar(metodo, caminho, token, corpo)
+            latencias.append(time.perf_counter() - inicio)
+            status_contagem[status] = status_contagem.get(status, 0) + 1
+    finally:
+        conexao.fechar()
+
+
+async def fase(nome, url, gerar_requisicao, duracao, concorrencia):
+    latencias, status_contagem = [], {}
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    await asyncio.gather(*[
+        _trabalhador(url, gerar_requisicao, fim, latencias, status_contagem) for _ in range(concorrencia)
+    ])
+    decorrido = time.perf_counter() - inicio
+
+    latencias.sort()
+    percentil = lambda p: latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+    print(f"\n📊 {nome}")
+    print(f"   Requisições: {len(latencias)} em {decorrido:.1f}s -> {len(latencias) / decorrido:.0f} req/s")
+    if latencias:
+        print(f"   Latência média {statistics.mean(latencias) * 1000:.1f} ms | "
+              f"p50 {percentil(0.50):.1f} ms | p95 {percentil(0.95):.1f} ms | p99 {percentil(0.99):.1f} ms")
+    print(f"   Status HTTP: {dict(sorted(status_contagem.items()))}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API da locadora")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--usuario', default='admin')
+    parser.add_argument('--senha', default='admin123')
+    parser.add_argument('--duracao', type=float, default=10.0, help="Segundos por fase")
+    parser.add_argument('--concorrencia', type=int, default=50, help="Conexões simultâneas")
+    parser.add_argument('--cliente-id', type=int, default=1, help="Cliente ativo usado nas reservas")
+    parser.add_argument('--sem-reservas', action='store_true', help="Executa apenas a fase de disponibilidade")
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    conexao = ConexaoHttp(url.hostname, url.port or 80)
+    status, resposta = await conexao.requisitar('POST', '/api/login', corpo={'username': args.usuario, 'password': args.senha})
+    if status != 200:
+        print(f"❌ Falha no login: {resposta.decode()}")
+        return 1
+    token = json.loads(resposta)['token']
+
+    hoje = date.today()
+    periodos = [(hoje + timedelta(days=d), hoje + timedelta(days=d + random.randint(1, 7))) for d in range(30)]
+
+    def requisicao_disponibilidade():
+        inicio, fim = random.choice(periodos)
+        return 'GET', f"/api/disponibilidade?inicio={inicio}&fim={fim}", token, None
+
+    await fase("Disponibilidade (GET /api/disponibilidade)", url, requisicao_disponibilidade,
+               args.duracao, args.concorrencia)
+
+    if not args.sem_reservas:
+        # Datas a partir de 10 anos à frente, para não interferir na operação
+        base = hoje + timedelta(days=3650)
+        _, resposta = await conexao.requisitar('GET', f"/api/disponibilidade?inicio={base}&fim={base}", token)
+        carros = [carro['id'] for carro in json.loads(resposta)['carros']]
+        if not carros:
+            print("❌ Nenhum carro disponível para a fase de reservas")
+            return 1
+
+        def requisicao_reserva():
+            inicio = base + timedelta(days=random.randint(0, 3650))
+            return 'POST', '/api/reservas', token, {
+                'carro_id': random.choice(carros), 'cliente_id': args.cliente_id,
+                'inicio': inicio.isoformat(), 'fim': (inicio + timedelta(days=random.randint(1, 3))).isoformat(),
+            }
+
+        await fase("Reservas (POST /api/reservas) — 201 criada, 409 conflito de datas", url, requisicao_reserva,
+                   args.duracao, args.concorrencia)
+
+    conexao.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,111 @@
+"""
+Benchmark da busca da próxima janela livre (operacoes.proximas_janelas)
+Compara a busca em uma passada com o que o balcão fazia à mão: repetir a
+consulta de disponibilidade dia a dia até aparecer um carro livre. Usa um
+banco temporário com a frota quase toda reservada nas próximas semanas, e
+confere se as duas buscas chegam à mesma data.
+
+Uso:
+    python benchmarks/janelas_disponibilidade.py --carros 300 --reservas 300000 --dias 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consultas import CONSULTAS
+from operacoes import _carregar_janelas, janelas_por_modelo
+from pdfgenerator import STATUS_CARRO
+
+MODELOS = ['Fiat Mobi', 'Onix', 'HB20', 'Kwid', 'Gol', 'Argo', 'Polo', 'Sandero']
+
+
+def preparar_banco(db_file, carros, reservas, hoje):
+    conn = sqlite3.connect(db_file)
+    conn.executescript('''
+        CREATE TABLE carros (id INTEGER PRIMARY KEY AUTOINCREMENT, modelo TEXT, placa TEXT UNIQUE, cor TEXT,
+            diaria REAL, preco_km REAL, km_atual INTEGER, status TEXT DEFAULT 'Disponível', numero_chassi TEXT,
+            numero_renavam TEXT, ano_veiculo INTEGER, km_troca_oleo INTEGER DEFAULT 10000);
+        CREATE TABLE reservas (id INTEGER PRIMARY KEY AUTOINCREMENT, carro_id INTEGER, cliente_id INTEGER,
+            data_inicio DATE, data_fim DATE, reserva_status TEXT DEFAULT 'Reservada');
+    ''')
+    conn.executemany("INSERT INTO carros (modelo, placa, diaria, preco_km, km_atual, status) VALUES (?, ?, 120, 1.5, 0, ?)",
+                     [(MODELOS[i % len(MODELOS)], f"BEN{i:04d}", STATUS_CARRO['DISPONIVEL']) for i in range(carros)])
+
+    # 80% histórico encerrado, 20% reservas futuras coladas umas nas outras (lacunas de 0 a 3 dias)
+    linhas = []
+    historicas = int(reservas * 0.8)
+    for i in range(historicas):
+        inicio = hoje - timedelta(days=random.randint(30, 3000))
+        linhas.append((i % carros + 1, inicio, inicio + timedelta(days=random.randint(1, 10)), 'Finalizada'))
+    por_carro = max(1, (reservas - historicas) // carros)
+    for carro_id in range(1, carros + 1):
+        inicio = hoje - timedelta(days=random.randint(0, 3))
+        for _ in range(por_carro):
+            fim = inicio + timedelta(days=random.randint(1, 10))
+            linhas.append((carro_id, inicio, fim, random.choice(['Reservada', 'Locada'])))
+            inicio = fim + timedelta(days=random.choice([1, 1, 1, 2, 3, 4]))
+    random.shuffle(linhas)
+    conn.executemany("INSERT INTO reservas (carro_id, data_inicio, data_fim, reserva_status) VALUES (?, ?, ?, ?)", linhas)
+    conn.commit()
+    conn.close()
+
+
+def tentativas_manuais(db_file, inicio, dias, limite):
+    """Repete a consulta de disponibilidade dia a dia (como o balcão fazia). Retorna (data, tentativas)."""
+    conn = sqlite3.connect(db_file)
+    try:
+        for tentativa in range(1, limite + 1):
+            fim = inicio + timedelta(days=dias)
+            livres = conn.execute(CONSULTAS['carros_disponiveis_periodo'],
+                                  (STATUS_CARRO['INDISPONIVEL'], STATUS_CARRO['EXCLUIDO'], fim, inicio)).fetchall()
+            if livres:
+                return inicio, tentativa
+            inicio += timedelta(days=1)
+    finally:
+        conn.close()
+    return None, limite
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Próxima janela livre: uma passada x tentativas dia a dia")
+    parser.add_argument('--carros', type=int, default=300)
+    parser.add_argument('--reservas', type=int, default=300000)
+    parser.add_argument('--dias', type=int, default=5, help="Duração da locação procurada")
+    parser.add_argument('--limite', type=int, default=3650, help="Máximo de tentativas manuais")
+    args = parser.parse_args()
+
+    random.seed(42)
+    hoje = date.today()
+    with tempfile.TemporaryDirectory() as pasta:
+        db_file = os.path.join(pasta, 'janelas_benchmark.db')
+        inicio = time.perf_counter()
+        preparar_banco(db_file, args.carros, args.reservas, hoje)
+        print(f"Banco: {args.carros} carros, {args.reservas} reservas ({time.perf_counter() - inicio:.1f}s para gerar)")
+
+        inicio = time.perf_counter()
+        data_manual, tentativas = tentativas_manuais(db_file, hoje, args.dias, args.limite)
+        tempo_manual = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        janelas = _carregar_janelas(hoje, args.dias, db_file)
+        tempo_janelas = time.perf_counter() - inicio
+        modelos = janelas_por_modelo(janelas)
+
+        print(f"\n📊 Locação de {args.dias} dia(s) a partir de {hoje:%d/%m/%Y}")
+        print(f"   Tentativas dia a dia: {tentativas} consultas, {tempo_manual * 1000:.0f} ms "
+              f"-> primeira data {data_manual:%d/%m/%Y}" if data_manual else
+              f"   Tentativas dia a dia: nenhuma data em {tentativas} consultas ({tempo_manual * 1000:.0f} ms)")
+        print(f"   Uma passada: {tempo_janelas * 1000:.0f} ms -> primeira data {janelas[0]['janela_inicio']:%d/%m/%Y}, "
+              f"janelas de {len(janelas)} carros e {len(modelos)} modelos")
+        print(f"   Mesma data: {'sim' if data_manual == janelas[0]['janela_inicio'] else 'NÃO'}")
+
+
+if __name__ == "__main__":
+    main()
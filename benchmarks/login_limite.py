@@ -0,0 +1,125 @@
+"""
+Benchmark do limite de tentativas de login (limite_login.py)
+Mede a latência do login legítimo (usuário certo, senha certa, endereço próprio)
+sozinho e durante um ataque de força bruta/pulverização de senhas vindo de
+outros endereços, com e sem o limitador. Usa um banco de autenticação temporário.
+O ataque começa --aquecimento segundos antes da medição (ataque em regime, com
+a rajada inicial de cada endereço já consumida).
+
+Uso:
+    python benchmarks/login_limite.py --duracao 10 --aquecimento 30 --atacantes 4 --taxa 50 --usuarios 200
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth import AuthManager
+from limite_login import LimitadorLogin
+
+
+def preparar_banco(pasta, usuarios):
+    """Banco com o usuário legítimo e as contas alvo do ataque (mesmo hash, para não pagar bcrypt N vezes)"""
+    db_file = os.path.join(pasta, 'auth_benchmark.db')
+    auth = AuthManager(db_file)
+    auth.create_user('balcao', 'senha-correta', 'employee', 'Balcão')
+    hash_alvo = auth._hash_password('senha-das-contas')
+    conn = sqlite3.connect(db_file)
+    conn.executemany("INSERT INTO users (username, password_hash, role) VALUES (?, ?, 'employee')",
+                     [(f"conta{i}", hash_alvo) for i in range(usuarios)])
+    conn.commit()
+    conn.close()
+    return db_file
+
+
+def restaurar_contas(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.execute("UPDATE users SET login_attempts = 0, locked_until = NULL")
+    conn.execute("DELETE FROM login_limites")
+    conn.execute("DELETE FROM sessions")
+    conn.commit()
+    conn.close()
+
+
+def percentis(latencias):
+    latencias = sorted(latencias)
+    percentil = lambda p: latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+    return (f"média {statistics.mean(latencias) * 1000:.0f} ms | p50 {percentil(0.50):.0f} ms | "
+            f"p95 {percentil(0.95):.0f} ms | p99 {percentil(0.99):.0f} ms ({len(latencias)} logins)")
+
+
+def fase(nome, auth, duracao, atacantes, usuarios, aquecimento=0.0, taxa=50.0):
+    parar = threading.Event()
+    tentativas_ataque = [0] * atacantes
+
+    def atacar(indice):
+        # Pulverização de senhas nas outras contas (a conta legítima não é atacada:
+        # o bloqueio de 5 tentativas já a protegeria, e o que se mede é a disputa por CPU e banco)
+        endereco = f"203.0.113.{indice + 1}"
+        proxima = time.perf_counter()
+        while not parar.is_set():
+            auth.authenticate(f"conta{random.randrange(usuarios)}", f"chute{random.random()}", endereco, 'benchmark')
+            tentativas_ataque[indice] += 1
+            # Cada endereço envia até `taxa` tentativas por segundo (mais rápido só se o servidor responder)
+            proxima = max(proxima + 1 / taxa, time.perf_counter() - 1)
+            time.sleep(max(0.0, proxima - time.perf_counter()))
+
+    threads = [threading.Thread(target=atacar, args=(i,), daemon=True) for i in range(atacantes)]
+    for thread in threads:
+        thread.start()
+    time.sleep(aquecimento if atacantes else 0)
+    tentativas_antes = sum(tentativas_ataque)
+
+    latencias, falhas = [], 0
+    fim = time.perf_counter() + duracao
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        sucesso, _ = auth.authenticate('balcao', 'senha-correta', '198.51.100.7', 'benchmark')
+        latencias.append(time.perf_counter() - inicio)
+        falhas += not sucesso
+
+    parar.set()
+    for thread in threads:
+        thread.join()
+
+    print(f"\n📊 {nome}")
+    print(f"   Login legítimo: {percentis(latencias)}, {falhas} recusado(s)")
+    if atacantes:
+        tentativas = sum(tentativas_ataque) - tentativas_antes
+        print(f"   Ataque durante a medição: {tentativas} tentativas ({tentativas / duracao:.0f}/s)")
+        print(f"   Limitador: {auth.limitador.estatisticas()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência do login legítimo durante um ataque de senhas")
+    parser.add_argument('--duracao', type=float, default=10.0, help="Segundos de medição por fase")
+    parser.add_argument('--aquecimento', type=float, default=30.0, help="Segundos de ataque antes da medição")
+    parser.add_argument('--atacantes', type=int, default=4, help="Threads de ataque (uma por endereço)")
+    parser.add_argument('--taxa', type=float, default=50.0, help="Tentativas por segundo de cada atacante")
+    parser.add_argument('--usuarios', type=int, default=200, help="Contas alvo da pulverização")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        db_file = preparar_banco(pasta, args.usuarios)
+        auth = AuthManager(db_file)
+
+        # Sem limite: capacidade que nenhum ataque esgota durante o teste
+        auth.limitador = LimitadorLogin(db_file, capacidade_usuario=10 ** 9, capacidade_endereco=10 ** 9)
+        fase("Sem ataque", auth, args.duracao, 0, args.usuarios)
+        restaurar_contas(db_file)
+        fase("Ataque sem limitador", auth, args.duracao, args.atacantes, args.usuarios, args.aquecimento, args.taxa)
+
+        restaurar_contas(db_file)
+        auth.limitador = LimitadorLogin(db_file)
+        fase("Ataque com limitador", auth, args.duracao, args.atacantes, args.usuarios, args.aquecimento, args.taxa)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark das projeções do livro de eventos (eventos_reservas.py)
+Compara o custo de refazer as projeções a partir do primeiro evento com o da
+atualização incremental depois de algumas operações novas (reserva, entrega e
+devolução pelos fluxos de operacoes). Usa um banco temporário.
+
+Uso:
+    python benchmarks/projecoes_eventos.py --reservas 100000 --novas 100
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eventos_reservas import atualizar_projecoes, garantir_livro, reconstruir_projecoes
+from operacoes import devolver, entregar, reservar
+
+
+def preparar_banco(db_file, reservas, carros, hoje):
+    conn = sqlite3.connect(db_file)
+    conn.executescript('''
+        CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT, placa TEXT, cor TEXT, diaria REAL, preco_km REAL,
+            km_atual INTEGER, status TEXT, numero_chassi TEXT, numero_renavam TEXT, ano_veiculo INTEGER, km_troca_oleo INTEGER);
+        CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT, cpf TEXT, cnh TEXT, validade_cnh DATE, telefone TEXT,
+            endereco TEXT, observacoes TEXT, status TEXT);
+        CREATE TABLE reservas (id INTEGER PRIMARY KEY AUTOINCREMENT, carro_id INTEGER, cliente_id INTEGER,
+            data_inicio DATE, data_fim DATE, reserva_status TEXT, status TEXT, custo_lavagem REAL DEFAULT 0,
+            valor_total REAL DEFAULT 0, km_saida INTEGER, km_volta INTEGER, km_franquia INTEGER,
+            adiantamento REAL, valor_multas REAL, valor_danos REAL, valor_outros REAL);
+        INSERT INTO clientes VALUES (1, 'Cliente', '000', '1', '2040-01-01', '', '', '', 'Ativo');
+    ''')
+    conn.executemany("INSERT INTO carros VALUES (?, 'Mobi', ?, '', 100, 1, 0, 'Disponível', '', '', 2022, 10000)",
+                     [(i, f"BEN{i:04d}") for i in range(1, carros + 1)])
+    linhas = []
+    for _ in range(reservas):
+        inicio = hoje - timedelta(days=random.randint(30, 1500))
+        fim = inicio + timedelta(days=random.randint(1, 10))
+        linhas.append((random.randint(1, carros), inicio, fim, random.uniform(200, 1500)))
+    conn.executemany('''
+        INSERT INTO reservas (carro_id, cliente_id, data_inicio, data_fim, reserva_status, status, valor_total, km_saida, km_volta)
+        VALUES (?, 1, ?, ?, 'Finalizada', 'Finalizada', ?, 0, 100)
+    ''', linhas)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Projeções do livro de eventos: reconstrução x incremental")
+    parser.add_argument('--reservas', type=int, default=100000, help="Reservas existentes (importadas para o livro)")
+    parser.add_argument('--novas', type=int, default=100, help="Locações completas feitas após a atualização")
+    parser.add_argument('--carros', type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(42)
+    hoje = date.today()
+    with tempfile.TemporaryDirectory() as pasta:
+        db_file = os.path.join(pasta, 'eventos_benchmark.db')
+        preparar_banco(db_file, args.reservas, args.carros, hoje)
+
+        inicio = time.perf_counter()
+        garantir_livro(db_file)
+        print(f"Importação de {args.reservas} reservas para o livro: {time.perf_counter() - inicio:.2f}s")
+
+        inicio = time.perf_counter()
+        aplicados = reconstruir_projecoes(db_file)
+        print(f"Reconstrução das projeções: {sum(aplicados.values())} aplicações em {time.perf_counter() - inicio:.2f}s")
+
+        for i in range(args.novas):
+            dia = hoje + timedelta(days=i)
+            ok, reserva_id = reservar(i % args.carros + 1, 1, dia, dia + timedelta(days=2), db_file=db_file)
+            if ok:
+                entregar(reserva_id, db_file=db_file)
+                devolver(reserva_id, 100, dia + timedelta(days=2), db_file=db_file)
+
+        inicio = time.perf_counter()
+        aplicados = atualizar_projecoes(db_file)
+        incremental = time.perf_counter() - inicio
+        print(f"Atualização incremental após {args.novas} locações: {sum(aplicados.values())} aplicações "
+              f"em {incremental * 1000:.1f} ms")
+
+        inicio = time.perf_counter()
+        atualizar_projecoes(db_file)
+        print(f"Atualização sem eventos novos: {(time.perf_counter() - inicio) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
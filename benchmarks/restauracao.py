@@ -0,0 +1,142 @@
+"""
+Benchmark da restauração de backup (restauracao.py)
+Restaura um backup de um banco grande enquanto threads leitoras (como outras
+sessões e réplicas) consultam o banco sem parar, e compara com a restauração
+antiga (shutil.copy2 por cima do arquivo em uso): tempo de cada etapa, maior
+espera de um leitor e leituras que falharam ou viram dados inconsistentes.
+Usa um banco temporário.
+
+Uso:
+    python benchmarks/restauracao.py --reservas 1000000 --leitores 4
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from restauracao import copiar_banco, descrever_relatorio, restaurar
+
+
+def preparar_banco(db_file, reservas, hoje):
+    conn = sqlite3.connect(db_file)
+    conn.executescript('''
+        CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT, placa TEXT);
+        CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT);
+        CREATE TABLE reservas (id INTEGER PRIMARY KEY AUTOINCREMENT, carro_id INTEGER, cliente_id INTEGER,
+            data_inicio DATE, data_fim DATE, reserva_status TEXT, valor_total REAL);
+        CREATE TABLE totais (id INTEGER PRIMARY KEY CHECK (id = 1), reservas INTEGER);
+    ''')
+    conn.executemany("INSERT INTO carros VALUES (?, 'Onix', ?)", [(i, f"BEN{i:04d}") for i in range(1, 201)])
+
+    def linhas():
+        for _ in range(reservas):
+            inicio = hoje - timedelta(days=random.randint(0, 1500))
+            yield (random.randint(1, 200), random.randint(1, 50000), inicio, inicio + timedelta(days=3),
+                   random.uniform(200, 1500))
+    conn.executemany('''
+        INSERT INTO reservas (carro_id, cliente_id, data_inicio, data_fim, reserva_status, valor_total)
+        VALUES (?, ?, ?, ?, 'Finalizada', ?)
+    ''', linhas())
+    conn.execute("INSERT INTO totais VALUES (1, (SELECT COUNT(*) FROM reservas))")
+    conn.commit()
+    conn.close()
+
+
+def alterar_banco(db_file, novas):
+    """Movimento depois do backup: a restauração volta ao estado anterior"""
+    conn = sqlite3.connect(db_file)
+    conn.execute("DELETE FROM reservas WHERE id % 3 = 0")
+    conn.executemany("INSERT INTO reservas (carro_id, cliente_id, data_inicio, data_fim, reserva_status, valor_total) "
+                     "VALUES (1, 1, '2030-01-01', '2030-01-03', 'Reservada', 100)", [()] * novas)
+    conn.execute("UPDATE totais SET reservas = (SELECT COUNT(*) FROM reservas)")
+    conn.commit()
+    conn.close()
+
+
+def ler_sem_parar(db_file, parar, resultado):
+    """Leitor: cada leitura confere o total guardado contra a contagem (um estado consistente)"""
+    conn = sqlite3.connect(db_file, timeout=30)
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        try:
+            conn.execute("BEGIN")
+            total, = conn.execute("SELECT reservas FROM totais").fetchone()
+            contagem, = conn.execute("SELECT COUNT(*) FROM reservas WHERE id > 0").fetchone()
+            conn.execute("COMMIT")
+            if total != contagem:
+                resultado['inconsistentes'] += 1
+        except sqlite3.DatabaseError as e:
+            resultado['erros'] += 1
+            resultado['mensagens'].add(str(e))
+            conn.close()
+            conn = sqlite3.connect(db_file, timeout=30)
+        resultado['leituras'] += 1
+        resultado['maior_espera'] = max(resultado['maior_espera'], time.perf_counter() - inicio)
+    conn.close()
+
+
+def com_leitores(db_file, leitores, funcao):
+    parar = threading.Event()
+    resultados = [{'leituras': 0, 'erros': 0, 'inconsistentes': 0, 'maior_espera': 0.0, 'mensagens': set()}
+                  for _ in range(leitores)]
+    threads = [threading.Thread(target=ler_sem_parar, args=(db_file, parar, resultado)) for resultado in resultados]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+    inicio = time.perf_counter()
+    retorno = funcao()
+    segundos = time.perf_counter() - inicio
+    time.sleep(0.5)
+    parar.set()
+    for thread in threads:
+        thread.join()
+    total = {chave: sum(resultado[chave] for resultado in resultados) for chave in ('leituras', 'erros', 'inconsistentes')}
+    total['maior_espera'] = max(resultado['maior_espera'] for resultado in resultados)
+    total['mensagens'] = set().union(*(resultado['mensagens'] for resultado in resultados))
+    return segundos, retorno, total
+
+
+def imprimir(nome, segundos, leitura):
+    print(f"{nome:<32}{segundos:>8.2f}s   maior espera de leitor {leitura['maior_espera'] * 1000:>7.0f} ms   "
+          f"{leitura['leituras']:>6} leituras, {leitura['erros']} erros, {leitura['inconsistentes']} inconsistentes")
+    for mensagem in sorted(leitura['mensagens'])[:3]:
+        print(f"{'':<32}  ↳ {mensagem}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restauração a quente x cópia por cima do banco em uso")
+    parser.add_argument('--reservas', type=int, default=1000000)
+    parser.add_argument('--novas', type=int, default=50000, help="Reservas gravadas depois do backup")
+    parser.add_argument('--leitores', type=int, default=4)
+    args = parser.parse_args()
+
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as pasta:
+        db_file = os.path.join(pasta, 'restauracao_benchmark.db')
+        backup = os.path.join(pasta, 'backup.db')
+        preparar_banco(db_file, args.reservas, date.today())
+        copiar_banco(db_file, backup)
+        print(f"Backup: {args.reservas} reservas, {os.path.getsize(backup) / 1024 / 1024:.0f} MB; "
+              f"{args.leitores} leitores contínuos\n")
+
+        alterar_banco(db_file, args.novas)
+        segundos, _, leitura = com_leitores(db_file, args.leitores, lambda: shutil.copy2(backup, db_file))
+        imprimir("Cópia por cima (antiga)", segundos, leitura)
+
+        alterar_banco(db_file, args.novas)
+        segundos, (sucesso, relatorio), leitura = com_leitores(
+            db_file, args.leitores, lambda: restaurar(backup, db_file, os.path.join(pasta, 'seguranca.db')))
+        imprimir("Restauração a quente", segundos, leitura)
+        print(f"{'':<32}  etapas: {descrever_relatorio(relatorio) if sucesso else relatorio}")
+
+
+if __name__ == "__main__":
+    main()
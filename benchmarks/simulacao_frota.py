@@ -0,0 +1,81 @@
+"""
+Benchmark da simulação de dimensionamento da frota (simulacao_frota.py)
+Gera um banco temporário com um ano de reservas por modelo e mede a simulação
+completa (ajuste da demanda + cenários) no próprio processo e no pool de
+processos, e a leitura seguinte em cache.
+
+Uso:
+    python benchmarks/simulacao_frota.py --modelos 8 --carros 12 --execucoes 10000 --dias 365
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulacao_frota import carregar_simulacao, obter_simulacao_frota
+
+
+def preparar_banco(db_file, modelos, carros, hoje):
+    conn = sqlite3.connect(db_file)
+    conn.executescript('''
+        CREATE TABLE carros (id INTEGER PRIMARY KEY AUTOINCREMENT, modelo TEXT, placa TEXT, status TEXT);
+        CREATE TABLE reservas (id INTEGER PRIMARY KEY AUTOINCREMENT, carro_id INTEGER, data_inicio DATE,
+            data_fim DATE, reserva_status TEXT);
+    ''')
+    linhas = []
+    for m in range(modelos):
+        ids = [conn.execute("INSERT INTO carros (modelo, placa, status) VALUES (?, ?, 'Disponível')",
+                            (f"Modelo {m + 1}", f"SIM{m:02d}{c:02d}")).lastrowid for c in range(carros)]
+        # Cada carro alugado em ~70% dos dias, com locações de 1 a 10 dias
+        for carro_id in ids:
+            dia = hoje - timedelta(days=365)
+            while dia < hoje:
+                dia += timedelta(days=random.randint(0, 3))
+                fim = dia + timedelta(days=random.randint(0, 9))
+                linhas.append((carro_id, dia, fim, 'Finalizada'))
+                dia = fim + timedelta(days=1)
+    conn.executemany("INSERT INTO reservas (carro_id, data_inicio, data_fim, reserva_status) VALUES (?, ?, ?, ?)", linhas)
+    conn.commit()
+    conn.close()
+    return len(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo da simulação de dimensionamento da frota")
+    parser.add_argument('--modelos', type=int, default=8)
+    parser.add_argument('--carros', type=int, default=12, help="Carros por modelo")
+    parser.add_argument('--execucoes', type=int, default=10000)
+    parser.add_argument('--dias', type=int, default=365)
+    args = parser.parse_args()
+
+    random.seed(42)
+    hoje = date.today()
+    with tempfile.TemporaryDirectory() as pasta:
+        db_file = os.path.join(pasta, 'simulacao_benchmark.db')
+        reservas = preparar_banco(db_file, args.modelos, args.carros, hoje)
+        print(f"Banco: {args.modelos} modelos x {args.carros} carros, {reservas} reservas no último ano")
+        print(f"Simulação: {args.execucoes} cenários de {args.dias} dias, 6 tamanhos de frota por modelo\n")
+
+        for processos in sorted({1, os.cpu_count() or 1}):
+            inicio = time.perf_counter()
+            tabela = carregar_simulacao(db_file, hoje, args.dias, args.execucoes, processos=processos)
+            print(f"   {processos} processo(s): {time.perf_counter() - inicio:.2f}s")
+
+        obter_simulacao_frota(db_file, hoje, args.dias, args.execucoes)
+        inicio = time.perf_counter()
+        obter_simulacao_frota(db_file, hoje, args.dias, args.execucoes)
+        print(f"   Em cache: {(time.perf_counter() - inicio) * 1000:.2f} ms")
+
+        atual = tabela[tabela['carros'] == tabela['frota_atual']]
+        print(f"\n   Frota atual: utilização média {atual['utilizacao_pct'].mean():.1f}%, "
+              f"demanda recusada {atual['demanda_recusada_pct'].mean():.1f}%")
+
+
+if __name__ == "__main__":
+    main()
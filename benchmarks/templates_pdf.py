@@ -0,0 +1,83 @@
+"""
+Benchmark dos modelos de documento pré-compilados (modelos_pdf.py)
+Compara, por documento, a renderização antiga (multi_cell sobre o texto completo)
+com o modelo pré-compilado, e confere se os PDFs gerados são idênticos.
+
+Uso:
+    python benchmarks/templates_pdf.py --documentos 500
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdfgenerator import (PDF, MODELO_CONTRATO, MODELO_RECIBO, campos_contrato, campos_recibo,
+                          gerar_contrato_pdf, gerar_recibo_pdf)
+
+CLIENTE = {'nome': 'Cliente de Teste da Silva', 'cpf': '123.456.789-09', 'cnh': '01234567890',
+           'telefone': '(46) 99999-0000', 'endereco': 'Rua das Flores, 123, Centro, Capanema - PR'}
+CARRO = {'modelo': 'Fiat Mobi Like 1.0', 'placa': 'ABC1D23', 'cor': 'Branco', 'diaria': 120.0, 'preco_km': 1.5,
+         'km_atual': 45210, 'numero_chassi': '9BD341A5XJY123456', 'numero_renavam': '01234567890',
+         'chassi': '9BD341A5XJY123456', 'renavam': '01234567890', 'ano_veiculo': 2022}
+INICIO = date(2025, 3, 10)
+FIM = INICIO + timedelta(days=7)
+RECIBO = {'data_inicio': INICIO, 'data_fim': FIM, 'km_saida': 45210, 'km_volta': 46010, 'km_franquia': 300,
+          'dias_cobranca': 7, 'custo_diarias': 840.0, 'custo_km': 750.0, 'valor_lavagem': 50.0,
+          'valor_multas': 0.0, 'valor_danos': 0.0, 'valor_outros': 0.0, 'adiantamento': 420.0,
+          'total_final': 1220.0}
+
+
+def contrato_multi_cell():
+    """Renderização anterior: todo o texto do contrato passa por multi_cell"""
+    pdf = PDF(titulo='CONTRATO DE LOCACAO DE VEICULO')
+    pdf.add_page()
+    pdf.set_font("Arial", size=10)
+    pdf.multi_cell(0, 5, MODELO_CONTRATO.texto(campos_contrato(CLIENTE, CARRO, INICIO, FIM)))
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def recibo_multi_cell():
+    pdf = PDF(titulo='RECIBO DE DEVOLUCAO')
+    pdf.add_page()
+    pdf.set_font("Arial", size=11)
+    pdf.multi_cell(0, 5, MODELO_RECIBO.texto(campos_recibo(CLIENTE, CARRO, RECIBO)))
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def medir(funcao, documentos):
+    funcao()  # aquecimento (compila o layout do modelo)
+    inicio = time.perf_counter()
+    for _ in range(documentos):
+        funcao()
+    return (time.perf_counter() - inicio) / documentos * 1000
+
+
+def sem_data_criacao(pdf_bytes):
+    return re.sub(rb'/CreationDate \(D:\d+\)', b'', pdf_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos modelos de contrato e recibo")
+    parser.add_argument('--documentos', type=int, default=500, help="Documentos renderizados por medição")
+    args = parser.parse_args()
+
+    casos = [
+        ('Contrato', contrato_multi_cell, lambda: gerar_contrato_pdf(CLIENTE, CARRO, INICIO, FIM)),
+        ('Recibo', recibo_multi_cell, lambda: gerar_recibo_pdf(CLIENTE, CARRO, RECIBO)),
+    ]
+    for nome, anterior, modelo in casos:
+        identicos = sem_data_criacao(anterior()) == sem_data_criacao(modelo())
+        ms_anterior = medir(anterior, args.documentos)
+        ms_modelo = medir(modelo, args.documentos)
+        print(f"\n📄 {nome} ({args.documentos} documentos)")
+        print(f"   multi_cell:      {ms_anterior:.2f} ms/doc")
+        print(f"   pré-compilado:   {ms_modelo:.2f} ms/doc ({ms_anterior / ms_modelo:.1f}x)")
+        print(f"   PDFs idênticos:  {'sim' if identicos else 'NÃO'}")
+
+
+if __name__ == "__main__":
+    main()
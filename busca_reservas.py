@@ -0,0 +1,276 @@
+"""
+Busca de reservas com paginação por chave (keyset)
+Filtros combináveis (placa, cliente, status e período de retirada) sobre a
+tabela reservas e, no histórico, também sobre o arquivo morto. Cada página
+continua do último (data_inicio, id) exibido em vez de usar OFFSET, então a
+página 1000 custa o mesmo que a primeira: o índice por data de retirada (ou o
+do filtro mais seletivo) entrega as linhas já ordenadas.
+
+- Placa e cliente viram listas de ids antes da busca (carros é pequena;
+  clientes usa o índice por nome e o UNIQUE do CPF). Os ids entram como um
+  único parâmetro JSON (json_each).
+- As consultas são variantes fixas do catálogo (consultas.py), uma por filtro
+  que conduz o índice e por ordem; os outros filtros, o período e o cursor são
+  sempre parâmetros (ver 'busca_reservas_*').
+- Com o arquivo morto, cada origem devolve no máximo uma página já ordenada e
+  as duas são intercaladas aqui.
+
+Uso:
+    python busca_reservas.py --placa ABC1234
+    python busca_reservas.py --cliente Maria --status Finalizada --limite 10
+    python busca_reservas.py --plano         # cria os índices e mostra o plano da busca
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date
+from conexao import ao_restaurar, obter_pool, uri_somente_leitura
+from consultas import CONSULTAS
+from arquivo_reservas import arquivo_morto
+
+DB_FILE = 'locadora_v2.db'
+
+# Reservas por página
+TAMANHO_PAGINA = int(os.environ.get('BUSCA_RESERVAS_PAGINA', 25))
+
+STATUS_ATIVOS = ('Reservada', 'Locada')
+
+# Índices das reservas (também criados no arquivo morto). O id (rowid) entra no fim
+# de todo índice, o que dá a ordem (data_inicio, id) usada pelo cursor
+INDICES_RESERVAS = {
+    'idx_reservas_inicio': "reservas (data_inicio)",
+    'idx_reservas_status_inicio': "reservas (reserva_status, data_inicio)",
+    'idx_reservas_cliente_inicio': "reservas (cliente_id, data_inicio)",
+    'idx_reservas_carro_inicio': "reservas (carro_id, data_inicio)",
+}
+# Busca de cliente pelo início do nome (LIKE usa o índice NOCASE). A placa já
+# tem o índice do UNIQUE e a tabela carros é pequena
+INDICES_CADASTROS = {
+    'idx_clientes_nome': "clientes (nome COLLATE NOCASE)",
+}
+
+COLUNAS_RESERVA = ('id', 'carro_id', 'cliente_id', 'data_inicio', 'data_fim', 'reserva_status', 'km_franquia',
+                   'adiantamento', 'valor_total', 'valor_multas', 'valor_danos', 'valor_outros')
+
+ORDENS = ('asc', 'desc')
+
+# Filtros de lista, do mais para o menos seletivo: o primeiro informado conduz o
+# índice (variante 'busca_reservas_<guia>_<ordem>'); sem nenhum, o índice por data
+GUIAS = ('clientes', 'carros', 'status')
+
+# Período não informado: limites que valem para qualquer data de retirada
+INICIO_MINIMO = date.min
+INICIO_MAXIMO = date.max
+
+_indexados = set()
+_indices_lock = threading.Lock()
+
+
+def criar_indices(conn, esquema='main', cadastros=True):
+    """Cria os índices da busca no esquema informado ('main' ou um banco anexado)"""
+    for nome, alvo in INDICES_RESERVAS.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.{nome} ON {alvo}")
+    if cadastros:
+        for nome, alvo in INDICES_CADASTROS.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.{nome} ON {alvo}")
+
+
+def garantir_indices(db_file=DB_FILE):
+    """
+    Cria os índices uma vez por processo e por banco (também no arquivo morto,
+    se existir). Em um banco grande a primeira criação leva alguns segundos.
+    """
+    with _indices_lock:
+        if db_file in _indexados:
+            return
+        conn = sqlite3.connect(db_file, timeout=30)
+        try:
+            tabelas = {nome for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if not {'reservas', 'clientes'} <= tabelas:
+                return  # Banco ainda sem estrutura: tenta de novo na próxima busca
+            with conn:
+                criar_indices(conn)
+            arquivo = arquivo_morto(db_file)
+            if os.path.exists(arquivo):
+                conn.execute("ATTACH DATABASE ? AS arquivo", (arquivo,))
+                if conn.execute("SELECT 1 FROM arquivo.sqlite_master WHERE name = 'reservas'").fetchone():
+                    with conn:
+                        criar_indices(conn, 'arquivo', cadastros=False)
+        finally:
+            conn.close()
+        _indexados.add(db_file)
+
+
+@ao_restaurar
+def _esquecer_indices(db_file):
+    """O banco restaurado pode ser de antes dos índices"""
+    with _indices_lock:
+        _indexados.discard(db_file)
+
+
+def normalizar_placa(placa: str) -> str:
+    return re.sub(r'[^A-Z0-9]', '', placa.upper())
+
+
+def _ids_carros(conn, placa: str) -> list:
+    """Carros cuja placa (sem traço/espaço) começa com o texto informado"""
+    return [linha[0] for linha in conn.execute(CONSULTAS['busca_carros_por_placa'], (normalizar_placa(placa) + '%',))]
+
+
+def _ids_clientes(conn, cliente: str) -> list:
+    """Clientes pelo CPF (11 dígitos, com ou sem pontuação) ou pelo início do nome"""
+    texto = cliente.strip()
+    digitos = re.sub(r'\D', '', texto)
+    if len(digitos) == 11 and not re.sub(r'[\d.\-\s]', '', texto):
+        formatado = f"{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}"
+        consulta, params = CONSULTAS['busca_clientes_por_cpf'], (formatado, digitos)
+    else:
+        # Curingas digitados são removidos: a busca é sempre pelo início do nome
+        consulta, params = CONSULTAS['busca_clientes_por_nome'], (re.sub(r'[%_]', '', texto) + '%',)
+    return [linha[0] for linha in conn.execute(consulta, params)]
+
+
+def _escolher_consulta(filtros: dict, depois, ordem: str, limite: int):
+    """Variante do catálogo e parâmetros nomeados da busca (ver 'busca_reservas_*' em consultas.py)"""
+    guia = next((nome for nome in GUIAS if nome in filtros), 'inicio')
+    inicio_de, inicio_ate = filtros.get('inicio_de', INICIO_MINIMO), filtros.get('inicio_ate', INICIO_MAXIMO)
+    # O limite do período do lado em que a página avança entra no cursor: assim o
+    # índice é lido a partir do cursor, e não do início do período
+    if ordem == 'asc':
+        cursor = (inicio_de, 0) if depois is None else max(tuple(depois), (inicio_de, 0))
+    else:
+        cursor = (inicio_ate, 2 ** 63 - 1) if depois is None else min(tuple(depois), (inicio_ate, 2 ** 63 - 1))
+    params = {nome: json.dumps(list(filtros[nome])) if nome in filtros else None for nome in GUIAS}
+    params.update(inicio_de=inicio_de, inicio_ate=inicio_ate, cursor_data=cursor[0], cursor_id=cursor[1], limite=limite)
+    return CONSULTAS[f'busca_reservas_{guia}_{ordem}'], params
+
+
+def _ler(conn, consulta, params, arquivada: bool) -> list:
+    linhas = []
+    for valores in conn.execute(consulta, params):
+        linha = dict(zip(COLUNAS_RESERVA, valores))
+        linha['arquivada'] = arquivada
+        linhas.append(linha)
+    return linhas
+
+
+def _completar(conn, linhas: list):
+    """Acrescenta nome/CPF do cliente e modelo/placa/preços do carro (só das linhas da página)"""
+    clientes = {linha[0]: linha[1:] for linha in conn.execute(
+        CONSULTAS['busca_clientes_dados'], (json.dumps(sorted({linha['cliente_id'] for linha in linhas})),))}
+    carros = {linha[0]: linha[1:] for linha in conn.execute(
+        CONSULTAS['busca_carros_dados'], (json.dumps(sorted({linha['carro_id'] for linha in linhas})),))}
+    for linha in linhas:
+        linha['cliente'], linha['cpf'] = clientes.get(linha['cliente_id'], (None, None))
+        linha['modelo'], linha['placa'], linha['diaria'], linha['preco_km'], linha['km_atual'] = \
+            carros.get(linha['carro_id'], (None,) * 5)
+
+
+def buscar_reservas(placa: str = None, cliente: str = None, status=None, inicio_de: date = None,
+                    inicio_ate: date = None, depois=None, limite: int = TAMANHO_PAGINA, ordem: str = 'desc',
+                    incluir_arquivo: bool = False, db_file=DB_FILE):
+    """
+    Uma página de reservas que atendem a todos os filtros informados, ordenadas
+    por (data_inicio, id) ('asc' ou 'desc').
+    'depois' é o cursor devolvido pela página anterior (None na primeira).
+    Retorna (linhas, proximo): 'proximo' é o cursor da página seguinte, ou None
+    se esta é a última. Com incluir_arquivo=True também busca no arquivo morto.
+    """
+    if ordem not in ORDENS:
+        raise ValueError("A ordem deve ser 'asc' ou 'desc'")
+    if limite < 1:
+        raise ValueError("O limite deve ser de pelo menos 1 reserva")
+    garantir_indices(db_file)
+
+    with obter_pool(db_file).conexao() as conn:
+        filtros = {}
+        if placa:
+            filtros['carros'] = _ids_carros(conn, placa)
+        if cliente:
+            filtros['clientes'] = _ids_clientes(conn, cliente)
+        if any(not ids for ids in filtros.values()):
+            return [], None
+        if status:
+            filtros['status'] = [status] if isinstance(status, str) else list(status)
+        if inicio_de:
+            filtros['inicio_de'] = inicio_de
+        if inicio_ate:
+            filtros['inicio_ate'] = inicio_ate
+
+        # Uma linha a mais diz se existe a página seguinte
+        consulta, params = _escolher_consulta(filtros, depois, ordem, limite + 1)
+        linhas = _ler(conn, consulta, params, arquivada=False)
+
+        arquivo = arquivo_morto(db_file)
+        if incluir_arquivo and os.path.exists(arquivo):
+            conn_arquivo = sqlite3.connect(uri_somente_leitura(arquivo), uri=True,
+                                           detect_types=sqlite3.PARSE_DECLTYPES)
+            try:
+                linhas += _ler(conn_arquivo, consulta, params, arquivada=True)
+            except sqlite3.OperationalError:
+                pass  # Arquivo criado mas ainda sem a tabela reservas
+            finally:
+                conn_arquivo.close()
+            linhas.sort(key=lambda linha: (linha['data_inicio'], linha['id']), reverse=(ordem == 'desc'))
+
+        proximo = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo = (linhas[-1]['data_inicio'], linhas[-1]['id'])
+        if linhas:
+            _completar(conn, linhas)
+    return linhas, proximo
+
+
+def cursor_para_texto(cursor) -> str:
+    """Cursor (data_inicio, id) como texto 'AAAA-MM-DD_id' (para a API e a linha de comando)"""
+    return f"{cursor[0]}_{cursor[1]}"
+
+
+def ler_cursor(texto: str):
+    """Inverso de cursor_para_texto; ValueError se o texto não é um cursor"""
+    data_texto, _, id_texto = texto.rpartition('_')
+    return date.fromisoformat(data_texto), int(id_texto)
+
+
+def explicar_busca(db_file=DB_FILE, **filtros) -> list:
+    """Plano do SQLite (EXPLAIN QUERY PLAN) da consulta principal da busca, para conferir os índices"""
+    garantir_indices(db_file)
+    nomes = {'placa': 'carros', 'cliente': 'clientes', 'status': 'status',
+             'inicio_de': 'inicio_de', 'inicio_ate': 'inicio_ate'}
+    usados = {nomes[nome]: ([1] if nome in ('placa', 'cliente') else valor)
+              for nome, valor in filtros.items() if valor and nome in nomes}
+    depois = filtros.get('depois')
+    consulta, params = _escolher_consulta(usados, depois, filtros.get('ordem', 'desc'), TAMANHO_PAGINA + 1)
+    with obter_pool(db_file).conexao() as conn:
+        return [linha[-1] for linha in conn.execute("EXPLAIN QUERY PLAN " + consulta, params)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Busca de reservas por placa, cliente, status e período")
+    parser.add_argument('--banco', default=DB_FILE)
+    parser.add_argument('--placa')
+    parser.add_argument('--cliente', help="Início do nome ou CPF")
+    parser.add_argument('--status', action='append', help="Pode ser repetido")
+    parser.add_argument('--de', type=date.fromisoformat, help="Retirada a partir de (AAAA-MM-DD)")
+    parser.add_argument('--ate', type=date.fromisoformat, help="Retirada até (AAAA-MM-DD)")
+    parser.add_argument('--limite', type=int, default=TAMANHO_PAGINA)
+    parser.add_argument('--depois', type=ler_cursor, help="Cursor da página anterior (AAAA-MM-DD_id)")
+    parser.add_argument('--arquivo', action='store_true', help="Inclui o arquivo morto")
+    parser.add_argument('--plano', action='store_true', help="Mostra o plano da consulta em vez de buscar")
+    args = parser.parse_args()
+
+    if args.plano:
+        for passo in explicar_busca(args.banco, placa=args.placa, cliente=args.cliente, status=args.status,
+                                    inicio_de=args.de, inicio_ate=args.ate):
+            print(passo)
+    else:
+        linhas, proximo = buscar_reservas(args.placa, args.cliente, args.status, args.de, args.ate,
+                                          depois=args.depois, limite=args.limite, incluir_arquivo=args.arquivo, db_file=args.banco)
+        for linha in linhas:
+            print(f"#{linha['id']:>7} {linha['data_inicio']} a {linha['data_fim']} {linha['reserva_status']:<10} "
+                  f"{linha['placa'] or '?':<9} {linha['cliente'] or '?'}{' (arquivo)' if linha['arquivada'] else ''}")
+        print(f"{len(linhas)} reserva(s)" + (f"; próxima página: --depois {cursor_para_texto(proximo)}" if proximo else ""))
@@ -0,0 +1,214 @@
+"""
+Camada de notificação de mudanças entre processos
+Mantém a tabela change_log via triggers e invalida os caches locais de cada
+processo (réplica) apenas nas chaves afetadas pelas tabelas alteradas
+"""
+import sqlite3
+import threading
+from conexao import ao_restaurar, verificar_restauracao
+
+DB_FILE = 'locadora_v2.db'
+
+# Tabelas cujas alterações são registradas no change_log
+TABELAS_MONITORADAS = ('carros', 'clientes', 'reservas', 'users', 'sessions')
+
+# Quantidade de registros mantidos no change_log após a limpeza
+MANTER_CHANGE_LOG = 10000
+
+
+def instalar_change_log(db_file=DB_FILE):
+    """
+    Cria a tabela change_log e os triggers de INSERT/UPDATE/DELETE
+    nas tabelas monitoradas (apenas as que já existem no banco)
+    """
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabela TEXT NOT NULL,
+            row_id INTEGER,
+            operacao TEXT NOT NULL,
+            alterado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    c.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    existentes = {row[0] for row in c.fetchall()}
+
+    for tabela in TABELAS_MONITORADAS:
+        if tabela not in existentes:
+            continue
+        for operacao, referencia in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            c.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{tabela}_{operacao.lower()}_log
+                AFTER {operacao} ON {tabela}
+                BEGIN
+                    INSERT INTO change_log (tabela, row_id, operacao)
+                    VALUES ('{tabela}', {referencia}.rowid, '{operacao}');
+                END
+            ''')
+
+    conn.commit()
+    conn.close()
+
+
+def limpar_change_log(db_file=DB_FILE, manter=MANTER_CHANGE_LOG):
+    """
+    Remove entradas antigas do change_log, mantendo apenas as mais recentes
+    """
+    conn = sqlite3.connect(db_file)
+    c = conn.cursor()
+    c.execute("DELETE FROM change_log WHERE id <= (SELECT MAX(id) FROM change_log) - ?", (manter,))
+    removidos = c.rowcount
+    conn.commit()
+    conn.close()
+    return removidos
+
+
+class MonitorMudancas:
+    """
+    Detecta alterações feitas por outras conexões (inclusive de outros processos)
+
+    O PRAGMA data_version só muda quando outra conexão confirma uma escrita,
+    então a verificação em repouso custa uma única leitura de página.
+    Quando muda, o change_log diz quais tabelas foram afetadas.
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._data_version = self._ler_data_version()
+        self._ultimo_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM change_log").fetchone()[0]
+        self._versoes = {tabela: 0 for tabela in TABELAS_MONITORADAS}
+        self._ouvintes = []
+
+    def _ler_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def registrar(self, callback):
+        """Registra uma função chamada com o conjunto de tabelas alteradas"""
+        self._ouvintes.append(callback)
+
+    def verificar(self) -> set:
+        """Retorna as tabelas alteradas desde a última verificação"""
+        verificar_restauracao(self.db_file)
+        with self._lock:
+            data_version = self._ler_data_version()
+            if data_version == self._data_version:
+                return set()
+            self._data_version = data_version
+
+            menor_id = self._conn.execute("SELECT MIN(id) FROM change_log").fetchone()[0]
+            linhas = self._conn.execute("""
+                SELECT tabela, MAX(id) FROM change_log
+                WHERE id > ? GROUP BY tabela
+            """, (self._ultimo_id,)).fetchall()
+
+            if menor_id is not None and menor_id > self._ultimo_id + 1:
+                # O change_log foi limpo além do ponto visto: invalida tudo
+                alteradas = set(TABELAS_MONITORADAS)
+            else:
+                alteradas = {tabela for tabela, _ in linhas}
+
+            for tabela, max_id in linhas:
+                self._ultimo_id = max(self._ultimo_id, max_id)
+            for tabela in alteradas:
+                self._versoes[tabela] = self._versoes.get(tabela, 0) + 1
+
+        if alteradas:
+            for callback in self._ouvintes:
+                callback(alteradas)
+        return alteradas
+
+    def reiniciar(self):
+        """Recomeça do estado atual do banco (após uma restauração) e invalida tudo"""
+        with self._lock:
+            self._data_version = self._ler_data_version()
+            self._ultimo_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM change_log").fetchone()[0]
+            for tabela in self._versoes:
+                self._versoes[tabela] += 1
+        for callback in self._ouvintes:
+            callback(set(TABELAS_MONITORADAS))
+
+    def versao(self, *tabelas) -> tuple:
+        """
+        Retorna a versão atual das tabelas informadas, útil como parte da
+        chave de caches externos (ex.: st.cache_data)
+        """
+        self.verificar()
+        return tuple(self._versoes.get(tabela, 0) for tabela in tabelas)
+
+
+class CacheLocal:
+    """Cache em memória do processo, com chaves dependentes de tabelas"""
+
+    def __init__(self, monitor: MonitorMudancas):
+        self.monitor = monitor
+        self._lock = threading.Lock()
+        self._dados = {}
+        self._geracao = 0
+        self.acertos = 0
+        self.falhas = 0
+        monitor.registrar(self.invalidar_tabelas)
+
+    def obter(self, chave, tabelas, carregar):
+        """
+        Retorna o valor em cache para a chave ou executa carregar().
+        tabelas: tabelas das quais o valor depende
+        """
+        self.monitor.verificar()
+        with self._lock:
+            if chave in self._dados:
+                self.acertos += 1
+                return self._dados[chave][1]
+            geracao = self._geracao
+
+        valor = carregar()
+        with self._lock:
+            self.falhas += 1
+            # Não guarda valores lidos durante uma invalidação concorrente
+            if geracao == self._geracao:
+                self._dados[chave] = (frozenset(tabelas), valor)
+        return valor
+
+    def invalidar(self, chave):
+        """Remove uma chave específica do cache"""
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def invalidar_tabelas(self, tabelas):
+        """Remove as chaves que dependem de qualquer uma das tabelas"""
+        with self._lock:
+            self._geracao += 1
+            for chave in [k for k, (deps, _) in self._dados.items() if deps & tabelas]:
+                del self._dados[chave]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def obter_cache(db_file=DB_FILE) -> CacheLocal:
+    """
+    Retorna o cache compartilhado do processo para o banco informado,
+    instalando o change_log na primeira chamada
+    """
+    with _caches_lock:
+        if db_file not in _caches:
+            instalar_change_log(db_file)
+            _caches[db_file] = CacheLocal(MonitorMudancas(db_file))
+        return _caches[db_file]
+
+
+@ao_restaurar
+def _reiniciar_cache(db_file):
+    """O banco restaurado pode não ter os triggers e tem outro change_log"""
+    with _caches_lock:
+        cache = _caches.get(db_file)
+        if cache is None:
+            return
+        instalar_change_log(db_file)
+    cache.monitor.reiniciar()
@@ -0,0 +1,159 @@
+"""
+Pool de conexões SQLite reutilizáveis
+Cada conexão mantém um cache de statements preparados (cached_statements),
+então o custo de parse/plan de cada consulta do catálogo é pago uma vez por conexão
+
+Restauração de backup (restauracao.py): a troca do banco grava o arquivo
+'<banco>.geracao'. Cada empréstimo compara o inode/mtime desse arquivo com o
+visto pelo pool (um stat); quando muda, em qualquer réplica, o pool descarta
+as conexões ociosas, as emprestadas não voltam ao pool e as funções
+registradas com ao_restaurar (caches e registros do processo) são chamadas.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from rastreamento import trecho
+
+DB_FILE = 'locadora_v2.db'
+
+# Conexões ociosas mantidas por banco
+TAMANHO_POOL = 8
+
+# Statements preparados mantidos por conexão (o catálogo tem bem menos que isso)
+TAMANHO_CACHE_STATEMENTS = 256
+
+
+def uri_somente_leitura(caminho: str) -> str:
+    """URI de um arquivo SQLite aberto só para leitura (sqlite3.connect(..., uri=True) ou ATTACH)"""
+    return Path(caminho).absolute().as_uri() + '?mode=ro'
+
+
+def arquivo_geracao(db_file=DB_FILE) -> str:
+    """Marca da última restauração do banco: locadora_v2.db -> locadora_v2.db.geracao"""
+    return f"{db_file}.geracao"
+
+
+def geracao_banco(db_file=DB_FILE):
+    """(inode, mtime) da marca de restauração, ou None se o banco nunca foi restaurado"""
+    try:
+        estado = os.stat(arquivo_geracao(db_file))
+    except FileNotFoundError:
+        return None
+    return estado.st_ino, estado.st_mtime_ns
+
+
+_ao_restaurar = []
+
+
+def ao_restaurar(funcao):
+    """
+    Registra uma função chamada com o caminho do banco quando o processo percebe
+    que ele foi restaurado (para descartar estado guardado sobre o banco anterior)
+    """
+    _ao_restaurar.append(funcao)
+    return funcao
+
+
+class PoolConexoes:
+    """Pool simples de conexões SQLite compartilhado entre as threads do processo"""
+
+    def __init__(self, db_file=DB_FILE, tamanho=TAMANHO_POOL, cached_statements=TAMANHO_CACHE_STATEMENTS):
+        self.db_file = db_file
+        self.tamanho = tamanho
+        self.cached_statements = cached_statements
+        self._livres = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._abertas = 0
+        self._geracao = geracao_banco(db_file)
+
+    def _nova_conexao(self):
+        conn = sqlite3.connect(
+            self.db_file,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=self.cached_statements,
+            check_same_thread=False
+        )
+        with self._lock:
+            self._abertas += 1
+        return conn
+
+    def _descartar(self, conn):
+        conn.close()
+        with self._lock:
+            self._abertas -= 1
+
+    def verificar_geracao(self):
+        """Descarta as conexões do banco anterior se ele foi restaurado desde a última verificação"""
+        geracao = geracao_banco(self.db_file)
+        if geracao == self._geracao:
+            return
+        with self._lock:
+            if geracao == self._geracao:
+                return  # Outra thread já tratou a troca
+            self._geracao = geracao
+        self.fechar_todas()
+        for funcao in _ao_restaurar:
+            funcao(self.db_file)
+
+    @contextmanager
+    def conexao(self):
+        """
+        Empresta uma conexão do pool. Em caso de erro a transação pendente é
+        desfeita antes de a conexão voltar ao pool.
+        O empréstimo é medido como trecho 'sql' do rastro da página (se houver).
+        """
+        self.verificar_geracao()
+        try:
+            conn = self._livres.get_nowait()
+        except queue.Empty:
+            conn = self._nova_conexao()
+        geracao = self._geracao
+
+        try:
+            with trecho('sql'):
+                yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._livres.qsize() < self.tamanho and geracao == self._geracao:
+                self._livres.put(conn)
+            else:
+                self._descartar(conn)
+
+    def fechar_todas(self):
+        """Fecha as conexões ociosas do pool"""
+        while True:
+            try:
+                self._descartar(self._livres.get_nowait())
+            except queue.Empty:
+                break
+
+    @property
+    def abertas(self):
+        return self._abertas
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obter_pool(db_file=DB_FILE) -> PoolConexoes:
+    """Retorna o pool compartilhado do processo para o banco informado"""
+    with _pools_lock:
+        if db_file not in _pools:
+            _pools[db_file] = PoolConexoes(db_file)
+        return _pools[db_file]
+
+
+def verificar_restauracao(db_file=DB_FILE):
+    """
+    Confere a marca de restauração do banco (um stat). Chamada no início de cada
+    execução/requisição, antes de qualquer estado guardado do processo ser usado.
+    """
+    obter_pool(db_file).verificar_geracao()
@@ -0,0 +1,20 @@
+"""
+Configuração do pytest para os testes de test_app.py
+Os testes seguem o formato do script (python test_app.py): cada função imprime
+o diagnóstico e retorna True/False. Sob o pytest, retornar False reprova o teste
+(o pytest só avisaria do retorno e daria o teste como aprovado).
+"""
+import inspect
+
+import pytest
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    funcao = pyfuncitem.obj
+    if inspect.iscoroutinefunction(funcao):
+        return None  # Segue a chamada padrão do pytest
+    argumentos = {nome: pyfuncitem.funcargs[nome] for nome in pyfuncitem._fixtureinfo.argnames}
+    if funcao(**argumentos) is False:
+        pytest.fail(f"{pyfuncitem.name} retornou False (ver a saída capturada)", pytrace=False)
+    return True
@@ -0,0 +1,391 @@
+"""
+Catálogo central de consultas SQL parametrizadas
+Todo texto de consulta é uma constante: valores variáveis (datas, status, IDs)
+entram sempre como parâmetros, então o cache de statements das conexões do pool
+reaproveita o plano de cada consulta e não há superfície de injeção de SQL.
+"""
+
+CONSULTAS = {
+    # --- CARROS ---
+    'carros_todos': "SELECT * FROM carros",
+    'carro_por_id': "SELECT * FROM carros WHERE id=?",
+    'carros_exceto_status': "SELECT * FROM carros WHERE status != ?",
+    'carros_ativos_resumo': "SELECT id, modelo, placa FROM carros WHERE status != ?",
+    'carro_inserir': """
+        INSERT INTO carros (modelo, placa, cor, km_atual, diaria, preco_km, status, numero_chassi, numero_renavam, ano_veiculo, km_troca_oleo)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?)
+    """,
+    'carro_atualizar': """
+        UPDATE carros
+        SET cor=?, diaria=?, preco_km=?, km_atual=?, status=?, numero_chassi=?, numero_renavam=?, ano_veiculo=?, km_troca_oleo=?
+        WHERE id=?
+    """,
+    'carro_atualizar_status': "UPDATE carros SET status=? WHERE id=?",
+    'carros_placas': "SELECT placa FROM carros",
+    'carro_atualizar_status_km': "UPDATE carros SET status=?, km_atual=? WHERE id=?",
+
+    # Carros livres no período: parâmetros (status_indisponivel, status_excluido, data_fim, data_inicio)
+    'carros_disponiveis_periodo': """
+        SELECT * FROM carros
+        WHERE status NOT IN (?, ?)
+        AND id NOT IN (
+            SELECT carro_id FROM reservas
+            WHERE reserva_status IN ('Reservada', 'Locada')
+            AND (data_inicio <= ? AND data_fim >= DATE(?, '+0 day'))
+        )
+    """,
+    # Versão resumida para a verificação rápida do Dashboard (mesmos parâmetros)
+    'carros_disponiveis_periodo_resumo': """
+        SELECT modelo, placa, diaria, preco_km
+        FROM carros
+        WHERE status NOT IN (?, ?)
+        AND id NOT IN (
+            SELECT carro_id FROM reservas
+            WHERE reserva_status IN ('Reservada', 'Locada')
+            AND (data_inicio <= ? AND data_fim >= DATE(?, '+0 day'))
+        )
+    """,
+    # Troca de veículo: (status_indisponivel, status_excluido, carro_atual, data_fim, data_inicio)
+    'carros_disponiveis_troca': """
+        SELECT id, modelo, placa FROM carros
+        WHERE status NOT IN (?, ?)
+        AND id != ?
+        AND id NOT IN (
+            SELECT carro_id FROM reservas
+            WHERE reserva_status IN ('Reservada', 'Locada')
+            AND (data_inicio <= ? AND data_fim >= DATE(?, '+0 day'))
+        )
+    """,
+    # Carros que aceitam reservas: (status_indisponivel, status_excluido)
+    'carros_reservaveis': "SELECT * FROM carros WHERE status NOT IN (?, ?)",
+    # Um carro específico livre no período: (carro_id, status_indisponivel, status_excluido, data_fim, data_inicio)
+    'carro_disponivel_periodo': """
+        SELECT * FROM carros
+        WHERE id = ?
+        AND status NOT IN (?, ?)
+        AND id NOT IN (
+            SELECT carro_id FROM reservas
+            WHERE reserva_status IN ('Reservada', 'Locada')
+            AND (data_inicio <= ? AND data_fim >= DATE(?, '+0 day'))
+        )
+    """,
+
+    # --- CLIENTES ---
+    'cliente_por_id': "SELECT * FROM clientes WHERE id=?",
+    'clientes_exceto_status': "SELECT * FROM clientes WHERE status != ?",
+    'clientes_por_status': "SELECT * FROM clientes WHERE status = ?",
+    'cliente_inserir': """
+        INSERT INTO clientes (nome, cpf, cnh, validade_cnh, telefone, endereco, observacoes)
+        VALUES (?,?,?,?,?,?,?)
+    """,
+    'cliente_atualizar': """
+        UPDATE clientes
+        SET nome=?, cnh=?, validade_cnh=?, telefone=?, endereco=?, observacoes=?
+        WHERE id=?
+    """,
+    'cliente_atualizar_status': "UPDATE clientes SET status=? WHERE id=?",
+    'clientes_cpfs': "SELECT cpf FROM clientes",
+    'cliente_reservas_ativas': """
+        SELECT COUNT(*) FROM reservas
+        WHERE cliente_id=? AND reserva_status IN ('Reservada', 'Locada')
+    """,
+
+    # --- RESERVAS ---
+    'reservas_todas': "SELECT * FROM reservas",
+    'reserva_por_id': "SELECT * FROM reservas WHERE id=?",
+    'reserva_inserir': """
+        INSERT INTO reservas (carro_id, cliente_id, data_inicio, data_fim, status, reserva_status, km_saida, km_franquia, adiantamento, valor_multas, valor_danos, valor_outros)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+    """,
+    'reserva_atualizar': """
+        UPDATE reservas
+        SET data_inicio=?, data_fim=?, km_franquia=?, adiantamento=?, carro_id=?, valor_multas=?, valor_danos=?, valor_outros=?
+        WHERE id=?
+    """,
+    'reserva_atualizar_status': "UPDATE reservas SET reserva_status=? WHERE id=?",
+    'reserva_confirmar_entrega': """
+        UPDATE reservas SET km_saida=?, data_inicio=?, reserva_status='Locada' WHERE id=?
+    """,
+    'reserva_finalizar': """
+        UPDATE reservas
+        SET status='Finalizada', reserva_status='Finalizada', km_volta=?, custo_lavagem=?, valor_total=?,
+        valor_multas=?, valor_danos=?, valor_outros=?
+        WHERE id=?
+    """,
+    'reserva_dados_recibo': """
+        SELECT
+            r.id, r.data_inicio, r.data_fim, r.km_saida, r.km_volta, r.km_franquia,
+            r.custo_lavagem, r.valor_multas, r.valor_danos, r.valor_outros, r.adiantamento, r.valor_total,
+            cl.nome AS cliente_nome, cl.cpf AS cliente_cpf, cl.telefone AS cliente_telefone,
+            c.modelo AS carro_modelo, c.placa AS carro_placa, c.cor AS carro_cor, c.preco_km AS carro_preco_km, c.diaria AS carro_diaria,
+            c.numero_chassi AS carro_chassi, c.numero_renavam AS carro_renavam
+        FROM reservas r
+        JOIN clientes cl ON r.cliente_id = cl.id
+        JOIN carros c ON r.carro_id = c.id
+        WHERE r.id = ?
+    """,
+    'reservas_gerenciar': """
+        SELECT
+            r.id, cl.nome AS Cliente, c.modelo AS Veiculo, c.placa AS Placa,
+            r.data_inicio, r.data_fim, r.reserva_status, r.km_franquia, r.adiantamento,
+            r.carro_id, r.cliente_id, c.diaria, c.preco_km, c.km_atual, r.valor_multas, r.valor_danos, r.valor_outros
+        FROM reservas r
+        JOIN clientes cl ON r.cliente_id = cl.id
+        JOIN carros c ON r.carro_id = c.id
+        WHERE r.reserva_status IN ('Reservada', 'Locada')
+        ORDER BY r.data_inicio ASC
+    """,
+    'reservas_pendentes_entrega': """
+        SELECT
+            r.id, cl.nome, c.modelo, c.placa, c.km_atual, r.carro_id, r.cliente_id,
+            r.data_inicio, r.data_fim
+        FROM reservas r
+        JOIN carros c ON r.carro_id = c.id
+        JOIN clientes cl ON r.cliente_id = cl.id
+        WHERE r.status='Ativa' AND r.reserva_status='Reservada'
+        ORDER BY r.data_inicio ASC
+    """,
+    'reservas_pendentes_devolucao': """
+        SELECT
+            r.id, cl.nome, c.modelo, c.placa, r.km_saida, c.preco_km, c.diaria,
+            r.data_inicio, r.carro_id, r.cliente_id, r.km_franquia, r.adiantamento,
+            r.valor_multas, r.valor_danos, r.valor_outros
+        FROM reservas r
+        JOIN carros c ON r.carro_id = c.id
+        JOIN clientes cl ON r.cliente_id = cl.id
+        WHERE r.status='Ativa' AND r.reserva_status='Locada'
+    """,
+    # Reserva com preços do carro para o cálculo da devolução
+    'reserva_para_devolucao': """
+        SELECT r.*, c.preco_km, c.diaria
+        FROM reservas r
+        JOIN carros c ON r.carro_id = c.id
+        WHERE r.id = ?
+    """,
+    # Reservas Reservada/Locada que cruzam o período: (ultimo_dia, primeiro_dia)
+    'reservas_ativas_periodo': """
+        SELECT carro_id, data_inicio, data_fim, reserva_status
+        FROM reservas
+        WHERE (reserva_status = 'Reservada' OR reserva_status = 'Locada')
+        AND (data_inicio <= ? AND data_fim >= ?)
+    """,
+
+    # Reservas Reservada/Locada que terminam a partir da data, por carro e início: (primeiro_dia,)
+    'reservas_ativas_a_partir': """
+        SELECT carro_id, data_inicio, data_fim
+        FROM reservas
+        WHERE reserva_status IN ('Reservada', 'Locada')
+        AND data_fim >= ?
+        ORDER BY carro_id, data_inicio
+    """,
+
+    # Reservas entregues que cruzam o período (exportação de documentos): (ultimo_dia, primeiro_dia)
+    'exportacao_reservas_periodo': """
+        SELECT id FROM reservas
+        WHERE reserva_status IN ('Locada', 'Finalizada')
+        AND data_inicio <= ? AND data_fim >= ?
+        ORDER BY data_inicio, id
+    """,
+
+    # --- DASHBOARD ---
+    'dashboard_faturamento_periodo': """
+        SELECT SUM(valor_total) FROM reservas
+        WHERE status = 'Finalizada'
+        AND data_fim BETWEEN ? AND ?
+    """,
+    'dashboard_locados': """
+        SELECT
+            c.modelo, c.placa, r.data_fim, cl.nome as cliente
+        FROM reservas r
+        JOIN carros c ON r.carro_id = c.id
+        JOIN clientes cl ON r.cliente_id = cl.id
+        WHERE r.status = 'Ativa' AND r.reserva_status = 'Locada'
+    """,
+    'dashboard_reservados': """
+        SELECT
+            c.modelo, c.placa, r.data_inicio, cl.nome as cliente
+        FROM reservas r
+        JOIN carros c ON r.carro_id = c.id
+        JOIN clientes cl ON r.cliente_id = cl.id
+        WHERE r.status = 'Ativa' AND r.reserva_status = 'Reservada'
+    """,
+    # Devoluções previstas para a data informada
+    'dashboard_entradas_dia': """
+        SELECT c.modelo, c.placa, cl.nome AS cliente, r.data_fim
+        FROM reservas r
+        JOIN carros c ON r.carro_id = c.id
+        JOIN clientes cl ON r.cliente_id = cl.id
+        WHERE r.status = 'Ativa' AND r.reserva_status = 'Locada' AND date(r.data_fim) = date(?)
+    """,
+    # Entregas (saídas) previstas para a data informada
+    'dashboard_saidas_dia': """
+        SELECT c.modelo, c.placa, cl.nome AS cliente, r.data_inicio
+        FROM reservas r
+        JOIN carros c ON r.carro_id = c.id
+        JOIN clientes cl ON r.cliente_id = cl.id
+        WHERE r.reserva_status = 'Reservada' AND date(r.data_inicio) = date(?)
+    """,
+
+    # Reservas com retirada na data informada (contratos pré-gerados pelo agendador)
+    'agendador_saidas_previstas': """
+        SELECT id, cliente_id, carro_id, data_inicio, data_fim
+        FROM reservas
+        WHERE reserva_status = 'Reservada' AND date(data_inicio) = date(?)
+    """,
+
+    # --- INDICADORES DA FROTA ---
+    'frota_indicadores_carros': "SELECT id, km_atual, km_troca_oleo FROM carros",
+    'frota_indicadores_reservas': """
+        SELECT carro_id, data_inicio, data_fim, reserva_status, km_saida, km_volta, valor_total
+        FROM reservas
+        WHERE reserva_status IN ('Locada', 'Finalizada')
+    """,
+
+    # --- SIMULAÇÃO DA FROTA ---
+    'simulacao_reservas': """
+        SELECT c.modelo, r.data_inicio, r.data_fim
+        FROM reservas r JOIN carros c ON c.id = r.carro_id
+        WHERE r.reserva_status != 'Cancelada' AND r.data_inicio >= ?
+    """,
+    'simulacao_frota_modelos': "SELECT modelo, COUNT(*) FROM carros WHERE status NOT IN (?, ?) GROUP BY modelo",
+
+    # --- HISTÓRICO ---
+    # reservas_historico: reservas + arquivo morto (visão temporária, ver arquivo_reservas.criar_visao_historico)
+    'historico_meses': """
+        SELECT DISTINCT strftime('%Y-%m', data_fim) AS mes FROM reservas_historico
+        WHERE reserva_status='Finalizada' ORDER BY mes DESC
+    """,
+    'historico_periodo': """
+        SELECT
+            r.id AS Reserva_ID,
+            cl.nome AS Cliente,
+            c.modelo AS Veiculo,
+            c.placa AS Placa,
+            r.data_inicio AS Inicio,
+            r.data_fim AS Fim,
+            r.valor_total AS Total_Faturado,
+            -- Tratamento para evitar divisão por zero: se km_rodados for 0, retorna 0, senão calcula
+            CASE WHEN (r.km_volta - r.km_saida) = 0 THEN 0 ELSE (r.valor_total / (r.km_volta - r.km_saida)) END AS Lucro_por_km,
+            (r.km_volta - r.km_saida) AS Km_Rodados
+        FROM reservas_historico r
+        JOIN clientes cl ON r.cliente_id = cl.id
+        JOIN carros c ON r.carro_id = c.id
+        WHERE r.reserva_status = 'Finalizada'
+        AND r.data_fim BETWEEN ? AND ?
+    """,
+
+    # --- BUSCA DE RESERVAS (busca_reservas.py) ---
+    # Parâmetros nomeados, os mesmos em todas as variantes: carros, clientes e status
+    # (listas JSON, ou NULL sem o filtro), inicio_de, inicio_ate, cursor_data, cursor_id
+    # e limite. Cada variante exige o filtro que conduz o índice ('guia': o mais
+    # seletivo informado) e testa os outros com ':filtro IS NULL OR ...', que o
+    # planejador não usa para escolher índice. O cursor já inclui o limite do
+    # período do lado em que a página avança (ver busca_reservas._escolher_consulta),
+    # então é ele que delimita a leitura do índice
+    'busca_reservas_inicio_asc': """
+        SELECT id, carro_id, cliente_id, data_inicio, data_fim, reserva_status, km_franquia,
+               adiantamento, valor_total, valor_multas, valor_danos, valor_outros
+        FROM reservas
+        WHERE (:carros IS NULL OR carro_id IN (SELECT value FROM json_each(:carros)))
+          AND (:clientes IS NULL OR cliente_id IN (SELECT value FROM json_each(:clientes)))
+          AND (:status IS NULL OR reserva_status IN (SELECT value FROM json_each(:status)))
+          AND data_inicio <= :inicio_ate
+          AND (data_inicio, id) > (:cursor_data, :cursor_id)
+        ORDER BY data_inicio, id
+        LIMIT :limite
+    """,
+    'busca_reservas_inicio_desc': """
+        SELECT id, carro_id, cliente_id, data_inicio, data_fim, reserva_status, km_franquia,
+               adiantamento, valor_total, valor_multas, valor_danos, valor_outros
+        FROM reservas
+        WHERE (:carros IS NULL OR carro_id IN (SELECT value FROM json_each(:carros)))
+          AND (:clientes IS NULL OR cliente_id IN (SELECT value FROM json_each(:clientes)))
+          AND (:status IS NULL OR reserva_status IN (SELECT value FROM json_each(:status)))
+          AND data_inicio >= :inicio_de
+          AND (data_inicio, id) < (:cursor_data, :cursor_id)
+        ORDER BY data_inicio DESC, id DESC
+        LIMIT :limite
+    """,
+    'busca_reservas_clientes_asc': """
+        SELECT id, carro_id, cliente_id, data_inicio, data_fim, reserva_status, km_franquia,
+               adiantamento, valor_total, valor_multas, valor_danos, valor_outros
+        FROM reservas
+        WHERE cliente_id IN (SELECT value FROM json_each(:clientes))
+          AND (:carros IS NULL OR carro_id IN (SELECT value FROM json_each(:carros)))
+          AND (:status IS NULL OR reserva_status IN (SELECT value FROM json_each(:status)))
+          AND data_inicio <= :inicio_ate
+          AND (data_inicio, id) > (:cursor_data, :cursor_id)
+        ORDER BY data_inicio, id
+        LIMIT :limite
+    """,
+    'busca_reservas_clientes_desc': """
+        SELECT id, carro_id, cliente_id, data_inicio, data_fim, reserva_status, km_franquia,
+               adiantamento, valor_total, valor_multas, valor_danos, valor_outros
+        FROM reservas
+        WHERE cliente_id IN (SELECT value FROM json_each(:clientes))
+          AND (:carros IS NULL OR carro_id IN (SELECT value FROM json_each(:carros)))
+          AND (:status IS NULL OR reserva_status IN (SELECT value FROM json_each(:status)))
+          AND data_inicio >= :inicio_de
+          AND (data_inicio, id) < (:cursor_data, :cursor_id)
+        ORDER BY data_inicio DESC, id DESC
+        LIMIT :limite
+    """,
+    'busca_reservas_carros_asc': """
+        SELECT id, carro_id, cliente_id, data_inicio, data_fim, reserva_status, km_franquia,
+               adiantamento, valor_total, valor_multas, valor_danos, valor_outros
+        FROM reservas
+        WHERE carro_id IN (SELECT value FROM json_each(:carros))
+          AND (:clientes IS NULL OR cliente_id IN (SELECT value FROM json_each(:clientes)))
+          AND (:status IS NULL OR reserva_status IN (SELECT value FROM json_each(:status)))
+          AND data_inicio <= :inicio_ate
+          AND (data_inicio, id) > (:cursor_data, :cursor_id)
+        ORDER BY data_inicio, id
+        LIMIT :limite
+    """,
+    'busca_reservas_carros_desc': """
+        SELECT id, carro_id, cliente_id, data_inicio, data_fim, reserva_status, km_franquia,
+               adiantamento, valor_total, valor_multas, valor_danos, valor_outros
+        FROM reservas
+        WHERE carro_id IN (SELECT value FROM json_each(:carros))
+          AND (:clientes IS NULL OR cliente_id IN (SELECT value FROM json_each(:clientes)))
+          AND (:status IS NULL OR reserva_status IN (SELECT value FROM json_each(:status)))
+          AND data_inicio >= :inicio_de
+          AND (data_inicio, id) < (:cursor_data, :cursor_id)
+        ORDER BY data_inicio DESC, id DESC
+        LIMIT :limite
+    """,
+    'busca_reservas_status_asc': """
+        SELECT id, carro_id, cliente_id, data_inicio, data_fim, reserva_status, km_franquia,
+               adiantamento, valor_total, valor_multas, valor_danos, valor_outros
+        FROM reservas
+        WHERE reserva_status IN (SELECT value FROM json_each(:status))
+          AND (:carros IS NULL OR carro_id IN (SELECT value FROM json_each(:carros)))
+          AND (:clientes IS NULL OR cliente_id IN (SELECT value FROM json_each(:clientes)))
+          AND data_inicio <= :inicio_ate
+          AND (data_inicio, id) > (:cursor_data, :cursor_id)
+        ORDER BY data_inicio, id
+        LIMIT :limite
+    """,
+    'busca_reservas_status_desc': """
+        SELECT id, carro_id, cliente_id, data_inicio, data_fim, reserva_status, km_franquia,
+               adiantamento, valor_total, valor_multas, valor_danos, valor_outros
+        FROM reservas
+        WHERE reserva_status IN (SELECT value FROM json_each(:status))
+          AND (:carros IS NULL OR carro_id IN (SELECT value FROM json_each(:carros)))
+          AND (:clientes IS NULL OR cliente_id IN (SELECT value FROM json_each(:clientes)))
+          AND data_inicio >= :inicio_de
+          AND (data_inicio, id) < (:cursor_data, :cursor_id)
+        ORDER BY data_inicio DESC, id DESC
+        LIMIT :limite
+    """,
+    'busca_carros_por_placa': "SELECT id FROM carros WHERE REPLACE(REPLACE(UPPER(placa), '-', ''), ' ', '') LIKE ?",
+    'busca_clientes_por_cpf': "SELECT id FROM clientes WHERE cpf IN (?, ?)",
+    'busca_clientes_por_nome': "SELECT id FROM clientes WHERE nome LIKE ?",
+    'busca_clientes_dados': "SELECT id, nome, cpf FROM clientes WHERE id IN (SELECT value FROM json_each(?))",
+    'busca_carros_dados': "SELECT id, modelo, placa, diaria, preco_km, km_atual FROM carros WHERE id IN (SELECT value FROM json_each(?))",
+}
+
+
+def consulta(nome: str) -> str:
+    """Retorna o texto da consulta registrada no catálogo"""
+    return CONSULTAS[nome]
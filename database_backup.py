@@ -6,26 +6,37 @@ import os
 import shutil
 from datetime import datetime
 import streamlit as st
+from restauracao import restaurar, descrever_relatorio, ultima_restauracao
 
-def fazer_backup():
+DB_FILE = 'locadora_v2.db'
+
+def pasta_backups(db_file=DB_FILE):
+    """
+    Pasta de backups de um banco: 'backups' para o banco principal e
+    'backups/<nome do arquivo>' para os bancos das demais filiais
+    """
+    if os.path.normpath(db_file) == os.path.normpath(DB_FILE):
+        return 'backups'
+    return os.path.join('backups', os.path.splitext(os.path.basename(db_file))[0])
+
+def fazer_backup(db_origem=DB_FILE, backup_dir=None):
     """
     Cria um backup do banco de dados com timestamp
+    (em backup_dir; por padrão, a pasta de backups do banco)
     """
     try:
-        db_origem = 'locadora_v2.db'
-
         # Verifica se o banco existe
         if not os.path.exists(db_origem):
             return None, "Banco de dados não encontrado"
 
         # Cria diretório de backup se não existir
-        backup_dir = 'backups'
+        backup_dir = backup_dir or pasta_backups(db_origem)
         if not os.path.exists(backup_dir):
             os.makedirs(backup_dir)
 
         # Nome do arquivo de backup com timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_file = f'{backup_dir}/locadora_backup_{timestamp}.db'
+        backup_file = os.path.join(backup_dir, f'locadora_backup_{timestamp}.db')
 
         # Faz cópia do arquivo
         shutil.copy2(db_origem, backup_file)
@@ -35,36 +46,36 @@ def fazer_backup():
     except Exception as e:
         return None, f"Erro ao criar backup: {str(e)}"
 
-def restaurar_backup(backup_file):
+def restaurar_backup(backup_file, db_destino=DB_FILE, backup_dir=None):
     """
-    Restaura o banco de dados a partir de um backup
+    Restaura o banco de dados a partir de um backup, sem parar a aplicação
+    (preparação verificada e troca em uma transação; ver restauracao.py).
+    O banco atual é copiado para backup_dir (por padrão, a pasta de backups
+    do banco) antes da troca.
     """
     try:
-        db_destino = 'locadora_v2.db'
-
-        # Verifica se o backup existe
-        if not os.path.exists(backup_file):
-            return False, "Arquivo de backup não encontrado"
-
-        # Faz backup do banco atual antes de restaurar
-        if os.path.exists(db_destino):
-            backup_atual = fazer_backup()
-            if backup_atual[0]:
-                print(f"Backup automático criado antes da restauração: {backup_atual[0]}")
-
-        # Restaura o backup
-        shutil.copy2(backup_file, db_destino)
+        backup_dir = backup_dir or pasta_backups(db_destino)
+        if not os.path.exists(backup_dir):
+            os.makedirs(backup_dir)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        copia_seguranca = os.path.join(backup_dir, f'locadora_backup_{timestamp}.db')
+        if os.path.exists(copia_seguranca):
+            copia_seguranca = None  # Backup do mesmo segundo: é o estado atual
 
-        return True, f"Banco restaurado com sucesso de: {backup_file}"
+        sucesso, resultado = restaurar(backup_file, db_destino, copia_seguranca)
+        if not sucesso:
+            return False, resultado
+        if resultado.get('copia_seguranca'):
+            print(f"Backup automático criado antes da restauração: {resultado['copia_seguranca']}")
+        return True, f"Banco restaurado de {backup_file} em {descrever_relatorio(resultado)}"
 
     except Exception as e:
         return False, f"Erro ao restaurar backup: {str(e)}"
 
-def listar_backups():
+def listar_backups(backup_dir='backups'):
     """
     Lista todos os backups disponíveis
     """
-    backup_dir = 'backups'
     if not os.path.exists(backup_dir):
         return []
 
@@ -90,11 +101,11 @@ def listar_backups():
     backups.sort(key=lambda x: x['datetime'], reverse=True)
     return backups
 
-def limpar_backups_antigos(manter=5):
+def limpar_backups_antigos(manter=5, backup_dir='backups'):
     """
     Remove backups antigos, mantendo apenas os mais recentes
     """
-    backups = listar_backups()
+    backups = listar_backups(backup_dir)
 
     if len(backups) <= manter:
         return 0, "Nenhum backup removido"
@@ -111,12 +122,12 @@ def limpar_backups_antigos(manter=5):
 
     return removidos, f"{removidos} backup(s) antigo(s) removido(s)"
 
-def obter_estatisticas_banco():
+def obter_estatisticas_banco(db_file=DB_FILE):
     """
     Retorna estatísticas básicas do banco de dados
     """
     try:
-        conn = sqlite3.connect('locadora_v2.db')
+        conn = sqlite3.connect(db_file)
         c = conn.cursor()
 
         # Conta registros em cada tabela
@@ -134,18 +145,19 @@ def obter_estatisticas_banco():
         return {"erro": str(e)}
 
 # Interface Streamlit para gerenciamento de backups
-def interface_backup():
+def interface_backup(db_file=DB_FILE):
     """
-    Interface do Streamlit para gerenciar backups
+    Interface do Streamlit para gerenciar backups (do banco informado)
     """
     st.header("💾 Gerenciamento de Backup")
+    backup_dir = pasta_backups(db_file)
 
     col1, col2, col3 = st.columns(3)
 
     with col1:
         if st.button("📦 Criar Backup Agora", type="primary"):
             with st.spinner("Criando backup..."):
-                backup_file, mensagem = fazer_backup()
+                backup_file, mensagem = fazer_backup(db_file)
                 if backup_file:
                     st.success(mensagem)
                 else:
@@ -153,23 +165,29 @@ def interface_backup():
 
     with col2:
         if st.button("🧹 Limpar Backups Antigos"):
-            removidos, mensagem = limpar_backups_antigos()
+            removidos, mensagem = limpar_backups_antigos(backup_dir=backup_dir)
             if removidos > 0:
                 st.success(mensagem)
             else:
                 st.info(mensagem)
 
     with col3:
-        stats = obter_estatisticas_banco()
+        stats = obter_estatisticas_banco(db_file)
         if "erro" not in stats:
             st.metric("Total de Registros",
                      sum(stats.values()))
         else:
             st.error("Erro ao obter estatísticas")
 
+    ultima = ultima_restauracao(db_file)
+    if ultima:
+        restaurado_em = datetime.fromisoformat(ultima['restaurado_em']).strftime('%d/%m/%Y %H:%M')
+        st.caption(f"🔄 Última restauração: {os.path.basename(ultima['backup'])} em {restaurado_em}, "
+                   f"{descrever_relatorio(ultima)}")
+
     # Lista de backups disponíveis
     st.subheader("Backups Disponíveis")
-    backups = listar_backups()
+    backups = listar_backups(backup_dir)
 
     if backups:
         for backup in backups[:10]:  # Mostra apenas os 10 mais recentes
@@ -188,7 +206,7 @@ def interface_backup():
             with col4:
                 if st.button("🔄 Restaurar", key=f"restore_{backup['filename']}"):
                     with st.spinner("Restaurando backup..."):
-                        sucesso, mensagem = restaurar_backup(backup['file'])
+                        sucesso, mensagem = restaurar_backup(backup['file'], db_file)
                         if sucesso:
                             st.success(mensagem)
                             st.rerun()
@@ -0,0 +1,80 @@
+"""
+Estrutura do banco (tabelas principais) sem dependência do Streamlit
+Usada pela inicialização do app (init_db.py, com as mensagens na tela) e pela
+API no startup (api.py), para qualquer banco de filial.
+"""
+import sqlite3
+
+DB_FILE = 'locadora_v2.db'
+
+
+def criar_estrutura(db_file=DB_FILE):
+    """
+    Cria as tabelas principais que ainda não existirem e os triggers do
+    change_log (caches das réplicas)
+    """
+    conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES)
+    try:
+        c = conn.cursor()
+
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS carros (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                modelo TEXT,
+                placa TEXT UNIQUE,
+                cor TEXT,
+                diaria REAL,
+                preco_km REAL,
+                km_atual INTEGER,
+                status TEXT DEFAULT 'Disponível',
+                numero_chassi TEXT,
+                numero_renavam TEXT,
+                ano_veiculo INTEGER,
+                km_troca_oleo INTEGER DEFAULT 10000
+            )
+        ''')
+
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS clientes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT,
+                cpf TEXT UNIQUE,
+                cnh TEXT,
+                validade_cnh DATE,
+                telefone TEXT,
+                endereco TEXT,
+                observacoes TEXT,
+                status TEXT DEFAULT 'Ativo'
+            )
+        ''')
+
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS reservas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                carro_id INTEGER,
+                cliente_id INTEGER,
+                data_inicio DATE,
+                data_fim DATE,
+                reserva_status TEXT DEFAULT 'Reservada',
+                status TEXT,
+                custo_lavagem REAL DEFAULT 0,
+                valor_total REAL DEFAULT 0,
+                km_saida INTEGER,
+                km_volta INTEGER,
+                km_franquia INTEGER DEFAULT 300,
+                adiantamento REAL DEFAULT 0.0,
+                valor_multas REAL DEFAULT 0.0,
+                valor_danos REAL DEFAULT 0.0,
+                valor_outros REAL DEFAULT 0.0,
+                FOREIGN KEY(carro_id) REFERENCES carros(id),
+                FOREIGN KEY(cliente_id) REFERENCES clientes(id)
+            )
+        ''')
+
+        conn.commit()
+    finally:
+        conn.close()
+
+    # Triggers de notificação de mudanças para os caches das réplicas
+    from cache_sync import instalar_change_log
+    instalar_change_log(db_file)
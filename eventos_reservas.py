@@ -0,0 +1,472 @@
+"""
+Livro de eventos das reservas (somente inclusão) e projeções incrementais
+Cada fluxo de operacoes (reserva, entrega, edição, cancelamento e devolução)
+grava um evento em reserva_eventos na mesma transação em que altera a reserva:
+o livro nunca diverge das colunas de reservas e guarda quem fez o quê e quando.
+Triggers impedem UPDATE e DELETE no livro.
+
+As projeções (estado das reservas, ocupação por dia e faturamento mensal)
+consomem os eventos a partir do último evento aplicado, gravado em
+projecoes_offsets na mesma transação das tabelas da projeção: a atualização
+custa O(eventos novos), e uma projeção pode ser refeita do zero a qualquer hora.
+
+Ao criar o livro em um banco que já tem reservas, o estado atual de cada uma
+é importado como eventos (dados com 'importado': true). Reservas que já estavam
+no arquivo morto ficam fora do livro.
+
+Uso pela linha de comando:
+    python eventos_reservas.py                     # atualiza as projeções
+    python eventos_reservas.py --reconstruir       # refaz as projeções a partir do evento 1
+    python eventos_reservas.py --reserva 42        # linha do tempo de uma reserva
+"""
+import argparse
+import json
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List
+from conexao import ao_restaurar, obter_pool
+
+DB_FILE = 'locadora_v2.db'
+
+TIPOS_EVENTO = ('Reservada', 'Entregue', 'Editada', 'Cancelada', 'Devolvida')
+
+# Eventos aplicados por transação ao atualizar uma projeção
+LOTE_EVENTOS = 5000
+
+
+def _json_padrao(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def _data(valor) -> date:
+    return date.fromisoformat(str(valor)[:10])
+
+
+# --- LIVRO ---
+
+def _instalar_livro(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reserva_eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reserva_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            ocorrido_em TIMESTAMP NOT NULL,
+            usuario TEXT,
+            dados TEXT NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reserva_eventos_reserva ON reserva_eventos (reserva_id, id)")
+    for operacao in ('UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_reserva_eventos_sem_{operacao.lower()}
+            BEFORE {operacao} ON reserva_eventos
+            BEGIN
+                SELECT RAISE(ABORT, 'reserva_eventos é somente inclusão');
+            END
+        ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS projecoes_offsets (
+            nome TEXT PRIMARY KEY,
+            ultimo_evento INTEGER NOT NULL DEFAULT 0,
+            atualizado_em TIMESTAMP
+        )
+    ''')
+
+
+def registrar_evento(conn, reserva_id: int, tipo: str, dados: dict, usuario: str = None,
+                     ocorrido_em: datetime = None) -> int:
+    """Grava um evento na transação aberta em conn (a mesma da alteração da reserva). Retorna o id do evento."""
+    if tipo not in TIPOS_EVENTO:
+        raise ValueError(f"Tipo de evento desconhecido: {tipo}")
+    cursor = conn.execute(
+        "INSERT INTO reserva_eventos (reserva_id, tipo, ocorrido_em, usuario, dados) VALUES (?, ?, ?, ?, ?)",
+        (int(reserva_id), tipo, ocorrido_em or datetime.now(), usuario,
+         json.dumps(dados, default=_json_padrao, ensure_ascii=False))
+    )
+    return cursor.lastrowid
+
+
+def _eventos_importados(reserva: dict) -> list:
+    """Eventos (tipo, ocorrido_em, dados) que levam ao estado atual de uma reserva sem histórico"""
+    inicio = reserva.get('data_inicio')
+    eventos = [('Reservada', inicio, {
+        campo: reserva.get(campo) for campo in ('carro_id', 'cliente_id', 'data_inicio', 'data_fim',
+                                                 'km_franquia', 'adiantamento')
+    })]
+    status = reserva.get('reserva_status')
+    if status in ('Locada', 'Finalizada'):
+        eventos.append(('Entregue', inicio, {'carro_id': reserva.get('carro_id'), 'data_inicio': inicio,
+                                             'km_saida': reserva.get('km_saida')}))
+    if status == 'Finalizada':
+        eventos.append(('Devolvida', reserva.get('data_fim'), {
+            'data_devolucao': reserva.get('data_fim'), 'km_volta': reserva.get('km_volta'),
+            'valor_total': reserva.get('valor_total') or 0.0,
+        }))
+    elif status == 'Cancelada':
+        eventos.append(('Cancelada', inicio, {'status_anterior': 'Reservada'}))
+    return [(tipo, datetime.combine(_data(quando), datetime.min.time()) if quando else datetime.now(),
+             dict(dados, importado=True)) for tipo, quando, dados in eventos]
+
+
+def importar_reservas(conn) -> int:
+    """Importa como eventos o estado atual das reservas que ainda não têm eventos. Retorna quantas reservas."""
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    reservas = cursor.execute('''
+        SELECT * FROM reservas r
+        WHERE NOT EXISTS (SELECT 1 FROM reserva_eventos e WHERE e.reserva_id = r.id)
+        ORDER BY r.id
+    ''').fetchall()
+    for reserva in reservas:
+        reserva = dict(reserva)
+        for tipo, ocorrido_em, dados in _eventos_importados(reserva):
+            registrar_evento(conn, reserva['id'], tipo, dados, None, ocorrido_em)
+    return len(reservas)
+
+
+_livros = set()
+_livros_lock = threading.Lock()
+
+
+def garantir_livro(db_file=DB_FILE):
+    """
+    Cria o livro, as tabelas de offset e as das projeções uma vez por processo e
+    por banco. Na criação, importa o estado atual das reservas existentes.
+    """
+    with _livros_lock:
+        if db_file in _livros:
+            return
+        conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            tabelas = {nome for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            _instalar_livro(conn)
+            for projecao in PROJECOES.values():
+                projecao.instalar(conn)
+            if 'reserva_eventos' not in tabelas and 'reservas' in tabelas:
+                importar_reservas(conn)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        _livros.add(db_file)
+
+
+@ao_restaurar
+def _esquecer_livro(db_file):
+    """O banco restaurado pode ser de antes do livro (a criação importa as reservas dele)"""
+    with _livros_lock:
+        _livros.discard(db_file)
+
+
+def _evento(linha) -> dict:
+    evento = dict(linha)
+    evento['dados'] = json.loads(evento['dados'])
+    return evento
+
+
+def eventos_da_reserva(reserva_id: int, db_file=DB_FILE) -> List[dict]:
+    """Linha do tempo de uma reserva: [{'id', 'tipo', 'ocorrido_em', 'usuario', 'dados'}]"""
+    garantir_livro(db_file)
+    with obter_pool(db_file).conexao() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        linhas = cursor.execute('''
+            SELECT id, reserva_id, tipo, ocorrido_em, usuario, dados FROM reserva_eventos
+            WHERE reserva_id = ? ORDER BY id
+        ''', (int(reserva_id),)).fetchall()
+    return [_evento(linha) for linha in linhas]
+
+
+# --- PROJEÇÕES ---
+
+class Projecao:
+    """Projeção alimentada pelos eventos: tabelas próprias e um aplicador por tipo de evento"""
+    nome = ''
+    tabelas = {}  # nome da tabela -> CREATE TABLE
+
+    def instalar(self, conn):
+        for ddl in self.tabelas.values():
+            conn.execute(ddl)
+
+    def limpar(self, conn):
+        for tabela in self.tabelas:
+            conn.execute(f"DELETE FROM {tabela}")
+
+    def aplicar(self, conn, evento: dict):
+        aplicador = getattr(self, f"_{evento['tipo'].lower()}", None)
+        if aplicador:
+            aplicador(conn, evento, evento['dados'])
+
+
+class ProjecaoReservas(Projecao):
+    """Estado atual de cada reserva (contadores do painel sem varrer reservas)"""
+    nome = 'reservas'
+    tabelas = {'proj_reservas': '''
+        CREATE TABLE IF NOT EXISTS proj_reservas (
+            reserva_id INTEGER PRIMARY KEY,
+            carro_id INTEGER,
+            cliente_id INTEGER,
+            data_inicio DATE,
+            data_fim DATE,
+            data_devolucao DATE,
+            estado TEXT NOT NULL,
+            valor_total REAL DEFAULT 0.0,
+            atualizado_em TIMESTAMP
+        )
+    '''}
+
+    def _reservada(self, conn, evento, dados):
+        conn.execute('''
+            INSERT OR REPLACE INTO proj_reservas (reserva_id, carro_id, cliente_id, data_inicio, data_fim, estado, atualizado_em)
+            VALUES (?, ?, ?, ?, ?, 'Reservada', ?)
+        ''', (evento['reserva_id'], dados.get('carro_id'), dados.get('cliente_id'), dados.get('data_inicio'),
+              dados.get('data_fim'), evento['ocorrido_em']))
+
+    def _entregue(self, conn, evento, dados):
+        conn.execute('''
+            UPDATE proj_reservas SET estado = 'Locada', data_inicio = COALESCE(?, data_inicio), atualizado_em = ?
+            WHERE reserva_id = ?
+        ''', (dados.get('data_inicio'), evento['ocorrido_em'], evento['reserva_id']))
+
+    def _editada(self, conn, evento, dados):
+        depois = dados.get('depois', {})
+        conn.execute('''
+            UPDATE proj_reservas SET carro_id = COALESCE(?, carro_id), data_inicio = COALESCE(?, data_inicio),
+                data_fim = COALESCE(?, data_fim), atualizado_em = ?
+            WHERE reserva_id = ?
+        ''', (depois.get('carro_id'), depois.get('data_inicio'), depois.get('data_fim'), evento['ocorrido_em'],
+              evento['reserva_id']))
+
+    def _cancelada(self, conn, evento, dados):
+        conn.execute("UPDATE proj_reservas SET estado = 'Cancelada', atualizado_em = ? WHERE reserva_id = ?",
+                     (evento['ocorrido_em'], evento['reserva_id']))
+
+    def _devolvida(self, conn, evento, dados):
+        conn.execute('''
+            UPDATE proj_reservas SET estado = 'Finalizada', data_devolucao = ?, valor_total = ?, atualizado_em = ?
+            WHERE reserva_id = ?
+        ''', (dados.get('data_devolucao'), dados.get('valor_total') or 0.0, evento['ocorrido_em'], evento['reserva_id']))
+
+
+class ProjecaoOcupacao(Projecao):
+    """
+    Reservas que ocupam cada dia (data_inicio até data_fim inclusive, a regra das
+    reservas; após a devolução, até a data real). Cada evento só mexe nos dias
+    que entraram ou saíram do período da reserva.
+    """
+    nome = 'ocupacao'
+    tabelas = {
+        'proj_ocupacao': '''
+            CREATE TABLE IF NOT EXISTS proj_ocupacao (
+                dia DATE PRIMARY KEY,
+                reservas INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        ''',
+        'proj_ocupacao_periodos': '''
+            CREATE TABLE IF NOT EXISTS proj_ocupacao_periodos (
+                reserva_id INTEGER PRIMARY KEY,
+                data_inicio DATE NOT NULL,
+                data_fim DATE NOT NULL
+            )
+        ''',
+    }
+
+    @staticmethod
+    def _dias(inicio, fim) -> set:
+        if inicio is None or fim is None:
+            return set()
+        inicio, fim = _data(inicio), _data(fim)
+        return {inicio + timedelta(days=d) for d in range((fim - inicio).days + 1)}
+
+    def aplicar(self, conn, evento: dict):
+        dados = evento['dados']
+        atual = conn.execute("SELECT data_inicio, data_fim FROM proj_ocupacao_periodos WHERE reserva_id = ?",
+                             (evento['reserva_id'],)).fetchone()
+        inicio, fim = atual if atual else (None, None)
+
+        tipo = evento['tipo']
+        if tipo == 'Reservada':
+            novo = (dados.get('data_inicio'), dados.get('data_fim'))
+        elif tipo == 'Entregue':
+            novo = (dados.get('data_inicio') or inicio, fim)
+        elif tipo == 'Editada':
+            depois = dados.get('depois', {})
+            novo = (depois.get('data_inicio', inicio), depois.get('data_fim', fim))
+        elif tipo == 'Devolvida':
+            novo = (inicio, dados.get('data_devolucao') or fim)
+        else:
+            novo = (None, None)
+
+        antes, depois = self._dias(inicio, fim), self._dias(*novo)
+        saem, entram = sorted(antes - depois), sorted(depois - antes)
+        if saem:
+            conn.executemany("UPDATE proj_ocupacao SET reservas = reservas - 1 WHERE dia = ?", [(d,) for d in saem])
+        if entram:
+            conn.executemany('''
+                INSERT INTO proj_ocupacao (dia, reservas) VALUES (?, 1)
+                ON CONFLICT (dia) DO UPDATE SET reservas = reservas + 1
+            ''', [(d,) for d in entram])
+
+        if None in novo or not depois:
+            conn.execute("DELETE FROM proj_ocupacao_periodos WHERE reserva_id = ?", (evento['reserva_id'],))
+        else:
+            conn.execute("INSERT OR REPLACE INTO proj_ocupacao_periodos (reserva_id, data_inicio, data_fim) VALUES (?, ?, ?)",
+                         (evento['reserva_id'], _data(novo[0]), _data(novo[1])))
+
+
+class ProjecaoFaturamento(Projecao):
+    """Reservas, cancelamentos, devoluções e receita por mês (AAAA-MM)"""
+    nome = 'faturamento_mensal'
+    tabelas = {'proj_faturamento_mensal': '''
+        CREATE TABLE IF NOT EXISTS proj_faturamento_mensal (
+            mes TEXT PRIMARY KEY,
+            reservas INTEGER NOT NULL DEFAULT 0,
+            cancelamentos INTEGER NOT NULL DEFAULT 0,
+            devolucoes INTEGER NOT NULL DEFAULT 0,
+            receita REAL NOT NULL DEFAULT 0.0
+        ) WITHOUT ROWID
+    '''}
+
+    @staticmethod
+    def _somar(conn, mes, reservas=0, cancelamentos=0, devolucoes=0, receita=0.0):
+        conn.execute('''
+            INSERT INTO proj_faturamento_mensal (mes, reservas, cancelamentos, devolucoes, receita) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (mes) DO UPDATE SET reservas = reservas + excluded.reservas,
+                cancelamentos = cancelamentos + excluded.cancelamentos,
+                devolucoes = devolucoes + excluded.devolucoes, receita = receita + excluded.receita
+        ''', (mes, reservas, cancelamentos, devolucoes, receita))
+
+    def _reservada(self, conn, evento, dados):
+        self._somar(conn, str(evento['ocorrido_em'])[:7], reservas=1)
+
+    def _cancelada(self, conn, evento, dados):
+        self._somar(conn, str(evento['ocorrido_em'])[:7], cancelamentos=1)
+
+    def _devolvida(self, conn, evento, dados):
+        mes = str(dados.get('data_devolucao') or evento['ocorrido_em'])[:7]
+        self._somar(conn, mes, devolucoes=1, receita=float(dados.get('valor_total') or 0.0))
+
+
+PROJECOES = {projecao.nome: projecao for projecao in (ProjecaoReservas(), ProjecaoOcupacao(), ProjecaoFaturamento())}
+
+
+def _atualizar_projecao(conn, projecao: Projecao, lote: int) -> int:
+    """Aplica um lote de eventos novos na transação aberta. Retorna quantos foram aplicados."""
+    linha = conn.execute("SELECT ultimo_evento FROM projecoes_offsets WHERE nome = ?", (projecao.nome,)).fetchone()
+    ultimo = linha[0] if linha else 0
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    eventos = cursor.execute('''
+        SELECT id, reserva_id, tipo, ocorrido_em, usuario, dados FROM reserva_eventos
+        WHERE id > ? ORDER BY id LIMIT ?
+    ''', (ultimo, lote)).fetchall()
+    for linha in eventos:
+        projecao.aplicar(conn, _evento(linha))
+    if eventos:
+        conn.execute('''
+            INSERT INTO projecoes_offsets (nome, ultimo_evento, atualizado_em) VALUES (?, ?, ?)
+            ON CONFLICT (nome) DO UPDATE SET ultimo_evento = excluded.ultimo_evento, atualizado_em = excluded.atualizado_em
+        ''', (projecao.nome, eventos[-1]['id'], datetime.now()))
+    return len(eventos)
+
+
+def _pendentes(conn, nomes) -> list:
+    """Projeções com offset anterior ao último evento do livro (só leitura, sem lock de escrita)"""
+    ultimo_evento = conn.execute("SELECT COALESCE(MAX(id), 0) FROM reserva_eventos").fetchone()[0]
+    offsets = dict(conn.execute("SELECT nome, ultimo_evento FROM projecoes_offsets").fetchall())
+    return [nome for nome in nomes if offsets.get(nome, 0) < ultimo_evento]
+
+
+def atualizar_projecoes(db_file=DB_FILE, nomes: Iterable[str] = None, lote: int = LOTE_EVENTOS) -> Dict[str, int]:
+    """
+    Aplica às projeções os eventos posteriores ao offset de cada uma, em lotes
+    (cada lote e o novo offset na mesma transação). Retorna {projeção: eventos aplicados}.
+    Sem eventos novos é só uma leitura: as páginas que leem projeções não
+    disputam o lock de escrita com as reservas.
+    """
+    garantir_livro(db_file)
+    nomes = list(nomes or PROJECOES)
+    aplicados = dict.fromkeys(nomes, 0)
+    with obter_pool(db_file).conexao() as conn:
+        for nome in _pendentes(conn, nomes):
+            projecao = PROJECOES[nome]
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    quantidade = _atualizar_projecao(conn, projecao, lote)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                aplicados[nome] += quantidade
+                if quantidade < lote:
+                    break
+    return aplicados
+
+
+def reconstruir_projecoes(db_file=DB_FILE, nomes: Iterable[str] = None) -> Dict[str, int]:
+    """Apaga as projeções e as refaz a partir do primeiro evento"""
+    garantir_livro(db_file)
+    nomes = list(nomes or PROJECOES)
+    with obter_pool(db_file).conexao() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for nome in nomes:
+            PROJECOES[nome].instalar(conn)
+            PROJECOES[nome].limpar(conn)
+            conn.execute("DELETE FROM projecoes_offsets WHERE nome = ?", (nome,))
+        conn.commit()
+    return atualizar_projecoes(db_file, nomes)
+
+
+def reservas_por_estado(db_file=DB_FILE) -> Dict[str, int]:
+    """{estado: quantidade} da projeção de reservas (atualizada antes da leitura)"""
+    atualizar_projecoes(db_file, ['reservas'])
+    with obter_pool(db_file).conexao() as conn:
+        return dict(conn.execute("SELECT estado, COUNT(*) FROM proj_reservas GROUP BY estado").fetchall())
+
+
+def ocupacao_por_dia(inicio: date, fim: date, db_file=DB_FILE) -> Dict[date, int]:
+    """{dia: reservas que ocupam o dia} de inicio a fim (dias sem reservas com 0)"""
+    atualizar_projecoes(db_file, ['ocupacao'])
+    with obter_pool(db_file).conexao() as conn:
+        ocupados = dict(conn.execute("SELECT dia, reservas FROM proj_ocupacao WHERE dia BETWEEN ? AND ?",
+                                     (inicio, fim)).fetchall())
+    dias = (inicio + timedelta(days=d) for d in range((fim - inicio).days + 1))
+    return {dia: ocupados.get(dia, 0) for dia in dias}
+
+
+def movimento_mensal(db_file=DB_FILE, meses: int = 12) -> List[dict]:
+    """Últimos meses da projeção de faturamento: [{'mes', 'reservas', 'cancelamentos', 'devolucoes', 'receita'}]"""
+    atualizar_projecoes(db_file, ['faturamento_mensal'])
+    with obter_pool(db_file).conexao() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        linhas = cursor.execute("SELECT * FROM proj_faturamento_mensal ORDER BY mes DESC LIMIT ?", (meses,)).fetchall()
+    return [dict(linha) for linha in linhas]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Livro de eventos das reservas e projeções")
+    parser.add_argument('--reconstruir', action='store_true', help="Refaz as projeções a partir do primeiro evento")
+    parser.add_argument('--importar', action='store_true', help="Importa o estado das reservas ainda sem eventos")
+    parser.add_argument('--reserva', type=int, help="Mostra a linha do tempo de uma reserva")
+    parser.add_argument('--banco', default=DB_FILE)
+    args = parser.parse_args()
+
+    if args.reserva:
+        for evento in eventos_da_reserva(args.reserva, args.banco):
+            print(f"#{evento['id']} {evento['ocorrido_em']} {evento['tipo']:<10} {evento['usuario'] or '-':<12} "
+                  f"{json.dumps(evento['dados'], ensure_ascii=False)}")
+    else:
+        if args.importar:
+            garantir_livro(args.banco)
+            with obter_pool(args.banco).conexao() as conexao:
+                conexao.execute("BEGIN IMMEDIATE")
+                print(f"{importar_reservas(conexao)} reserva(s) importada(s) para o livro")
+                conexao.commit()
+        aplicados = (reconstruir_projecoes if args.reconstruir else atualizar_projecoes)(args.banco)
+        for nome, quantidade in aplicados.items():
+            print(f"{nome}: {quantidade} evento(s) aplicado(s)")
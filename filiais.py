@@ -0,0 +1,101 @@
+"""
+Roteamento por filial: um banco SQLite (shard) por filial
+Carros, clientes e reservas de cada filial ficam em um arquivo próprio, então
+as gravações de uma filial não disputam o banco das outras e cada arquivo tem
+seus próprios backups. Usuários, sessões e auditoria ficam no banco de
+autenticação, compartilhado por todas as filiais.
+
+Configuração (variáveis de ambiente):
+    FILIAIS=matriz:locadora_v2.db,centro:locadora_centro.db
+    BANCO_AUTENTICACAO=locadora_v2.db
+
+Sem FILIAIS há uma única filial ('matriz') no banco locadora_v2.db. A primeira
+filial da lista é a padrão (usuários sem filial cadastrada).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+import pandas as pd
+
+BANCO_AUTENTICACAO = os.environ.get('BANCO_AUTENTICACAO', 'locadora_v2.db')
+
+
+def ler_configuracao(texto: str) -> Dict[str, str]:
+    """'matriz:locadora_v2.db,centro:locadora_centro.db' -> {'matriz': 'locadora_v2.db', ...}"""
+    filiais = {}
+    for item in texto.split(','):
+        if not item.strip():
+            continue
+        nome, separador, banco = item.partition(':')
+        nome, banco = nome.strip(), banco.strip()
+        if not separador or not nome or not banco:
+            raise ValueError(f"Filial mal configurada (use nome:arquivo.db): {item!r}")
+        if nome in filiais:
+            raise ValueError(f"Filial repetida: {nome}")
+        if banco in filiais.values():
+            raise ValueError(f"Banco usado por mais de uma filial: {banco}")
+        filiais[nome] = banco
+    return filiais or {'matriz': 'locadora_v2.db'}
+
+
+FILIAIS = ler_configuracao(os.environ.get('FILIAIS', ''))
+FILIAL_PADRAO = next(iter(FILIAIS))
+
+
+def listar_filiais() -> List[str]:
+    return list(FILIAIS)
+
+
+def banco_da_filial(filial: str) -> str:
+    try:
+        return FILIAIS[filial]
+    except KeyError:
+        raise ValueError(f"Filial desconhecida: {filial}") from None
+
+
+def filial_do_usuario(usuario: dict) -> str:
+    """Filial cadastrada do usuário (a padrão, se ele não tiver uma)"""
+    return (usuario or {}).get('filial') or FILIAL_PADRAO
+
+
+def bancos_das_filiais() -> List[str]:
+    return list(FILIAIS.values())
+
+
+def executar_em_filiais(funcao: Callable, filiais: List[str] = None) -> Tuple[dict, dict]:
+    """
+    Executa funcao(db_file) no banco de cada filial, em paralelo (o sqlite3 libera
+    o GIL durante as consultas). Retorna ({filial: resultado}, {filial: erro}).
+    """
+    filiais = filiais or listar_filiais()
+    resultados, erros = {}, {}
+    with ThreadPoolExecutor(max_workers=len(filiais), thread_name_prefix='filial') as executor:
+        futuros = {filial: executor.submit(funcao, banco_da_filial(filial)) for filial in filiais}
+        for filial, futuro in futuros.items():
+            try:
+                resultados[filial] = futuro.result()
+            except Exception as e:
+                erros[filial] = str(e)
+    return resultados, erros
+
+
+def consultar_filiais(consulta: str, params=(), filiais: List[str] = None) -> Tuple[pd.DataFrame, dict]:
+    """
+    Executa uma consulta do catálogo na cópia analítica de cada filial e junta os
+    resultados, com a coluna 'Filial' na frente. Retorna (DataFrame, {filial: erro}).
+    """
+    from snapshot_analitico import consultar, garantir_snapshot
+
+    def consultar_filial(db_file):
+        try:
+            garantir_snapshot(db_file)
+            return consultar(consulta, params, db_file)
+        except Exception:
+            return consultar(consulta, params, db_file, copia=False)
+
+    resultados, erros = executar_em_filiais(consultar_filial, filiais)
+    partes = [df.assign(Filial=filial) for filial, df in resultados.items()]
+    if not partes:
+        return pd.DataFrame(), erros
+    combinado = pd.concat(partes, ignore_index=True)
+    return combinado[['Filial'] + [coluna for coluna in combinado.columns if coluna != 'Filial']], erros
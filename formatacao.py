@@ -0,0 +1,87 @@
+"""
+Formatação de valores para exibição (moeda brasileira e datas dd/mm/aaaa)
+As funções de Series formatam apenas os valores distintos da coluna e
+espalham o resultado pelos códigos de pd.factorize: diárias, custos e datas
+se repetem muito, então o custo deixa de crescer com o número de linhas.
+Formate só a página visível da tabela (ver pagina()).
+"""
+from typing import Iterable
+import numpy as np
+import pandas as pd
+
+FORMATO_DATA = '%d/%m/%Y'
+
+# Linhas exibidas por página nas tabelas longas
+LINHAS_POR_PAGINA = 50
+
+
+def formatar_moeda(valor) -> str:
+    """
+    Formata um valor float para a moeda brasileira (R$ 0.000,00).
+
+    Args:
+        valor: Valor numérico a ser formatado
+
+    Returns:
+        String formatada no padrão brasileiro (R$ 1.234,56)
+    """
+    if valor is None:
+        valor = 0.0
+    # Garante que o separador decimal seja vírgula e o milhar seja ponto
+    return f"R$ {valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _por_valores_distintos(serie: pd.Series, formatar, vazio) -> pd.Series:
+    """Aplica formatar(valores distintos) e replica o resultado para todas as linhas"""
+    codigos, distintos = pd.factorize(serie)
+    # O código -1 (valor ausente) indexa o último elemento: o texto de vazio
+    textos = np.array(list(formatar(distintos)) + [vazio], dtype=object)
+    return pd.Series(textos[codigos], index=serie.index, name=serie.name)
+
+
+def moeda(serie: pd.Series, simbolo: bool = True) -> pd.Series:
+    """
+    Formata uma coluna numérica como moeda brasileira.
+    Valores ausentes (NULL no banco) são exibidos como zero, como em formatar_moeda(None).
+    """
+    inicio = 0 if simbolo else len("R$ ")
+
+    def formatar(distintos):
+        return (formatar_moeda(float(valor))[inicio:] for valor in distintos)
+
+    return _por_valores_distintos(serie, formatar, formatar_moeda(None)[inicio:])
+
+
+def datas(serie: pd.Series, formato: str = FORMATO_DATA, vazio=None) -> pd.Series:
+    """Formata uma coluna de datas (date, datetime ou texto AAAA-MM-DD) no formato informado"""
+    def formatar(distintos):
+        convertidas = pd.to_datetime(pd.Series(distintos), errors='coerce')
+        return convertidas.dt.strftime(formato).where(convertidas.notna(), vazio)
+
+    return _por_valores_distintos(serie, formatar, vazio)
+
+
+def formatar_tabela(df: pd.DataFrame, colunas_moeda: Iterable[str] = (), colunas_data: Iterable[str] = (),
+                    colunas_valor: Iterable[str] = (), formato_data: str = FORMATO_DATA) -> pd.DataFrame:
+    """
+    Cópia do DataFrame com as colunas formatadas para exibição.
+    colunas_valor: moeda sem o prefixo "R$ " (para colunas com "(R$)" no título)
+    """
+    formatado = df.copy()
+    for coluna in colunas_moeda:
+        formatado[coluna] = moeda(formatado[coluna])
+    for coluna in colunas_valor:
+        formatado[coluna] = moeda(formatado[coluna], simbolo=False)
+    for coluna in colunas_data:
+        formatado[coluna] = datas(formatado[coluna], formato_data)
+    return formatado
+
+
+def total_paginas(total_linhas: int, tamanho: int = LINHAS_POR_PAGINA) -> int:
+    return max(1, -(-total_linhas // tamanho))
+
+
+def pagina(df: pd.DataFrame, numero: int, tamanho: int = LINHAS_POR_PAGINA) -> pd.DataFrame:
+    """Linhas da página informada (a partir de 1)"""
+    inicio = (numero - 1) * tamanho
+    return df.iloc[inicio:inicio + tamanho]
@@ -0,0 +1,41 @@
+"""
+Seções isoladas do app8 (fragmentos do Streamlit)
+Interagir com os widgets de uma seção reexecuta só a seção, não a página
+inteira: st.fragment a partir do Streamlit 1.37, st.experimental_fragment de
+1.33 a 1.36. As versões anteriores (requirements.txt fixa a 1.28.1) não têm
+fragmentos: a seção vira uma função comum e acompanha o rerun da página.
+"""
+from functools import wraps
+
+import streamlit as st
+
+from rastreamento import iniciar_rastro, rastro_atual
+
+
+def decorador_fragmento():
+    """Decorador de fragmento da versão instalada do Streamlit, ou None se ela não tem fragmentos"""
+    return getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+
+
+def fragmento(rotulo):
+    """
+    Decorador de seção isolada. A reexecução só da seção não passa pelo início do
+    script, então ela abre o próprio rastro ("<página> › <rótulo>") e não deve usar
+    o 'contexto' do script (ver secao_fechamento_devolucao no app8).
+    """
+    def decorador(funcao):
+        decorador_st = decorador_fragmento()
+        if decorador_st is None:
+            return funcao  # Sem fragmentos: roda dentro do rerun completo, já rastreado
+
+        @wraps(funcao)
+        def secao(*args, **kwargs):
+            if rastro_atual() is not None:  # Chamada dentro da execução completa (já rastreada)
+                return funcao(*args, **kwargs)
+            rastro = iniciar_rastro(f"{st.session_state.get('main_menu_selector')} › {rotulo}")
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                rastro.encerrar()
+        return decorador_st(secao)
+    return decorador
@@ -0,0 +1,102 @@
+"""
+Indicadores da frota calculados de forma vetorizada (pandas/NumPy)
+Utilização, km médio por dia, previsão da próxima troca de óleo e receita por carro,
+calculados sobre a frota inteira e o histórico de reservas de uma só vez.
+"""
+from datetime import date
+import numpy as np
+import pandas as pd
+from cache_sync import obter_cache
+from conexao import obter_pool
+from consultas import CONSULTAS
+
+DB_FILE = 'locadora_v2.db'
+
+# Janela (em dias) usada no cálculo da taxa de utilização
+JANELA_UTILIZACAO_DIAS = 90
+
+
+def km_ate_proxima_troca(km_troca_oleo: pd.Series, km_atual: pd.Series) -> pd.Series:
+    """KM restante até a troca de óleo (0 quando vencida ou sem dados)"""
+    restante = pd.to_numeric(km_troca_oleo, errors='coerce') - pd.to_numeric(km_atual, errors='coerce')
+    return restante.clip(lower=0).fillna(0).astype(int)
+
+
+def calcular_indicadores_frota(carros: pd.DataFrame, reservas: pd.DataFrame, hoje: date = None,
+                               janela_dias: int = JANELA_UTILIZACAO_DIAS,
+                               arquivadas: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Calcula os indicadores por carro.
+
+    carros: colunas id, km_atual, km_troca_oleo
+    reservas: colunas carro_id, data_inicio, data_fim, reserva_status, km_saida, km_volta, valor_total
+    arquivadas: totais das locações no arquivo morto, indexados por carro_id (colunas receita, km, dias)
+
+    Retorna um DataFrame indexado pelo id do carro com as colunas
+    km_ate_proxima_troca, utilizacao_pct, km_por_dia, previsao_troca_oleo e receita_total
+    """
+    hoje = pd.Timestamp(hoje or date.today())
+    inicio_janela = hoje - pd.Timedelta(days=janela_dias)
+
+    resultado = pd.DataFrame(index=pd.Index(carros['id'].astype(int), name='id'))
+    resultado['km_ate_proxima_troca'] = km_ate_proxima_troca(carros['km_troca_oleo'], carros['km_atual']).to_numpy()
+
+    inicio = pd.to_datetime(reservas['data_inicio'], errors='coerce')
+    fim = pd.to_datetime(reservas['data_fim'], errors='coerce')
+    carro_id = pd.to_numeric(reservas['carro_id'], errors='coerce')
+    finalizada = (reservas['reserva_status'] == 'Finalizada').to_numpy()
+
+    # Utilização: dias locados dentro da janela (locações em curso contam até hoje)
+    fim_efetivo = fim.where(finalizada, fim.clip(lower=hoje))
+    inicio_corte = inicio.clip(lower=inicio_janela)
+    fim_corte = fim_efetivo.clip(upper=hoje)
+    dias_na_janela = (fim_corte - inicio_corte).dt.days.clip(lower=0).fillna(0)
+    utilizacao = dias_na_janela.groupby(carro_id).sum() / janela_dias * 100
+
+    # KM por dia e receita: apenas locações finalizadas
+    dias_locacao = (fim - inicio).dt.days.clip(lower=1)
+    km_rodados = (pd.to_numeric(reservas['km_volta'], errors='coerce')
+                  - pd.to_numeric(reservas['km_saida'], errors='coerce')).clip(lower=0)
+    validas = finalizada & km_rodados.notna().to_numpy() & dias_locacao.notna().to_numpy()
+    por_carro = pd.DataFrame({
+        'km': km_rodados[validas],
+        'dias': dias_locacao[validas],
+    }).groupby(carro_id[validas]).sum()
+    receita = pd.to_numeric(reservas['valor_total'], errors='coerce')[finalizada].groupby(carro_id[finalizada]).sum()
+    if arquivadas is not None and not arquivadas.empty:
+        por_carro = por_carro.add(arquivadas[['km', 'dias']], fill_value=0)
+        receita = receita.add(arquivadas['receita'], fill_value=0)
+
+    resultado['utilizacao_pct'] = utilizacao.reindex(resultado.index).fillna(0).clip(upper=100).round(1)
+    km_por_dia = (por_carro['km'] / por_carro['dias']).reindex(resultado.index)
+    resultado['km_por_dia'] = km_por_dia.fillna(0).round(1)
+    resultado['receita_total'] = receita.reindex(resultado.index).fillna(0).round(2)
+
+    # Previsão da troca de óleo: KM restante / KM médio por dia (sem previsão quando não há histórico)
+    dias_ate_troca = np.ceil(resultado['km_ate_proxima_troca'] / km_por_dia.where(km_por_dia > 0))
+    resultado['previsao_troca_oleo'] = hoje + pd.to_timedelta(dias_ate_troca, unit='D')
+
+    return resultado
+
+
+def carregar_indicadores_frota(db_file=DB_FILE, hoje: date = None) -> pd.DataFrame:
+    """Lê carros e reservas do banco (e os totais do arquivo morto) e calcula os indicadores da frota"""
+    from arquivo_reservas import resumo_arquivado_por_carro
+    with obter_pool(db_file).conexao() as conn:
+        carros = pd.read_sql_query(CONSULTAS['frota_indicadores_carros'], conn)
+        reservas = pd.read_sql_query(CONSULTAS['frota_indicadores_reservas'], conn)
+    return calcular_indicadores_frota(carros, reservas, hoje, arquivadas=resumo_arquivado_por_carro(db_file))
+
+
+def obter_indicadores_frota(db_file=DB_FILE, hoje: date = None) -> pd.DataFrame:
+    """
+    Indicadores da frota em cache por versão dos dados: só são recalculados
+    quando carros ou reservas mudam (ou quando o dia vira)
+    """
+    hoje = hoje or date.today()
+    indicadores = obter_cache(db_file).obter(
+        ('indicadores_frota', hoje.isoformat()),
+        ('carros', 'reservas'),
+        lambda: carregar_indicadores_frota(db_file, hoje)
+    )
+    return indicadores.copy()
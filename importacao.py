@@ -0,0 +1,326 @@
+"""
+Importação em lote de clientes e veículos (CSV/XLSX)
+Lê o arquivo em blocos, valida CPF, placa e validade da CNH de forma vetorizada,
+reporta conflitos de cpf/placa (no próprio arquivo e com o banco) e grava as
+linhas válidas com executemany em uma única transação.
+
+Uso pela linha de comando:
+    python importacao.py clientes clientes.csv
+    python importacao.py carros frota.xlsx --validar --relatorio erros.csv
+"""
+import argparse
+import codecs
+import os
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+from conexao import obter_pool
+from consultas import CONSULTAS
+from pdfgenerator import STATUS_CARRO
+
+DB_FILE = 'locadora_v2.db'
+
+# Linhas processadas por bloco
+TAMANHO_BLOCO = 10000
+
+# Bytes do início do CSV usados para descobrir a codificação e o separador
+TAMANHO_AMOSTRA = 64 * 1024
+
+# Colunas aceitas por tipo de importação (na ordem dos parâmetros do INSERT do catálogo)
+COLUNAS = {
+    'clientes': ['nome', 'cpf', 'cnh', 'validade_cnh', 'telefone', 'endereco', 'observacoes'],
+    'carros': ['modelo', 'placa', 'cor', 'km_atual', 'diaria', 'preco_km', 'status',
+               'numero_chassi', 'numero_renavam', 'ano_veiculo', 'km_troca_oleo'],
+}
+
+# Mesmos campos exigidos pelos formulários de cadastro
+OBRIGATORIAS = {
+    'clientes': ['nome', 'cpf', 'cnh', 'telefone', 'validade_cnh'],
+    'carros': ['modelo', 'placa', 'cor', 'diaria', 'numero_chassi', 'numero_renavam', 'ano_veiculo'],
+}
+
+# Chave única de cada tipo e consultas usadas
+CHAVE = {'clientes': 'cpf', 'carros': 'placa'}
+CONSULTA_CHAVES = {'clientes': 'clientes_cpfs', 'carros': 'carros_placas'}
+CONSULTA_INSERIR = {'clientes': 'cliente_inserir', 'carros': 'carro_inserir'}
+
+# Placa no padrão antigo (ABC1234) ou Mercosul (ABC1D23)
+PADRAO_PLACA = r'^[A-Z]{3}[0-9][A-Z0-9][0-9]{2}$'
+
+
+# --- LEITURA ---
+
+def _normalizar_colunas(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(coluna).strip().lower().replace(' ', '_') for coluna in df.columns]
+    return df
+
+
+def _detectar_formato_csv(amostra: bytes):
+    """
+    (codificação, separador) do CSV a partir dos primeiros bytes: UTF-8 (com ou
+    sem BOM) quando a amostra é UTF-8 válido, senão Latin-1 (planilhas salvas
+    pelo Excel em português)
+    """
+    try:
+        # Decodificador incremental: um caractere cortado no fim da amostra não conta como erro
+        texto = codecs.getincrementaldecoder('utf-8-sig')().decode(amostra, final=False)
+        codificacao = 'utf-8-sig'
+    except UnicodeDecodeError:
+        texto = amostra.decode('latin-1')
+        codificacao = 'latin-1'
+
+    # Planilhas exportadas no Brasil costumam usar ';' como separador
+    primeira_linha = texto.split('\n', 1)[0]
+    separador = ';' if primeira_linha.count(';') > primeira_linha.count(',') else ','
+    return codificacao, separador
+
+
+def ler_em_blocos(arquivo, nome_arquivo: str, tamanho_bloco: int = TAMANHO_BLOCO):
+    """
+    Gera DataFrames (todas as colunas como texto) de até tamanho_bloco linhas.
+    arquivo: caminho ou objeto binário posicionável (ex.: arquivo enviado pelo
+    st.file_uploader).
+    CSV é lido em blocos de fato: a codificação e o separador saem de uma amostra
+    do início e o pandas lê o restante aos poucos. XLSX é lido de uma vez (o
+    formato não permite leitura parcial) e então dividido em blocos.
+    """
+    if nome_arquivo.lower().endswith(('.xlsx', '.xls')):
+        df = _normalizar_colunas(pd.read_excel(arquivo, dtype=str).fillna(''))
+        for inicio in range(0, len(df), tamanho_bloco):
+            yield df.iloc[inicio:inicio + tamanho_bloco]
+        return
+
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, 'rb') as f:
+            amostra = f.read(TAMANHO_AMOSTRA)
+    else:
+        posicao = arquivo.tell()
+        amostra = arquivo.read(TAMANHO_AMOSTRA)
+        arquivo.seek(posicao)
+    codificacao, separador = _detectar_formato_csv(amostra)
+
+    with pd.read_csv(arquivo, sep=separador, dtype=str, chunksize=tamanho_bloco, keep_default_na=False,
+                     encoding=codificacao, encoding_errors='replace') as leitor:
+        for bloco in leitor:
+            yield _normalizar_colunas(bloco)
+
+
+# --- VALIDAÇÃO VETORIZADA ---
+
+def somente_digitos(serie: pd.Series) -> pd.Series:
+    return serie.astype(str).str.replace(r'\D', '', regex=True)
+
+
+def cpf_valido(serie: pd.Series) -> pd.Series:
+    """Valida os dígitos verificadores de uma série de CPFs (com ou sem pontuação)"""
+    digitos = somente_digitos(serie)
+    valido = (digitos.str.len() == 11) & ~digitos.str.fullmatch(r'(\d)\1{10}')
+    resultado = pd.Series(False, index=serie.index)
+    if not valido.any():
+        return resultado
+
+    candidatos = digitos[valido]
+    matriz = (np.frombuffer(''.join(candidatos).encode('ascii'), dtype=np.uint8)
+              .reshape(-1, 11).astype(np.int64) - ord('0'))
+
+    def digito_verificador(parte):
+        pesos = np.arange(parte.shape[1] + 1, 1, -1)
+        resto = (parte * pesos).sum(axis=1) * 10 % 11
+        return np.where(resto == 10, 0, resto)
+
+    ok = (digito_verificador(matriz[:, :9]) == matriz[:, 9]) & (digito_verificador(matriz[:, :10]) == matriz[:, 10])
+    resultado[candidatos.index] = ok
+    return resultado
+
+
+def formatar_cpf(serie: pd.Series) -> pd.Series:
+    """Formata CPFs de 11 dígitos como 000.000.000-00"""
+    return somente_digitos(serie).str.replace(r'^(\d{3})(\d{3})(\d{3})(\d{2})$', r'\1.\2.\3-\4', regex=True)
+
+
+def normalizar_placa(serie: pd.Series) -> pd.Series:
+    return serie.astype(str).str.upper().str.replace(r'[^A-Z0-9]', '', regex=True)
+
+
+def converter_datas(serie: pd.Series) -> pd.Series:
+    """Converte datas nos formatos AAAA-MM-DD (inclusive com hora, vindo do Excel) ou DD/MM/AAAA"""
+    texto = serie.astype(str).str.strip()
+    iso = pd.to_datetime(texto.str[:10], format='%Y-%m-%d', errors='coerce')
+    brasileiro = pd.to_datetime(texto, format='%d/%m/%Y', errors='coerce')
+    return iso.fillna(brasileiro)
+
+
+def _numeros(serie: pd.Series, padrao=None) -> pd.Series:
+    texto = serie.astype(str).str.strip()
+    # Aceita vírgula decimal (1.234,56) além do ponto
+    brasileiro = texto.str.contains(',', regex=False)
+    texto = texto.where(~brasileiro, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    numeros = pd.to_numeric(texto.replace('', np.nan), errors='coerce')
+    if padrao is not None:
+        numeros = numeros.where(texto != '', padrao)
+    return numeros
+
+
+def _validar_clientes(bloco: pd.DataFrame):
+    """Retorna (bloco normalizado, lista de (máscara de erro, campo, motivo))"""
+    dados = bloco.copy()
+    validade = converter_datas(dados['validade_cnh'])
+    problemas = [
+        (~cpf_valido(dados['cpf']) & (dados['cpf'] != ''), 'cpf', "CPF inválido"),
+        (validade.isna() & (dados['validade_cnh'] != ''), 'validade_cnh', "Data inválida (use DD/MM/AAAA ou AAAA-MM-DD)"),
+        (validade.notna() & (validade < pd.Timestamp(date.today())), 'validade_cnh', "CNH vencida"),
+    ]
+    dados['cpf'] = formatar_cpf(dados['cpf'])
+    dados['validade_cnh'] = validade.dt.strftime('%Y-%m-%d')
+    return dados, problemas
+
+
+def _validar_carros(bloco: pd.DataFrame):
+    dados = bloco.copy()
+    dados['placa'] = normalizar_placa(dados['placa'])
+    dados['status'] = dados['status'].where(dados['status'] != '', STATUS_CARRO['DISPONIVEL'])
+    numericos = {'km_atual': 0, 'diaria': None, 'preco_km': 0.0, 'ano_veiculo': None, 'km_troca_oleo': 10000}
+    problemas = [
+        (~dados['placa'].str.fullmatch(PADRAO_PLACA) & (dados['placa'] != ''), 'placa', "Placa inválida"),
+        (~dados['status'].isin(list(STATUS_CARRO.values())), 'status', "Status desconhecido"),
+    ]
+    for coluna, padrao in numericos.items():
+        originais = dados[coluna]
+        dados[coluna] = _numeros(originais, padrao)
+        problemas.append((dados[coluna].isna() & (originais != ''), coluna, "Número inválido"))
+    for coluna in ('km_atual', 'ano_veiculo', 'km_troca_oleo'):
+        dados[coluna] = dados[coluna].round().astype('Int64')
+    problemas += [
+        (dados['diaria'].notna() & (dados['diaria'] <= 0), 'diaria', "A diária deve ser maior que zero"),
+        (dados['ano_veiculo'].notna() & ~dados['ano_veiculo'].between(1900, date.today().year + 1),
+         'ano_veiculo', "Ano fora do intervalo"),
+    ]
+    return dados, problemas
+
+
+_VALIDADORES = {'clientes': _validar_clientes, 'carros': _validar_carros}
+
+
+# --- IMPORTAÇÃO ---
+
+def _chaves_existentes(tipo, db_file) -> set:
+    with obter_pool(db_file).conexao() as conn:
+        valores = pd.Series([linha[0] or '' for linha in conn.execute(CONSULTAS[CONSULTA_CHAVES[tipo]])], dtype=str)
+    normalizar = somente_digitos if tipo == 'clientes' else normalizar_placa
+    return set(normalizar(valores))
+
+
+def importar(tipo: str, arquivo, nome_arquivo: str = None, db_file=DB_FILE,
+             tamanho_bloco: int = TAMANHO_BLOCO, apenas_validar: bool = False) -> dict:
+    """
+    Importa clientes ou carros de um arquivo CSV/XLSX.
+
+    Linhas com erro (campos obrigatórios, formato, cpf/placa duplicado no arquivo
+    ou já cadastrado) são rejeitadas e listadas no relatório; as demais são gravadas
+    em uma única transação (nada é gravado se a transação falhar).
+
+    Retorna {'lidas', 'importadas', 'rejeitadas', 'erros' (DataFrame linha/campo/valor/motivo),
+             'segundos', 'mensagem'}
+    """
+    if tipo not in COLUNAS:
+        raise ValueError(f"Tipo de importação inválido: {tipo}")
+    nome_arquivo = nome_arquivo or str(arquivo)
+    inicio = time.perf_counter()
+    chave = CHAVE[tipo]
+    normalizar_chave = somente_digitos if tipo == 'clientes' else normalizar_placa
+
+    vistas = _chaves_existentes(tipo, db_file)
+    erros, lidas, importadas = [], 0, 0
+
+    with obter_pool(db_file).conexao() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for bloco in ler_em_blocos(arquivo, nome_arquivo, tamanho_bloco):
+                faltando = [coluna for coluna in OBRIGATORIAS[tipo] if coluna not in bloco.columns]
+                if faltando:
+                    raise ValueError(f"Colunas obrigatórias ausentes no arquivo: {', '.join(faltando)}")
+                for coluna in COLUNAS[tipo]:
+                    if coluna not in bloco.columns:
+                        bloco[coluna] = ''
+                bloco = bloco[COLUNAS[tipo]].apply(lambda serie: serie.str.strip())
+                # Número da linha no arquivo (cabeçalho = linha 1)
+                bloco.index = pd.RangeIndex(lidas + 2, lidas + 2 + len(bloco))
+                lidas += len(bloco)
+
+                problemas = [(bloco[coluna] == '', coluna, "Campo obrigatório vazio") for coluna in OBRIGATORIAS[tipo]]
+                dados, problemas_formato = _VALIDADORES[tipo](bloco)
+                problemas += problemas_formato
+
+                # Conflitos de cpf/placa com o banco e com linhas anteriores do arquivo
+                chaves = normalizar_chave(bloco[chave])
+                problemas.append((chaves.isin(vistas) & (chaves != ''), chave, "Já cadastrado ou repetido no arquivo"))
+                problemas.append((chaves.duplicated() & (chaves != ''), chave, "Já cadastrado ou repetido no arquivo"))
+
+                rejeitada = pd.Series(False, index=bloco.index)
+                for mascara, campo, motivo in problemas:
+                    mascara = mascara.fillna(False).astype(bool)
+                    if mascara.any():
+                        rejeitada |= mascara
+                        erros.append(pd.DataFrame({'linha': bloco.index[mascara], 'campo': campo,
+                                                   'valor': bloco.loc[mascara, campo], 'motivo': motivo}))
+
+                vistas.update(chaves[chaves != ''])
+                validas = dados.loc[~rejeitada, COLUNAS[tipo]]
+                if not apenas_validar and not validas.empty:
+                    registros = validas.astype(object).where(validas.notna(), None)
+                    conn.executemany(CONSULTAS[CONSULTA_INSERIR[tipo]], registros.itertuples(index=False, name=None))
+                importadas += len(validas)
+
+            if apenas_validar:
+                conn.rollback()
+            else:
+                conn.commit()
+        except Exception as e:
+            conn.rollback()
+            return {'lidas': lidas, 'importadas': 0, 'rejeitadas': 0, 'erros': pd.DataFrame(),
+                    'segundos': time.perf_counter() - inicio,
+                    'mensagem': f"Importação cancelada, nada foi gravado: {str(e)}"}
+
+    relatorio = (pd.concat(erros).sort_values(['linha', 'campo']).drop_duplicates()
+                 if erros else pd.DataFrame(columns=['linha', 'campo', 'valor', 'motivo']))
+    rejeitadas = relatorio['linha'].nunique()
+    segundos = time.perf_counter() - inicio
+    acao = "válidas" if apenas_validar else "importadas"
+    return {
+        'lidas': lidas,
+        'importadas': importadas,
+        'rejeitadas': rejeitadas,
+        'erros': relatorio.reset_index(drop=True),
+        'segundos': segundos,
+        'mensagem': f"{importadas} de {lidas} linhas {acao} em {segundos:.1f}s ({rejeitadas} rejeitadas)",
+    }
+
+
+def importar_clientes(arquivo, nome_arquivo: str = None, **opcoes) -> dict:
+    return importar('clientes', arquivo, nome_arquivo, **opcoes)
+
+
+def importar_carros(arquivo, nome_arquivo: str = None, **opcoes) -> dict:
+    return importar('carros', arquivo, nome_arquivo, **opcoes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importação em lote de clientes e veículos")
+    parser.add_argument('tipo', choices=sorted(COLUNAS))
+    parser.add_argument('arquivo', help="Arquivo .csv ou .xlsx")
+    parser.add_argument('--validar', action='store_true', help="Apenas valida, sem gravar")
+    parser.add_argument('--bloco', type=int, default=TAMANHO_BLOCO, help="Linhas por bloco")
+    parser.add_argument('--relatorio', help="Salva as linhas rejeitadas neste CSV")
+    parser.add_argument('--banco', default=DB_FILE)
+    args = parser.parse_args()
+
+    resultado = importar(args.tipo, args.arquivo, db_file=args.banco,
+                         tamanho_bloco=args.bloco, apenas_validar=args.validar)
+    print(resultado['mensagem'])
+    if not resultado['erros'].empty:
+        if args.relatorio:
+            resultado['erros'].to_csv(args.relatorio, index=False)
+            print(f"Relatório de erros salvo em {args.relatorio}")
+        else:
+            print(resultado['erros'].head(20).to_string(index=False))
@@ -6,12 +6,12 @@ import sqlite3
 import os
 import streamlit as st
 from datetime import datetime
+from estrutura_banco import criar_estrutura
 
-def init_db_production():
+def init_db_production(db_file='locadora_v2.db'):
     """
     Inicializa o banco de dados com verificações adicionais para produção
     """
-    db_file = 'locadora_v2.db'
 
     # Verifica se o banco já existe
     db_exists = os.path.exists(db_file)
@@ -36,7 +36,7 @@ def init_db_production():
         except sqlite3.DatabaseError as e:
             st.error(f"❌ Banco de dados corrompido: {e}")
             # Tenta restaurar backup se disponível
-            backup_restored = try_restore_backup()
+            backup_restored = try_restore_backup(db_file)
             if backup_restored:
                 return True
             else:
@@ -46,70 +46,11 @@ def init_db_production():
     if not db_exists:
         st.info("🔄 Criando novo banco de dados...")
 
-        conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES)
-        c = conn.cursor()
-
-        # Criar tabelas principais
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS carros (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                modelo TEXT,
-                placa TEXT UNIQUE,
-                cor TEXT,
-                diaria REAL,
-                preco_km REAL,
-                km_atual INTEGER,
-                status TEXT DEFAULT 'Disponível',
-                numero_chassi TEXT,
-                numero_renavam TEXT,
-                ano_veiculo INTEGER,
-                km_troca_oleo INTEGER DEFAULT 10000
-            )
-        ''')
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS clientes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT,
-                cpf TEXT UNIQUE,
-                cnh TEXT,
-                validade_cnh DATE,
-                telefone TEXT,
-                endereco TEXT,
-                observacoes TEXT,
-                status TEXT DEFAULT 'Ativo'
-            )
-        ''')
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS reservas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                carro_id INTEGER,
-                cliente_id INTEGER,
-                data_inicio DATE,
-                data_fim DATE,
-                reserva_status TEXT DEFAULT 'Reservada',
-                status TEXT,
-                custo_lavagem REAL DEFAULT 0,
-                valor_total REAL DEFAULT 0,
-                km_saida INTEGER,
-                km_volta INTEGER,
-                km_franquia INTEGER DEFAULT 300,
-                adiantamento REAL DEFAULT 0.0,
-                valor_multas REAL DEFAULT 0.0,
-                valor_danos REAL DEFAULT 0.0,
-                valor_outros REAL DEFAULT 0.0,
-                FOREIGN KEY(carro_id) REFERENCES carros(id),
-                FOREIGN KEY(cliente_id) REFERENCES clientes(id)
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
+        criar_estrutura(db_file)
 
         # Criar backup inicial
         from database_backup import fazer_backup
-        backup_file, _ = fazer_backup()
+        backup_file, _ = fazer_backup(db_file)
         if backup_file:
             st.success(f"✅ Banco criado e backup inicial salvo: {backup_file}")
         else:
@@ -117,17 +58,17 @@ def init_db_production():
 
         return True
 
-def try_restore_backup():
+def try_restore_backup(db_file='locadora_v2.db'):
     """
     Tenta restaurar o backup mais recente se disponível
     """
     try:
-        from database_backup import listar_backups, restaurar_backup
+        from database_backup import listar_backups, restaurar_backup, pasta_backups
 
-        backups = listar_backups()
+        backups = listar_backups(pasta_backups(db_file))
         if backups:
             latest_backup = backups[0]['file']  # Primeiro da lista (mais recente)
-            sucesso, mensagem = restaurar_backup(latest_backup)
+            sucesso, mensagem = restaurar_backup(latest_backup, db_file)
             if sucesso:
                 st.success(f"✅ Backup restaurado: {mensagem}")
                 return True
@@ -141,12 +82,12 @@ def try_restore_backup():
 
     return False
 
-def check_db_health():
+def check_db_health(db_file='locadora_v2.db'):
     """
     Verifica a saúde do banco de dados e retorna estatísticas
     """
     try:
-        conn = sqlite3.connect('locadora_v2.db', detect_types=sqlite3.PARSE_DECLTYPES)
+        conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES)
         c = conn.cursor()
 
         # Verificar tabelas
@@ -169,7 +110,7 @@ def check_db_health():
         conn.close()
 
         return {
-            'healthy': integrity == 'ok',
+            'healthy': integrity == 'ok' and all(table in tables for table in ('carros', 'clientes', 'reservas')),
             'tables': tables,
             'stats': stats,
             'integrity': integrity
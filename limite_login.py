@@ -0,0 +1,211 @@
+"""
+Limite de tentativas de login (token bucket) antes do bcrypt e da tabela users
+Cada tentativa consome uma ficha de dois baldes: o do par usuário + endereço
+(força bruta em uma conta) e o do endereço (uma senha testada em muitas contas).
+As fichas voltam a uma taxa fixa até a capacidade do balde.
+
+- O estado fica na tabela login_limites do banco de autenticação, então todas
+  as réplicas enxergam os mesmos baldes.
+- Quando um balde esvazia, a réplica guarda em memória até quando ele fica
+  vazio: as tentativas seguintes são recusadas sem bcrypt e sem abrir o banco.
+- Login bem-sucedido devolve as fichas do par usuário + endereço (quem errou a
+  senha uma vez não fica com o balde pela metade) e a ficha que consumiu do
+  endereço: na prática, só as tentativas erradas gastam fichas.
+- O endereço vem do X-Forwarded-For, contado a partir da direita: só os
+  saltos acrescentados pelos proxies confiáveis valem (o que está à esquerda
+  foi enviado pelo cliente e pode ser forjado). Sem um endereço confiável o
+  balde do endereço é ignorado, em vez de juntar todos os clientes em um só.
+"""
+import ipaddress
+import os
+import sqlite3
+import threading
+import time
+from typing import Tuple
+
+DB_FILE = 'locadora_v2.db'
+
+# Balde por usuário + endereço: rajada de tentativas e segundos para repor uma ficha
+CAPACIDADE_USUARIO = int(os.environ.get('LOGIN_TENTATIVAS_USUARIO', 5))
+INTERVALO_USUARIO = 30.0
+
+# Balde por endereço (cobre vários usuários atrás do mesmo endereço)
+CAPACIDADE_ENDERECO = int(os.environ.get('LOGIN_TENTATIVAS_ENDERECO', 10))
+INTERVALO_ENDERECO = 6.0
+
+# Proxies reversos confiáveis na frente da aplicação (Nginx, balanceador). Com a
+# aplicação exposta diretamente use 0: o X-Forwarded-For é ignorado
+PROXIES_CONFIAVEIS = int(os.environ.get('PROXIES_CONFIAVEIS', 1))
+
+# Quantidade máxima de bloqueios mantidos em memória por processo
+MAXIMO_BLOQUEIOS_MEMORIA = 10000
+
+# Consome uma ficha do balde (repondo as fichas do tempo decorrido). Não retorna
+# linha quando o balde está vazio: o UPDATE não acontece e nada é consumido.
+CONSUMIR_FICHA = """
+    INSERT INTO login_limites (chave, fichas, atualizado_em) VALUES (:chave, :capacidade - 1, :agora)
+    ON CONFLICT (chave) DO UPDATE SET
+        fichas = MIN(:capacidade, fichas + (:agora - atualizado_em) / :intervalo) - 1,
+        atualizado_em = :agora
+    WHERE MIN(:capacidade, fichas + (:agora - atualizado_em) / :intervalo) >= 1
+    RETURNING fichas
+"""
+
+
+def instalar_limites(db_file=DB_FILE):
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS login_limites (
+                chave TEXT PRIMARY KEY,
+                fichas REAL NOT NULL,
+                atualizado_em REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def endereco_encaminhado(cabecalho: str, proxies: int = PROXIES_CONFIAVEIS) -> str:
+    """
+    Endereço do cliente no X-Forwarded-For: o salto acrescentado pelo proxy
+    confiável mais externo (o 'proxies'-ésimo a partir da direita).
+    Retorna '' se não há proxy confiável, se faltam saltos ou se o valor não é um IP.
+    """
+    if proxies < 1 or not cabecalho:
+        return ''
+    saltos = [salto.strip() for salto in cabecalho.split(',')]
+    if len(saltos) < proxies:
+        return ''
+    try:
+        return str(ipaddress.ip_address(saltos[-proxies]))
+    except ValueError:
+        return ''
+
+
+class LimitadorLogin:
+    """Token bucket por usuário + endereço e por endereço, compartilhado pelo banco"""
+
+    def __init__(self, db_file=DB_FILE, capacidade_usuario: int = CAPACIDADE_USUARIO,
+                 intervalo_usuario: float = INTERVALO_USUARIO, capacidade_endereco: int = CAPACIDADE_ENDERECO,
+                 intervalo_endereco: float = INTERVALO_ENDERECO):
+        self.db_file = db_file
+        self.capacidade_usuario = capacidade_usuario
+        self.intervalo_usuario = intervalo_usuario
+        self.capacidade_endereco = capacidade_endereco
+        self.intervalo_endereco = intervalo_endereco
+        self._lock = threading.Lock()
+        self._bloqueadas = {}  # chave -> instante em que o balde volta a ter uma ficha
+        self.permitidas = 0
+        self.recusadas_banco = 0
+        self.recusadas_memoria = 0
+        instalar_limites(db_file)
+
+    def _baldes(self, usuario: str, endereco: str) -> list:
+        """[(chave, capacidade, intervalo)] dos baldes que a tentativa consome"""
+        usuario = (usuario or '').strip().lower()
+        baldes = [(f"usuario:{usuario}|{endereco or ''}", self.capacidade_usuario, self.intervalo_usuario)]
+        if endereco:
+            baldes.append((f"endereco:{endereco}", self.capacidade_endereco, self.intervalo_endereco))
+        return baldes
+
+    def _bloquear(self, chave: str, ate: float, agora: float):
+        with self._lock:
+            if len(self._bloqueadas) >= MAXIMO_BLOQUEIOS_MEMORIA:
+                for vencida in [c for c, instante in self._bloqueadas.items() if instante <= agora]:
+                    del self._bloqueadas[vencida]
+            if len(self._bloqueadas) < MAXIMO_BLOQUEIOS_MEMORIA:
+                self._bloqueadas[chave] = ate
+
+    def permitir(self, usuario: str, endereco: str = '', agora: float = None) -> Tuple[bool, float]:
+        """
+        Consome uma ficha de cada balde da tentativa.
+        Retorna (True, 0) se a tentativa pode seguir ou (False, segundos até a próxima ficha).
+        """
+        agora = agora or time.time()
+        baldes = self._baldes(usuario, endereco)
+
+        with self._lock:
+            espera = max(self._bloqueadas.get(chave, 0) - agora for chave, _, _ in baldes)
+            if espera > 0:
+                self.recusadas_memoria += 1
+                return False, espera
+
+        conn = sqlite3.connect(self.db_file, timeout=5, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for chave, capacidade, intervalo in baldes:
+                parametros = {'chave': chave, 'capacidade': capacidade, 'intervalo': intervalo, 'agora': agora}
+                if conn.execute(CONSUMIR_FICHA, parametros).fetchall():
+                    continue
+                # Balde vazio: desfaz as fichas já consumidas nesta tentativa
+                fichas, atualizado_em = conn.execute(
+                    "SELECT fichas, atualizado_em FROM login_limites WHERE chave = ?", (chave,)
+                ).fetchone()
+                conn.execute("ROLLBACK")
+                fichas = min(capacidade, fichas + (agora - atualizado_em) / intervalo)
+                espera = (1 - fichas) * intervalo
+                self._bloquear(chave, agora + espera, agora)
+                with self._lock:
+                    self.recusadas_banco += 1
+                return False, espera
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        with self._lock:
+            self.permitidas += 1
+        return True, 0.0
+
+    def liberar(self, usuario: str, endereco: str = ''):
+        """
+        Após um login bem-sucedido: enche o balde do par usuário + endereço e
+        devolve ao balde do endereço a ficha desta tentativa
+        """
+        baldes = self._baldes(usuario, endereco)
+        chave_usuario = baldes[0][0]
+        with self._lock:
+            self._bloqueadas.pop(chave_usuario, None)
+        conn = sqlite3.connect(self.db_file, timeout=5)
+        try:
+            conn.execute("DELETE FROM login_limites WHERE chave = ?", (chave_usuario,))
+            for chave, capacidade, _ in baldes[1:]:
+                conn.execute("UPDATE login_limites SET fichas = MIN(?, fichas + 1) WHERE chave = ?", (capacidade, chave))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {'permitidas': self.permitidas, 'recusadas_banco': self.recusadas_banco,
+                    'recusadas_memoria': self.recusadas_memoria, 'bloqueios_memoria': len(self._bloqueadas)}
+
+
+def limpar_limites(db_file=DB_FILE, agora: float = None) -> int:
+    """Remove os baldes que já se encheram de novo (equivalem a não ter registro)"""
+    agora = agora or time.time()
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'login_limites'").fetchone():
+            return 0
+        removidos = conn.execute('''
+            DELETE FROM login_limites
+            WHERE atualizado_em <= ? - ? * MAX(?, ?)
+        ''', (agora, max(CAPACIDADE_USUARIO, CAPACIDADE_ENDERECO), INTERVALO_USUARIO, INTERVALO_ENDERECO)).rowcount
+        conn.commit()
+        return removidos
+    finally:
+        conn.close()
+
+
+_limitadores = {}
+_limitadores_lock = threading.Lock()
+
+
+def obter_limitador(db_file=DB_FILE) -> LimitadorLogin:
+    """Limitador compartilhado do processo para o banco de autenticação informado"""
+    with _limitadores_lock:
+        if db_file not in _limitadores:
+            _limitadores[db_file] = LimitadorLogin(db_file)
+        return _limitadores[db_file]
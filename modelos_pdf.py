@@ -0,0 +1,176 @@
+"""
+Modelos de documento pré-compilados para os PDFs da Locadora
+O texto fixo de um modelo (dados da empresa, cláusulas) é quebrado em linhas e
+justificado uma única vez por versão do modelo e fonte; a cada documento só as
+linhas que contêm campos variáveis (cliente, carro, datas, valores) são
+formatadas e quebradas. O resultado é idêntico ao de FPDF.multi_cell (fpdf 1.7.2,
+alinhamento justificado) sobre o texto completo.
+"""
+from typing import Dict, List, Optional, Tuple
+
+# Layouts compilados: (nome, versao, fonte, tamanho, largura) -> lista de itens
+_LAYOUTS: Dict[tuple, list] = {}
+
+
+def para_latin1(texto: str) -> str:
+    """Substitui por '?' os caracteres que as fontes padrão do PDF não representam"""
+    return texto.encode('latin-1', 'replace').decode('latin-1')
+
+
+class LinhaOpcional:
+    """Linha incluída apenas quando o campo informado não é None"""
+
+    def __init__(self, campo: str, linha: str):
+        self.campo = campo
+        self.linha = linha
+
+
+class ModeloDocumento:
+    """
+    Texto de um documento com campos no formato str.format ({nome}).
+
+    partes: sequência de blocos de texto (str) e LinhaOpcional.
+    Alterar o texto de um modelo exige incrementar a versao, que faz parte da
+    chave do layout compilado.
+    """
+
+    def __init__(self, nome: str, versao: int, *partes):
+        self.nome = nome
+        self.versao = versao
+        # Linhas: str fixa, ('campos', formato) ou ('opcional', campo, formato).
+        # Partes consecutivas são unidas por quebra de linha.
+        self.linhas = []
+        for parte in partes:
+            if isinstance(parte, LinhaOpcional):
+                self.linhas.append(('opcional', parte.campo, parte.linha))
+                continue
+            for linha in parte.split('\n'):
+                self.linhas.append(('campos', linha) if '{' in linha else para_latin1(linha))
+        # multi_cell ignora a quebra de linha final
+        if self.linhas and self.linhas[-1] == '':
+            self.linhas.pop()
+
+    def linhas_preenchidas(self, campos: dict) -> List[str]:
+        linhas = []
+        for linha in self.linhas:
+            if isinstance(linha, str):
+                linhas.append(linha)
+            elif linha[0] == 'campos':
+                linhas.append(para_latin1(linha[1].format(**campos)))
+            elif campos.get(linha[1]) is not None:
+                linhas.append(para_latin1(linha[2].format(**campos)))
+        return linhas
+
+    def texto(self, campos: dict) -> str:
+        """Texto completo preenchido (o que seria passado a multi_cell)"""
+        return '\n'.join(self.linhas_preenchidas(campos))
+
+    def _layout(self, pdf, largura: float) -> list:
+        chave = (self.nome, self.versao, pdf.font_family + pdf.font_style, pdf.font_size_pt, largura)
+        layout = _LAYOUTS.get(chave)
+        if layout is None:
+            cw = pdf.current_font['cw']
+            limite = (largura - 2 * pdf.c_margin) * 1000.0 / pdf.font_size
+            layout = []
+            for linha in self.linhas:
+                if isinstance(linha, str):
+                    pedacos = _quebrar_linha(linha, cw, limite, pdf.font_size, pdf.k)
+                    # Linhas fixas consecutivas formam um único bloco pronto
+                    if layout and isinstance(layout[-1], list):
+                        layout[-1].extend(pedacos)
+                    else:
+                        layout.append(pedacos)
+                else:
+                    layout.append(linha)
+            _LAYOUTS[chave] = layout
+        return layout
+
+    def escrever(self, pdf, altura: float, campos: dict):
+        """Escreve o documento na página atual, como pdf.multi_cell(0, altura, texto)"""
+        largura = pdf.w - pdf.r_margin - pdf.x
+        cw = pdf.current_font['cw']
+        limite = (largura - 2 * pdf.c_margin) * 1000.0 / pdf.font_size
+        for item in self._layout(pdf, largura):
+            if isinstance(item, list):
+                pedacos = item
+            elif item[0] == 'campos':
+                pedacos = _quebrar_linha(para_latin1(item[1].format(**campos)), cw, limite, pdf.font_size, pdf.k)
+            elif campos.get(item[1]) is not None:
+                pedacos = _quebrar_linha(para_latin1(item[2].format(**campos)), cw, limite, pdf.font_size, pdf.k)
+            else:
+                continue
+            _escrever_pedacos(pdf, largura, altura, pedacos)
+        if pdf.ws > 0:
+            pdf.ws = 0
+            pdf._out('0 Tw')
+        pdf.x = pdf.l_margin
+
+
+def _escapar(texto: str) -> str:
+    """Escape de string PDF (o mesmo de FPDF._escape)"""
+    return texto.replace('\\', '\\\\').replace(')', '\\)').replace('(', '\\(').replace('\r', '\\r')
+
+
+def _quebrar_linha(texto: str, cw: dict, limite: float, tamanho_fonte: float,
+                   escala: float) -> List[Tuple[str, Optional[float], Optional[str], str]]:
+    """
+    Quebra uma linha (sem '\\n') como FPDF.multi_cell com alinhamento 'J'.
+    Retorna (pedaço, espaçamento entre palavras, comando Tw, pedaço escapado)
+    por linha do PDF; o espaçamento é None quando a linha não é justificada.
+    """
+    pedacos = []
+    inicio = i = largura = espacos = 0
+    separador = -1
+    largura_no_separador = 0
+    total = len(texto)
+    while i < total:
+        c = texto[i]
+        if c == ' ':
+            separador = i
+            largura_no_separador = largura
+            espacos += 1
+        largura += cw.get(c, 0)
+        if largura > limite:
+            if separador == -1:
+                if i == inicio:
+                    i += 1
+                pedacos.append((texto[inicio:i], None, None, _escapar(texto[inicio:i])))
+            else:
+                ws = (limite - largura_no_separador) / 1000.0 * tamanho_fonte / (espacos - 1) if espacos > 1 else 0
+                pedacos.append((texto[inicio:separador], ws, '%.3f Tw' % (ws * escala),
+                                _escapar(texto[inicio:separador])))
+                i = separador + 1
+            separador = -1
+            inicio = i
+            largura = espacos = 0
+        else:
+            i += 1
+    pedacos.append((texto[inicio:i], None, None, _escapar(texto[inicio:i])))
+    return pedacos
+
+
+def _escrever_pedacos(pdf, largura: float, altura: float, pedacos):
+    """
+    Escreve cada pedaço como FPDF.cell(largura, altura, pedaço, 0, 2, 'J').
+    Fora das quebras de página (e sem cor de texto ou sublinhado) o comando de
+    texto é gravado direto, com o pedaço já escapado; nos demais casos usa cell.
+    """
+    k = pdf.k
+    x = (pdf.x + pdf.c_margin) * k
+    deslocamento = 0.5 * altura + 0.3 * pdf.font_size
+    direto = not (pdf.color_flag or pdf.underline)
+    for pedaco, ws, comando_tw, escapado in pedacos:
+        if ws is None:
+            if pdf.ws > 0:
+                pdf.ws = 0
+                pdf._out('0 Tw')
+        else:
+            pdf.ws = ws
+            pdf._out(comando_tw)
+        if direto and pdf.y + altura <= pdf.page_break_trigger:
+            if pedaco:
+                pdf._out('BT %.2f %.2f Td (%s) Tj ET' % (x, (pdf.h - (pdf.y + deslocamento)) * k, escapado))
+            pdf.lasth = altura
+            pdf.y += altura
+        else:
+            pdf.cell(largura, altura, pedaco, 0, 2, 'J', 0)
@@ -0,0 +1,412 @@
+"""
+Operações de domínio da locadora (disponibilidade, reserva, entrega, devolução e recibo)
+Funções sem dependência de interface, usadas pelo app Streamlit e pela API JSON.
+Cada escrita roda em uma única transação (BEGIN IMMEDIATE) em uma conexão do pool,
+junto com o evento correspondente no livro de eventos (eventos_reservas).
+"""
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+from cache_sync import obter_cache
+from conexao import obter_pool
+from consultas import CONSULTAS
+from eventos_reservas import garantir_livro, registrar_evento
+from pdfgenerator import STATUS_CARRO, STATUS_CLIENTE
+from repositorio import Carro, buscar_dados_recibo
+
+DB_FILE = 'locadora_v2.db'
+
+# Franquia de KM padrão de uma nova reserva
+KM_FRANQUIA_PADRAO = 300
+
+# Fração do valor previsto sugerida como adiantamento
+FRACAO_ADIANTAMENTO = 0.5
+
+
+def para_data(valor) -> Optional[date]:
+    """Converte date, datetime ou texto ISO ('AAAA-MM-DD[ ...]') em date"""
+    if valor is None or isinstance(valor, date) and not isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, datetime):
+        return valor.date()
+    return date.fromisoformat(str(valor)[:10])
+
+
+@contextmanager
+def _transacao(db_file):
+    """Transação de escrita: trava o banco para escrita já no início (BEGIN IMMEDIATE)"""
+    garantir_livro(db_file)
+    with obter_pool(db_file).conexao() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.commit()
+
+
+def _linha(conn, nome, params):
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    return cursor.execute(CONSULTAS[nome], params).fetchone()
+
+
+# --- DISPONIBILIDADE ---
+
+def _carregar_disponiveis(inicio, fim, db_file):
+    with obter_pool(db_file).conexao() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        linhas = cursor.execute(
+            CONSULTAS['carros_disponiveis_periodo'],
+            (STATUS_CARRO['INDISPONIVEL'], STATUS_CARRO['EXCLUIDO'], fim, inicio)
+        ).fetchall()
+    return [Carro.de_linha(linha).to_dict() for linha in linhas]
+
+
+def carros_disponiveis(inicio: date, fim: date, db_file=DB_FILE) -> List[dict]:
+    """
+    Carros livres no período (mesma regra da tela de reservas).
+    O resultado fica no cache do processo até carros ou reservas mudarem.
+    """
+    inicio, fim = para_data(inicio), para_data(fim)
+    carros = obter_cache(db_file).obter(
+        ('disponibilidade', inicio.isoformat(), fim.isoformat()),
+        ('carros', 'reservas'),
+        lambda: _carregar_disponiveis(inicio, fim, db_file)
+    )
+    return [dict(carro) for carro in carros]
+
+
+def _carregar_janelas(inicio, dias, db_file):
+    with obter_pool(db_file).conexao() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        carros = [Carro.de_linha(linha).to_dict() for linha in cursor.execute(
+            CONSULTAS['carros_reservaveis'], (STATUS_CARRO['INDISPONIVEL'], STATUS_CARRO['EXCLUIDO'])
+        ).fetchall()]
+        reservas = conn.execute(CONSULTAS['reservas_ativas_a_partir'], (inicio,)).fetchall()
+
+    # Uma passada pelas reservas (ordenadas por carro e início): a janela do carro começa
+    # em 'candidato' e é empurrada para o dia seguinte ao fim de cada reserva que a cruza,
+    # até aparecer uma reserva que começa depois do fim da janela
+    duracao = timedelta(days=dias)
+    candidato = {carro['id']: inicio for carro in carros}
+    encontrados = set()
+    for carro_id, data_inicio, data_fim in reservas:
+        if carro_id not in candidato or carro_id in encontrados:
+            continue
+        if para_data(data_inicio) > candidato[carro_id] + duracao:
+            encontrados.add(carro_id)
+        else:
+            candidato[carro_id] = max(candidato[carro_id], para_data(data_fim) + timedelta(days=1))
+
+    janelas = [dict(carro, janela_inicio=candidato[carro['id']], janela_fim=candidato[carro['id']] + duracao)
+               for carro in carros]
+    janelas.sort(key=lambda janela: (janela['janela_inicio'], janela['modelo'] or '', janela['placa'] or ''))
+    return janelas
+
+
+def proximas_janelas(inicio: date, dias: int, db_file=DB_FILE) -> List[dict]:
+    """
+    Primeira janela livre de cada carro para uma locação de 'dias' dias com retirada
+    a partir de 'inicio' (mesma regra de conflito de carros_disponiveis).
+    Cada carro vem com 'janela_inicio' e 'janela_fim', em ordem de retirada.
+    """
+    inicio = para_data(inicio)
+    if dias < 0:
+        raise ValueError("A duração da locação não pode ser negativa")
+    janelas = obter_cache(db_file).obter(
+        ('janelas', inicio.isoformat(), dias),
+        ('carros', 'reservas'),
+        lambda: _carregar_janelas(inicio, dias, db_file)
+    )
+    return [dict(janela) for janela in janelas]
+
+
+def janelas_por_modelo(janelas: List[dict]) -> List[dict]:
+    """Primeira janela de cada modelo: {'modelo', 'janela_inicio', 'janela_fim', 'carros'} (carros livres nessa data)"""
+    modelos = {}
+    for janela in janelas:
+        primeira = modelos.setdefault(janela['modelo'], dict(
+            modelo=janela['modelo'], janela_inicio=janela['janela_inicio'], janela_fim=janela['janela_fim'], carros=0))
+        if janela['janela_inicio'] == primeira['janela_inicio']:
+            primeira['carros'] += 1
+    return list(modelos.values())
+
+
+# --- RESERVA ---
+
+def valor_previsto(diaria: float, inicio: date, fim: date) -> float:
+    """Valor das diárias previstas (mínimo de 1 dia)"""
+    return (diaria or 0.0) * max((para_data(fim) - para_data(inicio)).days, 1)
+
+
+def reservar(carro_id: int, cliente_id: int, inicio: date, fim: date,
+             km_franquia: int = KM_FRANQUIA_PADRAO, adiantamento: float = None,
+             usuario: str = None, db_file=DB_FILE) -> Tuple[bool, object]:
+    """
+    Cria uma reserva (bloqueio de data). O carro permanece 'Disponível' até a entrega.
+    Retorna (True, id_da_reserva) ou (False, mensagem de erro).
+    """
+    inicio, fim = para_data(inicio), para_data(fim)
+    if fim < inicio:
+        return False, "A data de devolução deve ser igual ou posterior à data de retirada"
+
+    try:
+        with _transacao(db_file) as conn:
+            cliente = _linha(conn, 'cliente_por_id', (int(cliente_id),))
+            if cliente is None or cliente['status'] != STATUS_CLIENTE['ATIVO']:
+                return False, f"Cliente {cliente_id} não encontrado ou inativo"
+
+            # A verificação e a gravação ficam na mesma transação: duas réplicas
+            # não conseguem reservar o mesmo carro para datas conflitantes
+            carro = _linha(conn, 'carro_disponivel_periodo', (
+                int(carro_id), STATUS_CARRO['INDISPONIVEL'], STATUS_CARRO['EXCLUIDO'], fim, inicio
+            ))
+            if carro is None:
+                return False, f"Veículo {carro_id} indisponível para o período"
+
+            if adiantamento is None:
+                adiantamento = valor_previsto(carro['diaria'], inicio, fim) * FRACAO_ADIANTAMENTO
+
+            # O KM atual do carro é salvo como km_saida previsto da reserva
+            cursor = conn.execute(CONSULTAS['reserva_inserir'], (
+                int(carro_id), int(cliente_id), inicio, fim, 'Ativa', 'Reservada',
+                int(carro['km_atual'] or 0), int(km_franquia), float(adiantamento), 0.0, 0.0, 0.0
+            ))
+            registrar_evento(conn, cursor.lastrowid, 'Reservada', {
+                'carro_id': int(carro_id), 'cliente_id': int(cliente_id), 'data_inicio': inicio, 'data_fim': fim,
+                'km_franquia': int(km_franquia), 'adiantamento': float(adiantamento),
+            }, usuario)
+            return True, cursor.lastrowid
+
+    except Exception as e:
+        return False, f"Erro ao salvar a reserva: {str(e)}"
+
+
+# --- ENTREGA ---
+
+def entregar(reserva_id: int, km_saida: int = None, data_saida: date = None,
+             usuario: str = None, db_file=DB_FILE) -> Tuple[bool, str]:
+    """
+    Confirma a entrega: o carro passa a 'Locado' e a reserva a 'Locada',
+    com o KM e a data reais de saída.
+    """
+    try:
+        with _transacao(db_file) as conn:
+            reserva = _linha(conn, 'reserva_por_id', (int(reserva_id),))
+            if reserva is None or reserva['reserva_status'] != 'Reservada':
+                return False, f"Reserva {reserva_id} não encontrada ou não está pendente de entrega"
+
+            km_registrado = int(reserva['km_saida'] or 0)
+            km_saida = km_registrado if km_saida is None else int(km_saida)
+            if km_saida < km_registrado:
+                return False, f"KM de saída não pode ser menor que o registrado na reserva ({km_registrado})"
+            data_saida = para_data(data_saida) or para_data(reserva['data_inicio'])
+
+            conn.execute(CONSULTAS['carro_atualizar_status_km'],
+                         (STATUS_CARRO['LOCADO'], km_saida, reserva['carro_id']))
+            conn.execute(CONSULTAS['reserva_confirmar_entrega'], (km_saida, data_saida, int(reserva_id)))
+            registrar_evento(conn, reserva_id, 'Entregue', {
+                'carro_id': reserva['carro_id'], 'data_inicio': data_saida, 'km_saida': km_saida,
+            }, usuario)
+            return True, "Entrega confirmada"
+
+    except Exception as e:
+        return False, f"Erro ao confirmar a entrega: {str(e)}"
+
+
+# --- EDIÇÃO E CANCELAMENTO ---
+
+def editar_reserva(reserva_id: int, inicio: date, fim: date, km_franquia: int, adiantamento: float,
+                   carro_id: int = None, usuario: str = None, db_file=DB_FILE) -> Tuple[bool, str]:
+    """
+    Altera datas, franquia, adiantamento e (opcionalmente) o veículo de uma reserva em aberto.
+    O evento 'Editada' guarda os valores antes e depois dos campos alterados.
+    """
+    inicio, fim = para_data(inicio), para_data(fim)
+    if fim < inicio:
+        return False, "A data de devolução deve ser igual ou posterior à data de retirada"
+
+    try:
+        with _transacao(db_file) as conn:
+            reserva = _linha(conn, 'reserva_por_id', (int(reserva_id),))
+            if reserva is None or reserva['reserva_status'] not in ('Reservada', 'Locada'):
+                return False, f"Reserva {reserva_id} não encontrada ou já encerrada"
+
+            carro_id = int(reserva['carro_id'] if carro_id is None else carro_id)
+            novos = {'data_inicio': inicio, 'data_fim': fim, 'km_franquia': int(km_franquia),
+                     'adiantamento': float(adiantamento), 'carro_id': carro_id}
+            alterados = [campo for campo, valor in novos.items()
+                         if (para_data(reserva[campo]) if campo.startswith('data_') else reserva[campo]) != valor]
+            if not alterados:
+                return True, "Nenhuma alteração"
+
+            conn.execute(CONSULTAS['reserva_atualizar'], (
+                inicio, fim, int(km_franquia), float(adiantamento), carro_id,
+                reserva['valor_multas'], reserva['valor_danos'], reserva['valor_outros'], int(reserva_id)
+            ))
+            registrar_evento(conn, reserva_id, 'Editada', {
+                'antes': {campo: reserva[campo] for campo in alterados},
+                'depois': {campo: novos[campo] for campo in alterados},
+            }, usuario)
+            return True, "Reserva atualizada"
+
+    except Exception as e:
+        return False, f"Erro ao atualizar a reserva: {str(e)}"
+
+
+def cancelar_reserva(reserva_id: int, usuario: str = None, db_file=DB_FILE) -> Tuple[bool, str]:
+    """Cancela uma reserva ainda não entregue (a locada precisa passar pela devolução)"""
+    try:
+        with _transacao(db_file) as conn:
+            reserva = _linha(conn, 'reserva_por_id', (int(reserva_id),))
+            if reserva is None:
+                return False, f"Reserva {reserva_id} não encontrada"
+            if reserva['reserva_status'] == 'Locada':
+                return False, "Não é possível cancelar uma reserva que já está Locada. Realize a Devolução primeiro."
+            if reserva['reserva_status'] != 'Reservada':
+                return False, f"Reserva {reserva_id} já está {reserva['reserva_status']}"
+
+            conn.execute(CONSULTAS['reserva_atualizar_status'], ('Cancelada', int(reserva_id)))
+            registrar_evento(conn, reserva_id, 'Cancelada', {'status_anterior': reserva['reserva_status']}, usuario)
+            return True, "Reserva cancelada"
+
+    except Exception as e:
+        return False, f"Erro ao cancelar a reserva: {str(e)}"
+
+
+# --- DEVOLUÇÃO ---
+
+def calcular_fechamento(reserva, km_saida: int, km_volta: int, data_devolucao: date,
+                        valor_lavagem: float = 0.0, valor_multas: float = 0.0,
+                        valor_danos: float = 0.0, valor_outros: float = 0.0) -> dict:
+    """
+    Calcula a fatura da devolução.
+    reserva: mapeamento com data_inicio, km_franquia, diaria, preco_km e adiantamento.
+    A franquia só é abatida quando os KM rodados não a ultrapassam.
+    Retorna o dicionário no formato esperado por gerar_recibo_pdf, mais os totais intermediários.
+    """
+    data_inicio = para_data(reserva['data_inicio'])
+    dias_cobranca = max((data_devolucao - data_inicio).days, 1)
+
+    km_rodados = km_volta - km_saida
+    km_franquia = reserva['km_franquia'] if reserva['km_franquia'] is not None else 0
+    if km_rodados > km_franquia:
+        km_franquia = 0
+    km_a_cobrar = max(0, km_rodados - km_franquia)
+
+    custo_km = km_a_cobrar * reserva['preco_km']
+    custo_diarias = reserva['diaria'] * dias_cobranca
+    adiantamento = reserva['adiantamento'] if reserva['adiantamento'] is not None else 0.0
+    subtotal = custo_diarias + custo_km + valor_lavagem + valor_multas + valor_danos + valor_outros
+
+    return {
+        'data_inicio': data_inicio,
+        'data_fim': data_devolucao,
+        'km_saida': km_saida,
+        'km_volta': km_volta,
+        'km_franquia': km_franquia,
+        'km_rodados': km_rodados,
+        'km_a_cobrar': km_a_cobrar,
+        'dias_cobranca': dias_cobranca,
+        'custo_diarias': custo_diarias,
+        'custo_km': custo_km,
+        'valor_lavagem': valor_lavagem,
+        'valor_multas': valor_multas,
+        'valor_danos': valor_danos,
+        'valor_outros': valor_outros,
+        'adiantamento': adiantamento,
+        'subtotal': subtotal,
+        'total_final': subtotal - adiantamento,
+    }
+
+
+def devolver(reserva_id: int, km_volta: int, data_devolucao: date = None,
+             valor_lavagem: float = 0.0, valor_multas: float = 0.0, valor_danos: float = 0.0,
+             valor_outros: float = 0.0, usuario: str = None, db_file=DB_FILE) -> Tuple[bool, object]:
+    """
+    Finaliza a locação: grava a fatura na reserva e libera o carro com o KM de devolução.
+    Retorna (True, fechamento) ou (False, mensagem de erro).
+    """
+    data_devolucao = para_data(data_devolucao) or date.today()
+    try:
+        with _transacao(db_file) as conn:
+            reserva = _linha(conn, 'reserva_para_devolucao', (int(reserva_id),))
+            if reserva is None or reserva['reserva_status'] != 'Locada':
+                return False, f"Reserva {reserva_id} não encontrada ou não está locada"
+
+            km_saida = int(reserva['km_saida'] or 0)
+            if int(km_volta) < km_saida:
+                return False, f"KM de devolução não pode ser menor que o de saída ({km_saida})"
+
+            fechamento = calcular_fechamento(reserva, km_saida, int(km_volta), data_devolucao,
+                                             valor_lavagem, valor_multas, valor_danos, valor_outros)
+
+            conn.execute(CONSULTAS['reserva_finalizar'], (
+                fechamento['km_volta'], valor_lavagem, fechamento['subtotal'],
+                valor_multas, valor_danos, valor_outros, int(reserva_id)
+            ))
+            conn.execute(CONSULTAS['carro_atualizar_status_km'],
+                         (STATUS_CARRO['DISPONIVEL'], fechamento['km_volta'], reserva['carro_id']))
+            registrar_evento(conn, reserva_id, 'Devolvida', {
+                'carro_id': reserva['carro_id'], 'data_devolucao': data_devolucao, 'km_volta': fechamento['km_volta'],
+                'valor_lavagem': valor_lavagem, 'valor_multas': valor_multas, 'valor_danos': valor_danos,
+                'valor_outros': valor_outros, 'valor_total': fechamento['subtotal'],
+                'total_final': fechamento['total_final'],
+            }, usuario)
+            return True, fechamento
+
+    except Exception as e:
+        return False, f"Erro ao finalizar a devolução: {str(e)}"
+
+
+# --- RECIBO ---
+
+def montar_recibo(reserva_id: int, db_file=DB_FILE) -> Optional[Tuple[dict, dict, dict]]:
+    """
+    Monta os dicionários (cliente, carro, recibo) de gerar_recibo_pdf para uma reserva
+    já gravada. Retorna None se a reserva não existir.
+    """
+    reserva = buscar_dados_recibo(reserva_id, db_file)
+    if reserva is None:
+        return None
+
+    cliente = {
+        'nome': reserva['cliente_nome'],
+        'cpf': reserva['cliente_cpf'],
+        'telefone': reserva['cliente_telefone']
+    }
+
+    carro = {
+        'modelo': reserva['carro_modelo'],
+        'placa': reserva['carro_placa'],
+        'cor': reserva['carro_cor'],
+        'preco_km': reserva['carro_preco_km'],
+        'diaria': reserva['carro_diaria'],
+        'chassi': reserva['carro_chassi'],
+        'renavam': reserva['carro_renavam']
+    }
+
+    data_inicio = para_data(reserva['data_inicio'])
+    data_fim = para_data(reserva['data_fim'])
+    dias_cobranca = (data_fim - data_inicio).days
+    km_franquia = reserva['km_franquia'] if reserva['km_franquia'] is not None else 0.0
+
+    recibo = {
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'km_saida': reserva['km_saida'],
+        'km_volta': reserva['km_volta'],
+        'km_franquia': km_franquia,
+        'dias_cobranca': dias_cobranca,
+        'custo_diarias': reserva['carro_diaria'] * dias_cobranca,
+        'custo_km': max(0, reserva['km_volta'] - reserva['km_saida'] - km_franquia) * reserva['carro_preco_km'],
+        'valor_lavagem': reserva['custo_lavagem'] if reserva['custo_lavagem'] is not None else 0.0,
+        'valor_multas': reserva['valor_multas'] if reserva['valor_multas'] is not None else 0.0,
+        'valor_danos': reserva['valor_danos'] if reserva['valor_danos'] is not None else 0.0,
+        'valor_outros': reserva['valor_outros'] if reserva['valor_outros'] is not None else 0.0,
+        'adiantamento': reserva['adiantamento'] if reserva['adiantamento'] is not None else 0.0,
+        'total_final': reserva['valor_total']
+    }
+
+    return cliente, carro, recibo
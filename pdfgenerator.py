@@ -5,8 +5,13 @@ Baseado no contrato oficial da J.A. MARCELLO & CIA LTDA
 """
 
 from fpdf import FPDF
+from modelos_pdf import ModeloDocumento, LinhaOpcional
+from formatacao import formatar_moeda
+from rastreamento import rastreado
 from datetime import date, timedelta
+import hashlib
 import os
+import time
 
 
 # --- CONSTANTES DE STATUS DO VEÍCULO ---
@@ -25,20 +30,8 @@ STATUS_CLIENTE = {
     'REMOVIDO': 'Removido'
 }
 
-def formatar_moeda(valor):
-    """
-    Formata um valor float para a moeda brasileira (R$ 0.000,00).
-
-    Args:
-        valor: Valor numérico a ser formatado
-
-    Returns:
-        String formatada no padrão brasileiro (R$ 1.234,56)
-    """
-    if valor is None:
-        valor = 0.0
-    # Garante que o separador decimal seja vírgula e o milhar seja ponto
-    return f"R$ {valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+MESES_PORTUGUES = ('janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho', 'julho',
+                   'agosto', 'setembro', 'outubro', 'novembro', 'dezembro')
 
 
 def formatar_data_portugues(data):
@@ -51,30 +44,7 @@ def formatar_data_portugues(data):
     Returns:
         String formatada no padrão brasileiro (dia de mês de ano)
     """
-    # Mapeamento dos meses em inglês para português
-    meses_portugues = {
-        'January': 'janeiro',
-        'February': 'fevereiro',
-        'March': 'março',
-        'April': 'abril',
-        'May': 'maio',
-        'June': 'junho',
-        'July': 'julho',
-        'August': 'agosto',
-        'September': 'setembro',
-        'October': 'outubro',
-        'November': 'novembro',
-        'December': 'dezembro'
-    }
-
-    # Formata a data primeiro em inglês
-    data_ingles = data.strftime('%d de %B de %Y')
-
-    # Substitui o nome do mês em inglês pelo português
-    for mes_ingles, mes_portugues in meses_portugues.items():
-        data_ingles = data_ingles.replace(mes_ingles, mes_portugues)
-
-    return data_ingles
+    return f"{data.day:02d} de {MESES_PORTUGUES[data.month - 1]} de {data.year}"
 
 
 class PDF(FPDF):
@@ -97,37 +67,15 @@ class PDF(FPDF):
         self.ln(5)
 
 
-def gerar_contrato_pdf(cliente, carro, data_inicio, data_fim):
-    """
-    Gera o PDF do contrato de locação no formato oficial.
-    
-    Args:
-        cliente: Dicionário com dados do cliente (nome, cpf, cnh, telefone, endereco)
-        carro: Dicionário com dados do carro (modelo, placa, cor, km_atual, diaria, preco_km)
-        data_inicio: Data de início da locação (date object)
-        data_fim: Data prevista de devolução (date object)
-        
-    Returns:
-        Bytes do PDF gerado em formato latin-1
-    """
-    pdf = PDF(titulo='CONTRATO DE LOCACAO DE VEICULO')
-    pdf.add_page()
-    pdf.set_font("Arial", size=10)
-
-    # Calcula o prazo em dias
-    prazo_dias = (data_fim - data_inicio).days
-    
-    # Formatação de valores monetários
-    diaria_formatada = formatar_moeda(carro['diaria'])
-    preco_km_formatado = formatar_moeda(carro['preco_km'])
-
-    # Monta o texto do contrato baseado no template oficial
-    texto = f"""
+# --- MODELOS DE DOCUMENTO ---
+# O texto fixo é quebrado em linhas uma única vez por versão (ver modelos_pdf.py).
+# Qualquer alteração no texto de um modelo deve incrementar sua versão.
+MODELO_CONTRATO = ModeloDocumento('contrato', 1, """
 J.A. MARCELLO & CIA LTDA, ora denominado empresa Brasileira, sediada na Avenida 
 Independencia, 1950, Sao Cristovao, em Capanema - PR, inscrita CNPJ no 10.454.344/0001-24.
 
-{cliente['nome'].upper()}, ora denominado brasileiro, sediado em {cliente.get('endereco', 'NAO INFORMADO')},
-inscrito CPF: {cliente['cpf']} TELEFONE: {cliente.get('telefone', 'NAO INFORMADO')}
+{nome}, ora denominado brasileiro, sediado em {endereco},
+inscrito CPF: {cpf} TELEFONE: {telefone}
 
 As partes acima identificadas tem, entre si, justo e acertado o presente Contrato de Locacao 
 de Automovel por Prazo Determinado, que se regera pelas clausulas seguintes e pelas condicoes 
@@ -135,11 +83,11 @@ descritas no presente.
 
 DO OBJETO DO CONTRATO
 
-Clausula 1a. O presente contrato tem como OBJETO a locacao do AUTOMOVEL {carro['modelo'].upper()},
-COR PREDOMINANTE {carro.get('cor', 'NAO INFORMADA').upper()}, PLACA {carro['placa'].upper()},
-RENAVAM {carro.get('numero_renavam', 'NAO INFORMADO')}, CHASSI {carro.get('numero_chassi', 'NAO INFORMADO')},
-ANO VEICULO: {carro.get('ano_veiculo', 'NAO INFORMADO')},
-KM INICIAL: {carro.get('km_atual', 0)}.
+Clausula 1a. O presente contrato tem como OBJETO a locacao do AUTOMOVEL {modelo},
+COR PREDOMINANTE {cor}, PLACA {placa},
+RENAVAM {numero_renavam}, CHASSI {numero_chassi},
+ANO VEICULO: {ano_veiculo},
+KM INICIAL: {km_atual}.
 
 Clausula 2a. O LOCADOR declara ser o legitimo possuidor e/ou proprietario do veiculo descrito
 acima, o qual encontra-se em perfeitas condicoes mecanicas de uso, conservacao e funcionamento
@@ -158,7 +106,7 @@ regulamentos estabelecidos pelo Conselho Nacional de Transito e pelo Departament
 Transito, bem como, pela guarda e uso correto do veiculo.
 
 Clausula 5a. O veiculo locado apenas podera ser dirigido pelo LOCATARIO, portador da CNH no
-{cliente.get('cnh', 'NAO INFORMADA')}.
+{cnh}.
 
 DO USO INDEVIDO DO VEICULO
 
@@ -197,8 +145,8 @@ LOCATARIO.
 
 DO PRAZO
 
-Clausula 9a. A presente locacao tera o inicio a partir de {formatar_data_portugues(data_inicio)}
-e tera a duracao de {prazo_dias} ({_numero_por_extenso(prazo_dias)}) DIAS. Findo o prazo
+Clausula 9a. A presente locacao tera o inicio a partir de {data_inicio_extenso}
+e tera a duracao de {prazo_dias} ({prazo_extenso}) DIAS. Findo o prazo
 estipulado, o contrato podera ser renovado por vontade das partes atraves de aditivo ou outro
 instrumento contratual, ou ainda, o veiculo devera ser devolvido ao LOCADOR nas mesmas condicoes
 em que estava quando o recebeu (Higienizado e em perfeitas condicoes de uso), ou seja, em
@@ -210,7 +158,7 @@ automovel venha a sofrer mesmo se proveniente de caso fortuito.
 
 DO PAGAMENTO
 
-Clausula 11a. Pagamento sera no valor de {diaria_formatada} a diaria + {preco_km_formatado}
+Clausula 11a. Pagamento sera no valor de {diaria} a diaria + {preco_km}
 o quilometro rodado.
 
 Clausula 12a. O LOCATARIO reconhece que o valor apurado neste instrumento como divida liquida,
@@ -266,39 +214,284 @@ foro da comarca de Capanema - PR.
 Por estarem assim justos e contratados, firmam o presente instrumento, em duas vias de igual
 teor e forma, juntamente com 2 (duas) testemunhas.
 
-Capanema, {formatar_data_portugues(date.today())}.
+Capanema, {data_emissao_extenso}.
 
 
 ____________________________________
-{cliente['nome'].upper()}
+{nome}
 
 
 DADOS E CARACTERISTICAS DO VEICULO LOCADO:
 
-Marca/Modelo: {carro['modelo'].upper()}
-Placa: {carro['placa'].upper()}
-Chassi: {carro.get('chassi', 'NAO INFORMADO')}
-Renavam: {carro.get('renavam', 'NAO INFORMADO')}
+Marca/Modelo: {modelo}
+Placa: {placa}
+Chassi: {chassi}
+Renavam: {renavam}
 Prazo de locacao: {prazo_dias} DIAS
-Km do hodometro: {carro.get('km_atual', 0)}
+Km do hodometro: {km_atual}
 
-DATA DE ENTREGA DO VEICULO AO CLIENTE: {data_inicio.strftime('%d/%m/%Y')}
+DATA DE ENTREGA DO VEICULO AO CLIENTE: {data_inicio}
 
 Declaro que conferi o estado do veiculo ora entregue para locacao, recebendo-o por este termo
 conforme contrato de locacao de veiculos firmado.
 
 
 ____________________________________
-{cliente['nome'].upper()}
+{nome}
 
-DATA DE DEVOLUCAO DO VEICULO: {data_fim.strftime('%d/%m/%Y')}
-"""
+DATA DE DEVOLUCAO DO VEICULO: {data_fim}
+""")
+
+MODELO_RECIBO = ModeloDocumento(
+    'recibo', 1,
+    """
+J.A. MARCELLO & CIA LTDA
+Avenida Independencia, 1950, Sao Cristovao, Capanema - PR
+CNPJ: 10.454.344/0001-24
+
+DATA DE EMISSAO: {data_emissao}
+
+================================================================
+RECIBO DE DEVOLUCAO DE VEICULO
+================================================================
+
+CLIENTE: {nome}
+CPF: {cpf}
+TELEFONE: {telefone}
+
+VEICULO: {modelo}
+PLACA: {placa}
+COR: {cor}
+CHASSI: {chassi}
+RENAVAM: {renavam}
+
+================================================================
+PERIODO DA LOCACAO
+================================================================
+
+Data de Retirada: {data_inicio}
+Data de Devolucao: {data_fim}
+Total de Dias Locados: {dias_cobranca} dia(s)
+
+================================================================
+QUILOMETRAGEM
+================================================================
+
+KM de Saida: {km_saida} km
+KM de Volta: {km_volta} km
+KM Rodados (Total): {km_rodados} km
+KM de Franquia Contratada: {km_franquia} km (gratuitos)
+KM Excedente a Cobrar: {km_a_cobrar} km
+
+================================================================
+VALORES COBRADOS
+================================================================
+
+Diarias: {dias_cobranca} dia(s) x {diaria}
+    Subtotal Diarias: {custo_diarias}
+
+Quilometragem: {km_a_cobrar} km x {preco_km}
+    Subtotal KM: {custo_km}
+""",
+    LinhaOpcional('valor_lavagem', "Lavagem do Veiculo: {valor_lavagem}"),
+    LinhaOpcional('valor_multas', "Multas de Transito: {valor_multas}"),
+    LinhaOpcional('valor_danos', "Danos ao Veiculo: {valor_danos}"),
+    LinhaOpcional('valor_outros', "Outros Custos: {valor_outros}"),
+    """
+----------------------------------------------------------------
+SUBTOTAL DA LOCACAO: {subtotal}
+(-) Adiantamento Ja Pago: {adiantamento}
+================================================================
+
+{rotulo_total}: {valor_total}
+
+================================================================
+
+Declaro que devolvi o veiculo em perfeitas condicoes de uso e 
+que nao tenho nada a reclamar quanto aos servicos prestados.
+
+Capanema, {data_emissao}
+
+
+____________________________________
+{nome}
+LOCATARIO
+
+
+____________________________________
+J.A. MARCELLO & CIA LTDA
+LOCADOR
+""",
+)
+
+
+def campos_contrato(cliente, carro, data_inicio, data_fim, data_emissao=None):
+    """Campos variáveis do MODELO_CONTRATO (data_emissao: padrão hoje)"""
+    prazo_dias = (data_fim - data_inicio).days
+    return {
+        'nome': cliente['nome'].upper(),
+        'endereco': cliente.get('endereco', 'NAO INFORMADO'),
+        'cpf': cliente['cpf'],
+        'telefone': cliente.get('telefone', 'NAO INFORMADO'),
+        'cnh': cliente.get('cnh', 'NAO INFORMADA'),
+        'modelo': carro['modelo'].upper(),
+        'cor': carro.get('cor', 'NAO INFORMADA').upper(),
+        'placa': carro['placa'].upper(),
+        'numero_renavam': carro.get('numero_renavam', 'NAO INFORMADO'),
+        'numero_chassi': carro.get('numero_chassi', 'NAO INFORMADO'),
+        'renavam': carro.get('renavam', 'NAO INFORMADO'),
+        'chassi': carro.get('chassi', 'NAO INFORMADO'),
+        'ano_veiculo': carro.get('ano_veiculo', 'NAO INFORMADO'),
+        'km_atual': carro.get('km_atual', 0),
+        'diaria': formatar_moeda(carro['diaria']),
+        'preco_km': formatar_moeda(carro['preco_km']),
+        'prazo_dias': prazo_dias,
+        'prazo_extenso': _numero_por_extenso(prazo_dias),
+        'data_inicio_extenso': formatar_data_portugues(data_inicio),
+        'data_emissao_extenso': formatar_data_portugues(data_emissao or date.today()),
+        'data_inicio': data_inicio.strftime('%d/%m/%Y'),
+        'data_fim': data_fim.strftime('%d/%m/%Y'),
+    }
+
+
+def campos_recibo(cliente, carro, reserva_dados):
+    """Campos variáveis do MODELO_RECIBO"""
+    # Calcula KM rodados
+    km_rodados = reserva_dados['km_volta'] - reserva_dados['km_saida']
+    km_a_cobrar = max(0, km_rodados - reserva_dados['km_franquia'])
+
+    # Subtotal antes do adiantamento
+    subtotal = (reserva_dados['custo_diarias'] +
+                reserva_dados['custo_km'] +
+                reserva_dados['valor_lavagem'] +
+                reserva_dados['valor_multas'] +
+                reserva_dados['valor_danos'] +
+                reserva_dados['valor_outros'])
+
+    # Define se é valor a pagar ou a receber
+    if reserva_dados['total_final'] >= 0:
+        rotulo_total = "VALOR A PAGAR"
+    else:
+        rotulo_total = "VALOR A DEVOLVER AO CLIENTE"
+
+    campos = {
+        'nome': cliente['nome'].upper(),
+        'cpf': cliente['cpf'],
+        'telefone': cliente.get('telefone', 'NAO INFORMADO'),
+        'modelo': carro['modelo'].upper(),
+        'placa': carro['placa'].upper(),
+        'cor': carro.get('cor', 'NAO INFORMADA').upper(),
+        'chassi': carro.get('chassi', 'NAO INFORMADO'),
+        'renavam': carro.get('renavam', 'NAO INFORMADO'),
+        'diaria': formatar_moeda(carro['diaria']),
+        'preco_km': formatar_moeda(carro['preco_km']),
+        'data_emissao': date.today().strftime('%d/%m/%Y'),
+        'data_inicio': reserva_dados['data_inicio'].strftime('%d/%m/%Y'),
+        'data_fim': reserva_dados['data_fim'].strftime('%d/%m/%Y'),
+        'dias_cobranca': reserva_dados['dias_cobranca'],
+        'km_saida': reserva_dados['km_saida'],
+        'km_volta': reserva_dados['km_volta'],
+        'km_franquia': reserva_dados['km_franquia'],
+        'km_rodados': km_rodados,
+        'km_a_cobrar': km_a_cobrar,
+        'custo_diarias': formatar_moeda(reserva_dados['custo_diarias']),
+        'custo_km': formatar_moeda(reserva_dados['custo_km']),
+        'subtotal': formatar_moeda(subtotal),
+        'adiantamento': formatar_moeda(reserva_dados['adiantamento']),
+        'rotulo_total': rotulo_total,
+        'valor_total': formatar_moeda(abs(reserva_dados['total_final'])),
+    }
+    # Custos extras só aparecem no recibo quando cobrados
+    for campo in ('valor_lavagem', 'valor_multas', 'valor_danos', 'valor_outros'):
+        campos[campo] = formatar_moeda(reserva_dados[campo]) if reserva_dados[campo] > 0 else None
+    return campos
+
+
+@rastreado('pdf')
+def gerar_contrato_pdf(cliente, carro, data_inicio, data_fim, data_emissao=None):
+    """
+    Gera o PDF do contrato de locação no formato oficial.
     
-    # Adiciona o texto ao PDF (usa latin-1 para compatibilidade com acentos)
-    pdf.multi_cell(0, 5, texto.encode('latin-1', 'replace').decode('latin-1'))
+    Args:
+        cliente: Dicionário com dados do cliente (nome, cpf, cnh, telefone, endereco)
+        carro: Dicionário com dados do carro (modelo, placa, cor, km_atual, diaria, preco_km)
+        data_inicio: Data de início da locação (date object)
+        data_fim: Data prevista de devolução (date object)
+        data_emissao: Data por extenso ao final do contrato (padrão: hoje)
+        
+    Returns:
+        Bytes do PDF gerado em formato latin-1
+    """
+    return _renderizar_contrato(campos_contrato(cliente, carro, data_inicio, data_fim, data_emissao))
+
+
+def _renderizar_contrato(campos):
+    pdf = PDF(titulo='CONTRATO DE LOCACAO DE VEICULO')
+    pdf.add_page()
+    pdf.set_font("Arial", size=10)
+
+    MODELO_CONTRATO.escrever(pdf, 5, campos)
     return pdf.output(dest="S").encode("latin-1")
 
 
+# --- CONTRATOS PRÉ-GERADOS ---
+# O agendador gera de madrugada os contratos das retiradas do dia seguinte.
+# O arquivo é identificado pelo conteúdo (campos + versão do modelo): se algo
+# mudar até a retirada (KM, datas, cadastro), o contrato é gerado na hora.
+PASTA_PRE_GERADOS = os.path.join('contratos', 'pre_gerados')
+DIAS_MANTER_PRE_GERADOS = 7
+
+
+def _caminho_pre_gerado(campos):
+    assinatura = hashlib.sha1(repr((MODELO_CONTRATO.versao, sorted(campos.items()))).encode('utf-8')).hexdigest()
+    return os.path.join(PASTA_PRE_GERADOS, f"contrato_{assinatura}.pdf")
+
+
+def pre_renderizar_contrato(cliente, carro, data_inicio, data_fim):
+    """
+    Gera antecipadamente o contrato de uma retirada, datado do dia da retirada.
+
+    Returns:
+        Caminho do arquivo gerado (ou já existente)
+    """
+    campos = campos_contrato(cliente, carro, data_inicio, data_fim, data_emissao=data_inicio)
+    caminho = _caminho_pre_gerado(campos)
+    if not os.path.exists(caminho):
+        os.makedirs(PASTA_PRE_GERADOS, exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'wb') as f:
+            f.write(_renderizar_contrato(campos))
+        os.replace(temporario, caminho)
+    return caminho
+
+
+def obter_contrato_pdf(cliente, carro, data_inicio, data_fim):
+    """
+    Mesmo resultado de gerar_contrato_pdf (emitido hoje), usando o contrato
+    pré-gerado quando existir um com exatamente os mesmos dados.
+    """
+    campos = campos_contrato(cliente, carro, data_inicio, data_fim)
+    try:
+        with open(_caminho_pre_gerado(campos), 'rb') as f:
+            return f.read()
+    except OSError:
+        return _renderizar_contrato(campos)
+
+
+def limpar_contratos_pre_renderizados(dias=DIAS_MANTER_PRE_GERADOS):
+    """Remove contratos pré-gerados com mais de 'dias' dias. Retorna a quantidade removida."""
+    if not os.path.isdir(PASTA_PRE_GERADOS):
+        return 0
+    limite = time.time() - dias * 86400
+    removidos = 0
+    for nome in os.listdir(PASTA_PRE_GERADOS):
+        caminho = os.path.join(PASTA_PRE_GERADOS, nome)
+        if os.path.getmtime(caminho) < limite:
+            os.remove(caminho)
+            removidos += 1
+    return removidos
+
+
 def _numero_por_extenso(numero):
     """
     Converte números de 1 a 365 por extenso (simplificado).
@@ -332,6 +525,7 @@ def _numero_por_extenso(numero):
         return str(numero).upper()
 
 
+@rastreado('pdf')
 def gerar_recibo_pdf(cliente, carro, reserva_dados):
     """
     Gera o PDF do recibo de devolução.
@@ -362,117 +556,7 @@ def gerar_recibo_pdf(cliente, carro, reserva_dados):
     pdf.add_page()
     pdf.set_font("Arial", size=11)
 
-    # Calcula KM rodados
-    km_rodados = reserva_dados['km_volta'] - reserva_dados['km_saida']
-    km_a_cobrar = max(0, km_rodados - reserva_dados['km_franquia'])
-    
-    # Subtotal antes do adiantamento
-    subtotal = (reserva_dados['custo_diarias'] + 
-                reserva_dados['custo_km'] + 
-                reserva_dados['valor_lavagem'] +
-                reserva_dados['valor_multas'] +
-                reserva_dados['valor_danos'] +
-                reserva_dados['valor_outros'])
-    
-    # Define se é valor a pagar ou a receber
-    if reserva_dados['total_final'] >= 0:
-        label_total = "VALOR A PAGAR"
-        valor_final_display = formatar_moeda(reserva_dados['total_final'])
-    else:
-        label_total = "VALOR A DEVOLVER AO CLIENTE"
-        valor_final_display = formatar_moeda(abs(reserva_dados['total_final']))
-
-    texto = f"""
-J.A. MARCELLO & CIA LTDA
-Avenida Independencia, 1950, Sao Cristovao, Capanema - PR
-CNPJ: 10.454.344/0001-24
-
-DATA DE EMISSAO: {date.today().strftime('%d/%m/%Y')}
-
-================================================================
-RECIBO DE DEVOLUCAO DE VEICULO
-================================================================
-
-CLIENTE: {cliente['nome'].upper()}
-CPF: {cliente['cpf']}
-TELEFONE: {cliente.get('telefone', 'NAO INFORMADO')}
-
-VEICULO: {carro['modelo'].upper()}
-PLACA: {carro['placa'].upper()}
-COR: {carro.get('cor', 'NAO INFORMADA').upper()}
-CHASSI: {carro.get('chassi', 'NAO INFORMADO')}
-RENAVAM: {carro.get('renavam', 'NAO INFORMADO')}
-
-================================================================
-PERIODO DA LOCACAO
-================================================================
-
-Data de Retirada: {reserva_dados['data_inicio'].strftime('%d/%m/%Y')}
-Data de Devolucao: {reserva_dados['data_fim'].strftime('%d/%m/%Y')}
-Total de Dias Locados: {reserva_dados['dias_cobranca']} dia(s)
-
-================================================================
-QUILOMETRAGEM
-================================================================
-
-KM de Saida: {reserva_dados['km_saida']} km
-KM de Volta: {reserva_dados['km_volta']} km
-KM Rodados (Total): {km_rodados} km
-KM de Franquia Contratada: {reserva_dados['km_franquia']} km (gratuitos)
-KM Excedente a Cobrar: {km_a_cobrar} km
-
-================================================================
-VALORES COBRADOS
-================================================================
-
-Diarias: {reserva_dados['dias_cobranca']} dia(s) x {formatar_moeda(carro['diaria'])}
-    Subtotal Diarias: {formatar_moeda(reserva_dados['custo_diarias'])}
-
-Quilometragem: {km_a_cobrar} km x {formatar_moeda(carro['preco_km'])}
-    Subtotal KM: {formatar_moeda(reserva_dados['custo_km'])}
-"""
-    
-    # Adiciona custos extras se houver
-    if reserva_dados['valor_lavagem'] > 0:
-        texto += f"\nLavagem do Veiculo: {formatar_moeda(reserva_dados['valor_lavagem'])}"
-    
-    if reserva_dados['valor_multas'] > 0:
-        texto += f"\nMultas de Transito: {formatar_moeda(reserva_dados['valor_multas'])}"
-    
-    if reserva_dados['valor_danos'] > 0:
-        texto += f"\nDanos ao Veiculo: {formatar_moeda(reserva_dados['valor_danos'])}"
-    
-    if reserva_dados['valor_outros'] > 0:
-        texto += f"\nOutros Custos: {formatar_moeda(reserva_dados['valor_outros'])}"
-    
-    texto += f"""
-
-----------------------------------------------------------------
-SUBTOTAL DA LOCACAO: {formatar_moeda(subtotal)}
-(-) Adiantamento Ja Pago: {formatar_moeda(reserva_dados['adiantamento'])}
-================================================================
-
-{label_total}: {valor_final_display}
-
-================================================================
-
-Declaro que devolvi o veiculo em perfeitas condicoes de uso e 
-que nao tenho nada a reclamar quanto aos servicos prestados.
-
-Capanema, {date.today().strftime('%d/%m/%Y')}
-
-
-____________________________________
-{cliente['nome'].upper()}
-LOCATARIO
-
-
-____________________________________
-J.A. MARCELLO & CIA LTDA
-LOCADOR
-"""
-    
-    pdf.multi_cell(0, 5, texto.encode('latin-1', 'replace').decode('latin-1'))
+    MODELO_RECIBO.escrever(pdf, 5, campos_recibo(cliente, carro, reserva_dados))
     return pdf.output(dest="S").encode("latin-1")
 
 
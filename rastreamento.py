@@ -0,0 +1,323 @@
+"""
+Rastreamento do tempo de renderização por página (app8.py)
+Cada execução do script (rerun) vira um rastro: o tempo total e o tempo gasto
+em trechos por categoria (sql, pdf, grafico, excel). O que sobra ("outros") é
+Streamlit e pandas. Os rastros ficam em um banco local separado e viram
+p50/p95/p99 por página em percentis_por_pagina().
+
+Os trechos são medidos por trecho() / @rastreado e não custam nada quando não
+há rastro ativo na thread (API, agendador, workers da exportação). Trechos
+aninhados contam só no mais externo, para as categorias somarem no máximo o total.
+
+Uma execução interrompida por st.rerun()/st.stop() não chega ao fim do script:
+ela é gravada no início da execução seguinte, como interrompida, com o tempo
+até o último trecho medido.
+
+O administrador pode pedir o perfil (cProfile) da próxima execução; o arquivo
+.prof (formato do pstats/snakeviz) é guardado no armazém de blobs.
+
+Uso:
+    python rastreamento.py --dias 7
+    python rastreamento.py --limpar
+"""
+import argparse
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+import numpy as np
+import pandas as pd
+from armazem_blobs import guardar_blob
+
+ARQUIVO_RASTROS = os.environ.get('RASTROS_DB', 'locadora_rastros.db')
+
+# RASTREAMENTO=0 desliga a gravação (os trechos continuam sem custo)
+RASTREAMENTO_ATIVO = os.environ.get('RASTREAMENTO', '1') != '0'
+
+# Rastros mais antigos que isso são apagados (no máximo uma vez por hora)
+MANTER_RASTROS_DIAS = int(os.environ.get('MANTER_RASTROS_DIAS', '30'))
+INTERVALO_LIMPEZA_SEGUNDOS = 3600
+
+CATEGORIAS = ('sql', 'pdf', 'grafico', 'excel')
+
+# Funções listadas no resumo em texto do perfil
+LINHAS_RESUMO_PERFIL = 30
+
+# Arquivos ignorados ao nomear um trecho pelo chamador
+_ARQUIVOS_INTERNOS = ('rastreamento.py', 'contextlib.py', 'conexao.py')
+
+_local = threading.local()
+_preparados = set()
+_ultima_limpeza = {}
+_lock = threading.Lock()
+
+
+class Rastro:
+    """Tempos de uma execução do script; só existe um ativo por thread"""
+
+    def __init__(self, perfilar=False):
+        self.pagina = None
+        self.iniciado_em = time.time()
+        self._inicio = time.perf_counter()
+        self.ultimo_instante = self._inicio
+        self.trechos = {}  # (categoria, nome) -> [ms, chamadas]
+        self.profundidade = 0
+        self.encerrado = False
+        self.total_ms = None
+        self.perfil = None  # {'handle', 'pagina', 'total_ms', 'resumo'} depois de encerrar
+        self._perfilador = cProfile.Profile() if perfilar else None
+        if self._perfilador is not None:
+            self._perfilador.enable()
+
+    def registrar(self, categoria, nome, ms):
+        acumulado = self.trechos.setdefault((categoria, nome), [0.0, 0])
+        acumulado[0] += ms
+        acumulado[1] += 1
+        self.ultimo_instante = time.perf_counter()
+
+    def por_categoria(self) -> dict:
+        """{categoria: ms}, com 'outros' = total - trechos"""
+        tempos = {categoria: 0.0 for categoria in CATEGORIAS}
+        for (categoria, _), (ms, _) in self.trechos.items():
+            tempos[categoria] = tempos.get(categoria, 0.0) + ms
+        if self.total_ms is not None:
+            tempos['outros'] = max(self.total_ms - sum(tempos.values()), 0.0)
+        return tempos
+
+    def encerrar(self, concluido=True, arquivo=None):
+        """
+        Fecha o rastro e grava (se a página foi definida). Pode ser chamado mais
+        de uma vez; só a primeira conta. Retorna o total em ms.
+        """
+        if self.encerrado:
+            return self.total_ms
+        self.encerrado = True
+        fim = time.perf_counter() if concluido else self.ultimo_instante
+        self.total_ms = (fim - self._inicio) * 1000
+        if getattr(_local, 'rastro', None) is self:
+            _local.rastro = None
+        if self._perfilador is not None:
+            self._perfilador.disable()
+            self.perfil = _guardar_perfil(self._perfilador, self.pagina, self.total_ms)
+            self._perfilador = None
+        if self.pagina is not None and RASTREAMENTO_ATIVO:
+            try:
+                gravar_rastro(self, concluido, arquivo or ARQUIVO_RASTROS)
+            except sqlite3.Error:
+                pass  # Medição nunca derruba a página
+        return self.total_ms
+
+
+def iniciar_rastro(pagina=None, perfilar=False) -> Rastro:
+    """Abre o rastro da execução atual nesta thread (descarta um que tenha ficado aberto)"""
+    rastro = Rastro(perfilar)
+    rastro.pagina = pagina
+    _local.rastro = rastro
+    return rastro
+
+
+def rastro_atual():
+    return getattr(_local, 'rastro', None)
+
+
+def definir_pagina(pagina):
+    """Página do rastro atual (conhecida só depois do menu)"""
+    rastro = rastro_atual()
+    if rastro is not None:
+        rastro.pagina = pagina
+
+
+def _chamador():
+    """Nome da primeira função fora do pool/rastreamento na pilha"""
+    quadro = sys._getframe(2)
+    while quadro is not None and os.path.basename(quadro.f_code.co_filename) in _ARQUIVOS_INTERNOS:
+        quadro = quadro.f_back
+    return quadro.f_code.co_name if quadro is not None else '?'
+
+
+@contextmanager
+def trecho(categoria, nome=None):
+    """Mede o bloco na categoria informada (sem rastro ativo, não faz nada)"""
+    rastro = getattr(_local, 'rastro', None)
+    if rastro is None or rastro.encerrado:
+        yield
+        return
+    rastro.profundidade += 1
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        rastro.profundidade -= 1
+        if rastro.profundidade == 0:
+            rastro.registrar(categoria, nome or _chamador(), (time.perf_counter() - inicio) * 1000)
+
+
+def rastreado(categoria, nome=None):
+    """Decorador: mede cada chamada da função como um trecho da categoria"""
+    def decorador(funcao):
+        rotulo = nome or funcao.__name__
+
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if getattr(_local, 'rastro', None) is None:
+                return funcao(*args, **kwargs)
+            with trecho(categoria, rotulo):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def _guardar_perfil(perfilador, pagina, total_ms) -> dict:
+    """Grava o .prof no armazém de blobs e monta o resumo em texto (por tempo acumulado)"""
+    perfilador.create_stats()
+    rotulo = re.sub(r'\W+', '_', pagina or 'execucao').strip('_').lower()
+    nome = f"perfil_{rotulo}_{datetime.now():%Y%m%d_%H%M%S}.prof"
+    handle = guardar_blob(marshal.dumps(perfilador.stats), nome, 'application/octet-stream')
+    saida = io.StringIO()
+    pstats.Stats(perfilador, stream=saida).sort_stats('cumulative').print_stats(LINHAS_RESUMO_PERFIL)
+    return {'handle': handle, 'pagina': pagina, 'total_ms': total_ms, 'resumo': saida.getvalue()}
+
+
+# --- PERSISTÊNCIA ---
+def _conectar(arquivo):
+    conn = sqlite3.connect(arquivo, timeout=5)
+    if arquivo not in _preparados:
+        with _lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS rastros (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    pagina TEXT NOT NULL,
+                    iniciado_em REAL NOT NULL,
+                    total_ms REAL NOT NULL,
+                    concluido INTEGER NOT NULL DEFAULT 1
+                );
+                CREATE INDEX IF NOT EXISTS idx_rastros_iniciado ON rastros(iniciado_em);
+                CREATE TABLE IF NOT EXISTS rastros_trechos (
+                    rastro_id INTEGER NOT NULL,
+                    categoria TEXT NOT NULL,
+                    nome TEXT NOT NULL,
+                    ms REAL NOT NULL,
+                    chamadas INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_rastros_trechos ON rastros_trechos(rastro_id);
+            ''')
+            _preparados.add(arquivo)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def gravar_rastro(rastro, concluido=True, arquivo=ARQUIVO_RASTROS):
+    conn = _conectar(arquivo)
+    try:
+        with conn:
+            rastro_id = conn.execute(
+                "INSERT INTO rastros (pagina, iniciado_em, total_ms, concluido) VALUES (?, ?, ?, ?)",
+                (rastro.pagina, rastro.iniciado_em, rastro.total_ms, int(concluido))).lastrowid
+            conn.executemany(
+                "INSERT INTO rastros_trechos (rastro_id, categoria, nome, ms, chamadas) VALUES (?, ?, ?, ?, ?)",
+                [(rastro_id, categoria, nome, ms, chamadas)
+                 for (categoria, nome), (ms, chamadas) in rastro.trechos.items()])
+        agora = time.time()
+        if agora - _ultima_limpeza.get(arquivo, 0) > INTERVALO_LIMPEZA_SEGUNDOS:
+            _ultima_limpeza[arquivo] = agora
+            limpar_rastros(MANTER_RASTROS_DIAS, arquivo, conn)
+    finally:
+        conn.close()
+
+
+def limpar_rastros(dias=MANTER_RASTROS_DIAS, arquivo=ARQUIVO_RASTROS, conn=None) -> int:
+    """Apaga os rastros mais antigos que 'dias'. Retorna quantos foram apagados."""
+    proprio = conn is None
+    conn = conn or _conectar(arquivo)
+    try:
+        limite = time.time() - dias * 86400
+        with conn:
+            conn.execute("DELETE FROM rastros_trechos WHERE rastro_id IN (SELECT id FROM rastros WHERE iniciado_em < ?)",
+                         (limite,))
+            return conn.execute("DELETE FROM rastros WHERE iniciado_em < ?", (limite,)).rowcount
+    finally:
+        if proprio:
+            conn.close()
+
+
+def percentis_por_pagina(dias=7, arquivo=ARQUIVO_RASTROS) -> pd.DataFrame:
+    """
+    p50/p95/p99 do tempo total por página nos últimos 'dias', e o p95 de cada
+    categoria (sql, pdf, grafico, excel, outros). Execuções interrompidas entram
+    com o tempo até o último trecho medido.
+    """
+    colunas = ['pagina', 'execucoes', 'interrompidas', 'p50_ms', 'p95_ms', 'p99_ms'] + \
+              [f"{categoria}_p95_ms" for categoria in CATEGORIAS + ('outros',)]
+    conn = _conectar(arquivo)
+    try:
+        limite = time.time() - dias * 86400
+        rastros = pd.read_sql_query(
+            "SELECT id, pagina, total_ms, concluido FROM rastros WHERE iniciado_em >= ?", conn, params=(limite,))
+        trechos = pd.read_sql_query('''
+            SELECT t.rastro_id, t.categoria, SUM(t.ms) AS ms
+            FROM rastros_trechos t JOIN rastros r ON r.id = t.rastro_id
+            WHERE r.iniciado_em >= ?
+            GROUP BY t.rastro_id, t.categoria
+        ''', conn, params=(limite,))
+    finally:
+        conn.close()
+    if rastros.empty:
+        return pd.DataFrame(columns=colunas)
+
+    por_categoria = trechos.pivot_table(index='rastro_id', columns='categoria', values='ms', aggfunc='sum')
+    por_categoria = por_categoria.reindex(columns=list(CATEGORIAS)).reindex(rastros['id']).fillna(0.0)
+    por_categoria['outros'] = (rastros.set_index('id')['total_ms'] - por_categoria.sum(axis=1)).clip(lower=0)
+    por_categoria['pagina'] = rastros.set_index('id')['pagina']
+
+    linhas = []
+    for pagina, grupo in rastros.groupby('pagina'):
+        totais = grupo['total_ms'].to_numpy()
+        p50, p95, p99 = np.percentile(totais, [50, 95, 99])
+        categorias = por_categoria[por_categoria['pagina'] == pagina]
+        linhas.append([pagina, len(grupo), int((grupo['concluido'] == 0).sum()), p50, p95, p99] +
+                      [float(np.percentile(categorias[categoria], 95)) for categoria in CATEGORIAS + ('outros',)])
+    return pd.DataFrame(linhas, columns=colunas).sort_values('p95_ms', ascending=False, ignore_index=True)
+
+
+def trechos_mais_lentos(pagina, dias=7, limite=10, arquivo=ARQUIVO_RASTROS) -> pd.DataFrame:
+    """Trechos de uma página ordenados pelo tempo médio por execução"""
+    conn = _conectar(arquivo)
+    try:
+        return pd.read_sql_query('''
+            SELECT t.categoria, t.nome, SUM(t.chamadas) AS chamadas,
+                   SUM(t.ms) / COUNT(DISTINCT t.rastro_id) AS ms_por_execucao, MAX(t.ms) AS ms_maximo
+            FROM rastros_trechos t JOIN rastros r ON r.id = t.rastro_id
+            WHERE r.pagina = ? AND r.iniciado_em >= ?
+            GROUP BY t.categoria, t.nome
+            ORDER BY ms_por_execucao DESC
+            LIMIT ?
+        ''', conn, params=(pagina, time.time() - dias * 86400, limite))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempos de renderização por página do app")
+    parser.add_argument('--arquivo', default=ARQUIVO_RASTROS)
+    parser.add_argument('--dias', type=int, default=7, help="Janela dos percentis")
+    parser.add_argument('--pagina', help="Lista os trechos mais lentos da página")
+    parser.add_argument('--limpar', action='store_true', help=f"Apaga rastros com mais de {MANTER_RASTROS_DIAS} dias")
+    args = parser.parse_args()
+
+    if args.limpar:
+        print(f"{limpar_rastros(MANTER_RASTROS_DIAS, args.arquivo)} rastros apagados")
+    elif args.pagina:
+        print(trechos_mais_lentos(args.pagina, args.dias, arquivo=args.arquivo).to_string(index=False))
+    else:
+        tabela = percentis_por_pagina(args.dias, args.arquivo)
+        print(tabela.round(1).to_string(index=False) if not tabela.empty else "Nenhum rastro no período")
@@ -0,0 +1,166 @@
+"""
+Camada de repositório para consultas pontuais (uma linha ou poucas linhas)
+Retorna registros compactos com __slots__ ou sqlite3.Row, sem passar pelo pandas.
+DataFrames continuam sendo usados apenas para exibição de tabelas.
+"""
+import sqlite3
+from typing import List, Optional
+from conexao import obter_pool
+from consultas import CONSULTAS
+
+DB_FILE = 'locadora_v2.db'
+
+
+class Registro:
+    """
+    Registro base com __slots__, acessível por atributo ou por chave
+    (registro.placa ou registro['placa']), como os dicionários usados nos PDFs
+    """
+    __slots__ = ()
+
+    def __getitem__(self, campo):
+        try:
+            return getattr(self, campo)
+        except AttributeError:
+            raise KeyError(campo) from None
+
+    def get(self, campo, padrao=None):
+        return getattr(self, campo, padrao)
+
+    def to_dict(self) -> dict:
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    @classmethod
+    def de_linha(cls, linha: sqlite3.Row):
+        """Cria o registro a partir de uma sqlite3.Row (colunas ausentes ficam None)"""
+        registro = cls.__new__(cls)
+        colunas = linha.keys()
+        for campo in cls.__slots__:
+            setattr(registro, campo, linha[campo] if campo in colunas else None)
+        return registro
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Carro(Registro):
+    __slots__ = ('id', 'modelo', 'placa', 'cor', 'diaria', 'preco_km', 'km_atual', 'status',
+                 'numero_chassi', 'numero_renavam', 'ano_veiculo', 'km_troca_oleo')
+
+    def para_documento(self) -> dict:
+        """Dicionário com os aliases 'chassi' e 'renavam' esperados pelos PDFs"""
+        dados = self.to_dict()
+        dados['chassi'] = self.numero_chassi
+        dados['renavam'] = self.numero_renavam
+        return dados
+
+
+class Cliente(Registro):
+    __slots__ = ('id', 'nome', 'cpf', 'cnh', 'validade_cnh', 'telefone', 'endereco',
+                 'observacoes', 'status')
+
+
+class Reserva(Registro):
+    __slots__ = ('id', 'carro_id', 'cliente_id', 'data_inicio', 'data_fim', 'reserva_status',
+                 'status', 'custo_lavagem', 'valor_total', 'km_saida', 'km_volta', 'km_franquia',
+                 'adiantamento', 'valor_multas', 'valor_danos', 'valor_outros')
+
+
+def _executar(conn, query, params):
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    return cursor.execute(query, params)
+
+
+def buscar_linha(query, params=(), db_file=DB_FILE) -> Optional[sqlite3.Row]:
+    """Executa uma query e retorna a primeira linha (ou None)"""
+    with obter_pool(db_file).conexao() as conn:
+        return _executar(conn, query, params).fetchone()
+
+
+def buscar_linhas(query, params=(), db_file=DB_FILE) -> List[sqlite3.Row]:
+    """Executa uma query de resultado pequeno e retorna a lista de linhas"""
+    with obter_pool(db_file).conexao() as conn:
+        return _executar(conn, query, params).fetchall()
+
+
+def buscar_carro(carro_id, db_file=DB_FILE) -> Optional[Carro]:
+    """Busca um carro pelo ID"""
+    linha = buscar_linha(CONSULTAS['carro_por_id'], (int(carro_id),), db_file)
+    return Carro.de_linha(linha) if linha else None
+
+
+def buscar_cliente(cliente_id, db_file=DB_FILE) -> Optional[Cliente]:
+    """Busca um cliente pelo ID"""
+    linha = buscar_linha(CONSULTAS['cliente_por_id'], (int(cliente_id),), db_file)
+    return Cliente.de_linha(linha) if linha else None
+
+
+def buscar_reserva(reserva_id, db_file=DB_FILE) -> Optional[Reserva]:
+    """Busca uma reserva pelo ID"""
+    linha = buscar_linha(CONSULTAS['reserva_por_id'], (int(reserva_id),), db_file)
+    return Reserva.de_linha(linha) if linha else None
+
+
+def buscar_dados_recibo(reserva_id, db_file=DB_FILE) -> Optional[sqlite3.Row]:
+    """Busca a reserva com os dados de cliente e carro necessários para o recibo"""
+    return buscar_linha(CONSULTAS['reserva_dados_recibo'], (int(reserva_id),), db_file)
+
+
+def contar_reservas_ativas_cliente(cliente_id, db_file=DB_FILE) -> int:
+    """Conta as reservas Reservada/Locada de um cliente"""
+    linha = buscar_linha(CONSULTAS['cliente_reservas_ativas'], (int(cliente_id),), db_file)
+    return linha[0]
+
+
+class ContextoDados:
+    """
+    Mapa de identidade válido por uma execução do script (rerun).
+    Cada entidade (tabela + id) é carregada do banco no máximo uma vez;
+    as escritas feitas pelo fluxo atualizam o registro já carregado.
+    """
+
+    _buscas = {
+        'carros': buscar_carro,
+        'clientes': buscar_cliente,
+        'reservas': buscar_reserva,
+    }
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self._mapa = {}
+        self.acertos = 0
+        self.falhas = 0
+
+    def _obter(self, tabela, registro_id):
+        chave = (tabela, int(registro_id))
+        if chave in self._mapa:
+            self.acertos += 1
+            return self._mapa[chave]
+        self.falhas += 1
+        registro = self._buscas[tabela](registro_id, self.db_file)
+        self._mapa[chave] = registro
+        return registro
+
+    def carro(self, carro_id) -> Optional[Carro]:
+        return self._obter('carros', carro_id)
+
+    def cliente(self, cliente_id) -> Optional[Cliente]:
+        return self._obter('clientes', cliente_id)
+
+    def reserva(self, reserva_id) -> Optional[Reserva]:
+        return self._obter('reservas', reserva_id)
+
+    def atualizar(self, tabela, registro_id, **campos):
+        """Aplica no registro carregado os valores gravados no banco pelo fluxo"""
+        registro = self._mapa.get((tabela, int(registro_id)))
+        if registro is not None:
+            for campo, valor in campos.items():
+                setattr(registro, campo, valor)
+
+    def invalidar(self, tabela, registro_id):
+        """Descarta um registro (ex.: após uma escrita não refletida em atualizar)"""
+        self._mapa.pop((tabela, int(registro_id)), None)
+
+    def estatisticas(self) -> dict:
+        return {'acertos': self.acertos, 'falhas': self.falhas, 'entidades': len(self._mapa)}
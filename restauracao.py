@@ -0,0 +1,238 @@
+"""
+Restauração de backup sem parar a aplicação
+O backup nunca é copiado por cima do banco em uso. A restauração acontece em
+etapas, cada uma medida:
+
+1. cópia: o backup é copiado (API de backup do SQLite, lendo o backup em modo
+   somente leitura) para um arquivo de preparação ao lado do banco;
+2. verificação: PRAGMA quick_check na preparação e conferência do esquema (as
+   tabelas principais e todas as colunas que o banco atual tem nelas), para não
+   trocar o banco por um arquivo corrompido ou de uma versão antiga;
+3. segurança: cópia consistente do banco atual para a pasta de backups;
+4. troca: a preparação é copiada para dentro do banco em uso em uma única
+   transação. As outras conexões (de qualquer réplica) leem o banco anterior
+   ou o restaurado, nunca um arquivo pela metade. Renomear a preparação por
+   cima do banco não é seguro com conexões abertas (o journal/WAL do banco
+   anterior seria aplicado ao novo), então isso só é feito quando o banco atual
+   não existe ou está ilegível;
+5. a marca '<banco>.geracao' é regravada: o pool de cada réplica percebe a
+   troca no próximo empréstimo, descarta as conexões e avisa os caches do
+   processo (ver conexao.py). A cópia analítica é descartada e refeita por
+   completo na próxima leitura.
+
+Uso pela linha de comando:
+    python restauracao.py backups/locadora_backup_20250101_120000.db
+    python restauracao.py backups/locadora_backup_20250101_120000.db --banco locadora_centro.db
+    python restauracao.py --verificar backups/locadora_backup_20250101_120000.db   # só as etapas 1 e 2
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from conexao import arquivo_geracao, uri_somente_leitura, verificar_restauracao
+from saude_banco import TABELAS_PRINCIPAIS
+from snapshot_analitico import arquivo_snapshot
+
+DB_FILE = 'locadora_v2.db'
+
+# Páginas copiadas por passo na preparação (o backup não é o banco em uso, então não há pausa)
+PAGINAS_POR_PASSO = 4096
+
+# Espera máxima (s) pelo lock de escrita do banco em uso durante a troca
+ESPERA_TROCA = 30
+
+# Problemas listados pelo quick_check antes de desistir
+MAXIMO_PROBLEMAS = 20
+
+_lock = threading.Lock()
+
+
+def _colunas(conn, tabela: str) -> set:
+    return {linha[1] for linha in conn.execute(f'PRAGMA table_info("{tabela}")')}
+
+
+def copiar_banco(origem: str, destino: str, paginas: int = PAGINAS_POR_PASSO):
+    """Cópia consistente de um banco SQLite (API de backup) para um arquivo novo"""
+    conn_origem = sqlite3.connect(uri_somente_leitura(origem), uri=True, timeout=ESPERA_TROCA)
+    conn_destino = sqlite3.connect(destino)
+    try:
+        conn_origem.backup(conn_destino, pages=paginas)
+    finally:
+        conn_destino.close()
+        conn_origem.close()
+
+
+def verificar_preparacao(preparacao: str, db_file=DB_FILE) -> list:
+    """
+    quick_check do arquivo preparado e conferência do esquema contra o banco atual.
+    Retorna a lista de problemas (vazia se o arquivo pode entrar no lugar do banco).
+    """
+    conn = sqlite3.connect(uri_somente_leitura(preparacao), uri=True)
+    try:
+        problemas = [linha for (linha,) in conn.execute(f"PRAGMA quick_check({MAXIMO_PROBLEMAS})")]
+        if problemas != ['ok']:
+            return [f"quick_check: {problema}" for problema in problemas]
+        tabelas = {nome for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        problemas = [f"Tabela ausente no backup: {tabela}" for tabela in TABELAS_PRINCIPAIS if tabela not in tabelas]
+
+        # Colunas que a aplicação já usa no banco atual (ALTER TABLE feitos depois do backup)
+        if os.path.exists(db_file):
+            try:
+                atual = sqlite3.connect(uri_somente_leitura(db_file), uri=True, timeout=ESPERA_TROCA)
+                try:
+                    esperadas = {tabela: _colunas(atual, tabela) for tabela in TABELAS_PRINCIPAIS}
+                finally:
+                    atual.close()
+            except sqlite3.DatabaseError:
+                esperadas = {}  # Banco atual ilegível: vale só a presença das tabelas
+            for tabela, colunas in esperadas.items():
+                if tabela in tabelas:
+                    faltando = sorted(colunas - _colunas(conn, tabela))
+                    if faltando:
+                        problemas.append(f"Colunas ausentes em {tabela}: {', '.join(faltando)}")
+        return problemas
+    finally:
+        conn.close()
+
+
+def _legivel(db_file: str) -> bool:
+    try:
+        conn = sqlite3.connect(uri_somente_leitura(db_file), uri=True, timeout=ESPERA_TROCA)
+        try:
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.OperationalError as e:
+        return 'locked' in str(e)  # Em uso, mas legível
+    except sqlite3.DatabaseError:
+        return False
+    return True
+
+
+def _trocar(preparacao: str, db_file: str) -> str:
+    """Coloca a preparação no lugar do banco; retorna o modo usado ('transacao' ou 'substituicao')"""
+    if os.path.exists(db_file) and _legivel(db_file):
+        origem = sqlite3.connect(uri_somente_leitura(preparacao), uri=True)
+        destino = sqlite3.connect(db_file, timeout=ESPERA_TROCA)
+        try:
+            # pages=-1: todas as páginas em um passo, confirmado como uma única transação
+            origem.backup(destino, pages=-1)
+        finally:
+            destino.close()
+            origem.close()
+        return 'transacao'
+
+    # Banco atual ausente ou ilegível: não há leitores a proteger
+    for sufixo in ('-journal', '-wal', '-shm'):
+        if os.path.exists(db_file + sufixo):
+            os.remove(db_file + sufixo)
+    os.replace(preparacao, db_file)
+    return 'substituicao'
+
+
+def _anunciar(db_file: str, relatorio: dict):
+    """Regrava a marca de geração (troca atômica do arquivo: novo inode)"""
+    temporario = f"{arquivo_geracao(db_file)}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, default=str)
+    os.replace(temporario, arquivo_geracao(db_file))
+
+
+def ultima_restauracao(db_file=DB_FILE):
+    """Relatório da última restauração do banco (ver restaurar), ou None"""
+    try:
+        with open(arquivo_geracao(db_file), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def restaurar(backup_file: str, db_file=DB_FILE, copia_seguranca: str = None, somente_verificar: bool = False):
+    """
+    Restaura o backup no banco em uso (ver as etapas no início do módulo).
+    copia_seguranca: caminho para a cópia do banco atual antes da troca (None: sem cópia).
+    Retorna (True, relatorio) ou (False, mensagem). O relatório traz o tempo de
+    cada etapa em 'etapas' (segundos), o total e o tamanho do backup.
+    """
+    if not os.path.exists(backup_file):
+        return False, "Arquivo de backup não encontrado"
+    if os.path.exists(db_file) and os.path.samefile(backup_file, db_file):
+        return False, "O backup informado é o próprio banco em uso"
+
+    with _lock:
+        inicio = time.perf_counter()
+        etapas = {}
+        preparacao = f"{db_file}.restaurando.{os.getpid()}.{threading.get_ident()}"
+        try:
+            try:
+                copiar_banco(backup_file, preparacao)
+            except sqlite3.DatabaseError as e:
+                return False, f"Backup ilegível: {e}"
+            etapas['copia'] = time.perf_counter() - inicio
+
+            marca = time.perf_counter()
+            problemas = verificar_preparacao(preparacao, db_file)
+            etapas['verificacao'] = time.perf_counter() - marca
+            if problemas:
+                return False, "Backup recusado: " + "; ".join(problemas)
+
+            relatorio = {
+                'backup': backup_file,
+                'tamanho': os.path.getsize(backup_file),
+                'etapas': etapas,
+            }
+            if somente_verificar:
+                relatorio['segundos'] = time.perf_counter() - inicio
+                return True, relatorio
+
+            if copia_seguranca and os.path.exists(db_file):
+                marca = time.perf_counter()
+                if _legivel(db_file):
+                    copiar_banco(db_file, copia_seguranca)
+                else:
+                    shutil.copyfile(db_file, copia_seguranca)  # Ilegível: guarda o arquivo como está
+                relatorio['copia_seguranca'] = copia_seguranca
+                etapas['seguranca'] = time.perf_counter() - marca
+
+            marca = time.perf_counter()
+            relatorio['modo'] = _trocar(preparacao, db_file)
+            etapas['troca'] = time.perf_counter() - marca
+        finally:
+            if os.path.exists(preparacao):
+                os.remove(preparacao)
+
+        # A cópia analítica acompanha o change_log do banco anterior: é refeita por completo
+        if os.path.exists(arquivo_snapshot(db_file)):
+            os.remove(arquivo_snapshot(db_file))
+        relatorio['segundos'] = time.perf_counter() - inicio
+        relatorio['restaurado_em'] = datetime.now().isoformat(timespec='seconds')
+        _anunciar(db_file, relatorio)
+    verificar_restauracao(db_file)  # Este processo troca as conexões e avisa os caches agora
+    return True, relatorio
+
+
+def descrever_relatorio(relatorio: dict) -> str:
+    """Resumo de uma linha: total e tempo de cada etapa"""
+    etapas = ', '.join(f"{nome} {segundos * 1000:.0f} ms" for nome, segundos in relatorio['etapas'].items())
+    return f"{relatorio['segundos']:.2f}s ({etapas})"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Restaura um backup no banco em uso, sem parar a aplicação")
+    parser.add_argument('backup')
+    parser.add_argument('--banco', default=DB_FILE)
+    parser.add_argument('--seguranca', help="Caminho para a cópia do banco atual antes da troca")
+    parser.add_argument('--verificar', action='store_true', help="Só prepara e verifica o backup")
+    args = parser.parse_args()
+
+    sucesso, resultado = restaurar(args.backup, args.banco, args.seguranca, args.verificar)
+    if not sucesso:
+        print(resultado)
+        sys.exit(1)
+    acao = "verificado" if args.verificar else f"restaurado ({resultado['modo']})"
+    print(f"Backup {acao} em {descrever_relatorio(resultado)}")
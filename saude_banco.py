@@ -0,0 +1,180 @@
+"""
+Verificação de saúde do banco em níveis
+- Início do processo: PRAGMA quick_check e presença das tabelas principais,
+  uma vez por processo e por banco (estado_saude guarda o resultado). Os
+  reruns do Streamlit só leem esse estado.
+- Agendada: PRAGMA integrity_check completo (lê o banco inteiro, inclusive os
+  índices), com o resultado gravado em saude_verificacoes e exibido na página
+  Backup para os administradores.
+- Sonda: uma leitura do esquema com conexão somente leitura, para o health
+  check da plataforma de deploy (GET /api/saude ou python saude_banco.py --sonda).
+
+Uso pela linha de comando:
+    python saude_banco.py                # última verificação completa registrada
+    python saude_banco.py --completa     # executa e grava o integrity_check
+    python saude_banco.py --sonda        # sai com código 1 se o banco não responde
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from conexao import ao_restaurar, uri_somente_leitura
+
+DB_FILE = 'locadora_v2.db'
+
+TABELAS_PRINCIPAIS = ('carros', 'clientes', 'reservas')
+
+# Problemas listados por verificação (o integrity_check para depois desse número)
+MAXIMO_PROBLEMAS = 20
+
+# Verificações completas mantidas no histórico
+MANTER_VERIFICACOES = 100
+
+
+def _tabelas(conn) -> list:
+    return [nome for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+
+
+def verificar_rapido(db_file=DB_FILE) -> dict:
+    """
+    PRAGMA quick_check (páginas e registros, sem conferir os índices contra as
+    tabelas) e presença das tabelas principais. Não cria o arquivo se ele não existe.
+    """
+    inicio = time.perf_counter()
+    if not os.path.exists(db_file):
+        return {'healthy': False, 'error': f"Banco não encontrado: {db_file}", 'tables': []}
+    try:
+        conn = sqlite3.connect(db_file, timeout=30)
+        try:
+            tabelas = _tabelas(conn)
+            problemas = [linha for (linha,) in conn.execute(f"PRAGMA quick_check({MAXIMO_PROBLEMAS})")]
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return {'healthy': False, 'error': str(e), 'tables': []}
+    integridade = 'ok' if problemas == ['ok'] else '; '.join(problemas)
+    return {
+        'healthy': integridade == 'ok' and all(tabela in tabelas for tabela in TABELAS_PRINCIPAIS),
+        'tables': tabelas,
+        'integrity': integridade,
+        'verificado_em': datetime.now(),
+        'segundos': time.perf_counter() - inicio,
+    }
+
+
+_estados = {}
+_estados_lock = threading.Lock()
+
+
+def estado_saude(db_file=DB_FILE) -> dict:
+    """Resultado de verificar_rapido guardado para o processo (a verificação roda uma vez por banco)"""
+    with _estados_lock:
+        if db_file not in _estados:
+            _estados[db_file] = verificar_rapido(db_file)
+        return _estados[db_file]
+
+
+@ao_restaurar
+def invalidar_saude(db_file=DB_FILE):
+    """Descarta o estado guardado (após criar, restaurar ou substituir o banco)"""
+    with _estados_lock:
+        _estados.pop(db_file, None)
+
+
+def _instalar_historico(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS saude_verificacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            verificado_em TIMESTAMP NOT NULL,
+            ok INTEGER NOT NULL,
+            resultado TEXT NOT NULL,
+            segundos REAL NOT NULL
+        )
+    ''')
+
+
+def verificar_integridade(db_file=DB_FILE) -> dict:
+    """
+    PRAGMA integrity_check completo, gravado em saude_verificacoes.
+    Retorna {'ok', 'resultado', 'segundos', 'verificado_em'}.
+    """
+    verificado_em = datetime.now()
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        problemas = [linha for (linha,) in conn.execute(f"PRAGMA integrity_check({MAXIMO_PROBLEMAS})")]
+        segundos = time.perf_counter() - inicio
+        ok = problemas == ['ok']
+        resultado = 'ok' if ok else '\n'.join(problemas)
+        _instalar_historico(conn)
+        conn.execute("INSERT INTO saude_verificacoes (verificado_em, ok, resultado, segundos) VALUES (?, ?, ?, ?)",
+                     (verificado_em, int(ok), resultado, segundos))
+        conn.execute("DELETE FROM saude_verificacoes WHERE id <= (SELECT MAX(id) FROM saude_verificacoes) - ?",
+                     (MANTER_VERIFICACOES,))
+        conn.commit()
+    finally:
+        conn.close()
+    return {'ok': ok, 'resultado': resultado, 'segundos': segundos, 'verificado_em': verificado_em}
+
+
+def ultima_verificacao(db_file=DB_FILE):
+    """Última verificação completa registrada ({'verificado_em', 'ok', 'resultado', 'segundos'}) ou None"""
+    conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.row_factory = sqlite3.Row
+    try:
+        linha = conn.execute('''
+            SELECT verificado_em, ok, resultado, segundos FROM saude_verificacoes ORDER BY id DESC LIMIT 1
+        ''').fetchone()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    return dict(linha, ok=bool(linha['ok'])) if linha else None
+
+
+def sonda(db_file=DB_FILE) -> dict:
+    """
+    Health check leve: abre o banco somente leitura e lê o esquema (algumas
+    páginas, qualquer que seja o tamanho do banco). Retorna {'ok', 'milissegundos', 'erro'?}.
+    """
+    inicio = time.perf_counter()
+    try:
+        conn = sqlite3.connect(uri_somente_leitura(db_file), uri=True, timeout=5)
+        try:
+            tabelas = _tabelas(conn)
+        finally:
+            conn.close()
+        faltando = [tabela for tabela in TABELAS_PRINCIPAIS if tabela not in tabelas]
+        resultado = {'ok': not faltando}
+        if faltando:
+            resultado['erro'] = f"Tabelas ausentes: {', '.join(faltando)}"
+    except sqlite3.Error as e:
+        resultado = {'ok': False, 'erro': str(e)}
+    resultado['milissegundos'] = round((time.perf_counter() - inicio) * 1000, 2)
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Saúde do banco de dados da locadora")
+    parser.add_argument('--completa', action='store_true', help="Executa e grava o PRAGMA integrity_check")
+    parser.add_argument('--sonda', action='store_true', help="Verificação leve (código de saída 1 se falhar)")
+    parser.add_argument('--banco', default=DB_FILE)
+    args = parser.parse_args()
+
+    if args.sonda:
+        resultado = sonda(args.banco)
+        print(f"{'✅' if resultado['ok'] else '❌'} {args.banco}: {resultado.get('erro', 'ok')} "
+              f"({resultado['milissegundos']} ms)")
+        sys.exit(0 if resultado['ok'] else 1)
+    if args.completa:
+        verificacao = verificar_integridade(args.banco)
+    else:
+        verificacao = ultima_verificacao(args.banco)
+        if verificacao is None:
+            print("Nenhuma verificação completa registrada (use --completa)")
+            sys.exit(0)
+    print(f"{'✅' if verificacao['ok'] else '❌'} integrity_check em {verificacao['verificado_em']:%d/%m/%Y %H:%M} "
+          f"({verificacao['segundos']:.2f}s): {verificacao['resultado']}")
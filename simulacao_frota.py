@@ -0,0 +1,268 @@
+"""
+Dimensionamento da frota por simulação de Monte Carlo (NumPy)
+A demanda é ajustada a partir do histórico de reservas de cada modelo: pedidos
+por dia (Poisson, com uma taxa para cada dia da semana) e dias bloqueados por
+locação (distribuição empírica, de data_inicio até data_fim inclusive, a mesma
+regra de conflito das reservas). Para cada tamanho de frota candidato, milhares
+de cenários do horizonte são simulados de uma vez em matrizes NumPy: o pedido
+que chega sem carro livre é recusado.
+
+- Os cenários são divididos em lotes de tamanho fixo, com sementes derivadas da
+  semente principal: o resultado não depende do número de processos. Os lotes
+  rodam em um pool de processos.
+- Todos os tamanhos de frota usam as mesmas chegadas (números aleatórios
+  comuns), então as diferenças entre eles não são ruído da simulação.
+- Cada cenário começa com a frota toda livre: em horizontes curtos a
+  utilização sai um pouco abaixo do regime.
+- O histórico só registra a demanda atendida (quem não encontrou carro não
+  reservou): em modelos sempre lotados, use --fator-demanda para testar cenários.
+
+Uso pela linha de comando:
+    python simulacao_frota.py                          # frota atual de cada modelo, -2 a +3 carros
+    python simulacao_frota.py --execucoes 10000 --dias 365 --fator-demanda 1.2
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, Iterable
+import numpy as np
+import pandas as pd
+from cache_sync import obter_cache
+from conexao import obter_pool
+from consultas import CONSULTAS
+from pdfgenerator import STATUS_CARRO
+
+DB_FILE = 'locadora_v2.db'
+
+# Histórico (em dias) usado para ajustar a demanda
+JANELA_HISTORICO_DIAS = 365
+
+HORIZONTE_PADRAO_DIAS = 365
+EXECUCOES_PADRAO = 10000
+
+# Cenários simulados por tarefa do pool (fixo: o resultado não depende do número de processos)
+EXECUCOES_POR_LOTE = 2500
+
+# Tamanhos candidatos em torno da frota atual de cada modelo
+CANDIDATOS_ABAIXO = 2
+CANDIDATOS_ACIMA = 3
+
+# Locações mais longas que isso são truncadas (limita o buffer de devoluções)
+DURACAO_MAXIMA_DIAS = 90
+
+# Abaixo desse número de locações o modelo usa a distribuição de durações da frota inteira
+MINIMO_AMOSTRAS_DURACAO = 10
+
+SEMENTE_PADRAO = 42
+
+
+def ajustar_demanda(reservas: pd.DataFrame, hoje: date = None,
+                    janela_dias: int = JANELA_HISTORICO_DIAS) -> Dict[str, dict]:
+    """
+    Ajusta a demanda de cada modelo.
+
+    reservas: colunas modelo, data_inicio, data_fim (reservas não canceladas)
+
+    Retorna {modelo: {'taxas': pedidos médios por dia da semana (segunda = 0),
+    'duracoes': dias bloqueados de cada locação observada}}
+    """
+    hoje = pd.Timestamp(hoje or date.today())
+    inicio_janela = hoje - pd.Timedelta(days=janela_dias)
+
+    inicio = pd.to_datetime(reservas['data_inicio'], errors='coerce')
+    fim = pd.to_datetime(reservas['data_fim'], errors='coerce')
+    validas = (inicio >= inicio_janela) & (inicio < hoje) & fim.notna()
+    inicio, fim, modelos = inicio[validas], fim[validas], reservas['modelo'][validas].fillna('')
+    duracoes = ((fim - inicio).dt.days + 1).clip(1, DURACAO_MAXIMA_DIAS).astype(int)
+
+    # Quantas vezes cada dia da semana aparece na janela (denominador das taxas)
+    ocorrencias = pd.date_range(inicio_janela, hoje - pd.Timedelta(days=1)).dayofweek.value_counts()
+    ocorrencias = ocorrencias.reindex(range(7), fill_value=0).to_numpy()
+    pedidos = pd.crosstab(modelos, inicio.dt.dayofweek).reindex(columns=range(7), fill_value=0)
+
+    duracoes_frota = duracoes.to_numpy()
+    demanda = {}
+    for modelo, contagem in pedidos.iterrows():
+        duracoes_modelo = duracoes[modelos == modelo].to_numpy()
+        demanda[modelo] = {
+            'taxas': contagem.to_numpy() / np.maximum(ocorrencias, 1),
+            'duracoes': duracoes_modelo if len(duracoes_modelo) >= MINIMO_AMOSTRAS_DURACAO else duracoes_frota,
+        }
+    return demanda
+
+
+def simular_lote(taxas, duracoes, tamanhos, horizonte: int, execucoes: int,
+                 dia_semana_inicial: int, semente) -> dict:
+    """
+    Simula 'execucoes' cenários do horizonte para cada tamanho de frota.
+    Retorna {'utilizacao': (tamanhos x execucoes) fração dos carros-dia ocupados,
+    'recusados': (tamanhos x execucoes) pedidos recusados, 'pedidos': (execucoes,) pedidos recebidos}
+    """
+    rng = np.random.default_rng(semente)
+    tamanhos = np.asarray(tamanhos, dtype=np.int64)
+    duracoes = np.asarray(duracoes, dtype=np.int64)
+    dias_semana = (dia_semana_inicial + np.arange(horizonte)) % 7
+    chegadas = rng.poisson(np.asarray(taxas, dtype=float)[dias_semana][:, None], size=(horizonte, execucoes))
+
+    # Estado achatado: um elemento por (tamanho de frota, cenário)
+    total = len(tamanhos) * execucoes
+    frota = np.repeat(tamanhos, execucoes)
+    cenarios = np.arange(total)
+    em_uso = np.zeros(total, dtype=np.int64)
+    ocupacao = np.zeros(total, dtype=np.int64)
+    recusados = np.zeros(total, dtype=np.int64)
+
+    # Devoluções agendadas em um buffer circular (uma linha por dia à frente)
+    linhas = int(duracoes.max()) + 1 if len(duracoes) else 1
+    devolucoes = np.zeros(linhas * total, dtype=np.int64)
+
+    for dia in range(horizonte):
+        linha = (dia % linhas) * total
+        em_uso -= devolucoes[linha:linha + total]
+        devolucoes[linha:linha + total] = 0
+
+        pedidos = np.tile(chegadas[dia], len(tamanhos))
+        aceitos = np.minimum(pedidos, frota - em_uso)
+        recusados += pedidos - aceitos
+        quantidade = int(aceitos.sum())
+        if quantidade:
+            # Cada locação aceita devolve o carro 'duração' dias depois (dia seguinte ao data_fim)
+            dias_devolucao = (dia + rng.choice(duracoes, size=quantidade)) % linhas
+            np.add.at(devolucoes, dias_devolucao * total + np.repeat(cenarios, aceitos), 1)
+            em_uso += aceitos
+        ocupacao += em_uso
+
+    forma = (len(tamanhos), execucoes)
+    return {
+        'utilizacao': (ocupacao / (horizonte * np.maximum(frota, 1))).reshape(forma),
+        'recusados': recusados.reshape(forma),
+        'pedidos': chegadas.sum(axis=0),
+    }
+
+
+def _simular_tarefa(tarefa):
+    modelo, argumentos = tarefa
+    return modelo, simular_lote(*argumentos)
+
+
+def simular_frota(demanda: Dict[str, dict], tamanhos: Dict[str, Iterable[int]],
+                  horizonte: int = HORIZONTE_PADRAO_DIAS, execucoes: int = EXECUCOES_PADRAO,
+                  inicio: date = None, fator_demanda: float = 1.0, semente: int = SEMENTE_PADRAO,
+                  processos: int = None) -> pd.DataFrame:
+    """
+    Simula cada modelo de 'demanda' nos tamanhos de frota candidatos.
+    processos: tamanho do pool (padrão: número de CPUs; 1 simula no próprio processo)
+
+    Retorna um DataFrame com uma linha por (modelo, carros) e as colunas
+    utilizacao_pct, utilizacao_p10, utilizacao_p90, pedidos, recusados,
+    recusados_p95 e demanda_recusada_pct (médias por cenário do horizonte)
+    """
+    inicio = inicio or date.today()
+    tarefas = []
+    for indice, (modelo, parametros) in enumerate(sorted(demanda.items())):
+        candidatos = sorted({int(t) for t in tamanhos.get(modelo, ()) if int(t) >= 0})
+        if not candidatos:
+            continue
+        lotes = [min(EXECUCOES_POR_LOTE, execucoes - i) for i in range(0, execucoes, EXECUCOES_POR_LOTE)]
+        sementes = np.random.SeedSequence([semente, indice]).spawn(len(lotes))
+        for lote, semente_lote in zip(lotes, sementes):
+            tarefas.append((modelo, (parametros['taxas'] * fator_demanda, parametros['duracoes'], candidatos,
+                                     horizonte, lote, inicio.weekday(), semente_lote)))
+
+    processos = min(processos or os.cpu_count() or 1, len(tarefas))
+    if processos <= 1:
+        resultados = [_simular_tarefa(tarefa) for tarefa in tarefas]
+    else:
+        # 'spawn' evita copiar por fork as threads do servidor Streamlit
+        with ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn')) as executor:
+            resultados = list(executor.map(_simular_tarefa, tarefas))
+
+    por_modelo = {}
+    for (modelo, resultado), tarefa in zip(resultados, tarefas):
+        por_modelo.setdefault(modelo, (tarefa[1][2], []))[1].append(resultado)
+
+    linhas = []
+    for modelo, (candidatos, lotes) in por_modelo.items():
+        utilizacao = np.concatenate([lote['utilizacao'] for lote in lotes], axis=1) * 100
+        recusados = np.concatenate([lote['recusados'] for lote in lotes], axis=1)
+        pedidos = np.concatenate([lote['pedidos'] for lote in lotes])
+        for posicao, carros in enumerate(candidatos):
+            linhas.append({
+                'modelo': modelo,
+                'carros': carros,
+                'utilizacao_pct': utilizacao[posicao].mean(),
+                'utilizacao_p10': np.percentile(utilizacao[posicao], 10),
+                'utilizacao_p90': np.percentile(utilizacao[posicao], 90),
+                'pedidos': pedidos.mean(),
+                'recusados': recusados[posicao].mean(),
+                'recusados_p95': np.percentile(recusados[posicao], 95),
+                'demanda_recusada_pct': recusados[posicao].sum() / max(pedidos.sum(), 1) * 100,
+            })
+
+    colunas = ['modelo', 'carros', 'utilizacao_pct', 'utilizacao_p10', 'utilizacao_p90', 'pedidos',
+               'recusados', 'recusados_p95', 'demanda_recusada_pct']
+    return pd.DataFrame(linhas, columns=colunas).round(2)
+
+
+def tamanhos_candidatos(frota_atual: Dict[str, int]) -> Dict[str, range]:
+    """Frota atual de cada modelo, de CANDIDATOS_ABAIXO carros a menos a CANDIDATOS_ACIMA a mais"""
+    return {modelo: range(max(1, atual - CANDIDATOS_ABAIXO), atual + CANDIDATOS_ACIMA + 1)
+            for modelo, atual in frota_atual.items()}
+
+
+def carregar_simulacao(db_file=DB_FILE, hoje: date = None, horizonte: int = HORIZONTE_PADRAO_DIAS,
+                       execucoes: int = EXECUCOES_PADRAO, fator_demanda: float = 1.0,
+                       semente: int = SEMENTE_PADRAO, processos: int = None) -> pd.DataFrame:
+    """
+    Ajusta a demanda com o histórico do banco e simula os tamanhos candidatos de cada modelo
+    (coluna frota_atual com o número de carros ativos do modelo hoje)
+    """
+    hoje = hoje or date.today()
+    with obter_pool(db_file).conexao() as conn:
+        reservas = pd.read_sql_query(CONSULTAS['simulacao_reservas'], conn,
+                                     params=(hoje - timedelta(days=JANELA_HISTORICO_DIAS),))
+        frota = dict(conn.execute(CONSULTAS['simulacao_frota_modelos'],
+                                  (STATUS_CARRO['INDISPONIVEL'], STATUS_CARRO['EXCLUIDO'])).fetchall())
+
+    demanda = ajustar_demanda(reservas, hoje)
+    resultado = simular_frota(demanda, tamanhos_candidatos({modelo: frota.get(modelo, 0) for modelo in demanda}),
+                              horizonte, execucoes, hoje, fator_demanda, semente, processos)
+    resultado.insert(2, 'frota_atual', resultado['modelo'].map(frota).fillna(0).astype(int))
+    return resultado
+
+
+def obter_simulacao_frota(db_file=DB_FILE, hoje: date = None, horizonte: int = HORIZONTE_PADRAO_DIAS,
+                          execucoes: int = EXECUCOES_PADRAO, fator_demanda: float = 1.0,
+                          semente: int = SEMENTE_PADRAO) -> pd.DataFrame:
+    """
+    Simulação em cache por versão dos dados: só é refeita quando carros ou
+    reservas mudam (ou quando o dia vira, ou com outros parâmetros)
+    """
+    hoje = hoje or date.today()
+    resultado = obter_cache(db_file).obter(
+        ('simulacao_frota', hoje.isoformat(), horizonte, execucoes, fator_demanda, semente),
+        ('carros', 'reservas'),
+        lambda: carregar_simulacao(db_file, hoje, horizonte, execucoes, fator_demanda, semente)
+    )
+    return resultado.copy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simula a utilização e a demanda recusada por tamanho de frota")
+    parser.add_argument('--dias', type=int, default=HORIZONTE_PADRAO_DIAS, help="Horizonte simulado")
+    parser.add_argument('--execucoes', type=int, default=EXECUCOES_PADRAO, help="Cenários por tamanho de frota")
+    parser.add_argument('--fator-demanda', type=float, default=1.0, help="Multiplica a demanda observada")
+    parser.add_argument('--semente', type=int, default=SEMENTE_PADRAO)
+    parser.add_argument('--processos', type=int, default=None)
+    parser.add_argument('--banco', default=DB_FILE)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    tabela = carregar_simulacao(args.banco, horizonte=args.dias, execucoes=args.execucoes,
+                                fator_demanda=args.fator_demanda, semente=args.semente, processos=args.processos)
+    print(f"{args.execucoes} cenários de {args.dias} dias em {time.perf_counter() - inicio:.1f}s\n")
+    with pd.option_context('display.width', 200, 'display.max_rows', None):
+        print(tabela.to_string(index=False))
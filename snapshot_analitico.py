@@ -0,0 +1,223 @@
+"""
+Cópia analítica (somente leitura) do banco para o Histórico e os Relatórios
+As consultas pesadas de relatório leem uma cópia separada do banco, e não o
+arquivo em que o balcão grava reservas.
+
+- A primeira cópia (e a reconstrução, quando necessária) usa a API de backup do
+  SQLite em passos curtos, liberando o banco entre um passo e outro.
+- As atualizações seguintes são incrementais: apenas as linhas registradas no
+  change_log (ver cache_sync.py) desde a última atualização são recopiadas.
+
+Uso pela linha de comando:
+    python snapshot_analitico.py             # atualização incremental
+    python snapshot_analitico.py --completo  # reconstrói a cópia
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from arquivo_reservas import criar_visao_historico
+from cache_sync import instalar_change_log
+from conexao import uri_somente_leitura
+from rastreamento import rastreado
+
+DB_FILE = 'locadora_v2.db'
+
+# Tabelas mantidas atualizadas na cópia analítica
+TABELAS_SNAPSHOT = ('carros', 'clientes', 'reservas')
+
+# Idade máxima (segundos) antes de uma consulta disparar a atualização incremental
+IDADE_MAXIMA = 60
+
+# Páginas copiadas por passo da API de backup (o banco fica livre entre os passos)
+PAGINAS_POR_PASSO = 1024
+
+_lock = threading.Lock()
+
+
+def arquivo_snapshot(db_file=DB_FILE) -> str:
+    """Caminho da cópia analítica: locadora_v2.db -> locadora_v2_analitico.db"""
+    base, extensao = os.path.splitext(db_file)
+    return f"{base}_analitico{extensao}"
+
+
+def _ultimo_change_id(conn, esquema='main') -> int:
+    return conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {esquema}.change_log").fetchone()[0]
+
+
+def _gravar_info(conn, ultimo_change_id: int):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS snapshot_info (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            ultimo_change_id INTEGER NOT NULL,
+            atualizado_em REAL NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR REPLACE INTO snapshot_info (id, ultimo_change_id, atualizado_em) VALUES (1, ?, ?)",
+                 (ultimo_change_id, time.time()))
+
+
+def _ler_info(destino: str):
+    """(ultimo_change_id, atualizado_em) da cópia, ou None se ela não existe ou está incompleta"""
+    if not os.path.exists(destino):
+        return None
+    conn = sqlite3.connect(destino)
+    try:
+        return conn.execute("SELECT ultimo_change_id, atualizado_em FROM snapshot_info WHERE id = 1").fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def reconstruir_snapshot(db_file=DB_FILE) -> dict:
+    """
+    Copia o banco inteiro com a API de backup para um arquivo temporário e o
+    coloca no lugar da cópia atual (troca atômica: consultas em andamento
+    continuam lendo o arquivo anterior).
+    """
+    instalar_change_log(db_file)
+    destino = arquivo_snapshot(db_file)
+    temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    inicio = time.perf_counter()
+    origem = sqlite3.connect(db_file)
+    copia = sqlite3.connect(temporario)
+    try:
+        # Lido antes da cópia: alterações feitas durante o backup são reaplicadas
+        # na próxima atualização incremental (recopiar uma linha é idempotente)
+        ultimo_change_id = _ultimo_change_id(origem)
+        origem.backup(copia, pages=PAGINAS_POR_PASSO, sleep=0.001)
+        # Os triggers do change_log não têm função na cópia
+        for (trigger,) in copia.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+            copia.execute(f'DROP TRIGGER "{trigger}"')
+        _gravar_info(copia, ultimo_change_id)
+        copia.commit()
+    finally:
+        copia.close()
+        origem.close()
+    os.replace(temporario, destino)
+
+    return {'modo': 'completo', 'linhas': None, 'segundos': time.perf_counter() - inicio}
+
+
+def _atualizar_incremental(db_file, destino, ultimo_change_id) -> dict:
+    """Recopia as linhas alteradas; retorna None se for preciso reconstruir a cópia"""
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(destino, isolation_level=None, uri=True)
+    try:
+        conn.execute("ATTACH DATABASE ? AS origem", (uri_somente_leitura(db_file),))
+        linhas = 0
+        try:
+            # Uma única transação: a origem é lida em um estado consistente
+            conn.execute("BEGIN")
+            menor_id = conn.execute("SELECT MIN(id) FROM origem.change_log").fetchone()[0]
+            if menor_id is not None and menor_id > ultimo_change_id + 1:
+                # O change_log foi limpo além do ponto copiado
+                conn.execute("ROLLBACK")
+                return None
+            novo_ultimo_id = _ultimo_change_id(conn, 'origem')
+
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS linhas_alteradas (tabela TEXT, row_id INTEGER)")
+            conn.execute("DELETE FROM temp.linhas_alteradas")
+            conn.execute("""
+                INSERT INTO temp.linhas_alteradas
+                SELECT DISTINCT tabela, row_id FROM origem.change_log WHERE id > ? AND id <= ?
+            """, (ultimo_change_id, novo_ultimo_id))
+
+            for tabela in TABELAS_SNAPSHOT:
+                filtro = "rowid IN (SELECT row_id FROM temp.linhas_alteradas WHERE tabela = ?)"
+                conn.execute(f"DELETE FROM main.{tabela} WHERE {filtro}", (tabela,))
+                linhas += conn.execute(f"INSERT INTO main.{tabela} SELECT * FROM origem.{tabela} WHERE {filtro}",
+                                       (tabela,)).rowcount
+
+            _gravar_info(conn, novo_ultimo_id)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            # Ex.: colunas novas na origem (ALTER TABLE): a cópia precisa ser refeita
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return None
+        finally:
+            conn.execute("DETACH DATABASE origem")
+    finally:
+        conn.close()
+
+    return {'modo': 'incremental', 'linhas': linhas, 'segundos': time.perf_counter() - inicio}
+
+
+def atualizar_snapshot(db_file=DB_FILE, completo: bool = False) -> dict:
+    """
+    Atualiza a cópia analítica (incremental, quando possível).
+    Retorna {'modo': 'completo'|'incremental', 'linhas', 'segundos'}.
+    """
+    with _lock:
+        destino = arquivo_snapshot(db_file)
+        info = None if completo else _ler_info(destino)
+        if info is not None:
+            resultado = _atualizar_incremental(db_file, destino, info[0])
+            if resultado is not None:
+                return resultado
+        return reconstruir_snapshot(db_file)
+
+
+def idade_snapshot(db_file=DB_FILE):
+    """Segundos desde a última atualização da cópia, ou None se ela não existe"""
+    info = _ler_info(arquivo_snapshot(db_file))
+    return None if info is None else max(0.0, time.time() - info[1])
+
+
+def garantir_snapshot(db_file=DB_FILE, idade_maxima: float = IDADE_MAXIMA) -> float:
+    """Atualiza a cópia se ela não existe ou passou da idade máxima; retorna a idade em segundos"""
+    idade = idade_snapshot(db_file)
+    if idade is None or idade > idade_maxima:
+        atualizar_snapshot(db_file)
+        idade = idade_snapshot(db_file)
+    return idade
+
+
+@rastreado('sql', 'consultar_snapshot')
+def consultar(consulta: str, params=(), db_file=DB_FILE, copia: bool = True) -> pd.DataFrame:
+    """
+    Executa uma consulta do catálogo na cópia analítica (ou, com copia=False,
+    no próprio banco, também somente leitura).
+    Cada chamada abre sua própria conexão somente leitura, para sempre enxergar
+    o arquivo mais recente depois de uma reconstrução.
+    Consultas sobre reservas_historico também enxergam o arquivo morto.
+    """
+    origem = arquivo_snapshot(db_file) if copia else db_file
+    conn = sqlite3.connect(uri_somente_leitura(origem), uri=True, detect_types=sqlite3.PARSE_DECLTYPES)
+    try:
+        if 'reservas_historico' in consulta:
+            criar_visao_historico(conn, db_file)
+        c = conn.execute(consulta, params)
+        return pd.DataFrame(c.fetchall(), columns=[descricao[0] for descricao in c.description])
+    finally:
+        conn.close()
+
+
+def descrever_idade(segundos) -> str:
+    """Texto curto para a interface: 'agora', '45 s', '3 min', '2 h'"""
+    if segundos is None:
+        return "indisponível"
+    if segundos < 5:
+        return "agora"
+    if segundos < 60:
+        return f"{segundos:.0f} s"
+    if segundos < 3600:
+        return f"{segundos / 60:.0f} min"
+    return f"{segundos / 3600:.1f} h"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Atualiza a cópia analítica do banco")
+    parser.add_argument('--completo', action='store_true', help="Reconstrói a cópia inteira")
+    parser.add_argument('--banco', default=DB_FILE)
+    args = parser.parse_args()
+
+    resumo = atualizar_snapshot(args.banco, args.completo)
+    linhas = f", {resumo['linhas']} linhas" if resumo['linhas'] is not None else ""
+    print(f"Cópia analítica atualizada ({resumo['modo']}{linhas}) em {resumo['segundos']:.2f}s "
+          f"-> {arquivo_snapshot(args.banco)}")
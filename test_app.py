@@ -4,6 +4,11 @@ Script de testes para verificar se a aplicação está funcionando corretamente
 import sys
 import os
 import subprocess
+import tempfile
+
+# Os testes não gravam no banco do app: a autenticação (auth.auth_manager, criada
+# na importação do módulo) usa um banco temporário
+os.environ.setdefault('BANCO_AUTENTICACAO', os.path.join(tempfile.mkdtemp(), 'auth_teste.db'))
 
 def test_imports():
     """Testa se todas as dependências podem ser importadas"""
@@ -110,7 +115,11 @@ def test_auth_system():
     print("\n🔍 Testando sistema de autenticação...")
 
     try:
-        from auth import auth_manager
+        import tempfile
+        from auth import AuthManager
+
+        # Banco temporário: o teste não grava usuários nem sessões no banco do app
+        auth_manager = AuthManager(os.path.join(tempfile.mkdtemp(), 'auth_teste.db'))
 
         # Testar criação de usuário
         success, message = auth_manager.create_user('test_user', 'test123', 'employee', 'Usuário Teste')
@@ -135,7 +144,13 @@ def test_auth_system():
                 if hasattr(st, 'session_state'):
                     st.session_state.user = user_data
 
-                    if check_permission('read'):
+                    # Fora do `streamlit run` algumas versões não guardam a session_state:
+                    # a permissão é conferida direto no gerenciador
+                    if st.session_state.get('user') is None:
+                        permitido = auth_manager.check_permission(user_data['permissions'], 'read')
+                    else:
+                        permitido = check_permission('read')
+                    if permitido:
                         print("✅ Sistema de permissões OK")
                         return True
                     else:
@@ -160,16 +175,25 @@ def test_backup_system():
     print("\n🔍 Testando sistema de backup...")
 
     try:
-        from database_backup import fazer_backup, listar_backups
+        import shutil
+        import sqlite3
+        import tempfile
+        from database_backup import fazer_backup, listar_backups, restaurar_backup
 
-        backup_file, mensagem = fazer_backup()
+        # Cópia do banco e pasta de backups temporárias: o teste não mexe em
+        # locadora_v2.db nem em backups/
+        pasta = tempfile.mkdtemp()
+        db_file = os.path.join(pasta, 'backup_teste.db')
+        backup_dir = os.path.join(pasta, 'backups')
+        shutil.copy2('locadora_v2.db', db_file)
+
+        backup_file, mensagem = fazer_backup(db_file, backup_dir)
         if backup_file:
             print(f"✅ Backup criado: {backup_file}")
 
-            backups = listar_backups()
+            backups = listar_backups(backup_dir)
             if backups:
                 print(f"✅ {len(backups)} backup(s) encontrado(s)")
-                return True
             else:
                 print("❌ Nenhum backup encontrado")
                 return False
@@ -177,10 +201,1737 @@ def test_backup_system():
             print(f"❌ Erro no backup: {mensagem}")
             return False
 
+        # Restauração: a alteração feita depois do backup é desfeita
+        conn = sqlite3.connect(db_file)
+        conn.execute("CREATE TABLE depois_do_backup (id INTEGER)")
+        conn.commit()
+        conn.close()
+        sucesso, mensagem = restaurar_backup(backup_file, db_file, backup_dir)
+        conn = sqlite3.connect(db_file)
+        restante = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'depois_do_backup'").fetchone()
+        conn.close()
+        if not sucesso or restante:
+            print(f"❌ Erro na restauração: {mensagem}")
+            return False
+        print("✅ Backup restaurado")
+        return True
+
     except Exception as e:
         print(f"❌ Erro no sistema de backup: {e}")
         return False
 
+def test_cache_sync():
+    """Testa a invalidação de cache entre processos via change_log"""
+    print("\n🔍 Testando invalidação de cache (change_log)...")
+
+    try:
+        import sqlite3
+        import tempfile
+        from cache_sync import instalar_change_log, MonitorMudancas, CacheLocal
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'cache_teste.db')
+        conn = sqlite3.connect(db_file)
+        conn.execute("CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT)")
+        conn.execute("CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT)")
+        conn.commit()
+        instalar_change_log(db_file)
+
+        cache = CacheLocal(MonitorMudancas(db_file))
+        contar = lambda tabela: conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+
+        cache.obter('carros', ('carros',), lambda: contar('carros'))
+        cache.obter('clientes', ('clientes',), lambda: contar('clientes'))
+
+        # Escrita por outra conexão (equivalente a outra réplica)
+        outra = sqlite3.connect(db_file)
+        outra.execute("INSERT INTO carros (modelo) VALUES ('Teste')")
+        outra.commit()
+        outra.close()
+
+        carros = cache.obter('carros', ('carros',), lambda: contar('carros'))
+        cache.obter('clientes', ('clientes',), lambda: contar('clientes'))
+        conn.close()
+
+        if carros == 1 and cache.acertos == 1 and cache.falhas == 3:
+            print("✅ Cache invalidado apenas para a tabela alterada")
+            return True
+        else:
+            print(f"❌ Invalidação incorreta (carros={carros}, acertos={cache.acertos}, falhas={cache.falhas})")
+            return False
+
+    except Exception as e:
+        print(f"❌ Erro no cache sincronizado: {e}")
+        return False
+
+def test_repositorio():
+    """Testa as consultas pontuais do repositório (sem pandas)"""
+    print("\n🔍 Testando repositório de consultas pontuais...")
+
+    try:
+        import sqlite3
+        import tempfile
+        from repositorio import buscar_carro, buscar_reserva, Carro, ContextoDados
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'repositorio_teste.db')
+        conn = sqlite3.connect(db_file)
+        conn.execute("""CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT, placa TEXT,
+                        numero_chassi TEXT, numero_renavam TEXT)""")
+        conn.execute("INSERT INTO carros (modelo, placa, numero_chassi) VALUES ('Mobi', 'ABC-1234', 'CH123')")
+        conn.execute("CREATE TABLE reservas (id INTEGER PRIMARY KEY, carro_id INTEGER)")
+        conn.commit()
+        conn.close()
+
+        carro = buscar_carro(1, db_file=db_file)
+        if not isinstance(carro, Carro) or carro['placa'] != 'ABC-1234' or carro.km_atual is not None:
+            print("❌ Registro de carro incorreto")
+            return False
+
+        documento = carro.para_documento()
+        if documento['chassi'] != 'CH123' or buscar_reserva(99, db_file=db_file) is not None:
+            print("❌ Conversão para documento ou busca inexistente incorreta")
+            return False
+
+        # Mapa de identidade: a segunda busca do mesmo carro não vai ao banco
+        contexto = ContextoDados(db_file=db_file)
+        primeiro = contexto.carro(1)
+        contexto.atualizar('carros', 1, km_atual=1500)
+        if contexto.carro('1') is not primeiro or primeiro.km_atual != 1500 \
+                or contexto.estatisticas() != {'acertos': 1, 'falhas': 1, 'entidades': 1}:
+            print("❌ Mapa de identidade não reaproveitou o registro")
+            return False
+
+        print("✅ Repositório OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no repositório: {e}")
+        return False
+
+def test_consultas_estaticas():
+    """Testa se nenhum texto de consulta SQL é montado dinamicamente"""
+    print("\n🔍 Testando catálogo de consultas parametrizadas...")
+
+    try:
+        import ast
+        import re
+        from consultas import CONSULTAS
+
+        sql = re.compile(r'\b(SELECT|INSERT|UPDATE|DELETE|WHERE|CREATE|ALTER|DROP|PRAGMA)\b', re.IGNORECASE)
+        base = os.path.dirname(os.path.abspath(__file__))
+        problemas = []
+
+        # Funções que montam texto SQL de propósito: só identificadores (tabela,
+        # coluna, índice, esquema), que não podem ser parâmetros, e argumentos de
+        # PRAGMA. Valores continuam sempre como parâmetros. Nova entrada exige revisão
+        permitidas = {
+            ('agendador.py', 'tarefa_otimizar'): "mensagem do log da tarefa, não é consulta",
+            ('armazenamento.py', 'estatisticas_desatualizadas'): "COUNT(*) das tabelas do sqlite_master",
+            ('armazenamento.py', 'coletar_estatisticas'): "COUNT(*) das tabelas do sqlite_master",
+            ('arquivo_reservas.py', '_colunas'): "PRAGMA table_info do esquema informado",
+            ('arquivo_reservas.py', '_preparar_arquivo'): "CREATE/ALTER com as colunas atuais de reservas",
+            ('arquivo_reservas.py', 'arquivar_reservas'): "lista de colunas lida do PRAGMA table_info",
+            ('arquivo_reservas.py', 'criar_visao_historico'): "lista de colunas comuns às duas tabelas",
+            ('auth.py', 'update_user'): "SET com nomes de coluna fixos do próprio método",
+            ('busca_reservas.py', 'criar_indices'): "esquema e índices de INDICES_RESERVAS/INDICES_CADASTROS",
+            ('cache_sync.py', 'instalar_change_log'): "um trigger por tabela monitorada",
+            ('database_backup.py', 'obter_estatisticas_banco'): "COUNT(*) de uma lista fixa de tabelas",
+            ('eventos_reservas.py', '_instalar_livro'): "um trigger por operação (UPDATE/DELETE)",
+            ('eventos_reservas.py', 'limpar'): "tabelas da própria projeção",
+            ('init_db.py', 'check_db_health'): "COUNT(*) de uma lista fixa de tabelas",
+            ('restauracao.py', '_colunas'): "PRAGMA table_info de TABELAS_PRINCIPAIS",
+            ('restauracao.py', 'verificar_preparacao'): "argumento do PRAGMA quick_check",
+            ('saude_banco.py', 'verificar_rapido'): "argumento do PRAGMA quick_check",
+            ('saude_banco.py', 'verificar_integridade'): "argumento do PRAGMA integrity_check",
+            ('snapshot_analitico.py', '_ultimo_change_id'): "esquema (main/origem)",
+            ('snapshot_analitico.py', 'reconstruir_snapshot'): "nomes dos triggers copiados da origem",
+            ('snapshot_analitico.py', '_atualizar_incremental'): "tabelas de TABELAS_SNAPSHOT",
+        }
+        usadas = set()
+
+        def texto(no):
+            return ' '.join(n.value for n in ast.walk(no)
+                            if isinstance(n, ast.Constant) and isinstance(n.value, str))
+
+        def funcoes(arvore):
+            """Função mais interna que contém cada nó"""
+            dono = {}
+            pendentes = [(arvore, None)]
+            while pendentes:
+                no, nome = pendentes.pop()
+                for filho in ast.iter_child_nodes(no):
+                    nome_filho = filho.name if isinstance(filho, (ast.FunctionDef, ast.AsyncFunctionDef)) else nome
+                    dono[id(filho)] = nome_filho
+                    pendentes.append((filho, nome_filho))
+            return dono
+
+        # 1. O catálogo deve conter apenas literais de texto
+        arvore = ast.parse(open(os.path.join(base, 'consultas.py'), encoding='utf-8').read())
+        for no in ast.walk(arvore):
+            if isinstance(no, ast.Dict):
+                for chave, valor in zip(no.keys, no.values):
+                    if not (isinstance(valor, ast.Constant) and isinstance(valor.value, str)):
+                        problemas.append(f"consultas.py: '{chave.value}' não é um texto fixo")
+
+        # 2. Em todos os módulos (também os que só montam o texto e o passam a
+        # run_query & cia.): nenhuma consulta montada com f-string, format, % ou
+        # concatenação fora das funções permitidas
+        modulos = sorted(arquivo for arquivo in os.listdir(base)
+                         if arquivo.endswith('.py') and not arquivo.startswith('test_'))
+        for arquivo in modulos:
+            arvore = ast.parse(open(os.path.join(base, arquivo), encoding='utf-8').read())
+            dono = funcoes(arvore)
+            for no in ast.walk(arvore):
+                dinamico = (
+                    isinstance(no, ast.JoinedStr)
+                    or (isinstance(no, ast.BinOp) and isinstance(no.op, (ast.Add, ast.Mod)))
+                    or (isinstance(no, ast.Call) and isinstance(no.func, ast.Attribute)
+                        and no.func.attr == 'format')
+                )
+                if dinamico and sql.search(texto(no)):
+                    if (arquivo, dono.get(id(no))) in permitidas:
+                        usadas.add((arquivo, dono.get(id(no))))
+                    else:
+                        problemas.append(f"{arquivo}:{no.lineno}: consulta montada dinamicamente")
+
+                # 3. Toda consulta referenciada deve existir no catálogo
+                if (isinstance(no, ast.Subscript) and isinstance(no.value, ast.Name)
+                        and no.value.id == 'CONSULTAS' and isinstance(no.slice, ast.Constant)
+                        and no.slice.value not in CONSULTAS):
+                    problemas.append(f"{arquivo}:{no.lineno}: consulta '{no.slice.value}' fora do catálogo")
+
+        # A lista de permissões não guarda funções que já não montam SQL
+        for arquivo, funcao in sorted(set(permitidas) - usadas):
+            problemas.append(f"{arquivo}: {funcao} está na lista de permissões sem montar SQL")
+
+        if problemas:
+            for problema in problemas:
+                print(f"❌ {problema}")
+            return False
+
+        print(f"✅ {len(CONSULTAS)} consultas fixas no catálogo; {len(modulos)} módulos sem SQL dinâmico "
+              f"fora das {len(permitidas)} funções permitidas")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro ao verificar o catálogo de consultas: {e}")
+        return False
+
+def test_indicadores_frota():
+    """Testa os indicadores vetorizados da frota"""
+    print("\n🔍 Testando indicadores da frota...")
+
+    try:
+        from datetime import date
+        import pandas as pd
+        from frota_analytics import calcular_indicadores_frota
+
+        carros = pd.DataFrame({'id': [1, 2, 3], 'km_atual': [9000, 20000, None],
+                               'km_troca_oleo': [10000, 15000, 5000]})
+        reservas = pd.DataFrame({
+            'carro_id': [1, 1, 2],
+            'data_inicio': ['2024-01-01', '2024-01-20', '2024-01-25'],
+            'data_fim': ['2024-01-11', '2024-01-25', '2024-02-10'],
+            'reserva_status': ['Finalizada', 'Finalizada', 'Locada'],
+            'km_saida': [8000, 8500, 20000],
+            'km_volta': [8500, 9000, None],
+            'valor_total': [1000.0, 500.0, 0.0],
+        })
+        resultado = calcular_indicadores_frota(carros, reservas, hoje=date(2024, 1, 31), janela_dias=30)
+
+        carro1, carro2, carro3 = resultado.loc[1], resultado.loc[2], resultado.loc[3]
+        # Carro 1: 1000 km em 15 dias, 1000 km até a troca -> 15 dias; utilização (10 + 5) / 30
+        if carro1['km_por_dia'] != 66.7 or carro1['receita_total'] != 1500.0 or carro1['utilizacao_pct'] != 50.0:
+            print(f"❌ Indicadores do carro 1 incorretos: {carro1.to_dict()}")
+            return False
+        if carro1['previsao_troca_oleo'] != pd.Timestamp('2024-02-15'):
+            print(f"❌ Previsão de troca de óleo incorreta: {carro1['previsao_troca_oleo']}")
+            return False
+        # Carro 2: locação em curso conta até hoje; sem histórico finalizado não há previsão
+        if carro2['utilizacao_pct'] != 20.0 or carro2['km_ate_proxima_troca'] != 0 or pd.notna(carro2['previsao_troca_oleo']):
+            print(f"❌ Indicadores do carro 2 incorretos: {carro2.to_dict()}")
+            return False
+        if carro3['km_ate_proxima_troca'] != 0 or carro3['receita_total'] != 0:
+            print(f"❌ Carro sem dados deveria ter indicadores zerados: {carro3.to_dict()}")
+            return False
+
+        print("✅ Indicadores da frota OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro nos indicadores da frota: {e}")
+        return False
+
+def test_operacoes():
+    """Testa o ciclo reserva -> entrega -> devolução das operações de domínio"""
+    print("\n🔍 Testando operações de domínio (reserva, entrega, devolução)...")
+
+    try:
+        import sqlite3
+        import tempfile
+        from datetime import date
+        from operacoes import carros_disponiveis, reservar, entregar, devolver, montar_recibo
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'operacoes_teste.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript("""
+            CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT, placa TEXT, cor TEXT, diaria REAL,
+                preco_km REAL, km_atual INTEGER, status TEXT, numero_chassi TEXT, numero_renavam TEXT,
+                ano_veiculo INTEGER, km_troca_oleo INTEGER);
+            CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT, cpf TEXT, cnh TEXT, validade_cnh DATE,
+                telefone TEXT, endereco TEXT, observacoes TEXT, status TEXT);
+            CREATE TABLE reservas (id INTEGER PRIMARY KEY AUTOINCREMENT, carro_id INTEGER, cliente_id INTEGER,
+                data_inicio DATE, data_fim DATE, reserva_status TEXT, status TEXT, custo_lavagem REAL DEFAULT 0,
+                valor_total REAL DEFAULT 0, km_saida INTEGER, km_volta INTEGER, km_franquia INTEGER,
+                adiantamento REAL, valor_multas REAL, valor_danos REAL, valor_outros REAL);
+            INSERT INTO carros VALUES (1, 'Mobi', 'ABC-1234', 'Branco', 100.0, 2.0, 1000, 'Disponível', 'CH', 'RN', 2022, 10000);
+            INSERT INTO clientes VALUES (1, 'Cliente Teste', '123.456.789-00', '123', '2030-01-01', '41', 'Rua', '', 'Ativo');
+        """)
+        conn.close()
+
+        inicio, fim = date(2030, 1, 10), date(2030, 1, 12)
+        ok, reserva_id = reservar(1, 1, inicio, fim, km_franquia=100, db_file=db_file)
+        if not ok:
+            print(f"❌ Reserva não criada: {reserva_id}")
+            return False
+
+        conflito, _ = reservar(1, 1, date(2030, 1, 11), date(2030, 1, 13), db_file=db_file)
+        if conflito or carros_disponiveis(inicio, fim, db_file=db_file):
+            print("❌ Carro reservado continuou disponível no período")
+            return False
+
+        if not entregar(reserva_id, 1050, db_file=db_file)[0]:
+            print("❌ Entrega não confirmada")
+            return False
+
+        ok, fechamento = devolver(reserva_id, 1550, date(2030, 1, 12), valor_lavagem=50.0, db_file=db_file)
+        # 2 diárias (200) + 500 km sem franquia (1000) + lavagem (50) - adiantamento de 50% (100)
+        if not ok or fechamento['subtotal'] != 1250.0 or fechamento['total_final'] != 1150.0:
+            print(f"❌ Fechamento incorreto: {fechamento}")
+            return False
+
+        cliente, carro, recibo = montar_recibo(reserva_id, db_file=db_file)
+        if recibo['total_final'] != 1250.0 or carro['placa'] != 'ABC-1234' or len(carros_disponiveis(inicio, fim, db_file=db_file)) != 1:
+            print("❌ Recibo ou liberação do carro incorretos")
+            return False
+
+        print("✅ Operações de domínio OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro nas operações de domínio: {e}")
+        return False
+
+def test_importacao():
+    """Testa a importação em lote com validação de CPF, CNH e duplicidades"""
+    print("\n🔍 Testando importação em lote...")
+
+    try:
+        import io
+        import sqlite3
+        import tempfile
+        import pandas as pd
+        from importacao import cpf_valido, importar_clientes, ler_em_blocos
+
+        if cpf_valido(pd.Series(['529.982.247-25', '52998224724', '111.111.111-11', '123'])).tolist() != [True, False, False, False]:
+            print("❌ Validação de CPF incorreta")
+            return False
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'importacao_teste.db')
+        conn = sqlite3.connect(db_file)
+        conn.execute("""CREATE TABLE clientes (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT, cpf TEXT UNIQUE,
+                        cnh TEXT, validade_cnh DATE, telefone TEXT, endereco TEXT, observacoes TEXT,
+                        status TEXT DEFAULT 'Ativo')""")
+        conn.execute("INSERT INTO clientes (nome, cpf) VALUES ('Existente', '529.982.247-25')")
+        conn.commit()
+        conn.close()
+
+        csv = ("nome;cpf;cnh;validade_cnh;telefone\n"
+               "Ana;168.995.350-09;1;31/12/2099;41\n"      # válida
+               "Bruno;52998224725;2;2099-12-31;41\n"       # CPF já cadastrado (sem pontuação)
+               "Carla;168.995.350-09;3;31/12/2099;41\n"    # repetido no arquivo
+               "Davi;390.533.447-05;4;01/01/2000;41\n"     # CNH vencida
+               "Eva;;5;31/12/2099;41\n")                   # CPF vazio
+        resultado = importar_clientes(io.BytesIO(csv.encode('utf-8')), 'clientes.csv', db_file=db_file, tamanho_bloco=2)
+
+        conn = sqlite3.connect(db_file)
+        gravados = conn.execute("SELECT nome, cpf, validade_cnh FROM clientes WHERE nome != 'Existente'").fetchall()
+        conn.close()
+
+        if resultado['importadas'] != 1 or resultado['rejeitadas'] != 4 or gravados != [('Ana', '168.995.350-09', '2099-12-31')]:
+            print(f"❌ Resultado da importação incorreto: {resultado['mensagem']} {gravados}")
+            return False
+
+        # CSV salvo pelo Excel (Latin-1, ';'), lido do caminho
+        caminho_latin1 = os.path.join(os.path.dirname(db_file), 'clientes_latin1.csv')
+        with open(caminho_latin1, 'wb') as arquivo:
+            arquivo.write("nome;cpf\nJoão;1\nConceição;2\n".encode('latin-1'))
+        nomes = [nome for bloco in ler_em_blocos(caminho_latin1, 'clientes_latin1.csv') for nome in bloco['nome']]
+        if nomes != ['João', 'Conceição']:
+            print(f"❌ Codificação do CSV não detectada: {nomes}")
+            return False
+
+        # O CSV é lido aos poucos: o primeiro bloco sai antes de o arquivo ser lido inteiro
+        grande = io.BytesIO(("nome,cpf\n" + "Cliente,52998224725\n" * 200000).encode('utf-8'))
+        primeiro = next(ler_em_blocos(grande, 'grande.csv', tamanho_bloco=1000))
+        if len(primeiro) != 1000 or grande.tell() >= len(grande.getvalue()) // 2:
+            print(f"❌ CSV lido inteiro antes do primeiro bloco ({grande.tell()} bytes)")
+            return False
+
+        print(f"✅ Importação em lote OK ({resultado['mensagem']})")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro na importação em lote: {e}")
+        return False
+
+def test_exportacao_documentos():
+    """Testa a exportação em lote de contratos e recibos para ZIP"""
+    print("\n🔍 Testando exportação de documentos em ZIP...")
+
+    try:
+        import io
+        import re
+        import sqlite3
+        import tempfile
+        import zipfile
+        from datetime import date
+        import exportacao
+        from exportacao import exportar_zip
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'exportacao_teste.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript("""
+            CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT, placa TEXT, cor TEXT, diaria REAL,
+                preco_km REAL, km_atual INTEGER, status TEXT, numero_chassi TEXT, numero_renavam TEXT,
+                ano_veiculo INTEGER, km_troca_oleo INTEGER);
+            CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT, cpf TEXT, cnh TEXT, validade_cnh DATE,
+                telefone TEXT, endereco TEXT, observacoes TEXT, status TEXT);
+            CREATE TABLE reservas (id INTEGER PRIMARY KEY AUTOINCREMENT, carro_id INTEGER, cliente_id INTEGER,
+                data_inicio DATE, data_fim DATE, reserva_status TEXT, status TEXT, custo_lavagem REAL DEFAULT 0,
+                valor_total REAL DEFAULT 0, km_saida INTEGER, km_volta INTEGER, km_franquia INTEGER,
+                adiantamento REAL, valor_multas REAL, valor_danos REAL, valor_outros REAL);
+            INSERT INTO carros VALUES (1, 'Mobi', 'ABC1234', 'Branco', 100.0, 2.0, 1500, 'Disponível', 'CH', 'RN', 2022, 10000);
+            INSERT INTO clientes VALUES (1, 'Cliente Teste', '123.456.789-00', '123', '2030-01-01', '41', 'Rua', '', 'Ativo');
+            INSERT INTO reservas VALUES (1, 1, 1, '2024-03-01', '2024-03-03', 'Finalizada', 'Finalizada', 0, 400, 1000, 1500, 0, 100, 0, 0, 0);
+            INSERT INTO reservas VALUES (2, 1, 1, '2024-03-10', '2024-03-12', 'Locada', 'Ativa', 0, 0, 1500, NULL, 300, 100, 0, 0, 0);
+            INSERT INTO reservas VALUES (3, 1, 1, '2024-03-20', '2024-03-22', 'Reservada', 'Ativa', 0, 0, 1500, NULL, 300, 100, 0, 0, 0);
+            INSERT INTO reservas VALUES (4, 1, 1, '2024-05-01', '2024-05-02', 'Finalizada', 'Finalizada', 0, 300, 1500, 1600, 0, 100, 0, 0, 0);
+        """)
+        conn.close()
+
+        destino = io.BytesIO()
+        resumo = exportar_zip(destino, inicio=date(2024, 3, 1), fim=date(2024, 3, 31), processos=1, db_file=db_file)
+        nomes = sorted(zipfile.ZipFile(destino).namelist())
+
+        # Março: contrato e recibo da reserva 1, contrato da 2; a 3 não foi entregue e a 4 é de maio
+        if nomes != ['contrato_1.pdf', 'contrato_2.pdf', 'recibo_1.pdf'] or resumo['erros']:
+            print(f"❌ Documentos exportados incorretos: {nomes} {resumo['erros']}")
+            return False
+
+        # Pool de processos (forçado abaixo do mínimo): o mesmo ZIP da renderização em série
+        conn = sqlite3.connect(db_file)
+        conn.executemany("""
+            INSERT INTO reservas (carro_id, cliente_id, data_inicio, data_fim, reserva_status, status, valor_total,
+                km_saida, km_volta, km_franquia, adiantamento, valor_multas, valor_danos, valor_outros)
+            VALUES (1, 1, '2024-03-05', '2024-03-07', 'Finalizada', 'Finalizada', 400, 1000, ?, 0, 100, 0, 0, 0)
+        """, [(1100 + i,) for i in range(10)])
+        conn.commit()
+        conn.close()
+
+        sem_data = lambda pdf_bytes: re.sub(rb'/CreationDate \(D:\d+\)', b'', pdf_bytes)
+
+        def conteudo(destino):
+            with zipfile.ZipFile(destino) as arquivo_zip:
+                return {nome: sem_data(arquivo_zip.read(nome)) for nome in arquivo_zip.namelist()}
+
+        serie, paralelo = io.BytesIO(), io.BytesIO()
+        exportar_zip(serie, inicio=date(2024, 3, 1), fim=date(2024, 3, 31), processos=1, db_file=db_file)
+        minimo_original = exportacao.MINIMO_PARA_POOL
+        exportacao.MINIMO_PARA_POOL = 0
+        try:
+            resumo_pool = exportar_zip(paralelo, inicio=date(2024, 3, 1), fim=date(2024, 3, 31), processos=2,
+                                       db_file=db_file)
+        finally:
+            exportacao.MINIMO_PARA_POOL = minimo_original
+        documentos_serie = conteudo(serie)
+        if len(documentos_serie) != 23 or resumo_pool['erros'] or conteudo(paralelo) != documentos_serie:
+            print(f"❌ ZIP do pool difere da exportação em série: {sorted(conteudo(paralelo))} {resumo_pool['erros']}")
+            return False
+
+        print(f"✅ Exportação OK ({resumo['documentos']} documentos, {resumo['docs_por_segundo']:.0f} docs/s)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro na exportação de documentos: {e}")
+        return False
+
+def test_modelos_pdf():
+    """Testa os modelos pré-compilados: PDF idêntico ao multi_cell do texto completo"""
+    print("\n🔍 Testando modelos de documento pré-compilados...")
+
+    try:
+        import re
+        from datetime import date
+        from pdfgenerator import (PDF, MODELO_RECIBO, campos_recibo, gerar_recibo_pdf,
+                                  formatar_data_portugues)
+
+        if formatar_data_portugues(date(2025, 3, 7)) != "07 de março de 2025":
+            print(f"❌ Data por extenso incorreta: {formatar_data_portugues(date(2025, 3, 7))}")
+            return False
+
+        cliente = {'nome': 'Jose (Teste) Ção', 'cpf': '123.456.789-00', 'telefone': '41'}
+        carro = {'modelo': 'Mobi', 'placa': 'abc1234', 'diaria': 100.0, 'preco_km': 2.0}
+        reserva = {'data_inicio': date(2024, 3, 1), 'data_fim': date(2024, 3, 3), 'km_saida': 1000,
+                   'km_volta': 1500, 'km_franquia': 300, 'dias_cobranca': 2, 'custo_diarias': 200.0,
+                   'custo_km': 400.0, 'valor_lavagem': 0.0, 'valor_multas': 35.5, 'valor_danos': 0.0,
+                   'valor_outros': 0.0, 'adiantamento': 100.0, 'total_final': 535.5}
+
+        pdf = PDF(titulo='RECIBO DE DEVOLUCAO')
+        pdf.add_page()
+        pdf.set_font("Arial", size=11)
+        campos = campos_recibo(cliente, carro, reserva)
+        pdf.multi_cell(0, 5, MODELO_RECIBO.texto(campos))
+        esperado = pdf.output(dest="S").encode("latin-1")
+
+        sem_data = lambda pdf_bytes: re.sub(rb'/CreationDate \(D:\d+\)', b'', pdf_bytes)
+        if sem_data(gerar_recibo_pdf(cliente, carro, reserva)) != sem_data(esperado):
+            print("❌ Recibo do modelo difere do gerado por multi_cell")
+            return False
+
+        texto = MODELO_RECIBO.texto(campos)
+        if "Multas de Transito: R$ 35,50" not in texto or "Lavagem do Veiculo" in texto:
+            print("❌ Linhas opcionais do recibo incorretas")
+            return False
+
+        print("✅ Modelos de documento OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro nos modelos de documento: {e}")
+        return False
+
+def test_formatacao():
+    """Testa a formatação vetorizada de moeda e datas para exibição"""
+    print("\n🔍 Testando formatação vetorizada...")
+
+    try:
+        import pandas as pd
+        from datetime import date
+        from formatacao import formatar_moeda, moeda, datas, formatar_tabela, pagina, total_paginas
+
+        valores = pd.Series([1234.5, None, -3.456, 1234.5, 0.0, 1500000.0])
+        esperado = ['R$ 1.234,50', 'R$ 0,00', 'R$ -3,46', 'R$ 1.234,50', 'R$ 0,00', 'R$ 1.500.000,00']
+        if moeda(valores).tolist() != esperado or formatar_moeda(1234.5) != 'R$ 1.234,50':
+            print(f"❌ Moeda incorreta: {moeda(valores).tolist()}")
+            return False
+        if moeda(valores, simbolo=False).iloc[0] != '1.234,50':
+            print("❌ Moeda sem símbolo incorreta")
+            return False
+
+        datas_texto = pd.Series(['2024-03-01', None, date(2024, 12, 25), '2024-03-01'])
+        if datas(datas_texto).tolist() != ['01/03/2024', None, '25/12/2024', '01/03/2024']:
+            print(f"❌ Datas incorretas: {datas(datas_texto).tolist()}")
+            return False
+
+        df = pd.DataFrame({'valor': range(120), 'inicio': ['2024-01-05'] * 120})
+        visivel = formatar_tabela(pagina(df, 3), colunas_moeda=['valor'], colunas_data=['inicio'])
+        if total_paginas(len(df)) != 3 or len(visivel) != 20 or visivel['valor'].iloc[0] != 'R$ 100,00':
+            print("❌ Paginação incorreta")
+            return False
+
+        print("✅ Formatação vetorizada OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro na formatação vetorizada: {e}")
+        return False
+
+def test_snapshot_analitico():
+    """Testa a cópia analítica: reconstrução, atualização incremental e consulta"""
+    print("\n🔍 Testando cópia analítica...")
+
+    try:
+        import sqlite3
+        import tempfile
+        from cache_sync import instalar_change_log
+        from snapshot_analitico import atualizar_snapshot, consultar, idade_snapshot
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'snapshot_teste.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript("""
+            CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT, placa TEXT);
+            CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT);
+            CREATE TABLE reservas (id INTEGER PRIMARY KEY, carro_id INTEGER, data_inicio DATE);
+            INSERT INTO carros VALUES (1, 'Mobi', 'ABC1234'), (2, 'Onix', 'DEF5678');
+        """)
+        conn.close()
+        instalar_change_log(db_file)
+
+        primeira = atualizar_snapshot(db_file)
+        conn = sqlite3.connect(db_file)
+        conn.execute("UPDATE carros SET modelo = 'Mobi Like' WHERE id = 1")
+        conn.execute("DELETE FROM carros WHERE id = 2")
+        conn.execute("INSERT INTO reservas VALUES (1, 1, '2024-03-01')")
+        conn.commit()
+        conn.close()
+
+        # Antes da atualização a cópia continua com os dados antigos
+        if consultar("SELECT modelo FROM carros WHERE id = 1", db_file=db_file).iloc[0, 0] != 'Mobi':
+            print("❌ A cópia analítica não deveria enxergar a alteração antes de atualizar")
+            return False
+
+        segunda = atualizar_snapshot(db_file)
+        carros = consultar("SELECT id, modelo FROM carros ORDER BY id", db_file=db_file)
+        reservas = consultar("SELECT data_inicio FROM reservas", db_file=db_file)
+        if (primeira['modo'], segunda['modo']) != ('completo', 'incremental') or segunda['linhas'] != 2:
+            print(f"❌ Modos de atualização incorretos: {primeira} {segunda}")
+            return False
+        if carros.values.tolist() != [[1, 'Mobi Like']] or str(reservas.iloc[0, 0]) != '2024-03-01':
+            print(f"❌ Cópia analítica desatualizada: {carros.values.tolist()}")
+            return False
+        if idade_snapshot(db_file) is None:
+            print("❌ Idade da cópia analítica indisponível")
+            return False
+
+        print(f"✅ Cópia analítica OK (incremental em {segunda['segundos'] * 1000:.1f} ms)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro na cópia analítica: {e}")
+        return False
+
+def test_agendador():
+    """Testa a agenda cron, a trava entre réplicas, o histórico e os contratos pré-gerados"""
+    print("\n🔍 Testando agendador...")
+
+    try:
+        import tempfile
+        import agendador
+        import pdfgenerator
+        from datetime import date, datetime
+
+        casos = [
+            ('0 2 * * *', datetime(2025, 3, 10, 1, 59), datetime(2025, 3, 10, 2, 0)),
+            ('0 2 * * *', datetime(2025, 3, 10, 2, 0), datetime(2025, 3, 11, 2, 0)),
+            ('*/15 * * * *', datetime(2025, 3, 10, 10, 7, 30), datetime(2025, 3, 10, 10, 15)),
+            ('0 8 * * 1-5', datetime(2025, 3, 8, 9, 0), datetime(2025, 3, 10, 8, 0)),  # sábado -> segunda
+            ('0 0 1 * *', datetime(2025, 12, 15, 0, 0), datetime(2026, 1, 1, 0, 0)),
+        ]
+        for agenda, depois, esperado in casos:
+            obtido = agendador.proxima_execucao(agenda, depois)
+            if obtido != esperado:
+                print(f"❌ proxima_execucao('{agenda}', {depois}) = {obtido}, esperado {esperado}")
+                return False
+
+        pasta = tempfile.mkdtemp()
+        db_file = os.path.join(pasta, 'agendador_teste.db')
+        agendador.instalar_agendador(db_file, datetime(2025, 3, 10, 0, 0))
+
+        # Só uma réplica detém a trava; a outra assume depois que ela expira
+        if not agendador.adquirir_trava(db_file, 'replica-a') or agendador.adquirir_trava(db_file, 'replica-b'):
+            print("❌ A trava do agendador não é exclusiva")
+            return False
+        agendador.liberar_trava(db_file, 'replica-a')
+        if not agendador.adquirir_trava(db_file, 'replica-b', duracao=-1) or not agendador.adquirir_trava(db_file, 'replica-a'):
+            print("❌ Trava expirada não foi assumida por outra réplica")
+            return False
+        agendador.liberar_trava(db_file, 'replica-a')
+
+        # Tarefas leves no lugar das reais (backup/snapshot mexeriam no banco de produção)
+        tarefas_originais = dict(agendador.TAREFAS)
+        for nome, (_, agenda, descricao) in tarefas_originais.items():
+            agendador.TAREFAS[nome] = (lambda db, nome=nome: f"{nome} ok", agenda, descricao)
+        agendador.TAREFAS['otimizar_banco'] = (lambda db: 1 / 0, '30 2 * * *', '')
+        try:
+            resultados = agendador.executar_pendentes(db_file, datetime(2025, 3, 10, 2, 45), 'replica-a')
+            ocupado = agendador.executar_pendentes(db_file, datetime(2025, 3, 10, 2, 45), 'replica-b')
+        finally:
+            agendador.TAREFAS.clear()
+            agendador.TAREFAS.update(tarefas_originais)
+
+        executadas = {nome: sucesso for nome, sucesso, _ in resultados}
+        if executadas != {'backup_noturno': True, 'otimizar_banco': False, 'atualizar_snapshot': True,
+                          'atualizar_projecoes': True} or ocupado:
+            print(f"❌ Execução de pendentes incorreta: {resultados} / {ocupado}")
+            return False
+        historico = agendador.historico_execucoes(db_file)
+        tarefas = {t['nome']: t for t in agendador.listar_tarefas(db_file)}
+        if len(historico) != 4 or tarefas['otimizar_banco']['ultimo_status'] != 'Erro':
+            print(f"❌ Histórico de execuções incorreto: {historico}")
+            return False
+        if agendador.alterar_tarefa('backup_noturno', '0 25 * * *', True, db_file)[0]:
+            print("❌ Agenda inválida foi aceita")
+            return False
+
+        # Contrato pré-gerado é reaproveitado quando os dados coincidem
+        cliente = {'nome': 'Cliente Teste', 'cpf': '123.456.789-09', 'cnh': '123', 'telefone': '', 'endereco': 'Rua A'}
+        carro = {'modelo': 'Mobi', 'placa': 'ABC1D23', 'cor': 'Branco', 'diaria': 100.0, 'preco_km': 1.0,
+                 'km_atual': 1000, 'chassi': 'X', 'renavam': 'Y', 'numero_chassi': 'X', 'numero_renavam': 'Y', 'ano_veiculo': 2022}
+        pasta_original = pdfgenerator.PASTA_PRE_GERADOS
+        pdfgenerator.PASTA_PRE_GERADOS = os.path.join(pasta, 'pre_gerados')
+        try:
+            hoje = date.today()
+            caminho = pdfgenerator.pre_renderizar_contrato(cliente, carro, hoje, hoje)
+            with open(caminho, 'ab') as f:
+                f.write(b'%marca')
+            reaproveitado = pdfgenerator.obter_contrato_pdf(cliente, carro, hoje, hoje).endswith(b'%marca')
+            outro_carro = dict(carro, km_atual=1001)
+            gerado_na_hora = not pdfgenerator.obter_contrato_pdf(cliente, outro_carro, hoje, hoje).endswith(b'%marca')
+        finally:
+            pdfgenerator.PASTA_PRE_GERADOS = pasta_original
+        if not (reaproveitado and gerado_na_hora):
+            print("❌ Contrato pré-gerado não foi usado corretamente")
+            return False
+
+        print("✅ Agendador OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no agendador: {e}")
+        return False
+
+def test_armazenamento():
+    """Testa o monitor de armazenamento: tamanhos, páginas livres, crescimento e ANALYZE"""
+    print("\n🔍 Testando monitor de armazenamento...")
+
+    try:
+        import sqlite3
+        import tempfile
+        from datetime import datetime
+        import armazenamento
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'armazenamento_teste.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript("""
+            CREATE TABLE reservas (id INTEGER PRIMARY KEY, placa TEXT, obs TEXT);
+            CREATE INDEX idx_reservas_placa ON reservas (placa);
+        """)
+        conn.executemany("INSERT INTO reservas (placa, obs) VALUES (?, ?)",
+                         [(f"ABC{i % 50}", 'x' * 200) for i in range(2000)])
+        conn.commit()
+        conn.close()
+
+        if [t for t, _, _ in armazenamento.estatisticas_desatualizadas(db_file)] != ['reservas']:
+            print("❌ Tabela sem ANALYZE não foi apontada como desatualizada")
+            return False
+        armazenamento.atualizar_estatisticas_planejador(db_file)
+        if armazenamento.estatisticas_desatualizadas(db_file):
+            print("❌ Estatísticas continuam desatualizadas após o ANALYZE")
+            return False
+
+        armazenamento.coletar_estatisticas(db_file, datetime(2025, 3, 1))
+        conn = sqlite3.connect(db_file)
+        conn.execute("DELETE FROM reservas WHERE id > 500")
+        conn.commit()
+        conn.close()
+        armazenamento.coletar_estatisticas(db_file, datetime(2025, 3, 11))
+
+        desatualizadas = [d for d in armazenamento.estatisticas_desatualizadas(db_file) if d[0] == 'reservas']
+        resumo = armazenamento.resumo_arquivo(db_file)
+        tamanhos = armazenamento.tamanhos_objetos(db_file)
+        crescimento = armazenamento.crescimento_linhas(db_file).set_index('tabela')
+        if desatualizadas != [('reservas', 500, 2000)]:
+            print(f"❌ Variação de linhas não detectada: {desatualizadas}")
+            return False
+        if resumo['proporcao_livre'] < 0.5 or resumo['compactar'] != (resumo['bytes_livres'] >= armazenamento.MINIMO_BYTES_LIVRES):
+            print(f"❌ Páginas livres incorretas: {resumo}")
+            return False
+        if not tamanhos.empty and set(tamanhos[tamanhos['tabela'] == 'reservas']['tipo']) != {'tabela', 'índice'}:
+            print(f"❌ Tamanhos por objeto incorretos: {tamanhos}")
+            return False
+        if crescimento.loc['reservas', 'variacao'] != -1500 or crescimento.loc['reservas', 'por_dia'] != -150:
+            print(f"❌ Crescimento incorreto: {crescimento}")
+            return False
+
+        antes, depois = armazenamento.compactar_banco(db_file)
+        if depois >= antes or armazenamento.resumo_arquivo(db_file)['paginas_livres'] != 0:
+            print(f"❌ VACUUM não compactou o banco: {antes} -> {depois}")
+            return False
+
+        print(f"✅ Monitor de armazenamento OK ({armazenamento.formatar_bytes(antes)} -> {armazenamento.formatar_bytes(depois)})")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no monitor de armazenamento: {e}")
+        return False
+
+def test_arquivo_reservas():
+    """Testa o arquivo morto: movimentação, visão do histórico e totais por carro"""
+    print("\n🔍 Testando arquivo morto de reservas...")
+
+    try:
+        import sqlite3
+        import tempfile
+        from datetime import date
+        import arquivo_reservas
+        from consultas import CONSULTAS
+        from snapshot_analitico import consultar
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'arquivo_teste.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript("""
+            CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT, placa TEXT);
+            CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT);
+            CREATE TABLE reservas (id INTEGER PRIMARY KEY AUTOINCREMENT, carro_id INTEGER, cliente_id INTEGER,
+                data_inicio DATE, data_fim DATE, reserva_status TEXT, status TEXT, valor_total REAL,
+                km_saida INTEGER, km_volta INTEGER);
+            INSERT INTO carros VALUES (1, 'Mobi', 'ABC1234');
+            INSERT INTO clientes VALUES (1, 'Cliente');
+            INSERT INTO reservas (carro_id, cliente_id, data_inicio, data_fim, reserva_status, status, valor_total, km_saida, km_volta) VALUES
+                (1, 1, '2023-01-01', '2023-01-05', 'Finalizada', 'Finalizada', 400.0, 1000, 1400),
+                (1, 1, '2023-02-01', '2023-02-03', 'Cancelada', 'Ativa', NULL, NULL, NULL),
+                (1, 1, '2024-12-20', '2024-12-22', 'Finalizada', 'Finalizada', 200.0, 1400, 1500),
+                (1, 1, '2025-01-10', '2025-01-12', 'Reservada', 'Ativa', NULL, NULL, NULL);
+        """)
+        conn.close()
+
+        meses_antes = consultar(CONSULTAS['historico_meses'], db_file=db_file, copia=False)
+        arquivadas = arquivo_reservas.arquivar_reservas(db_file, dias=365, hoje=date(2025, 1, 5), lote=1)
+        conn = sqlite3.connect(db_file)
+        restantes = [r[0] for r in conn.execute("SELECT id FROM reservas ORDER BY id")]
+        conn.close()
+        if arquivadas != 2 or restantes != [3, 4]:
+            print(f"❌ Arquivamento incorreto: {arquivadas} arquivadas, restantes {restantes}")
+            return False
+
+        meses = consultar(CONSULTAS['historico_meses'], db_file=db_file, copia=False)
+        janeiro = consultar(CONSULTAS['historico_periodo'], (date(2023, 1, 1), date(2023, 1, 31)), db_file=db_file, copia=False)
+        if not meses.equals(meses_antes) or janeiro['Total_Faturado'].tolist() != [400.0]:
+            print(f"❌ Histórico não enxerga o arquivo morto: {meses.values.tolist()}")
+            return False
+
+        resumo = arquivo_reservas.resumo_arquivado_por_carro(db_file)
+        if resumo.loc[1].tolist() != [400.0, 400, 4]:
+            print(f"❌ Totais arquivados por carro incorretos: {resumo}")
+            return False
+
+        try:
+            arquivo_reservas.arquivar_reservas(db_file, dias=30)
+            print("❌ Idade de arquivamento abaixo do mínimo foi aceita")
+            return False
+        except ValueError:
+            pass
+
+        print("✅ Arquivo morto de reservas OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no arquivo morto de reservas: {e}")
+        return False
+
+def test_armazem_blobs():
+    """Testa o armazém de downloads em disco: gravação, validade e limite de tamanho"""
+    print("\n🔍 Testando armazém de downloads...")
+
+    try:
+        import tempfile
+        import time
+        import armazem_blobs
+
+        pasta = tempfile.mkdtemp()
+        handle = armazem_blobs.guardar_blob(b'%PDF-1.3 teste', 'contrato.pdf', pasta=pasta)
+        documento = armazem_blobs.obter_blob(handle, pasta)
+        with open(documento['caminho'], 'rb') as f:
+            conteudo = f.read()
+        if conteudo != b'%PDF-1.3 teste' or documento['nome_arquivo'] != 'contrato.pdf' or documento['tamanho'] != 14:
+            print(f"❌ Documento gravado incorretamente: {documento}")
+            return False
+        if armazem_blobs.obter_blob('../../etc/passwd', pasta) is not None or armazem_blobs.obter_blob(None, pasta) is not None:
+            print("❌ Handle inválido foi aceito")
+            return False
+
+        # Limite de tamanho: os mais antigos saem primeiro
+        antigo = armazem_blobs.guardar_blob(b'x' * 100, 'a.pdf', pasta=pasta)
+        os.utime(os.path.join(pasta, antigo), (time.time() - 60, time.time() - 60))
+        novo = armazem_blobs.guardar_blob(b'y' * 100, 'b.pdf', pasta=pasta)
+        removidos = armazem_blobs.limpar_blobs(pasta, limite_bytes=150)
+        if armazem_blobs.obter_blob(antigo, pasta) is not None or armazem_blobs.obter_blob(novo, pasta) is None:
+            print(f"❌ Limite de tamanho não respeitado ({removidos} removidos)")
+            return False
+
+        # Validade
+        removidos = armazem_blobs.limpar_blobs(pasta, agora=time.time() + armazem_blobs.VALIDADE_SEGUNDOS + 1)
+        if removidos != 2 or armazem_blobs.estatisticas_blobs(pasta)['arquivos'] != 0:
+            print(f"❌ Arquivos vencidos não foram removidos ({removidos})")
+            return False
+
+        # Erro durante a escrita não deixa arquivo para trás
+        try:
+            with armazem_blobs.novo_blob('falha.zip', 'application/zip', pasta) as (_, arquivo):
+                arquivo.write(b'parcial')
+                raise RuntimeError("falha simulada")
+        except RuntimeError:
+            pass
+        if os.listdir(pasta):
+            print(f"❌ Escrita interrompida deixou arquivos: {os.listdir(pasta)}")
+            return False
+
+        print("✅ Armazém de downloads OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no armazém de downloads: {e}")
+        return False
+
+def test_filiais():
+    """Testa o roteamento por filial: configuração, consultas em paralelo e backups separados"""
+    print("\n🔍 Testando roteamento por filial...")
+
+    try:
+        import sqlite3
+        import tempfile
+        import filiais
+        from consultas import CONSULTAS
+        from database_backup import pasta_backups
+
+        configuracao = filiais.ler_configuracao(' matriz:locadora_v2.db , centro:centro.db,')
+        if configuracao != {'matriz': 'locadora_v2.db', 'centro': 'centro.db'} or filiais.ler_configuracao('') != {'matriz': 'locadora_v2.db'}:
+            print(f"❌ Configuração das filiais lida incorretamente: {configuracao}")
+            return False
+        for invalida in ('matriz', 'a:x.db,a:y.db', 'a:x.db,b:x.db'):
+            try:
+                filiais.ler_configuracao(invalida)
+                print(f"❌ Configuração inválida aceita: {invalida}")
+                return False
+            except ValueError:
+                pass
+
+        pasta = tempfile.mkdtemp()
+        bancos = {'matriz': os.path.join(pasta, 'matriz.db'), 'centro': os.path.join(pasta, 'centro.db')}
+        for filial, banco in bancos.items():
+            conn = sqlite3.connect(banco)
+            conn.executescript("""
+                CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT, placa TEXT);
+                CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT);
+                CREATE TABLE reservas (id INTEGER PRIMARY KEY, carro_id INTEGER, cliente_id INTEGER,
+                    data_inicio DATE, data_fim DATE, reserva_status TEXT, status TEXT, valor_total REAL,
+                    km_saida INTEGER, km_volta INTEGER);
+            """)
+            conn.execute("INSERT INTO reservas VALUES (1, 1, 1, ?, ?, 'Finalizada', 'Finalizada', 100, 0, 10)",
+                         ('2024-01-01' if filial == 'matriz' else '2024-02-01', '2024-01-03' if filial == 'matriz' else '2024-02-03'))
+            conn.commit()
+            conn.close()
+
+        configuracao_original = filiais.FILIAIS
+        filiais.FILIAIS = dict(bancos, sem_banco=os.path.join(pasta, 'inexistente', 'x.db'))
+        try:
+            meses, erros = filiais.consultar_filiais(CONSULTAS['historico_meses'])
+            if sorted(meses.values.tolist()) != [['centro', '2024-02'], ['matriz', '2024-01']] or list(erros) != ['sem_banco']:
+                print(f"❌ Consulta consolidada incorreta: {meses.values.tolist()} / {erros}")
+                return False
+            resultados, erros = filiais.executar_em_filiais(os.path.basename, ['matriz', 'centro'])
+            if resultados != {'matriz': 'matriz.db', 'centro': 'centro.db'} or erros:
+                print(f"❌ Execução por filial incorreta: {resultados} / {erros}")
+                return False
+        finally:
+            filiais.FILIAIS = configuracao_original
+
+        if pasta_backups('locadora_v2.db') != 'backups' or pasta_backups(bancos['centro']) != os.path.join('backups', 'centro'):
+            print(f"❌ Pasta de backups por filial incorreta: {pasta_backups(bancos['centro'])}")
+            return False
+
+        print("✅ Roteamento por filial OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no roteamento por filial: {e}")
+        return False
+
+def test_limite_login():
+    """Testa o limite de tentativas de login: baldes compartilhados, recusa em memória e reposição"""
+    print("\n🔍 Testando limite de tentativas de login...")
+
+    try:
+        import tempfile
+        from limite_login import LimitadorLogin, limpar_limites, endereco_encaminhado
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'limite_teste.db')
+        limitador = LimitadorLogin(db_file, capacidade_usuario=3, intervalo_usuario=10,
+                                   capacidade_endereco=5, intervalo_endereco=10)
+        agora = 1000.0
+        resultados = [limitador.permitir('Admin', '10.0.0.1', agora)[0] for _ in range(4)]
+        if resultados != [True, True, True, False]:
+            print(f"❌ Balde do usuário não esvaziou na capacidade: {resultados}")
+            return False
+
+        # Recusa seguinte sai da memória; outra réplica enxerga o mesmo balde no banco
+        limitador.permitir('admin', '10.0.0.1', agora + 1)
+        replica = LimitadorLogin(db_file, capacidade_usuario=3, intervalo_usuario=10,
+                                 capacidade_endereco=5, intervalo_endereco=10)
+        if limitador.recusadas_memoria != 1 or replica.permitir('admin', '10.0.0.1', agora + 1)[0]:
+            print(f"❌ Estado não compartilhado: {limitador.estatisticas()}")
+            return False
+
+        # Balde do endereço: outro usuário no mesmo endereço tem só as fichas restantes (5 - 3)
+        outros = [limitador.permitir('maria', '10.0.0.1', agora + 1)[0] for _ in range(3)]
+        if outros != [True, True, False]:
+            print(f"❌ Balde do endereço incorreto: {outros}")
+            return False
+
+        # Reposição: uma ficha a cada intervalo
+        permitido, _ = limitador.permitir('admin', '10.0.0.1', agora + 11)
+        if not permitido or limitador.permitir('admin', '10.0.0.1', agora + 11)[0]:
+            print("❌ Reposição de fichas incorreta")
+            return False
+
+        # Login bem-sucedido enche o balde do usuário
+        limitador.liberar('admin', '10.0.0.1')
+        if not limitador.permitir('admin', '10.0.0.1', agora + 21)[0]:
+            print("❌ Login bem-sucedido não liberou o usuário")
+            return False
+
+        if limpar_limites(db_file, agora + 10 ** 6) == 0:
+            print("❌ Baldes cheios não foram removidos")
+            return False
+
+        # X-Forwarded-For forjado: vale o salto acrescentado pelo proxy, não o que o cliente enviou
+        forjados = {endereco_encaminhado(f"198.51.100.{i}, 203.0.113.7") for i in range(20)}
+        if forjados != {'203.0.113.7'} or endereco_encaminhado("203.0.113.7, 10.0.0.2", proxies=2) != '203.0.113.7' \
+                or endereco_encaminhado("203.0.113.7", proxies=2) != '' or endereco_encaminhado("lixo") != '' \
+                or endereco_encaminhado("203.0.113.7", proxies=0) != '':
+            print(f"❌ Endereço encaminhado incorreto: {forjados}")
+            return False
+        tentativas = [limitador.permitir('admin', endereco_encaminhado(f"198.51.100.{i}, 203.0.113.7"), agora + 30)[0]
+                      for i in range(4)]
+        if tentativas != [True, True, True, False]:
+            print(f"❌ Endereço forjado ganhou um balde novo: {tentativas}")
+            return False
+
+        # Sem cabeçalho: o balde por endereço é ignorado (um cliente não bloqueia os demais usuários)
+        sem_endereco = endereco_encaminhado('')
+        espalhadas = [limitador.permitir(f"usuario{i}", sem_endereco, agora + 40)[0] for i in range(20)]
+        if sem_endereco != '' or not all(espalhadas) or not limitador.permitir('joana', sem_endereco, agora + 40)[0]:
+            print(f"❌ Clientes sem endereço dividiram um balde: {espalhadas}")
+            return False
+
+        # Cadastro recusado (usuário repetido) não deixa transação aberta prendendo o limite
+        import gc
+        import time
+        from auth import AuthManager
+        gerenciador = AuthManager(os.path.join(tempfile.mkdtemp(), 'auth_teste.db'))
+        gerenciador.create_user('repetido', 'senha123')
+        gc.disable()  # A conexão esquecida só seria fechada pelo coletor de lixo
+        try:
+            inicio = time.perf_counter()
+            recusado = gerenciador.create_user('repetido', 'senha123')
+            autenticado, _ = gerenciador.authenticate('repetido', 'senha123')
+            segundos = time.perf_counter() - inicio
+        finally:
+            gc.enable()
+        if recusado[0] or not autenticado or segundos > 2:
+            print(f"❌ Cadastro recusado prendeu o banco: {recusado} / login {autenticado} em {segundos:.1f}s")
+            return False
+
+        print("✅ Limite de tentativas de login OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no limite de tentativas de login: {e}")
+        return False
+
+def test_saude_banco():
+    """Testa a saúde do banco em níveis: quick_check guardado, integrity_check registrado e sonda"""
+    print("\n🔍 Testando saúde do banco...")
+
+    try:
+        import sqlite3
+        import tempfile
+        import saude_banco
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'saude_teste.db')
+        if saude_banco.verificar_rapido(db_file)['healthy'] or os.path.exists(db_file):
+            print("❌ Banco inexistente foi considerado saudável (ou criado pela verificação)")
+            return False
+
+        conn = sqlite3.connect(db_file)
+        conn.executescript("CREATE TABLE carros (id INTEGER PRIMARY KEY); CREATE TABLE clientes (id INTEGER PRIMARY KEY);"
+                           "CREATE TABLE reservas (id INTEGER PRIMARY KEY);")
+        conn.close()
+
+        estado = saude_banco.estado_saude(db_file)
+        conn = sqlite3.connect(db_file)
+        conn.execute("DROP TABLE reservas")
+        conn.close()
+        if not estado['healthy'] or saude_banco.estado_saude(db_file) is not estado:
+            print(f"❌ Estado de saúde não foi guardado para o processo: {estado}")
+            return False
+        saude_banco.invalidar_saude(db_file)
+        if saude_banco.estado_saude(db_file)['healthy']:
+            print("❌ Tabela ausente não detectada após invalidar o estado")
+            return False
+
+        if saude_banco.ultima_verificacao(db_file) is not None:
+            print("❌ Verificação completa inexistente foi retornada")
+            return False
+        verificacao = saude_banco.verificar_integridade(db_file)
+        ultima = saude_banco.ultima_verificacao(db_file)
+        if not verificacao['ok'] or not ultima or not ultima['ok'] or ultima['resultado'] != 'ok':
+            print(f"❌ integrity_check não registrado: {ultima}")
+            return False
+
+        sonda = saude_banco.sonda(db_file)
+        if sonda['ok'] or 'reservas' not in sonda.get('erro', '') or saude_banco.sonda(db_file + '.nao_existe')['ok']:
+            print(f"❌ Sonda incorreta: {sonda}")
+            return False
+
+        print("✅ Saúde do banco OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro na saúde do banco: {e}")
+        return False
+
+def test_janelas_disponibilidade():
+    """Testa a busca da próxima janela livre por carro e por modelo"""
+    print("\n🔍 Testando próximas janelas de disponibilidade...")
+
+    try:
+        import sqlite3
+        import tempfile
+        from datetime import date
+        from operacoes import proximas_janelas, janelas_por_modelo, reservar
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'janelas_teste.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript("""
+            CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT, placa TEXT, cor TEXT, diaria REAL,
+                preco_km REAL, km_atual INTEGER, status TEXT, numero_chassi TEXT, numero_renavam TEXT,
+                ano_veiculo INTEGER, km_troca_oleo INTEGER);
+            CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT, cpf TEXT, cnh TEXT, validade_cnh DATE,
+                telefone TEXT, endereco TEXT, observacoes TEXT, status TEXT);
+            CREATE TABLE reservas (id INTEGER PRIMARY KEY AUTOINCREMENT, carro_id INTEGER, cliente_id INTEGER,
+                data_inicio DATE, data_fim DATE, reserva_status TEXT, status TEXT, custo_lavagem REAL DEFAULT 0,
+                valor_total REAL DEFAULT 0, km_saida INTEGER, km_volta INTEGER, km_franquia INTEGER,
+                adiantamento REAL, valor_multas REAL, valor_danos REAL, valor_outros REAL);
+            INSERT INTO carros (id, modelo, placa, diaria, km_atual, status) VALUES
+                (1, 'Mobi', 'AAA-0001', 100.0, 0, 'Disponível'), (2, 'Mobi', 'AAA-0002', 100.0, 0, 'Disponível'),
+                (3, 'Onix', 'BBB-0001', 150.0, 0, 'Disponível'), (4, 'Onix', 'BBB-0002', 150.0, 0, 'Indisponível');
+            INSERT INTO clientes VALUES (1, 'Cliente Teste', '123.456.789-00', '123', '2031-01-01', '41', 'Rua', '', 'Ativo');
+            -- Carro 1: lacuna de um dia (13/01) curta demais para 2 dias; carro 2: reservas sobrepostas
+            INSERT INTO reservas (carro_id, data_inicio, data_fim, reserva_status) VALUES
+                (1, '2030-01-10', '2030-01-12', 'Reservada'), (1, '2030-01-14', '2030-01-20', 'Locada'),
+                (2, '2030-01-09', '2030-01-15', 'Locada'), (2, '2030-01-11', '2030-01-13', 'Reservada'),
+                (3, '2030-01-08', '2030-01-20', 'Finalizada');
+        """)
+        conn.close()
+
+        janelas = proximas_janelas(date(2030, 1, 10), 2, db_file=db_file)
+        por_placa = {janela['placa']: janela['janela_inicio'] for janela in janelas}
+        esperado = {'BBB-0001': date(2030, 1, 10), 'AAA-0002': date(2030, 1, 16), 'AAA-0001': date(2030, 1, 21)}
+        if por_placa != esperado or [janela['placa'] for janela in janelas] != list(esperado):
+            print(f"❌ Janelas por carro incorretas: {por_placa}")
+            return False
+        if janelas[0]['janela_fim'] != date(2030, 1, 12):
+            print(f"❌ Fim da janela incorreto: {janelas[0]['janela_fim']}")
+            return False
+
+        modelos = {m['modelo']: (m['janela_inicio'], m['carros']) for m in janelas_por_modelo(janelas)}
+        if modelos != {'Onix': (date(2030, 1, 10), 1), 'Mobi': (date(2030, 1, 16), 1)}:
+            print(f"❌ Janelas por modelo incorretas: {modelos}")
+            return False
+
+        # Nova reserva invalida o resultado guardado em cache
+        ok, _ = reservar(3, 1, date(2030, 1, 10), date(2030, 1, 11), db_file=db_file)
+        onix = [j for j in proximas_janelas(date(2030, 1, 10), 2, db_file=db_file) if j['placa'] == 'BBB-0001']
+        if not ok or onix[0]['janela_inicio'] != date(2030, 1, 12):
+            print(f"❌ Janela não acompanhou a nova reserva: {onix}")
+            return False
+
+        try:
+            proximas_janelas(date(2030, 1, 10), -1, db_file=db_file)
+            print("❌ Duração negativa aceita")
+            return False
+        except ValueError:
+            pass
+
+        print("✅ Próximas janelas de disponibilidade OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro nas janelas de disponibilidade: {e}")
+        return False
+
+def test_simulacao_frota():
+    """Testa o ajuste da demanda e a simulação de Monte Carlo do tamanho da frota"""
+    print("\n🔍 Testando simulação de dimensionamento da frota...")
+
+    try:
+        import numpy as np
+        import pandas as pd
+        from datetime import date
+        from simulacao_frota import ajustar_demanda, simular_frota, simular_lote
+
+        hoje = date(2030, 1, 1)
+        reservas = pd.DataFrame({
+            'modelo': ['Mobi', 'Mobi', 'Onix', 'Onix'],
+            'data_inicio': ['2029-12-30', '2029-12-23', '2029-12-31', '2020-01-01'],
+            'data_fim': ['2029-12-31', '2029-12-23', '2030-01-05', '2020-01-03'],
+        })
+        demanda = ajustar_demanda(reservas, hoje, janela_dias=14)
+        # 30/12 e 23/12 são domingos (2 ocorrências na janela); a reserva de 2020 fica de fora
+        if demanda['Mobi']['taxas'][6] != 1.0 or demanda['Mobi']['taxas'][:6].any() or demanda['Onix']['taxas'].sum() != 0.5:
+            print(f"❌ Taxas de demanda incorretas: {demanda}")
+            return False
+        if sorted(demanda['Onix']['duracoes']) != [1, 2, 6]:
+            print(f"❌ Durações incorretas (amostra pequena usa a frota inteira): {demanda['Onix']['duracoes']}")
+            return False
+
+        # Frota que cobre todos os pedidos não recusa nenhum; frota vazia recusa todos
+        lote = simular_lote(np.ones(7), [2], [0, 1000], 100, 3, 0, 1)
+        if lote['recusados'][0].tolist() != lote['pedidos'].tolist() or lote['recusados'][1].any() or lote['utilizacao'][0].any():
+            print(f"❌ Simulação incorreta nos extremos: {lote}")
+            return False
+
+        parametros = {'Mobi': {'taxas': np.full(7, 2.0), 'duracoes': np.array([1, 3, 5])}}
+        resultado = simular_frota(parametros, {'Mobi': range(3, 10)}, horizonte=60, execucoes=300, processos=1)
+        recusada = resultado['demanda_recusada_pct'].to_numpy()
+        if len(resultado) != 7 or not (np.diff(recusada) <= 0).all() or not (np.diff(resultado['utilizacao_pct']) <= 0).all():
+            print(f"❌ Mais carros deveriam recusar menos e ter menor utilização:\n{resultado}")
+            return False
+        if not resultado.equals(simular_frota(parametros, {'Mobi': range(3, 10)}, horizonte=60, execucoes=300, processos=1)):
+            print("❌ Simulação não é reprodutível com a mesma semente")
+            return False
+
+        print("✅ Simulação da frota OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro na simulação da frota: {e}")
+        return False
+
+def test_eventos_reservas():
+    """Testa o livro de eventos das reservas (mesma transação dos fluxos) e as projeções incrementais"""
+    print("\n🔍 Testando livro de eventos e projeções...")
+
+    try:
+        import sqlite3
+        import tempfile
+        import time
+        from datetime import date
+        from operacoes import reservar, entregar, editar_reserva, cancelar_reserva, devolver
+        from eventos_reservas import (eventos_da_reserva, atualizar_projecoes, reconstruir_projecoes,
+                                      reservas_por_estado, ocupacao_por_dia, movimento_mensal)
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'eventos_teste.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript("""
+            CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT, placa TEXT, cor TEXT, diaria REAL,
+                preco_km REAL, km_atual INTEGER, status TEXT, numero_chassi TEXT, numero_renavam TEXT,
+                ano_veiculo INTEGER, km_troca_oleo INTEGER);
+            CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT, cpf TEXT, cnh TEXT, validade_cnh DATE,
+                telefone TEXT, endereco TEXT, observacoes TEXT, status TEXT);
+            CREATE TABLE reservas (id INTEGER PRIMARY KEY AUTOINCREMENT, carro_id INTEGER, cliente_id INTEGER,
+                data_inicio DATE, data_fim DATE, reserva_status TEXT, status TEXT, custo_lavagem REAL DEFAULT 0,
+                valor_total REAL DEFAULT 0, km_saida INTEGER, km_volta INTEGER, km_franquia INTEGER,
+                adiantamento REAL, valor_multas REAL, valor_danos REAL, valor_outros REAL);
+            INSERT INTO carros VALUES (1, 'Mobi', 'ABC-1234', 'Branco', 100.0, 2.0, 1000, 'Disponível', 'CH', 'RN', 2022, 10000);
+            INSERT INTO carros VALUES (2, 'Onix', 'DEF-5678', 'Preto', 150.0, 2.0, 5000, 'Disponível', 'CH2', 'RN2', 2023, 10000);
+            INSERT INTO clientes VALUES (1, 'Cliente Teste', '123.456.789-00', '123', '2031-01-01', '41', 'Rua', '', 'Ativo');
+            -- Reserva anterior ao livro: importada como eventos na criação do livro
+            INSERT INTO reservas (carro_id, cliente_id, data_inicio, data_fim, reserva_status, status, valor_total, km_saida, km_volta)
+                VALUES (2, 1, '2029-12-01', '2029-12-03', 'Finalizada', 'Finalizada', 400.0, 5000, 5100);
+        """)
+        conn.close()
+
+        ok, reserva_id = reservar(1, 1, date(2030, 1, 10), date(2030, 1, 12), usuario='balcao', db_file=db_file)
+        ok_cancelada, cancelada_id = reservar(2, 1, date(2030, 1, 10), date(2030, 1, 11), db_file=db_file)
+        if not (ok and ok_cancelada):
+            print(f"❌ Reservas não criadas: {reserva_id} {cancelada_id}")
+            return False
+        editar_reserva(reserva_id, date(2030, 1, 10), date(2030, 1, 14), 100, 50.0, usuario='gerente', db_file=db_file)
+        entregar(reserva_id, 1050, usuario='balcao', db_file=db_file)
+        if cancelar_reserva(reserva_id, db_file=db_file)[0] or not cancelar_reserva(cancelada_id, db_file=db_file)[0]:
+            print("❌ Cancelamento incorreto (locada deve ser recusada, reservada aceita)")
+            return False
+
+        atualizar_projecoes(db_file)
+        devolver(reserva_id, 1150, date(2030, 1, 13), db_file=db_file)
+
+        linha_do_tempo = eventos_da_reserva(reserva_id, db_file)
+        if [e['tipo'] for e in linha_do_tempo] != ['Reservada', 'Editada', 'Entregue', 'Devolvida']:
+            print(f"❌ Linha do tempo incorreta: {[e['tipo'] for e in linha_do_tempo]}")
+            return False
+        editada = linha_do_tempo[1]
+        if editada['usuario'] != 'gerente' or editada['dados']['antes'].get('data_fim') is None \
+                or editada['dados']['depois']['data_fim'] != '2030-01-14':
+            print(f"❌ Evento de edição incompleto: {editada}")
+            return False
+        if [e['tipo'] for e in eventos_da_reserva(1, db_file)] != ['Reservada', 'Entregue', 'Devolvida']:
+            print("❌ Reserva existente não importada para o livro")
+            return False
+
+        conn = sqlite3.connect(db_file)
+        try:
+            conn.execute("DELETE FROM reserva_eventos")
+            print("❌ Livro de eventos aceitou DELETE")
+            return False
+        except sqlite3.DatabaseError:
+            pass
+        finally:
+            conn.close()
+
+        # Incremental: só a devolução é nova; depois disso nada a aplicar
+        if atualizar_projecoes(db_file) != {'reservas': 1, 'ocupacao': 1, 'faturamento_mensal': 1} \
+                or any(atualizar_projecoes(db_file).values()):
+            print("❌ Projeções não consumiram apenas os eventos novos")
+            return False
+
+        estados = reservas_por_estado(db_file)
+        ocupacao = ocupacao_por_dia(date(2030, 1, 9), date(2030, 1, 15), db_file)
+        movimento = {m['mes']: m for m in movimento_mensal(db_file)}
+        # Locação de 10/01 (após edição até 14/01) devolvida em 13/01; a cancelada não ocupa dias
+        if estados != {'Finalizada': 2, 'Cancelada': 1} or list(ocupacao.values()) != [0, 1, 1, 1, 1, 0, 0]:
+            print(f"❌ Projeções incorretas: {estados} {ocupacao}")
+            return False
+        if movimento['2030-01']['devolucoes'] != 1 or movimento['2030-01']['receita'] != 300.0 \
+                or movimento['2029-12']['receita'] != 400.0:
+            print(f"❌ Movimento mensal incorreto: {movimento}")
+            return False
+
+        reconstruir_projecoes(db_file)
+        if reservas_por_estado(db_file) != estados or ocupacao_por_dia(date(2030, 1, 9), date(2030, 1, 15), db_file) != ocupacao:
+            print("❌ Projeções reconstruídas diferem das incrementais")
+            return False
+
+        # Sem eventos novos a leitura não pede o lock de escrita (outra conexão está gravando)
+        escritor = sqlite3.connect(db_file, isolation_level=None)
+        escritor.execute("BEGIN IMMEDIATE")
+        try:
+            inicio = time.perf_counter()
+            lidos = ocupacao_por_dia(date(2030, 1, 9), date(2030, 1, 15), db_file), movimento_mensal(db_file)
+            if lidos[0] != ocupacao or time.perf_counter() - inicio > 1:
+                print("❌ Leitura das projeções esperou pelo lock de escrita")
+                return False
+        finally:
+            escritor.execute("ROLLBACK")
+            escritor.close()
+
+        print("✅ Livro de eventos e projeções OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no livro de eventos: {e}")
+        return False
+
+def test_rastreamento():
+    """Testa os rastros por página (trechos por categoria, percentis) e o perfil sob demanda"""
+    print("\n🔍 Testando rastreamento de renderização...")
+
+    try:
+        import pstats
+        import sqlite3
+        import tempfile
+        import time
+        from conexao import obter_pool
+        from armazem_blobs import obter_blob, remover_blob
+        from rastreamento import iniciar_rastro, trecho, rastreado, percentis_por_pagina, trechos_mais_lentos
+
+        pasta = tempfile.mkdtemp()
+        arquivo = os.path.join(pasta, 'rastros_teste.db')
+        db_file = os.path.join(pasta, 'banco_teste.db')
+        sqlite3.connect(db_file).close()
+
+        @rastreado('pdf')
+        def gerar_documento():
+            with trecho('sql', 'aninhado'):  # Conta só no trecho externo (pdf)
+                time.sleep(0.01)
+
+        with trecho('sql', 'sem_rastro'):  # Sem rastro ativo: não faz nada
+            pass
+
+        rastro = iniciar_rastro('Devolução')
+        with obter_pool(db_file).conexao() as conn:
+            conn.execute("SELECT 1").fetchall()
+        gerar_documento()
+        total = rastro.encerrar(arquivo=arquivo)
+        tempos = rastro.por_categoria()
+        if set(nome for _, nome in rastro.trechos) != {'test_rastreamento', 'gerar_documento'} \
+                or tempos['pdf'] < 10 or abs(sum(tempos.values()) - total) > 0.01:
+            print(f"❌ Trechos incorretos: {rastro.trechos} {tempos} {total}")
+            return False
+        if rastro.encerrar(arquivo=arquivo) != total:
+            print("❌ Encerrar duas vezes alterou o rastro")
+            return False
+
+        # Interrompida por rerun: vale o tempo até o último trecho
+        interrompido = iniciar_rastro('Devolução')
+        gerar_documento()
+        time.sleep(0.05)
+        if interrompido.encerrar(concluido=False, arquivo=arquivo) >= 50:
+            print("❌ Execução interrompida mediu além do último trecho")
+            return False
+        iniciar_rastro().encerrar(arquivo=arquivo)  # Sem página (login): não é gravado
+
+        tabela = percentis_por_pagina(7, arquivo)
+        linha = tabela.iloc[0]
+        if len(tabela) != 1 or linha['execucoes'] != 2 or linha['interrompidas'] != 1 \
+                or linha['pdf_p95_ms'] < 10 or not linha['p50_ms'] <= linha['p95_ms'] <= linha['p99_ms']:
+            print(f"❌ Percentis incorretos: {tabela.to_dict('records')}")
+            return False
+        if trechos_mais_lentos('Devolução', arquivo=arquivo).iloc[0]['nome'] != 'gerar_documento':
+            print("❌ Trecho mais lento incorreto")
+            return False
+
+        perfilado = iniciar_rastro('Relatórios', perfilar=True)
+        gerar_documento()
+        perfilado.encerrar(arquivo=arquivo)
+        documento = obter_blob(perfilado.perfil['handle'])
+        if documento is None or 'gerar_documento' not in perfilado.perfil['resumo']:
+            print(f"❌ Perfil não gerado: {perfilado.perfil}")
+            return False
+        pstats.Stats(documento['caminho'])  # Arquivo .prof legível pelo pstats
+        remover_blob(perfilado.perfil['handle'])
+
+        print("✅ Rastreamento de renderização OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro no rastreamento: {e}")
+        return False
+
+def test_parametros_widgets():
+    """Testa se os widgets do app usam só parâmetros aceitos pelo Streamlit instalado"""
+    print("\n🔍 Testando parâmetros dos widgets contra o Streamlit instalado...")
+
+    try:
+        import ast
+        import inspect
+        import streamlit as st
+
+        # Ex.: form_submit_button(key=...) não existe nas versões fixadas e derruba a página
+        widgets = ('button', 'form_submit_button', 'download_button', 'selectbox', 'multiselect', 'radio',
+                   'checkbox', 'number_input', 'text_input', 'text_area', 'date_input', 'file_uploader', 'slider')
+        aceitos = {}
+        for nome in widgets:
+            parametros = inspect.signature(getattr(st, nome)).parameters.values()
+            if not any(parametro.kind == parametro.VAR_KEYWORD for parametro in parametros):
+                aceitos[nome] = {parametro.name for parametro in parametros}
+
+        base = os.path.dirname(os.path.abspath(__file__))
+        problemas, chamadas = [], 0
+        for arquivo in sorted(os.listdir(base)):
+            if not arquivo.endswith('.py') or arquivo.startswith('test_'):
+                continue
+            arvore = ast.parse(open(os.path.join(base, arquivo), encoding='utf-8').read())
+            for no in ast.walk(arvore):
+                if (isinstance(no, ast.Call) and isinstance(no.func, ast.Attribute)
+                        and no.func.attr in aceitos):
+                    chamadas += 1
+                    desconhecidos = {kw.arg for kw in no.keywords if kw.arg} - aceitos[no.func.attr]
+                    if desconhecidos:
+                        problemas.append(f"{arquivo}:{no.lineno}: {no.func.attr}() não aceita "
+                                         f"{', '.join(sorted(desconhecidos))} no Streamlit {st.__version__}")
+
+        if problemas:
+            for problema in problemas:
+                print(f"❌ {problema}")
+            return False
+
+        print(f"✅ {chamadas} chamadas de widgets compatíveis com o Streamlit {st.__version__}")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro na verificação dos widgets: {e}")
+        return False
+
+def test_fragmentos():
+    """Testa as seções isoladas: st.fragment quando a versão do Streamlit tem, função comum quando não tem"""
+    print("\n🔍 Testando fragmentos...")
+
+    try:
+        import tempfile
+        import streamlit as st
+        import rastreamento
+        from fragmentos import fragmento
+        from rastreamento import iniciar_rastro, rastro_atual
+
+        nomes = ('fragment', 'experimental_fragment')
+        originais = {nome: st.__dict__[nome] for nome in nomes if nome in st.__dict__}
+        arquivo_original = rastreamento.ARQUIVO_RASTROS
+        rastreamento.ARQUIVO_RASTROS = os.path.join(tempfile.mkdtemp(), 'rastros_teste.db')
+
+        def secao():
+            return rastro_atual()
+
+        try:
+            # Versões sem fragmentos (anteriores à 1.33): a seção é a própria função
+            for nome in originais:
+                delattr(st, nome)
+            if fragmento("Teste")(secao) is not secao:
+                print("❌ Sem fragmentos a seção deveria ser a própria função")
+                return False
+
+            # Versões com fragmentos: a seção passa pelo decorador do Streamlit
+            decoradas = []
+
+            def fragment_falso(funcao):
+                decoradas.append(funcao)
+                return funcao
+
+            st.fragment = fragment_falso
+            isolada = fragmento("Teste")(secao)
+            if decoradas != [isolada] or isolada is secao:
+                print(f"❌ Seção não passou pelo st.fragment: {decoradas}")
+                return False
+
+            # Rerun só da seção: abre o próprio rastro e o fecha no fim
+            iniciar_rastro().encerrar()  # Nenhum rastro aberto na thread
+            rastro_secao = isolada()
+            if (rastro_secao is None or not rastro_secao.pagina.endswith('› Teste')
+                    or not rastro_secao.encerrado or rastro_atual() is not None):
+                print(f"❌ Rastro da seção incorreto: {rastro_secao and rastro_secao.pagina}")
+                return False
+
+            # Dentro do rerun completo: usa o rastro da página, sem encerrá-lo
+            rastro = iniciar_rastro('Dashboard')
+            if isolada() is not rastro or rastro.encerrado:
+                print("❌ Seção dentro da página não usou o rastro da página")
+                return False
+            rastro.encerrar()
+        finally:
+            rastreamento.ARQUIVO_RASTROS = arquivo_original
+            for nome in nomes:
+                if nome in st.__dict__ and nome not in originais:
+                    delattr(st, nome)
+            for nome, valor in originais.items():
+                setattr(st, nome, valor)
+
+        print("✅ Fragmentos OK (com e sem st.fragment)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro nos fragmentos: {e}")
+def test_busca_reservas():
+    """Testa a busca de reservas: filtros, páginas por cursor, CPF e arquivo morto"""
+    print("\n🔍 Testando busca de reservas...")
+
+    try:
+        import sqlite3
+        import tempfile
+        from datetime import date, timedelta
+        import arquivo_reservas
+        from busca_reservas import buscar_reservas, explicar_busca, cursor_para_texto, ler_cursor
+
+        db_file = os.path.join(tempfile.mkdtemp(), 'busca_teste.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript("""
+            CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT, placa TEXT UNIQUE, diaria REAL, preco_km REAL, km_atual INTEGER);
+            CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT, cpf TEXT UNIQUE);
+            CREATE TABLE reservas (id INTEGER PRIMARY KEY AUTOINCREMENT, carro_id INTEGER, cliente_id INTEGER,
+                data_inicio DATE, data_fim DATE, reserva_status TEXT, status TEXT, valor_total REAL, km_saida INTEGER,
+                km_volta INTEGER, km_franquia INTEGER, adiantamento REAL, valor_multas REAL, valor_danos REAL, valor_outros REAL);
+            INSERT INTO carros VALUES (1, 'Mobi', 'ABC-1234', 100, 1, 0), (2, 'Onix', 'XYZ9876', 150, 1.5, 0);
+            INSERT INTO clientes VALUES (1, 'Maria Souza', '123.456.789-09'), (2, 'Mário Lima', '98765432100');
+        """)
+        inicio = date(2025, 1, 1)
+        conn.executemany("""
+            INSERT INTO reservas (carro_id, cliente_id, data_inicio, data_fim, reserva_status, status, valor_total)
+            VALUES (?, ?, ?, ?, ?, ?, 100)
+        """, [(i % 2 + 1, i % 2 + 1, inicio + timedelta(days=i // 2), inicio + timedelta(days=i // 2 + 2),
+               'Finalizada' if i < 30 else 'Reservada', 'Finalizada' if i < 30 else 'Ativa') for i in range(40)])
+        conn.commit()
+        conn.close()
+
+        # Páginas por cursor (datas repetidas): nenhuma reserva repetida ou perdida
+        vistos, cursor = [], None
+        while True:
+            linhas, cursor = buscar_reservas(depois=cursor, limite=7, db_file=db_file)
+            vistos += [linha['id'] for linha in linhas]
+            if cursor is None:
+                break
+        if vistos != sorted(range(1, 41), key=lambda i: ((i - 1) // 2, i), reverse=True):
+            print(f"❌ Paginação por cursor incorreta: {vistos}")
+            return False
+
+        ativas, proximo = buscar_reservas(status=('Reservada', 'Locada'), ordem='asc', db_file=db_file)
+        placa, _ = buscar_reservas(placa='abc1234', db_file=db_file)
+        cpf, _ = buscar_reservas(cliente='12345678909', db_file=db_file)
+        nome, _ = buscar_reservas(cliente='mari', db_file=db_file)
+        periodo, _ = buscar_reservas(status='Finalizada', inicio_de=date(2025, 1, 3), inicio_ate=date(2025, 1, 4),
+                                     db_file=db_file)
+        if [linha['id'] for linha in ativas] != list(range(31, 41)) or proximo is not None \
+                or {linha['placa'] for linha in placa} != {'ABC-1234'} or len(placa) != 20 \
+                or {linha['cliente'] for linha in cpf} != {'Maria Souza'} or len(nome) != 20 \
+                or [linha['id'] for linha in periodo] != [8, 7, 6, 5]:
+            print(f"❌ Filtros incorretos: {len(ativas)} ativas, {len(placa)} placa, {len(cpf)} CPF, "
+                  f"{len(nome)} nome, período {[linha['id'] for linha in periodo]}")
+            return False
+        if buscar_reservas(placa='ZZZ', db_file=db_file) != ([], None):
+            print("❌ Placa inexistente devolveu reservas")
+            return False
+        for filtro, indice in (('status', 'idx_reservas_status_inicio'), ('placa', 'idx_reservas_carro_inicio'),
+                               ('cliente', 'idx_reservas_cliente_inicio'), ('ordem', 'idx_reservas_inicio')):
+            plano = explicar_busca(db_file, **{filtro: 'asc' if filtro == 'ordem' else 'Finalizada'})
+            if not any(indice in passo for passo in plano):
+                print(f"❌ Índice {indice} não usado na busca por {filtro}: {plano}")
+                return False
+
+        # Com o arquivo morto as duas origens são intercaladas na mesma ordem
+        arquivo_reservas.arquivar_reservas(db_file, dias=365, hoje=date(2026, 1, 10))
+        atuais, _ = buscar_reservas(limite=100, db_file=db_file)
+        todas, cursor = buscar_reservas(limite=25, incluir_arquivo=True, db_file=db_file)
+        resto, fim = buscar_reservas(depois=ler_cursor(cursor_para_texto(cursor)), limite=25, incluir_arquivo=True,
+                                     db_file=db_file)
+        if len(atuais) >= 40 or fim is not None or [linha['id'] for linha in todas + resto] != vistos \
+                or not any(linha['arquivada'] for linha in resto):
+            print(f"❌ Busca com arquivo morto incorreta: {[linha['id'] for linha in todas + resto]}")
+            return False
+
+        print("✅ Busca de reservas OK")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro na busca de reservas: {e}")
+        return False
+
+def test_restauracao():
+    """Testa a restauração a quente: verificação, troca em transação e novas conexões no pool"""
+    print("\n🔍 Testando restauração de backup...")
+
+    try:
+        import sqlite3
+        import tempfile
+        from conexao import obter_pool, ao_restaurar
+        from restauracao import restaurar, ultima_restauracao, copiar_banco
+
+        pasta = tempfile.mkdtemp()
+        db_file = os.path.join(pasta, 'restauracao_teste.db')
+        backup = os.path.join(pasta, 'backup.db')
+        conn = sqlite3.connect(db_file)
+        conn.executescript("""
+            CREATE TABLE carros (id INTEGER PRIMARY KEY, modelo TEXT);
+            CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT);
+            CREATE TABLE reservas (id INTEGER PRIMARY KEY, carro_id INTEGER);
+            INSERT INTO carros VALUES (1, 'Mobi');
+        """)
+        conn.commit()
+        conn.close()
+        copiar_banco(db_file, backup)
+
+        avisados = []
+        ao_restaurar(avisados.append)
+        pool = obter_pool(db_file)
+        with pool.conexao() as conn:
+            conn.execute("INSERT INTO carros VALUES (2, 'Onix')")
+            conn.commit()
+        leitor = sqlite3.connect(db_file)  # Conexão aberta durante a troca (outra réplica)
+        leitor.execute("SELECT COUNT(*) FROM carros").fetchone()
+
+        seguranca = os.path.join(pasta, 'seguranca.db')
+        sucesso, relatorio = restaurar(backup, db_file, seguranca)
+        if not sucesso or relatorio['modo'] != 'transacao' \
+                or set(relatorio['etapas']) != {'copia', 'verificacao', 'seguranca', 'troca'}:
+            print(f"❌ Restauração falhou: {relatorio}")
+            return False
+        with pool.conexao() as conn:
+            carros = conn.execute("SELECT COUNT(*) FROM carros").fetchone()[0]
+        copia = sqlite3.connect(seguranca)
+        na_copia = copia.execute("SELECT COUNT(*) FROM carros").fetchone()[0]
+        copia.close()
+        if carros != 1 or leitor.execute("SELECT COUNT(*) FROM carros").fetchone()[0] != 1 or na_copia != 2:
+            print(f"❌ Conteúdo após a restauração incorreto: {carros} carros, cópia de segurança com {na_copia}")
+            return False
+        leitor.close()
+        if avisados != [db_file] or pool.abertas != 1 or ultima_restauracao(db_file)['backup'] != backup:
+            print(f"❌ Pool/caches não avisados: {avisados}, {pool.abertas} conexões abertas")
+            return False
+        if [nome for nome in os.listdir(pasta) if '.restaurando.' in nome]:
+            print("❌ Arquivo de preparação não removido")
+            return False
+
+        # Backups recusados não tocam no banco em uso
+        antigo = os.path.join(pasta, 'antigo.db')
+        conn = sqlite3.connect(antigo)
+        conn.executescript("""
+            CREATE TABLE carros (id INTEGER PRIMARY KEY);
+            CREATE TABLE clientes (id INTEGER PRIMARY KEY, nome TEXT);
+        """)
+        conn.close()
+        corrompido = os.path.join(pasta, 'corrompido.db')
+        with open(corrompido, 'wb') as arquivo:
+            arquivo.write(b'isto nao e um banco' * 100)
+        recusas = [restaurar(antigo, db_file), restaurar(corrompido, db_file), restaurar(db_file, db_file)]
+        if any(sucesso for sucesso, _ in recusas) or 'modelo' not in recusas[0][1] or 'reservas' not in recusas[0][1]:
+            print(f"❌ Backup inválido aceito: {recusas}")
+            return False
+        with pool.conexao() as conn:
+            if conn.execute("SELECT modelo FROM carros").fetchall() != [('Mobi',)]:
+                print("❌ Banco alterado por uma restauração recusada")
+                return False
+
+        print(f"✅ Restauração de backup OK ({relatorio['segundos'] * 1000:.0f} ms)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro na restauração: {e}")
+        return False
+
+def test_api_startup_e_erros():
+    """Testa a API: importação sem efeitos, estrutura criada no startup e erro 500 sem detalhes"""
+    print("\n🔍 Testando startup e erros da API...")
+
+    try:
+        import asyncio
+        import json
+        import sqlite3
+        import tempfile
+        import api
+
+        # Importar a API não carrega o init_db (mensagens do Streamlit e inicialização do banco)
+        importados = subprocess.run([sys.executable, '-c', "import sys, api; print('init_db' in sys.modules)"],
+                                    capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if importados.stdout.strip() != 'False':
+            print(f"❌ Importar a API carregou o init_db: {importados.stdout} {importados.stderr[-300:]}")
+            return False
+
+        async def chamar(scope, mensagens):
+            enviadas = []
+
+            async def receive():
+                return mensagens.pop(0)
+
+            async def send(mensagem):
+                enviadas.append(mensagem)
+
+            await api.app(scope, receive, send)
+            return enviadas
+
+        # Startup: banco de filial sem tabelas ganha a estrutura
+        db_file = os.path.join(tempfile.mkdtemp(), 'api_teste.db')
+        bancos_originais, sonda_original = api.bancos_das_filiais, api.sonda
+        api.bancos_das_filiais = lambda: [db_file]
+        try:
+            enviadas = asyncio.run(chamar({'type': 'lifespan'}, [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]))
+            conn = sqlite3.connect(db_file)
+            tabelas = {linha[0] for linha in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            conn.close()
+            if ([m['type'] for m in enviadas] != ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+                    or not {'carros', 'clientes', 'reservas'} <= tabelas):
+                print(f"❌ Startup da API incorreto: {enviadas} {tabelas}")
+                return False
+
+            # Erro inesperado: 500 genérico, sem SQL nem caminhos na resposta
+            def sonda_com_erro(banco):
+                raise sqlite3.OperationalError(f"no such table: segredo ({banco})")
+
+            api.sonda = sonda_com_erro
+            enviadas = asyncio.run(chamar({'type': 'http', 'method': 'GET', 'path': '/api/saude', 'query_string': b''},
+                                          [{'type': 'http.request', 'body': b'', 'more_body': False}]))
+        finally:
+            api.bancos_das_filiais, api.sonda = bancos_originais, sonda_original
+
+        corpo = json.loads(b''.join(m.get('body', b'') for m in enviadas if m['type'] == 'http.response.body'))
+        if enviadas[0]['status'] != 500 or corpo != {'erro': "Erro interno"}:
+            print(f"❌ Resposta de erro interno incorreta: {enviadas[0]['status']} {corpo}")
+            return False
+
+        print("✅ API OK (startup cria a estrutura; erro 500 sem detalhes)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erro na API: {e}")
+        return False
+
 def main():
     """Executa todos os testes"""
     print("🚗 Iniciando testes da Locadora Strealit v4.9")
@@ -192,6 +1943,32 @@ def main():
         ("Sistema de Autenticação", test_auth_system),
         ("Geração de PDFs", test_pdf_generation),
         ("Sistema de Backup", test_backup_system),
+        ("Cache Sincronizado", test_cache_sync),
+        ("Repositório", test_repositorio),
+        ("Consultas Parametrizadas", test_consultas_estaticas),
+        ("Indicadores da Frota", test_indicadores_frota),
+        ("Operações de Domínio", test_operacoes),
+        ("Importação em Lote", test_importacao),
+        ("Exportação de Documentos", test_exportacao_documentos),
+        ("Modelos PDF", test_modelos_pdf),
+        ("Formatação para Exibição", test_formatacao),
+        ("Cópia Analítica", test_snapshot_analitico),
+        ("Agendador", test_agendador),
+        ("Monitor de Armazenamento", test_armazenamento),
+        ("Arquivo Morto de Reservas", test_arquivo_reservas),
+        ("Armazém de Downloads", test_armazem_blobs),
+        ("Roteamento por Filial", test_filiais),
+        ("Limite de Login", test_limite_login),
+        ("Saúde do Banco", test_saude_banco),
+        ("Janelas de disponibilidade", test_janelas_disponibilidade),
+        ("Simulação da frota", test_simulacao_frota),
+        ("Livro de eventos", test_eventos_reservas),
+        ("Rastreamento de Renderização", test_rastreamento),
+        ("Parâmetros dos Widgets", test_parametros_widgets),
+        ("Fragmentos", test_fragmentos),
+        ("Busca de Reservas", test_busca_reservas),
+        ("Restauração a Quente", test_restauracao),
+        ("API (startup e erros)", test_api_startup_e_erros),
     ]
 
     results = []